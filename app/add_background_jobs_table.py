@@ -0,0 +1,99 @@
+"""
+Migration pour créer la table background_jobs (registre partagé des jobs d'arrière-plan:
+rematch selfie, uploads asynchrones).
+
+Usage:
+    python add_background_jobs_table.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from database import engine
+
+
+def run_migration():
+    """Crée la table background_jobs si elle n'existe pas."""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+
+    if "background_jobs" in existing_tables:
+        print("[Migration][background_jobs] Table already exists, skipping creation")
+        return True
+
+    print("[Migration][background_jobs] Creating background_jobs table...")
+
+    create_sql = """
+    CREATE TABLE background_jobs (
+        id VARCHAR PRIMARY KEY,
+        kind VARCHAR NOT NULL,
+        subject_key VARCHAR NOT NULL,
+        user_id INTEGER,
+        event_id INTEGER,
+        status VARCHAR NOT NULL DEFAULT 'pending',
+        cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+        total INTEGER NOT NULL DEFAULT 0,
+        processed INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        matched INTEGER NOT NULL DEFAULT 0,
+        details_json TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP WITH TIME ZONE,
+        finished_at TIMESTAMP WITH TIME ZONE
+    )
+    """
+
+    create_sql_sqlite = """
+    CREATE TABLE background_jobs (
+        id VARCHAR PRIMARY KEY,
+        kind VARCHAR NOT NULL,
+        subject_key VARCHAR NOT NULL,
+        user_id INTEGER,
+        event_id INTEGER,
+        status VARCHAR NOT NULL DEFAULT 'pending',
+        cancel_requested BOOLEAN NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        processed INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        matched INTEGER NOT NULL DEFAULT 0,
+        details_json TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+    """
+
+    with engine.connect() as conn:
+        try:
+            is_sqlite = "sqlite" in str(engine.url).lower()
+            conn.execute(text(create_sql_sqlite if is_sqlite else create_sql))
+            conn.commit()
+            print("[Migration][background_jobs] ✓ Table created")
+
+            for name, cols in (
+                ("idx_background_jobs_subject", "kind, subject_key, status"),
+                ("idx_background_jobs_created", "created_at"),
+            ):
+                try:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON background_jobs ({cols})"))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"[Migration][background_jobs] Warning creating index {name}: {e}")
+            return True
+        except Exception as e:
+            conn.rollback()
+            if "already exists" in str(e).lower():
+                print("[Migration][background_jobs] Table already exists")
+                return True
+            print(f"[Migration][background_jobs] ERROR: {e}")
+            return False
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,27 @@
+"""
+Migration: add nullable events.face_quality_gate (JSON override of the face quality gate).
+
+Safe to run multiple times on PostgreSQL and SQLite.
+"""
+
+from database import engine
+from sqlalchemy import text
+
+
+def add_event_face_quality_gate():
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE events ADD COLUMN face_quality_gate TEXT"))
+            conn.commit()
+            print("[Migration] Column events.face_quality_gate added")
+        except Exception as e:
+            conn.rollback()
+            err = str(e).lower()
+            if "duplicate" in err or "already exists" in err or "duplicate column" in err:
+                print("[Migration] Column events.face_quality_gate already exists, skipping")
+            else:
+                print(f"[Migration] Warning adding events.face_quality_gate: {e}")
+
+
+if __name__ == "__main__":
+    add_event_face_quality_gate()
@@ -0,0 +1,85 @@
+"""
+Script de migration pour le stockage des binaires photo hors de la base (blob store).
+
+Colonnes ajoutées:
+    - photos.blob_key, photos.thumbnail_blob_key, photos.preview_blob_key
+    - photo_variants.blob_key
+
+Les binaires existants sont déplacés par blob_migration.py (en arrière-plan, reprenable).
+
+Usage:
+    python add_photo_blob_keys.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire courant au path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text, inspect
+from database import engine
+
+
+COLUMNS = {
+    "photos": ["blob_key", "thumbnail_blob_key", "preview_blob_key"],
+    "photo_variants": ["blob_key"],
+}
+
+
+def add_photo_blob_keys():
+    """Ajoute les colonnes *_blob_key et leurs index s'ils n'existent pas."""
+
+    inspector = inspect(engine)
+    for table, columns in COLUMNS.items():
+        try:
+            existing_columns = [col['name'] for col in inspector.get_columns(table)]
+        except Exception as e:
+            # Table absente: create_all la créera avec toutes les colonnes
+            print(f"[Migration] Table '{table}' not found, skipping: {e}")
+            continue
+
+        with engine.connect() as conn:
+            for col_name in columns:
+                if col_name in existing_columns:
+                    print(f"[Migration] Column '{table}.{col_name}' already exists")
+                    continue
+                try:
+                    if engine.dialect.name == "postgresql":
+                        sql = f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col_name} VARCHAR(64)"
+                    else:
+                        sql = f"ALTER TABLE {table} ADD COLUMN {col_name} VARCHAR(64)"
+                    conn.execute(text(sql))
+                    conn.commit()
+                    print(f"[Migration] Added column '{table}.{col_name}'")
+                except Exception as e:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                    if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                        print(f"[Migration] Column '{table}.{col_name}' already exists")
+                    else:
+                        print(f"[Migration] Error adding column '{table}.{col_name}': {e}")
+
+        # Index de vérification des références avant suppression d'un blob
+        for col_name in columns:
+            index_name = f"ix_{table}_{col_name}"
+            try:
+                with engine.connect() as conn:
+                    if engine.dialect.name in ("postgresql", "sqlite"):
+                        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({col_name})"))
+                    else:
+                        conn.execute(text(f"CREATE INDEX {index_name} ON {table} ({col_name})"))
+                    conn.commit()
+            except Exception as e:
+                if "already exists" not in str(e).lower():
+                    print(f"[Migration] Warning creating index {index_name}: {e}")
+
+    print("[Migration] Photo blob keys migration completed")
+
+
+if __name__ == "__main__":
+    add_photo_blob_keys()
@@ -0,0 +1,104 @@
+"""
+Script de migration pour la déduplication des photos par contenu.
+
+Colonne ajoutée:
+    - photos.content_sha256: empreinte SHA-256 du fichier uploadé
+
+Index ajouté:
+    - uq_photos_event_sha256 (event_id, content_sha256) UNIQUE, partiel (content_sha256 renseigné):
+      deux uploads concurrents du même fichier ne peuvent pas créer deux photos. Les doublons
+      existants perdent leur empreinte avant la création (la photo gardée est la plus ancienne
+      hors FAILED); l'ancien index non unique idx_photos_event_sha256 est supprimé.
+
+Usage:
+    python add_photo_content_hash_column.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire courant au path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text, inspect
+from database import engine
+
+
+def add_photo_content_hash_column():
+    """Ajoute photos.content_sha256 et l'index unique (event_id, content_sha256) s'ils n'existent pas."""
+
+    inspector = inspect(engine)
+    try:
+        existing_columns = [col['name'] for col in inspector.get_columns('photos')]
+    except Exception as e:
+        # Table absente: create_all la créera avec toutes les colonnes
+        print(f"[Migration] Table 'photos' not found, skipping: {e}")
+        return
+
+    with engine.connect() as conn:
+        if "content_sha256" in existing_columns:
+            print("[Migration] Column 'photos.content_sha256' already exists")
+        else:
+            try:
+                if engine.dialect.name == "postgresql":
+                    sql = "ALTER TABLE photos ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64)"
+                else:
+                    sql = "ALTER TABLE photos ADD COLUMN content_sha256 VARCHAR(64)"
+                conn.execute(text(sql))
+                conn.commit()
+                print("[Migration] Added column 'photos.content_sha256'")
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                    print("[Migration] Column 'photos.content_sha256' already exists")
+                else:
+                    print(f"[Migration] Error adding column 'photos.content_sha256': {e}")
+
+    # Index unique de recherche des doublons dans un événement
+    try:
+        with engine.connect() as conn:
+            # Doublons antérieurs à l'index: une seule photo garde l'empreinte par (événement, contenu)
+            cleared = conn.execute(text("""
+                UPDATE photos SET content_sha256 = NULL
+                WHERE content_sha256 IS NOT NULL AND processing_status = 'FAILED'
+                  AND EXISTS (
+                      SELECT 1 FROM photos p2
+                      WHERE p2.event_id = photos.event_id AND p2.content_sha256 = photos.content_sha256
+                        AND p2.id <> photos.id
+                        AND (p2.processing_status IS NULL OR p2.processing_status <> 'FAILED')
+                  )
+            """)).rowcount
+            cleared += conn.execute(text("""
+                UPDATE photos SET content_sha256 = NULL
+                WHERE content_sha256 IS NOT NULL
+                  AND EXISTS (
+                      SELECT 1 FROM photos p2
+                      WHERE p2.event_id = photos.event_id AND p2.content_sha256 = photos.content_sha256
+                        AND p2.id < photos.id
+                  )
+            """)).rowcount
+            if cleared:
+                print(f"[Migration] Cleared content_sha256 on {cleared} duplicate photos")
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_photos_event_sha256 "
+                "ON photos (event_id, content_sha256) WHERE content_sha256 IS NOT NULL"
+            ))
+            conn.execute(text("DROP INDEX IF EXISTS idx_photos_event_sha256"))
+            conn.commit()
+            print("[Migration] Created index 'uq_photos_event_sha256'")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("[Migration] Index 'uq_photos_event_sha256' already exists")
+        else:
+            print(f"[Migration] Warning creating index: {e}")
+
+    print("[Migration] Photo content hash migration completed")
+
+
+if __name__ == "__main__":
+    add_photo_content_hash_column()
@@ -0,0 +1,72 @@
+"""
+Script de migration pour l'export ZIP en flux des photos.
+
+Colonnes ajoutées:
+    - photos.optimized_size: taille en octets de la photo optimisée
+    - photos.optimized_crc32: CRC-32 de la photo optimisée
+
+Renseignées à l'ingestion et par la migration vers le blob store; les photos plus
+anciennes sont complétées en arrière-plan par blob_migration (phase checksums, lancée
+au démarrage), jamais pendant une requête d'export.
+
+Usage:
+    python add_photo_export_checksums.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire courant au path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text, inspect
+from database import engine
+
+
+PHOTO_COLUMNS = [
+    ("optimized_size", "INTEGER"),
+    ("optimized_crc32", "BIGINT"),
+]
+
+
+def add_photo_export_checksums():
+    """Ajoute les colonnes taille/CRC-32 de la photo optimisée si elles n'existent pas."""
+
+    inspector = inspect(engine)
+    try:
+        existing_columns = [col['name'] for col in inspector.get_columns('photos')]
+    except Exception as e:
+        # Table absente: create_all la créera avec toutes les colonnes
+        print(f"[Migration] Table 'photos' not found, skipping: {e}")
+        return
+
+    with engine.connect() as conn:
+        for column, sql_type in PHOTO_COLUMNS:
+            if column in existing_columns:
+                print(f"[Migration] Column 'photos.{column}' already exists")
+                continue
+            try:
+                if engine.dialect.name == "postgresql":
+                    sql = f"ALTER TABLE photos ADD COLUMN IF NOT EXISTS {column} {sql_type}"
+                else:
+                    sql = f"ALTER TABLE photos ADD COLUMN {column} {sql_type}"
+                conn.execute(text(sql))
+                conn.commit()
+                print(f"[Migration] Added column 'photos.{column}'")
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"[Migration] Column 'photos.{column}' already exists")
+                else:
+                    print(f"[Migration] Error adding column 'photos.{column}': {e}")
+
+    print("[Migration] Photo export checksums migration completed")
+
+
+if __name__ == "__main__":
+    add_photo_export_checksums()
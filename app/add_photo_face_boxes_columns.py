@@ -0,0 +1,94 @@
+"""
+Script de migration pour stocker les bounding boxes des visages dans photo_faces.
+
+Colonnes ajoutées:
+    - box_left, box_top, box_width, box_height: BoundingBox normalisée (0..1) sur l'image originale
+    - quality: Sharpness Rekognition du visage (si disponible)
+    - detection_source: rekognition | local | haar
+    - matched_user_id: utilisateur associé à ce visage (si match)
+
+Usage:
+    python add_photo_face_boxes_columns.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire courant au path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text, inspect
+from database import engine
+
+
+def add_photo_face_boxes_columns():
+    """Ajoute les colonnes de bounding box à la table photo_faces si elles n'existent pas."""
+
+    inspector = inspect(engine)
+    try:
+        existing_columns = [col['name'] for col in inspector.get_columns('photo_faces')]
+    except Exception as e:
+        # Table absente: create_all la créera avec toutes les colonnes
+        print(f"[Migration] Table 'photo_faces' not found, skipping: {e}")
+        return
+
+    columns_to_add = [
+        ("box_left", "FLOAT"),
+        ("box_top", "FLOAT"),
+        ("box_width", "FLOAT"),
+        ("box_height", "FLOAT"),
+        ("quality", "FLOAT"),
+        ("detection_source", "VARCHAR"),
+        ("matched_user_id", "INTEGER"),
+    ]
+
+    with engine.connect() as conn:
+        dialect = engine.dialect.name
+        for col_name, col_type in columns_to_add:
+            if col_name in existing_columns:
+                print(f"[Migration] Column 'photo_faces.{col_name}' already exists")
+                continue
+            try:
+                if dialect == "postgresql":
+                    sql = f"ALTER TABLE photo_faces ADD COLUMN IF NOT EXISTS {col_name} {col_type}"
+                else:
+                    sql = f"ALTER TABLE photo_faces ADD COLUMN {col_name} {col_type}"
+                conn.execute(text(sql))
+                conn.commit()
+                print(f"[Migration] Added column 'photo_faces.{col_name}'")
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"[Migration] Column 'photo_faces.{col_name}' already exists")
+                else:
+                    print(f"[Migration] Error adding column 'photo_faces.{col_name}': {e}")
+
+    # Index sur matched_user_id (lecture des visages d'un utilisateur)
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name in ("postgresql", "sqlite"):
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_photo_faces_matched_user ON photo_faces (matched_user_id)"
+                ))
+            else:
+                conn.execute(text(
+                    "CREATE INDEX idx_photo_faces_matched_user ON photo_faces (matched_user_id)"
+                ))
+            conn.commit()
+            print("[Migration] Created index 'idx_photo_faces_matched_user'")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("[Migration] Index 'idx_photo_faces_matched_user' already exists")
+        else:
+            print(f"[Migration] Warning creating index: {e}")
+
+    print("[Migration] Photo face boxes columns migration completed")
+
+
+if __name__ == "__main__":
+    add_photo_face_boxes_columns()
@@ -0,0 +1,118 @@
+"""
+Script de migration pour la détection des quasi-doublons (hash perceptuel).
+
+Colonnes ajoutées:
+    - photos.perceptual_hash: dHash 64 bits (16 caractères hex)
+    - photos.near_duplicate_of: photo source dont l'analyse a été réutilisée
+    - photos.near_duplicate_distance: distance de Hamming avec la source
+    - photos.image_width / image_height: dimensions de l'image hashée (même cadrage exigé
+      pour réutiliser les boîtes de visages d'une source)
+
+Table ajoutée:
+    - photo_hash_bands (photo_id, event_id, band, value): index des bandes de 16 bits
+      du dHash, recherche des candidats par (event_id, band, value)
+
+Usage:
+    python add_photo_perceptual_hash.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire courant au path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text, inspect
+from database import engine
+
+
+PHOTO_COLUMNS = [
+    ("perceptual_hash", "VARCHAR(16)"),
+    ("near_duplicate_of", "INTEGER"),
+    ("near_duplicate_distance", "INTEGER"),
+    ("image_width", "INTEGER"),
+    ("image_height", "INTEGER"),
+]
+
+
+def add_photo_perceptual_hash():
+    """Ajoute les colonnes de hash perceptuel sur photos et la table photo_hash_bands."""
+
+    inspector = inspect(engine)
+    try:
+        existing_columns = [col['name'] for col in inspector.get_columns('photos')]
+    except Exception as e:
+        # Table absente: create_all la créera avec toutes les colonnes
+        print(f"[Migration] Table 'photos' not found, skipping: {e}")
+        return
+
+    with engine.connect() as conn:
+        for column, sql_type in PHOTO_COLUMNS:
+            if column in existing_columns:
+                print(f"[Migration] Column 'photos.{column}' already exists")
+                continue
+            try:
+                if engine.dialect.name == "postgresql":
+                    sql = f"ALTER TABLE photos ADD COLUMN IF NOT EXISTS {column} {sql_type}"
+                else:
+                    sql = f"ALTER TABLE photos ADD COLUMN {column} {sql_type}"
+                conn.execute(text(sql))
+                conn.commit()
+                print(f"[Migration] Added column 'photos.{column}'")
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"[Migration] Column 'photos.{column}' already exists")
+                else:
+                    print(f"[Migration] Error adding column 'photos.{column}': {e}")
+
+    if "photo_hash_bands" not in inspector.get_table_names():
+        try:
+            with engine.connect() as conn:
+                id_type = "SERIAL PRIMARY KEY" if engine.dialect.name == "postgresql" else "INTEGER PRIMARY KEY AUTOINCREMENT"
+                conn.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS photo_hash_bands (
+                        id {id_type},
+                        photo_id INTEGER NOT NULL REFERENCES photos(id) ON DELETE CASCADE,
+                        event_id INTEGER NOT NULL,
+                        band INTEGER NOT NULL,
+                        value INTEGER NOT NULL
+                    )
+                """))
+                conn.commit()
+                print("[Migration] Created table 'photo_hash_bands'")
+        except Exception as e:
+            print(f"[Migration] Error creating table 'photo_hash_bands': {e}")
+    else:
+        print("[Migration] Table 'photo_hash_bands' already exists")
+
+    indexes = [
+        ("idx_photo_hash_bands_lookup", "photo_hash_bands (event_id, band, value)"),
+        ("ix_photo_hash_bands_photo_id", "photo_hash_bands (photo_id)"),
+        ("ix_photos_near_duplicate_of", "photos (near_duplicate_of)"),
+    ]
+    for name, target in indexes:
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name in ("postgresql", "sqlite"):
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+                else:
+                    conn.execute(text(f"CREATE INDEX {name} ON {target}"))
+                conn.commit()
+                print(f"[Migration] Created index '{name}'")
+        except Exception as e:
+            if "already exists" in str(e).lower():
+                print(f"[Migration] Index '{name}' already exists")
+            else:
+                print(f"[Migration] Warning creating index {name}: {e}")
+
+    print("[Migration] Photo perceptual hash migration completed")
+
+
+if __name__ == "__main__":
+    add_photo_perceptual_hash()
@@ -0,0 +1,66 @@
+"""
+Script de migration pour stocker les déclinaisons des photos (galeries).
+
+Colonnes ajoutées:
+    - photos.thumbnail_data: vignette JPEG (~320 px)
+    - photos.preview_data: aperçu JPEG (~1024 px)
+
+Les photos existantes reçoivent leurs déclinaisons au premier appel de
+/api/photo/{id}?size=thumbnail|preview.
+
+Usage:
+    python add_photo_renditions_columns.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire courant au path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text, inspect
+from database import engine
+
+
+def add_photo_renditions_columns():
+    """Ajoute photos.thumbnail_data et photos.preview_data si elles n'existent pas."""
+
+    inspector = inspect(engine)
+    try:
+        existing_columns = [col['name'] for col in inspector.get_columns('photos')]
+    except Exception as e:
+        # Table absente: create_all la créera avec toutes les colonnes
+        print(f"[Migration] Table 'photos' not found, skipping: {e}")
+        return
+
+    binary_type = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+    with engine.connect() as conn:
+        for col_name in ("thumbnail_data", "preview_data"):
+            if col_name in existing_columns:
+                print(f"[Migration] Column 'photos.{col_name}' already exists")
+                continue
+            try:
+                if engine.dialect.name == "postgresql":
+                    sql = f"ALTER TABLE photos ADD COLUMN IF NOT EXISTS {col_name} {binary_type}"
+                else:
+                    sql = f"ALTER TABLE photos ADD COLUMN {col_name} {binary_type}"
+                conn.execute(text(sql))
+                conn.commit()
+                print(f"[Migration] Added column 'photos.{col_name}'")
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"[Migration] Column 'photos.{col_name}' already exists")
+                else:
+                    print(f"[Migration] Error adding column 'photos.{col_name}': {e}")
+
+    print("[Migration] Photo renditions columns migration completed")
+
+
+if __name__ == "__main__":
+    add_photo_renditions_columns()
@@ -0,0 +1,78 @@
+"""
+Migration pour créer la table photo_variants (déclinaisons WebP/AVIF des photos,
+servies selon l'en-tête Accept de /api/photo/{id}).
+
+Usage:
+    python add_photo_variants_table.py
+
+Ce script est idempotent: il peut être exécuté plusieurs fois sans erreur.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from database import engine
+
+
+def run_migration():
+    """Crée la table photo_variants et son index unique si nécessaire."""
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+
+    if "photo_variants" in existing_tables:
+        print("[Migration][photo_variants] Table already exists, skipping creation")
+    else:
+        print("[Migration][photo_variants] Creating photo_variants table...")
+        if engine.dialect.name == "postgresql":
+            create_sql = """
+            CREATE TABLE photo_variants (
+                id SERIAL PRIMARY KEY,
+                photo_id INTEGER NOT NULL REFERENCES photos(id) ON DELETE CASCADE,
+                rendition VARCHAR NOT NULL,
+                format VARCHAR NOT NULL,
+                data BYTEA,
+                size_bytes INTEGER,
+                source_size_bytes INTEGER,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        else:
+            create_sql = """
+            CREATE TABLE photo_variants (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                photo_id INTEGER NOT NULL REFERENCES photos(id) ON DELETE CASCADE,
+                rendition VARCHAR NOT NULL,
+                format VARCHAR NOT NULL,
+                data BLOB,
+                size_bytes INTEGER,
+                source_size_bytes INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(create_sql))
+                conn.commit()
+            print("[Migration][photo_variants] Table created")
+        except Exception as e:
+            print(f"[Migration][photo_variants] Error creating table: {e}")
+            return False
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_photo_variants_photo_rendition_format "
+                "ON photo_variants (photo_id, rendition, format)"
+            ))
+            conn.commit()
+    except Exception as e:
+        print(f"[Migration][photo_variants] Warning creating index: {e}")
+
+    return True
+
+
+if __name__ == "__main__":
+    run_migration()
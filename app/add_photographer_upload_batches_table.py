@@ -1,6 +1,6 @@
 """
 Migration pour créer la table photographer_upload_batches
-et ajouter la colonne photos.upload_batch_id.
+et ajouter les colonnes photos.upload_batch_id et photographer_upload_batches.reserved_photos.
 
 Usage:
     python add_photographer_upload_batches_table.py
@@ -35,6 +35,7 @@ def _create_batches_table() -> bool:
         event_id INTEGER NOT NULL REFERENCES events(id),
         photographer_id INTEGER NOT NULL REFERENCES users(id),
         total_photos INTEGER NOT NULL DEFAULT 0,
+        reserved_photos INTEGER NOT NULL DEFAULT 0,
         processed_count INTEGER NOT NULL DEFAULT 0,
         success_count INTEGER NOT NULL DEFAULT 0,
         error_count INTEGER NOT NULL DEFAULT 0,
@@ -52,6 +53,7 @@ def _create_batches_table() -> bool:
         event_id INTEGER NOT NULL REFERENCES events(id),
         photographer_id INTEGER NOT NULL REFERENCES users(id),
         total_photos INTEGER NOT NULL DEFAULT 0,
+        reserved_photos INTEGER NOT NULL DEFAULT 0,
         processed_count INTEGER NOT NULL DEFAULT 0,
         success_count INTEGER NOT NULL DEFAULT 0,
         error_count INTEGER NOT NULL DEFAULT 0,
@@ -133,10 +135,47 @@ def _add_photo_upload_batch_column() -> bool:
     return True
 
 
+def _add_batch_reserved_column() -> bool:
+    inspector = inspect(engine)
+    try:
+        existing_columns = [col["name"] for col in inspector.get_columns("photographer_upload_batches")]
+    except Exception as e:
+        print(f"[Migration][upload_batches] Table photographer_upload_batches not found: {e}")
+        return False
+
+    if "reserved_photos" in existing_columns:
+        print("[Migration][upload_batches] Column reserved_photos already exists")
+        return True
+
+    print("[Migration][upload_batches] Adding column photographer_upload_batches.reserved_photos...")
+
+    with engine.connect() as conn:
+        try:
+            if engine.dialect.name == "postgresql":
+                sql = "ALTER TABLE photographer_upload_batches ADD COLUMN IF NOT EXISTS reserved_photos INTEGER NOT NULL DEFAULT 0"
+            else:
+                sql = "ALTER TABLE photographer_upload_batches ADD COLUMN reserved_photos INTEGER NOT NULL DEFAULT 0"
+            conn.execute(text(sql))
+            # Lots existants: les fichiers déjà annoncés sont au plus le total connu
+            conn.execute(text("UPDATE photographer_upload_batches SET reserved_photos = total_photos"))
+            conn.commit()
+            print("[Migration][upload_batches] ✓ Column reserved_photos added")
+        except Exception as e:
+            if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+                print("[Migration][upload_batches] Column reserved_photos already exists")
+            else:
+                print(f"[Migration][upload_batches] ✗ Failed to add reserved_photos: {e}")
+                conn.rollback()
+                return False
+
+    return True
+
+
 def run_migration():
     ok_table = _create_batches_table()
     ok_column = _add_photo_upload_batch_column()
-    success = ok_table and ok_column
+    ok_reserved = _add_batch_reserved_column()
+    success = ok_table and ok_column and ok_reserved
     if success:
         print("[Migration][upload_batches] Migration completed successfully")
     else:
@@ -55,6 +55,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_url_token(user_id: int, purpose: str, ttl_seconds: int) -> str:
+    """
+    Jeton court dédié à un usage, pour les URL (EventSource, lien de téléchargement), qui ne
+    peuvent pas porter d'en-tête Authorization. Contrairement au JWT de session, il peut
+    fuiter sans risque durable (historique, logs, Referer): il expire vite et n'est valable
+    que pour `purpose` (ex. "event_stream", "photos_zip:user:42").
+    """
+    return create_access_token(
+        {"sub": f"url:{user_id}", "user_id": user_id, "purpose": purpose},
+        expires_delta=timedelta(seconds=max(1, int(ttl_seconds))),
+    )
+
+def verify_url_token(token: str, purpose: str) -> int:
+    """Vérifie un jeton d'URL pour l'usage demandé et retourne l'user_id (401 sinon)."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    user_id = payload.get("user_id")
+    if payload.get("purpose") != purpose or user_id is None:
+        raise credentials_exception
+    return int(user_id)
+
 def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """Vérifie et décode le token JWT"""
     credentials_exception = HTTPException(
@@ -69,6 +96,9 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
         
         if username is None:
             raise credentials_exception
+        # Jeton d'URL (create_url_token): limité à son usage, jamais accepté par l'API
+        if payload.get("purpose"):
+            raise credentials_exception
     except JWTError:
         raise credentials_exception
     
@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 from database import get_db, create_tables
 from models import User, Photo, FaceMatch, Event, UserEvent, UserType
 from recognizer_factory import get_face_recognizer
+from blob_store import read_photo_bytes
 
 def update_face_recognition_for_event(event_id: int):
     """Met à jour la reconnaissance faciale pour un événement spécifique"""
@@ -59,8 +60,8 @@ def update_face_recognition_for_event(event_id: int):
             photo_input = None
             if photo.file_path and os.path.exists(photo.file_path):
                 photo_input = photo.file_path
-            elif getattr(photo, 'photo_data', None):
-                photo_input = photo.photo_data
+            elif getattr(photo, 'blob_key', None) or getattr(photo, 'photo_data', None):
+                photo_input = read_photo_bytes(photo)
             else:
                 print(f"⚠️  Photo {photo.filename} sans fichier ni données, ignorée")
                 continue
@@ -173,8 +174,8 @@ def optimize_face_recognition():
                 photo_input = None
                 if photo.file_path and os.path.exists(photo.file_path):
                     photo_input = photo.file_path
-                elif getattr(photo, 'photo_data', None):
-                    photo_input = photo.photo_data
+                elif getattr(photo, 'blob_key', None) or getattr(photo, 'photo_data', None):
+                    photo_input = read_photo_bytes(photo)
                 else:
                     print(f"⚠️  Photo {photo.filename} sans fichier ni données, ignorée")
                     continue
@@ -1,25 +1,41 @@
 import os
+import re
+import json
 import time
+import hashlib
 import threading
 import traceback
+from collections import OrderedDict
 from typing import List, Dict, Optional, Set, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import boto3
 from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from settings import settings
 
 from models import User, Photo, FaceMatch, Event, UserEvent, PhotoFace
 from aws_metrics import aws_metrics
+from event_bus import event_bus, user_topic
+from priority_limiter import PriorityLimiter, INTERACTIVE, MAINTENANCE, current_priority, bind_priority
+from response_cache import rekognition_search_cache
 from photo_optimizer import PhotoOptimizer
+from blob_store import read_photo_bytes, store_photo_blobs
 from io import BytesIO as _BytesIO
 from PIL import Image as _Image, ImageOps as _ImageOps
 import gc as _gc
 
 
+# Version locale par collection, incrémentée à chaque IndexFaces/DeleteFaces de ce process. Les clés du
+# cache SearchFaces la combinent avec l'état en base de l'événement (_collection_db_state), seul
+# partagé entre les process Gunicorn/workers: un index fait ailleurs invalide aussi le cache.
+_collection_versions: Dict[str, int] = {}
+_collection_versions_lock = threading.Lock()
+
+
 # === EXCEPTIONS PERSONNALISÉES ===
 
 class PhotoNotFoundError(Exception):
@@ -56,6 +72,37 @@ AWS_MIN_CROP_SIDE = int(os.environ.get("AWS_REKOGNITION_MIN_CROP_SIDE", "36") or
 AWS_MIN_OUTPUT_CROP_SIDE = int(os.environ.get("AWS_REKOGNITION_MIN_OUTPUT_CROP_SIDE", "448") or "448")
 AWS_TINY_FACE_AREA_THRESHOLD = float(os.environ.get("AWS_REKOGNITION_TINY_FACE_AREA", "0.015") or "0.015")
 
+# Filtre qualité avant IndexFaces (surcharge possible par événement via events.face_quality_gate)
+AWS_FACE_QUALITY_GATE_ENABLED = os.environ.get("AWS_FACE_QUALITY_GATE_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
+AWS_FACE_QUALITY_MIN_SHARPNESS = float(os.environ.get("AWS_FACE_QUALITY_MIN_SHARPNESS", "8") or "8")
+AWS_FACE_QUALITY_MIN_BRIGHTNESS = float(os.environ.get("AWS_FACE_QUALITY_MIN_BRIGHTNESS", "15") or "15")
+AWS_FACE_QUALITY_MAX_BRIGHTNESS = float(os.environ.get("AWS_FACE_QUALITY_MAX_BRIGHTNESS", "98") or "98")
+AWS_FACE_QUALITY_MAX_YAW = float(os.environ.get("AWS_FACE_QUALITY_MAX_YAW", "60") or "60")
+AWS_FACE_QUALITY_MAX_PITCH = float(os.environ.get("AWS_FACE_QUALITY_MAX_PITCH", "45") or "45")
+AWS_FACE_QUALITY_MIN_FACE_PX = int(os.environ.get("AWS_FACE_QUALITY_MIN_FACE_PX", "40") or "40")
+_FACE_QUALITY_GATE_CACHE_TTL = 60.0
+
+
+def _parse_bool(value) -> bool:
+    """Booléen d'une surcharge JSON: bool, 0/1 ou chaîne true/false/yes/no/on/off (ValueError sinon)."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in {"1", "true", "yes", "on"}:
+            return True
+        if text in {"0", "false", "no", "off"}:
+            return False
+    raise ValueError(f"invalid boolean: {value!r}")
+
+# Snapshot graph admin (construit en tâche de fond, servi depuis le dernier résultat)
+AWS_SNAPSHOT_GRAPH_WORKERS = int(os.environ.get("AWS_SNAPSHOT_GRAPH_WORKERS", "4") or "4")
+AWS_SNAPSHOT_GRAPH_MAX_AGE = float(os.environ.get("AWS_SNAPSHOT_GRAPH_MAX_AGE", "600") or "600")
+# Nombre de graphes gardés en mémoire (LRU sur (event_id, per_user_limit, fast))
+AWS_SNAPSHOT_GRAPH_CACHE_SIZE = int(os.environ.get("AWS_SNAPSHOT_GRAPH_CACHE_SIZE", "32") or "32")
+
 # Parallélisation bornée
 MAX_PARALLEL_PER_REQUEST = 2
 AWS_MAX_RETRIES = 2
@@ -72,10 +119,64 @@ _boto_config = BotoConfig(
     retries={"max_attempts": AWS_BOTO_MAX_ATTEMPTS, "mode": "standard"},
 )
 
-# Semaphore global pour limiter la concurrence AWS Rekognition
+# Limiteur global de concurrence AWS Rekognition, à slots réservés par classe de priorité:
+# les selfies (interactive) gardent des slots même quand l'ingestion (bulk) sature le reste.
 AWS_CONCURRENT_REQUESTS = int(os.environ.get("AWS_CONCURRENT_REQUESTS", "10"))
-_aws_semaphore = threading.Semaphore(AWS_CONCURRENT_REQUESTS)
+AWS_RESERVED_INTERACTIVE = int(os.environ.get("AWS_RESERVED_INTERACTIVE", "2"))
+AWS_RESERVED_MAINTENANCE = int(os.environ.get("AWS_RESERVED_MAINTENANCE", "0"))
+_rekognition_limiter = PriorityLimiter(
+    "rekognition",
+    AWS_CONCURRENT_REQUESTS,
+    {INTERACTIVE: AWS_RESERVED_INTERACTIVE, MAINTENANCE: AWS_RESERVED_MAINTENANCE},
+)
 _AWS_SEMAPHORE_TIMEOUT = 15.0
+_ensure_collection_lock = threading.Lock()
+
+
+def _face_detail_to_record(face_detail: Dict) -> Dict:
+    """Extrait BoundingBox normalisée + Sharpness d'un FaceDetail Rekognition."""
+    bb = (face_detail or {}).get("BoundingBox") or {}
+    quality = ((face_detail or {}).get("Quality") or {}).get("Sharpness")
+    return {
+        "box": {
+            "Left": float(bb.get("Left", 0.0)),
+            "Top": float(bb.get("Top", 0.0)),
+            "Width": float(bb.get("Width", 0.0)),
+            "Height": float(bb.get("Height", 0.0)),
+        } if bb else None,
+        "quality": float(quality) if quality is not None else None,
+    }
+
+
+def _photo_face_row(event_id: int, photo_id: int, face_id: str, record: Optional[Dict], source: str) -> PhotoFace:
+    box = (record or {}).get("box") or {}
+    return PhotoFace(
+        event_id=event_id,
+        photo_id=photo_id,
+        face_id=face_id,
+        box_left=box.get("Left"),
+        box_top=box.get("Top"),
+        box_width=box.get("Width"),
+        box_height=box.get("Height"),
+        quality=(record or {}).get("quality"),
+        detection_source=source,
+    )
+
+
+def _is_rekognition_face_row(row) -> bool:
+    """Les lignes sans source (antérieures aux boxes) proviennent toutes de Rekognition."""
+    return (getattr(row, "detection_source", None) or "rekognition") == "rekognition"
+
+
+def _photo_face_box(row) -> Optional[Dict[str, float]]:
+    if getattr(row, "box_width", None) is None or getattr(row, "box_height", None) is None:
+        return None
+    return {
+        "Left": float(row.box_left or 0.0),
+        "Top": float(row.box_top or 0.0),
+        "Width": float(row.box_width or 0.0),
+        "Height": float(row.box_height or 0.0),
+    }
 
 
 class AwsFaceRecognizer:
@@ -89,15 +190,16 @@ class AwsFaceRecognizer:
       * lors d'un upload photo: IndexFaces(photo) => FaceId => SearchFaces(FaceId) => ExternalImageId "user:{user_id}" => FaceMatch
     """
 
-    def __init__(self):
-        self.client = boto3.client(
+    def __init__(self, client=None):
+        # client: permet d'injecter un stand-in local (fake_rekognition.FakeRekognitionClient)
+        self.client = client or boto3.client(
             "rekognition",
             region_name=REKOGNITION_REGION,
             config=_boto_config,
         )
         print(f"[FaceRecognition][AWS] region={REKOGNITION_REGION} "
               f"connect_timeout={AWS_BOTO_CONNECT_TIMEOUT} read_timeout={AWS_BOTO_READ_TIMEOUT} "
-              f"max_attempts={AWS_BOTO_MAX_ATTEMPTS}")
+              f"max_attempts={AWS_BOTO_MAX_ATTEMPTS} client={type(self.client).__name__}")
 
         try:
             self.search_threshold: float = float(
@@ -130,6 +232,14 @@ class AwsFaceRecognizer:
         self._photos_indexed_events_lock = threading.Lock()
         # Cache FaceId par (event_id, user_id) pour accélérer les recherches
         self._user_faceid_cache: Dict[Tuple[int, int], str] = {}
+        # Filtre qualité effectif par événement: event_id -> (ts, gate)
+        self._quality_gate_cache: Dict[int, Tuple[float, Dict[str, object]]] = {}
+        self._quality_gate_lock = threading.Lock()
+        # Derniers snapshot graphs par (event_id, per_user_limit, fast), LRU borné par
+        # AWS_SNAPSHOT_GRAPH_CACHE_SIZE, + jobs de reconstruction en cours
+        self._snapshot_graphs: "OrderedDict[Tuple[int, int, bool], Dict]" = OrderedDict()
+        self._snapshot_graph_jobs: Dict[Tuple[int, int, bool], threading.Thread] = {}
+        self._snapshot_graph_lock = threading.Lock()
 
     def _get_persisted_user_face_id(self, event_id: int, user_id: int) -> Optional[str]:
         """Lit le FaceId persistant depuis la DB (UserEvent)."""
@@ -198,6 +308,91 @@ class AwsFaceRecognizer:
     def _collection_id(self, event_id: int) -> str:
         return f"{COLL_PREFIX}{event_id}"
 
+    def _event_id_from_collection(self, collection_id: Optional[str]) -> Optional[int]:
+        if not collection_id or not str(collection_id).startswith(COLL_PREFIX):
+            return None
+        rest = str(collection_id)[len(COLL_PREFIX):]
+        return int(rest) if rest.isdigit() else None
+
+    def _rek_call(self, op: str, **kwargs):
+        """Appel Rekognition instrumenté (compteur, latence, octets envoyés, retries/throttles, événement).
+
+        L'événement est déduit de CollectionId, sinon de l'action courante d'aws_metrics.
+        Les ClientError sont remontées telles quelles à l'appelant.
+        """
+        event_id = self._event_id_from_collection(kwargs.get("CollectionId"))
+        bytes_sent = 0
+        for key in ("Image", "SourceImage", "TargetImage"):
+            img = kwargs.get(key)
+            if isinstance(img, dict) and img.get("Bytes"):
+                bytes_sent += len(img["Bytes"])
+        method = getattr(self.client, re.sub(r"(?<!^)(?=[A-Z])", "_", op).lower())
+        aws_metrics.inc(op)
+        priority = current_priority()
+        token = _rekognition_limiter.acquire(priority, timeout=_AWS_SEMAPHORE_TIMEOUT)
+        if token is None:
+            # Ne jamais bloquer indéfiniment: l'appel part hors quota (visible dans les stats)
+            print(f"[AWS][Limiter] WARNING: no slot after {_AWS_SEMAPHORE_TIMEOUT}s op={op} priority={priority}")
+        t0 = time.perf_counter()
+        try:
+            resp = method(**kwargs)
+        except ClientError as e:
+            meta = e.response.get("ResponseMetadata") or {}
+            aws_metrics.observe(op, time.perf_counter() - t0, event_id=event_id, bytes_sent=bytes_sent,
+                                retries=int(meta.get("RetryAttempts", 0) or 0),
+                                error_code=e.response.get("Error", {}).get("Code"))
+            raise
+        finally:
+            _rekognition_limiter.release(priority, token)
+        meta = (resp or {}).get("ResponseMetadata") or {}
+        aws_metrics.observe(op, time.perf_counter() - t0, event_id=event_id, bytes_sent=bytes_sent,
+                            retries=int(meta.get("RetryAttempts", 0) or 0))
+        return resp
+
+    def _collection_version(self, collection_id: str) -> int:
+        with _collection_versions_lock:
+            return _collection_versions.get(collection_id, 0)
+
+    def _bump_collection_version(self, collection_id: str) -> None:
+        """Invalide les réponses SearchFaces en cache pour cette collection (contenu modifié)."""
+        with _collection_versions_lock:
+            _collection_versions[collection_id] = _collection_versions.get(collection_id, 0) + 1
+
+    def _collection_db_state(self, collection_id: str) -> Optional[str]:
+        """Contenu de la collection vu de la base: (nombre, max id) des visages photo et des selfies indexés.
+
+        None si l'état ne peut pas être lu (la réponse n'est alors pas mise en cache).
+        """
+        event_id = self._event_id_from_collection(collection_id)
+        if event_id is None:
+            return None
+        from sqlalchemy import func as _func
+        session = SessionLocal()
+        try:
+            pf = session.query(_func.count(PhotoFace.id), _func.max(PhotoFace.id)).filter(PhotoFace.event_id == event_id).one()
+            ue = (
+                session.query(_func.count(UserEvent.rekognition_face_id), _func.max(UserEvent.id))
+                .filter(UserEvent.event_id == event_id)
+                .one()
+            )
+            return "-".join(str(int(v or 0)) for v in (*pf, *ue))
+        except Exception as e:
+            print(f"[SearchCache] state read failed collection={collection_id}: {e}")
+            return None
+        finally:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def _search_cache_key(self, collection_id: str, target: str, threshold: float, max_faces: int) -> Optional[str]:
+        """Clé du cache SearchFaces, None si le contenu de la collection n'est pas connu."""
+        db_state = self._collection_db_state(collection_id)
+        if db_state is None:
+            return None
+        version = self._collection_version(collection_id)
+        return f"{collection_id}:v{version}:{db_state}:{target}:{threshold:g}:{max_faces}"
+
     def ensure_collection(self, event_id: int):
         coll_id = self._collection_id(event_id)
 
@@ -206,9 +401,9 @@ class AwsFaceRecognizer:
             if coll_id in self._known_collections:
                 return
 
-        acquired = _aws_semaphore.acquire(timeout=_AWS_SEMAPHORE_TIMEOUT)
+        acquired = _ensure_collection_lock.acquire(timeout=_AWS_SEMAPHORE_TIMEOUT)
         if not acquired:
-            print(f"[ENSURE-COLL] WARNING: semaphore timeout for coll_id={coll_id}, failing fast")
+            print(f"[ENSURE-COLL] WARNING: lock timeout for coll_id={coll_id}, failing fast")
             return
         try:
             # Double-check after acquiring
@@ -216,8 +411,7 @@ class AwsFaceRecognizer:
                 if coll_id in self._known_collections:
                     return
             try:
-                aws_metrics.inc("CreateCollection")
-                self.client.create_collection(CollectionId=coll_id)
+                self._rek_call('CreateCollection', CollectionId=coll_id)
                 print(f"[ENSURE-COLL] Created collection {coll_id}")
             except ClientError as e:
                 code = e.response.get("Error", {}).get("Code")
@@ -229,7 +423,7 @@ class AwsFaceRecognizer:
             with self._known_collections_lock:
                 self._known_collections.add(coll_id)
         finally:
-            _aws_semaphore.release()
+            _ensure_collection_lock.release()
 
 
     def index_user_selfie(self, event_id: int, user: User):
@@ -264,13 +458,12 @@ class AwsFaceRecognizer:
                 if cached_fid:
                     self._user_faceid_cache[(event_id, user.id)] = cached_fid
             if cached_fid:
-                with _aws_semaphore:
-                    try:
-                        aws_metrics.inc('DeleteFaces')
-                        self.client.delete_faces(CollectionId=coll_id, FaceIds=[cached_fid])
-                    except ClientError:
-                        # Ne pas bloquer l'indexation si la suppression échoue
-                        pass
+                try:
+                    self._rek_call('DeleteFaces', CollectionId=coll_id, FaceIds=[cached_fid])
+                    self._bump_collection_version(coll_id)
+                except ClientError:
+                    # Ne pas bloquer l'indexation si la suppression échoue
+                    pass
 
         # Préparer l'image (EXIF, RGB, dimension) et recadrer le meilleur visage
         prepared = self._prepare_image_bytes(image_bytes)
@@ -283,36 +476,35 @@ class AwsFaceRecognizer:
             return
 
         # Indexer le selfie de l'utilisateur dans la collection de l'événement
-        with _aws_semaphore:
+        try:
+            resp = self._rek_call('IndexFaces',
+                CollectionId=coll_id,
+                Image={"Bytes": best_crop},
+                ExternalImageId=f"user:{user.id}",
+                DetectionAttributes=[],
+                QualityFilter="AUTO",
+                MaxFaces=1,
+            )
+            self._bump_collection_version(coll_id)
             try:
-                aws_metrics.inc('IndexFaces')
-                resp = self.client.index_faces(
-                    CollectionId=coll_id,
-                    Image={"Bytes": best_crop},
-                    ExternalImageId=f"user:{user.id}",
-                    DetectionAttributes=[],
-                    QualityFilter="AUTO",
-                    MaxFaces=1,
-                )
-                try:
-                    face_count = len(resp.get('FaceRecords') or [])
-                    unindexed = len(resp.get('UnindexedFaces') or [])
-                    print(f"[AWS][SelfieIndex] index_faces ok user_id={user.id} faces={face_count} unindexed={unindexed}")
-                except Exception:
-                    pass
-                # Mémoriser le FaceId pour accélérer les prochaines recherches
-                try:
-                    for rec in (resp.get('FaceRecords') or []):
-                        fid = ((rec or {}).get('Face') or {}).get('FaceId')
-                        if fid:
-                            self._user_faceid_cache[(event_id, user.id)] = fid
-                            self._set_persisted_user_face_id(event_id, user.id, fid)
-                            break
-                except Exception:
-                    pass
-            except ClientError as e:
-                # Si l'indexation échoue, log pour debug
-                print(f"[AWS][SelfieIndex] index_faces error user_id={user.id}: {e}")
+                face_count = len(resp.get('FaceRecords') or [])
+                unindexed = len(resp.get('UnindexedFaces') or [])
+                print(f"[AWS][SelfieIndex] index_faces ok user_id={user.id} faces={face_count} unindexed={unindexed}")
+            except Exception:
+                pass
+            # Mémoriser le FaceId pour accélérer les prochaines recherches
+            try:
+                for rec in (resp.get('FaceRecords') or []):
+                    fid = ((rec or {}).get('Face') or {}).get('FaceId')
+                    if fid:
+                        self._user_faceid_cache[(event_id, user.id)] = fid
+                        self._set_persisted_user_face_id(event_id, user.id, fid)
+                        break
+            except Exception:
+                pass
+        except ClientError as e:
+            # Si l'indexation échoue, log pour debug
+            print(f"[AWS][SelfieIndex] index_faces error user_id={user.id}: {e}")
 
     def _delete_photo_faces(self, event_id: int, photo_id: int):
         """DB-driven: reads FaceIds from photo_faces table, deletes from Rekognition, removes DB rows."""
@@ -320,14 +512,15 @@ class AwsFaceRecognizer:
         session = SessionLocal()
         try:
             rows = session.query(PhotoFace).filter(PhotoFace.photo_id == photo_id).all()
-            face_ids_to_delete = [r.face_id for r in rows if r.face_id]
+            # Les visages locaux/Haar (FaceId synthétiques) n'existent pas dans Rekognition
+            face_ids_to_delete = [r.face_id for r in rows if r.face_id and _is_rekognition_face_row(r)]
             if face_ids_to_delete:
                 # Rekognition accepts max 4096 FaceIds per call; batch in chunks of 1000
                 for i in range(0, len(face_ids_to_delete), 1000):
                     chunk = face_ids_to_delete[i:i + 1000]
                     try:
-                        aws_metrics.inc('DeleteFaces')
-                        self.client.delete_faces(CollectionId=coll_id, FaceIds=chunk)
+                        self._rek_call('DeleteFaces', CollectionId=coll_id, FaceIds=chunk)
+                        self._bump_collection_version(coll_id)
                     except ClientError as e:
                         print(f"[DeletePhotoFaces] DeleteFaces error photo_id={photo_id}: {e}")
             # Remove DB rows
@@ -346,14 +539,20 @@ class AwsFaceRecognizer:
             except Exception:
                 pass
 
-    def _persist_photo_face_ids(self, event_id: int, photo_id: int, face_ids: List[str]):
-        """Bulk-insert FaceIds into photo_faces table."""
+    def _persist_photo_face_ids(self, event_id: int, photo_id: int, face_ids: List[str],
+                                details: Optional[Dict[str, Dict]] = None,
+                                source: str = "rekognition"):
+        """Bulk-insert FaceIds into photo_faces table.
+
+        details: {face_id: {"box": {Left, Top, Width, Height}, "quality": float}} (optionnel)
+        """
         if not face_ids:
             return
+        details = details or {}
         session = SessionLocal()
         try:
             for fid in face_ids:
-                session.add(PhotoFace(event_id=event_id, photo_id=photo_id, face_id=fid))
+                session.add(_photo_face_row(event_id, photo_id, fid, details.get(fid), source))
             session.commit()
         except Exception as e:
             print(f"[PersistPhotoFaces] error photo_id={photo_id}: {e}")
@@ -367,6 +566,28 @@ class AwsFaceRecognizer:
             except Exception:
                 pass
 
+    def _set_photo_face_matches(self, db: Session, photo_id: int,
+                                face_user_sims: Dict[str, Dict[int, int]],
+                                kept_user_ids: Dict[int, int]):
+        """Renseigne photo_faces.matched_user_id avec le meilleur utilisateur retenu par visage.
+
+        Écrit dans la session appelante: le commit final de la photo inclut ces mises à jour.
+        """
+        try:
+            db.query(PhotoFace).filter(PhotoFace.photo_id == photo_id).update(
+                {PhotoFace.matched_user_id: None}, synchronize_session=False
+            )
+            for fid, sims in face_user_sims.items():
+                candidates = [(uid, sim) for uid, sim in sims.items() if uid in kept_user_ids]
+                if not candidates:
+                    continue
+                best_uid = max(candidates, key=lambda kv: kv[1])[0]
+                db.query(PhotoFace).filter(
+                    PhotoFace.photo_id == photo_id, PhotoFace.face_id == fid
+                ).update({PhotoFace.matched_user_id: best_uid}, synchronize_session=False)
+        except Exception as e:
+            print(f"[PhotoFaceMatches] error photo_id={photo_id}: {e}")
+
     def _index_photo_faces_and_get_ids(self, event_id: int, photo_id: int, image_bytes: bytes) -> List[str]:
         """Indexe les visages d'une photo (crops carrés) et retourne la liste des FaceId créés.
         
@@ -376,19 +597,23 @@ class AwsFaceRecognizer:
         t0 = time.time()
         # DB-driven cleanup of old faces for this photo
         self._delete_photo_faces(event_id, photo_id)
-        # Détecter et recadrer tous les visages
+        # Détecter, filtrer par qualité et recadrer tous les visages
+        all_faces_rejected = False
         try:
             faces = self._detect_faces_boxes(image_bytes)
-            crops = self._crop_face_regions(image_bytes, faces) if faces else []
+            if faces:
+                faces = self._filter_faces_by_quality(event_id, photo_id, image_bytes, faces)
+                all_faces_rejected = not faces
+            crops = self._crop_face_regions_with_boxes(image_bytes, faces) if faces else []
         except Exception:
             crops = []
 
         face_ids: List[str] = []
+        face_details: Dict[str, Dict] = {}
         if crops:
-            for crop_bytes in crops:
+            for face_detail, crop_bytes in crops:
                 try:
-                    aws_metrics.inc('IndexFaces')
-                    resp = self.client.index_faces(
+                    resp = self._rek_call('IndexFaces',
                         CollectionId=coll_id,
                         Image={"Bytes": crop_bytes},
                         ExternalImageId=f"photo:{photo_id}",
@@ -396,18 +621,21 @@ class AwsFaceRecognizer:
                         QualityFilter="AUTO",
                         MaxFaces=1,
                     )
+                    self._bump_collection_version(coll_id)
                     for rec in (resp.get('FaceRecords') or []):
                         face = rec.get('Face') or {}
                         fid = face.get('FaceId')
                         if fid:
                             face_ids.append(fid)
+                            # Box du visage sur l'image originale (et non sur le crop)
+                            face_details[fid] = _face_detail_to_record(face_detail)
                 except ClientError as e:
                     print(f"[IndexFaces] crop error photo_id={photo_id}: {e}")
                     continue
-        else:
+        elif not all_faces_rejected:
+            # Repli plein cadre seulement si aucun visage n'a été écarté par le filtre qualité
             try:
-                aws_metrics.inc('IndexFaces')
-                resp = self.client.index_faces(
+                resp = self._rek_call('IndexFaces',
                     CollectionId=coll_id,
                     Image={"Bytes": image_bytes},
                     ExternalImageId=f"photo:{photo_id}",
@@ -415,17 +643,20 @@ class AwsFaceRecognizer:
                     QualityFilter="AUTO",
                     MaxFaces=50,
                 )
+                self._bump_collection_version(coll_id)
                 for rec in (resp.get('FaceRecords') or []):
                     face = rec.get('Face') or {}
                     fid = face.get('FaceId')
                     if fid:
                         face_ids.append(fid)
+                        # Image entière indexée: la BoundingBox est déjà relative à l'original
+                        face_details[fid] = _face_detail_to_record(rec.get('FaceDetail') or face)
             except ClientError as e:
                 print(f"[IndexFaces] error photo_id={photo_id}: {e}")
                 return []
 
-        # Persist face IDs to DB (single commit)
-        self._persist_photo_face_ids(event_id, photo_id, face_ids)
+        # Persist face IDs + boxes to DB (single commit)
+        self._persist_photo_face_ids(event_id, photo_id, face_ids, details=face_details)
         elapsed = time.time() - t0
         print(f"[IndexFaces] photo_id={photo_id} faces={len(face_ids)} elapsed={elapsed:.3f}s")
         return face_ids
@@ -442,7 +673,7 @@ class AwsFaceRecognizer:
             or_(Photo.is_indexed.is_(False), Photo.is_indexed.is_(None))
         ).all()
         for p in photos:
-            photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else p.photo_data
+            photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else read_photo_bytes(p)
             if not photo_input:
                 continue
             img_bytes = self._prepare_image_bytes(photo_input)
@@ -512,14 +743,55 @@ class AwsFaceRecognizer:
             # Marquer comme indexé à la FIN seulement (toujours dans le lock)
             self._indexed_events.add(event_id)
 
-    def prepare_event_for_batch(self, event_id: int, db: Session) -> None:
-        """Prépare une fois la collection pour un batch d'uploads: ensure + purge + index users."""
+    def prepare_event_for_batch(self, event_id: int, db: Session) -> Dict[str, object]:
+        """Prépare une fois la collection pour un batch d'uploads: ensure + purge + index users.
+
+        Retourne un contexte d'événement réutilisable par process_photo_from_bytes(event_context=...)
+        pour ne plus répéter cette préparation (ni les lectures associées) à chaque photo.
+        """
         self.ensure_collection(event_id)
         try:
             self._maybe_purge_collection(event_id, db)
         except Exception:
             pass
         self._maybe_ensure_event_users_indexed_for_photo(event_id, None, db)
+        self._refresh_event_photos_expiration(event_id, db)
+        return {
+            "event_id": event_id,
+            "threshold": self._photo_match_threshold(),
+            "allowed_user_ids": self._get_allowed_event_user_ids(event_id, db),
+            "prepared_at": time.time(),
+        }
+
+    def _photo_match_threshold(self) -> int:
+        """Seuil commun aligné sur la logique selfie->photos."""
+        try:
+            env_thr = int(os.environ.get('AWS_MATCH_MIN_SIMILARITY', '70') or '70')
+        except Exception:
+            env_thr = 70
+        try:
+            cfg_thr = int(round(float(getattr(self, 'search_threshold', 0) or 0)))
+        except Exception:
+            cfg_thr = 0
+        return max(env_thr, cfg_thr)
+
+    def _refresh_event_photos_expiration(self, event_id: int, db: Session) -> None:
+        """Réinitialise la date d'expiration de toutes les photos de l'événement (J+30)."""
+        try:
+            from datetime import datetime, timedelta
+            new_expiration = datetime.utcnow() + timedelta(days=30)
+            db.query(Photo).filter(
+                Photo.event_id == event_id,
+                Photo.expires_at.isnot(None)
+            ).update({
+                Photo.expires_at: new_expiration
+            }, synchronize_session=False)
+            db.commit()
+        except Exception:
+            try:
+                db.rollback()
+            except Exception:
+                pass
 
     def _get_allowed_event_user_ids(self, event_id: int, db: Session) -> set[int]:
         """Renvoie l'ensemble des user_id associés à l'événement et existant dans la table users."""
@@ -570,8 +842,7 @@ class AwsFaceRecognizer:
         et tente une deuxième passe upscalée si tous les visages détectés sont très petits.
         """
         try:
-            aws_metrics.inc('DetectFaces')
-            resp = self.client.detect_faces(Image={"Bytes": image_bytes}, Attributes=["ALL"])
+            resp = self._rek_call('DetectFaces', Image={"Bytes": image_bytes}, Attributes=["ALL"])
             faces = (resp.get("FaceDetails", []) or [])
             faces = [f for f in faces if float(f.get("Confidence", 0.0)) >= AWS_DETECT_MIN_CONF]
             if not faces:
@@ -594,8 +865,7 @@ class AwsFaceRecognizer:
                         out = _BytesIO()
                         up.save(out, format="JPEG", quality=92, optimize=False)
                         up_bytes = out.getvalue()
-                        aws_metrics.inc('DetectFaces')
-                        resp2 = self.client.detect_faces(Image={"Bytes": up_bytes}, Attributes=["ALL"])
+                        resp2 = self._rek_call('DetectFaces', Image={"Bytes": up_bytes}, Attributes=["ALL"])
                         faces2 = (resp2.get("FaceDetails", []) or [])
                         faces2 = [f for f in faces2 if float(f.get("Confidence", 0.0)) >= AWS_DETECT_MIN_CONF]
                         # Garder la passe qui retourne le plus de visages
@@ -610,12 +880,127 @@ class AwsFaceRecognizer:
             print(f"❌ AWS DetectFaces error: {e}")
             return []
 
+    # ---------- Filtre qualité ----------
+    def _default_face_quality_gate(self) -> Dict[str, object]:
+        return {
+            "enabled": AWS_FACE_QUALITY_GATE_ENABLED,
+            "min_sharpness": AWS_FACE_QUALITY_MIN_SHARPNESS,
+            "min_brightness": AWS_FACE_QUALITY_MIN_BRIGHTNESS,
+            "max_brightness": AWS_FACE_QUALITY_MAX_BRIGHTNESS,
+            "max_yaw": AWS_FACE_QUALITY_MAX_YAW,
+            "max_pitch": AWS_FACE_QUALITY_MAX_PITCH,
+            "min_face_px": AWS_FACE_QUALITY_MIN_FACE_PX,
+        }
+
+    def get_face_quality_gate(self, event_id: int) -> Dict[str, object]:
+        """Retourne le filtre qualité effectif d'un événement (défauts env + surcharge events.face_quality_gate).
+
+        Le résultat est mis en cache ~60s par process pour éviter une requête DB par photo.
+        """
+        now = time.time()
+        with self._quality_gate_lock:
+            cached = self._quality_gate_cache.get(event_id)
+            if cached and (now - cached[0]) < _FACE_QUALITY_GATE_CACHE_TTL:
+                return cached[1]
+
+        gate = self._default_face_quality_gate()
+        session = SessionLocal()
+        try:
+            raw = session.query(Event.face_quality_gate).filter(Event.id == event_id).scalar()
+            override = json.loads(raw) if raw else None
+            if isinstance(override, dict):
+                for key, default in list(gate.items()):
+                    value = override.get(key)
+                    if value is None:
+                        continue
+                    try:
+                        gate[key] = _parse_bool(value) if isinstance(default, bool) else type(default)(value)
+                    except Exception:
+                        print(f"[QualityGate] invalid override event_id={event_id} {key}={value!r}, default kept")
+        except Exception as e:
+            print(f"[QualityGate] could not load override event_id={event_id}: {e}")
+        finally:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+        with self._quality_gate_lock:
+            self._quality_gate_cache[event_id] = (now, gate)
+        return gate
+
+    def invalidate_face_quality_gate(self, event_id: Optional[int] = None) -> None:
+        """Invalide le cache du filtre qualité (un événement ou tous)."""
+        with self._quality_gate_lock:
+            if event_id is None:
+                self._quality_gate_cache.clear()
+            else:
+                self._quality_gate_cache.pop(event_id, None)
+
+    def _face_quality_reject_reason(self, face: Dict, gate: Dict[str, object], img_w: int, img_h: int) -> Optional[str]:
+        """Retourne la raison du rejet d'un visage DetectFaces, ou None s'il passe le filtre."""
+        bb = face.get("BoundingBox") or {}
+        side_px = min(float(bb.get("Width", 0.0)) * img_w, float(bb.get("Height", 0.0)) * img_h)
+        if side_px < float(gate["min_face_px"]):
+            return "too_small"
+        qual = face.get("Quality") or {}
+        sharpness = qual.get("Sharpness")
+        if sharpness is not None and float(sharpness) < float(gate["min_sharpness"]):
+            return "blurry"
+        brightness = qual.get("Brightness")
+        if brightness is not None:
+            if float(brightness) < float(gate["min_brightness"]):
+                return "too_dark"
+            if float(brightness) > float(gate["max_brightness"]):
+                return "overexposed"
+        pose = face.get("Pose") or {}
+        if abs(float(pose.get("Yaw", 0.0) or 0.0)) > float(gate["max_yaw"]):
+            return "extreme_pose"
+        if abs(float(pose.get("Pitch", 0.0) or 0.0)) > float(gate["max_pitch"]):
+            return "extreme_pose"
+        return None
+
+    def _filter_faces_by_quality(self, event_id: int, photo_id: Optional[int], image_bytes: bytes, faces: List[Dict]) -> List[Dict]:
+        """Écarte les visages flous, mal exposés, de profil ou trop petits avant l'IndexFaces."""
+        gate = self.get_face_quality_gate(event_id)
+        if not faces or not gate.get("enabled"):
+            return faces
+        try:
+            img_w, img_h = _Image.open(_BytesIO(image_bytes)).size
+        except Exception:
+            return faces
+
+        kept: List[Dict] = []
+        skipped: Dict[str, int] = {}
+        for f in faces:
+            try:
+                reason = self._face_quality_reject_reason(f, gate, img_w, img_h)
+            except Exception:
+                reason = None
+            if reason:
+                skipped[reason] = skipped.get(reason, 0) + 1
+            else:
+                kept.append(f)
+
+        aws_metrics.record_face_quality(checked=len(faces), kept=len(kept), skipped=skipped)
+        if skipped:
+            print(f"[QualityGate] photo_id={photo_id} event_id={event_id} detected={len(faces)} kept={len(kept)} skipped={skipped}")
+        return kept
+
     def _crop_face_regions(self, image_bytes: bytes, boxes: List[Dict]) -> List[bytes]:
         """Recadre l'image selon les BoundingBox Rekognition.
 
         BoundingBox fields are normalized [0,1]: Left, Top, Width, Height
         """
-        crops: List[bytes] = []
+        return [crop for _, crop in self._crop_face_regions_with_boxes(image_bytes, boxes)]
+
+    def _crop_face_regions_with_boxes(self, image_bytes: bytes, boxes: List[Dict]) -> List[Tuple[Dict, bytes]]:
+        """Comme _crop_face_regions, mais conserve le FaceDetail source de chaque crop.
+
+        Les visages trop petits sont ignorés: l'index d'un crop ne correspond donc pas
+        forcément à l'index du visage dans `boxes`.
+        """
+        crops: List[Tuple[Dict, bytes]] = []
         try:
             im = _Image.open(_BytesIO(image_bytes))
             if im.mode not in ("RGB", "L"):
@@ -657,7 +1042,7 @@ class AwsFaceRecognizer:
                             pass
                     out = _BytesIO()
                     crop.save(out, format="JPEG", quality=92, optimize=False)
-                    crops.append(out.getvalue())
+                    crops.append((f, out.getvalue()))
                 except Exception:
                     continue
         except Exception as e:
@@ -700,18 +1085,26 @@ class AwsFaceRecognizer:
             # Fallback ultime si search_threshold n'existe pas (ne devrait pas arriver)
             print("[WARNING] _search_faces_retry: self.search_threshold not found, using default")
             th = float(AWS_SEARCH_THRESHOLD)
+        cache_key = self._search_cache_key(collection_id, f"face:{face_id}", th, mf)
+        cached = rekognition_search_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached
         for attempt in range(AWS_MAX_RETRIES + 1):
             try:
-                aws_metrics.inc('SearchFaces')
-                return self.client.search_faces(
+                resp = self._rek_call('SearchFaces',
                     CollectionId=collection_id,
                     FaceId=face_id,
                     MaxFaces=mf,
                     FaceMatchThreshold=th,
                 )
+                if cache_key:
+                    rekognition_search_cache.set(cache_key, resp)
+                return resp
             except ClientError as e:
                 code = e.response.get("Error", {}).get("Code", "")
                 if "Throttl" in code or code in {"ProvisionedThroughputExceededException"}:
+                    if attempt < AWS_MAX_RETRIES:
+                        aws_metrics.record_retry('SearchFaces')
                     time.sleep(AWS_BACKOFF_BASE_SEC * (2 ** attempt))
                     last_exc = e
                     continue
@@ -727,16 +1120,23 @@ class AwsFaceRecognizer:
     def _search_faces_by_image_retry(self, collection_id: str, image_bytes: bytes, face_match_threshold: Optional[float] = None):
         last_exc = None
         th = float(face_match_threshold) if (face_match_threshold is not None) else float(self.search_threshold)
+        image_digest = hashlib.sha1(image_bytes).hexdigest()
+        cache_key = self._search_cache_key(collection_id, f"img:{image_digest}", th, AWS_SEARCH_MAXFACES)
+        cached = rekognition_search_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            return cached
         for attempt in range(AWS_MAX_RETRIES + 1):
             try:
-                aws_metrics.inc('SearchFacesByImage')
-                return self.client.search_faces_by_image(
+                resp = self._rek_call('SearchFacesByImage',
                     CollectionId=collection_id,
                     Image={"Bytes": image_bytes},
                     MaxFaces=AWS_SEARCH_MAXFACES,
                     FaceMatchThreshold=th,
                     QualityFilter=AWS_SEARCH_QUALITY_FILTER,
                 )
+                if cache_key:
+                    rekognition_search_cache.set(cache_key, resp)
+                return resp
             except ClientError as e:
                 code = e.response.get("Error", {}).get("Code", "")
                 msg = (e.response.get("Error", {}).get("Message") or "").lower()
@@ -744,6 +1144,8 @@ class AwsFaceRecognizer:
                 if code == "InvalidParameterException" and ("no faces" in msg or "there are no faces" in msg):
                     return None
                 if "Throttl" in code or code in {"ProvisionedThroughputExceededException"}:
+                    if attempt < AWS_MAX_RETRIES:
+                        aws_metrics.record_retry('SearchFacesByImage')
                     time.sleep(AWS_BACKOFF_BASE_SEC * (2 ** attempt))
                     last_exc = e
                     continue
@@ -790,7 +1192,7 @@ class AwsFaceRecognizer:
 
         if not faces:
             try:
-                resp = self.client.search_faces_by_image(
+                resp = self._rek_call('SearchFacesByImage',
                     CollectionId=self._collection_id(event_id),
                     Image={"Bytes": image_bytes},
                     MaxFaces=AWS_SEARCH_MAXFACES,
@@ -832,7 +1234,7 @@ class AwsFaceRecognizer:
         if crops:
             coll_id = self._collection_id(event_id)
             with ThreadPoolExecutor(max_workers=MAX_PARALLEL_PER_REQUEST) as ex:
-                futures = {ex.submit(self._search_faces_by_image_retry, coll_id, crop_bytes): idx for idx, crop_bytes in enumerate(crops)}
+                futures = {ex.submit(bind_priority(self._search_faces_by_image_retry), coll_id, crop_bytes): idx for idx, crop_bytes in enumerate(crops)}
                 for fut in as_completed(futures):
                     resp = fut.result()
                     if not resp:
@@ -922,7 +1324,7 @@ class AwsFaceRecognizer:
                 resp = self._search_faces_retry(self._collection_id(event_id), user_fid, max_faces=AWS_SELFIE_SEARCH_MAXFACES)
             if not resp:
                 try:
-                    resp = self.client.search_faces_by_image(
+                    resp = self._rek_call('SearchFacesByImage',
                         CollectionId=self._collection_id(event_id),
                         Image={"Bytes": image_bytes},
                         MaxFaces=AWS_SELFIE_SEARCH_MAXFACES,
@@ -935,6 +1337,7 @@ class AwsFaceRecognizer:
 
             # Extraire les photo_id à partir des ExternalImageId "photo:{photo_id}"
             matched_photo_ids: Dict[int, int] = {}
+            matched_face_ids: Dict[str, int] = {}  # FaceId photo -> photo_id
             for fm in resp.get("FaceMatches", [])[:AWS_SELFIE_SEARCH_MAXFACES]:
                 face = fm.get("Face") or {}
                 ext = (face.get("ExternalImageId") or "").strip()
@@ -944,6 +1347,8 @@ class AwsFaceRecognizer:
                     pid = int(ext.split(":", 1)[1])
                 except Exception:
                     continue
+                if face.get("FaceId"):
+                    matched_face_ids[face["FaceId"]] = pid
                 similarity = int(float(fm.get("Similarity", 0.0)))
                 prev = matched_photo_ids.get(pid)
                 if prev is None or similarity > prev:
@@ -965,6 +1370,11 @@ class AwsFaceRecognizer:
                     .filter(Photo.event_id == event_id, Photo.id.in_(list(matched_photo_ids.keys())))
                     .all()
                 )
+                # Quasi-doublons (non indexés): même score que leur photo source
+                from perceptual_hash import NEAR_FACE_PREFIX, expand_near_duplicates
+                for dup_id, source_id in expand_near_duplicates(local_db, allowed_ids).items():
+                    matched_photo_ids[dup_id] = matched_photo_ids.get(source_id, 0)
+                    allowed_ids.add(dup_id)
                 print(f"[SELFIE-MATCH] matched_photo_ids keys={list(matched_photo_ids.keys())} allowed={len(allowed_ids)}")
 
                 t4 = time.time()
@@ -992,6 +1402,15 @@ class AwsFaceRecognizer:
                         local_db.add(FaceMatch(photo_id=pid, user_id=user.id, confidence_score=score))
                         count_matches += 1
 
+                # Rattacher les visages photo correspondants à l'utilisateur (sans écraser un autre match)
+                face_ids_for_user = [fid for fid, pid in matched_face_ids.items() if pid in allowed_ids]
+                face_ids_for_user += [f"{NEAR_FACE_PREFIX}{fid}" for fid in face_ids_for_user]
+                if face_ids_for_user:
+                    local_db.query(PhotoFace).filter(
+                        PhotoFace.face_id.in_(face_ids_for_user),
+                        PhotoFace.matched_user_id.is_(None),
+                    ).update({PhotoFace.matched_user_id: user.id}, synchronize_session=False)
+
                 t5 = time.time()
                 print(f"[MATCH-SELFIE] before db.commit(): {t5 - t0:.3f}s")
                 local_db.commit()
@@ -1040,7 +1459,8 @@ class AwsFaceRecognizer:
             original_data = f.read()
         optimization_result = PhotoOptimizer.optimize_image(
             image_data=original_data,
-            photo_type='uploaded'
+            photo_type='uploaded',
+            with_renditions=True
         )
         import uuid as _uuid
         unique_filename = f"{_uuid.uuid4()}.jpg"
@@ -1052,7 +1472,6 @@ class AwsFaceRecognizer:
         photo = Photo(
             filename=unique_filename,
             original_filename=original_filename,
-            photo_data=optimization_result['compressed_data'],
             content_type=optimization_result['content_type'],
             photo_type="uploaded",
             photographer_id=photographer_id,
@@ -1064,6 +1483,7 @@ class AwsFaceRecognizer:
             retention_days=optimization_result['retention_days'],
             expires_at=optimization_result['expires_at']
         )
+        store_photo_blobs(photo, optimization_result['compressed_data'], optimization_result['renditions'])
         db.add(photo)
         db.commit()
         db.refresh(photo)
@@ -1092,7 +1512,7 @@ class AwsFaceRecognizer:
             user_best: Dict[int, int] = {}
             for fid in face_ids:
                 try:
-                    resp = self.client.search_faces(
+                    resp = self._rek_call('SearchFaces',
                         CollectionId=self._collection_id(event_id),
                         FaceId=fid,
                         MaxFaces=AWS_SEARCH_MAXFACES,
@@ -1147,16 +1567,25 @@ class AwsFaceRecognizer:
         print(f"[PROCESS-PHOTO] START file={original_filename} event_id={event_id}")
         with open(photo_path, 'rb') as f:
             original_data = f.read()
+        # Déduplication par contenu: photo déjà présente dans l'événement -> pas de retraitement
+        from photo_dedup import sha256_bytes, find_existing_photos, release_failed_hashes, is_duplicate_hash_error
+        content_sha256 = sha256_bytes(original_data)
+        existing = find_existing_photos(db, event_id, [content_sha256]).get(content_sha256)
+        if existing:
+            duplicate = db.query(Photo).filter(Photo.id == existing["photo_id"]).first()
+            if duplicate is not None:
+                print(f"[PROCESS-PHOTO] DUPLICATE file={original_filename} event_id={event_id} existing_photo_id={duplicate.id}")
+                return duplicate
         optimization_result = PhotoOptimizer.optimize_image(
             image_data=original_data,
-            photo_type='uploaded'
+            photo_type='uploaded',
+            with_renditions=True
         )
         import uuid as _uuid
         unique_filename = f"{_uuid.uuid4()}.jpg"
         photo = Photo(
             filename=unique_filename,
             original_filename=original_filename,
-            photo_data=optimization_result['compressed_data'],
             content_type=optimization_result['content_type'],
             photo_type="uploaded",
             photographer_id=photographer_id,
@@ -1166,10 +1595,25 @@ class AwsFaceRecognizer:
             compression_ratio=optimization_result['compression_ratio'],
             quality_level=optimization_result['quality_level'],
             retention_days=optimization_result['retention_days'],
-            expires_at=optimization_result['expires_at']
+            expires_at=optimization_result['expires_at'],
+            content_sha256=content_sha256,
         )
+        store_photo_blobs(photo, optimization_result['compressed_data'], optimization_result['renditions'])
+        release_failed_hashes(db, event_id, [content_sha256])
         db.add(photo)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError as e:
+            # Même contenu inséré entre-temps par un upload concurrent: renvoyer cette photo
+            db.rollback()
+            if not is_duplicate_hash_error(e):
+                raise
+            existing = find_existing_photos(db, event_id, [content_sha256]).get(content_sha256)
+            duplicate = db.query(Photo).filter(Photo.id == existing["photo_id"]).first() if existing else None
+            if duplicate is None:
+                raise
+            print(f"[PROCESS-PHOTO] DUPLICATE (concurrent) file={original_filename} event_id={event_id} existing_photo_id={duplicate.id}")
+            return duplicate
         db.refresh(photo)
         # Indexer les faces de la photo et rechercher des correspondances côté utilisateurs
         # Utiliser les octets originaux (préparés) pour une meilleure empreinte faciale
@@ -1204,6 +1648,7 @@ class AwsFaceRecognizer:
             cfg_thr = 0
         threshold = max(env_thr, cfg_thr)
         user_best: Dict[int, int] = {}
+        face_user_sims: Dict[str, Dict[int, int]] = {}  # face_id -> {user_id: similarity}
         _debug = False
         try:
             import os as _os
@@ -1232,11 +1677,12 @@ class AwsFaceRecognizer:
         if face_ids:
             coll_id = self._collection_id(event_id)
             with ThreadPoolExecutor(max_workers=MAX_PARALLEL_PER_REQUEST) as ex:
-                futures = {ex.submit(self._search_faces_retry, coll_id, fid, 0): fid for fid in face_ids}
+                futures = {ex.submit(bind_priority(self._search_faces_retry), coll_id, fid, 0): fid for fid in face_ids}
                 for fut in as_completed(futures):
                     resp = fut.result()
                     if not resp:
                         continue
+                    face_sims = face_user_sims.setdefault(futures[fut], {})
                     for fm in resp.get("FaceMatches", [])[:AWS_SEARCH_MAXFACES]:
                         ext = (fm.get("Face") or {}).get("ExternalImageId") or ""
                         if not (ext.startswith("user:") or ext.isdigit()):
@@ -1251,6 +1697,8 @@ class AwsFaceRecognizer:
                         prev = user_best.get(uid)
                         if prev is None or sim > prev:
                             user_best[uid] = sim
+                        if sim > face_sims.get(uid, -1):
+                            face_sims[uid] = sim
         if _debug and user_best:
             try:
                 print(f"[AWS-MATCH][photo->{photo.id}] candidates (top): {sorted(user_best.items(), key=lambda x: -x[1])[:5]} threshold={threshold}")
@@ -1290,7 +1738,7 @@ class AwsFaceRecognizer:
                 best_sim = 0
                 for cr in crops:
                     try:
-                        cmp = self.client.compare_faces(SourceImage={"Bytes": sc}, TargetImage={"Bytes": cr}, SimilarityThreshold=0)
+                        cmp = self._rek_call('CompareFaces', SourceImage={"Bytes": sc}, TargetImage={"Bytes": cr}, SimilarityThreshold=0)
                         for m in (cmp.get('FaceMatches') or []):
                             best_sim = max(best_sim, int(float(m.get('Similarity', 0.0))))
                     except ClientError:
@@ -1334,6 +1782,8 @@ class AwsFaceRecognizer:
             except Exception:
                 pass
         print(f"[PHOTO-PIPELINE] photo_id={photo.id} event_id={event_id} matched_user_ids_count={len(kept_user_ids)}")
+        # Associer chaque visage indexé à son meilleur utilisateur retenu (photo_faces.matched_user_id)
+        self._set_photo_face_matches(db, photo.id, face_user_sims, kept_user_ids)
         # Nettoyage: supprimer les FaceMatch non retenus pour cette photo
         try:
             from sqlalchemy import not_ as _not
@@ -1371,6 +1821,7 @@ class AwsFaceRecognizer:
         event_id: int,
         db: Session,
         original_filename: Optional[str] = None,
+        event_context: Optional[Dict[str, object]] = None,
     ) -> Photo:
         """
         Traite une photo à partir de bytes (récupérés depuis S3) au lieu d'un chemin fichier.
@@ -1384,6 +1835,9 @@ class AwsFaceRecognizer:
             event_id: ID de l'événement
             db: Session SQLAlchemy
             original_filename: Nom original du fichier (optionnel, pour les logs)
+            event_context: Contexte retourné par prepare_event_for_batch. S'il est fourni,
+                la préparation de l'événement (collection, purge, selfies, utilisateurs
+                autorisés, expiration) n'est pas refaite pour cette photo.
         
         Returns:
             Photo: L'objet Photo mis à jour
@@ -1405,11 +1859,12 @@ class AwsFaceRecognizer:
         # Optimiser l'image
         optimization_result = PhotoOptimizer.optimize_image(
             image_data=image_bytes,
-            photo_type='uploaded'
+            photo_type='uploaded',
+            with_renditions=True
         )
         
-        # Mettre à jour les données de la photo
-        photo.photo_data = optimization_result['compressed_data']
+        # Mettre à jour les données de la photo (et ses déclinaisons pour les galeries)
+        store_photo_blobs(photo, optimization_result['compressed_data'], optimization_result['renditions'])
         photo.content_type = optimization_result['content_type']
         photo.original_size = optimization_result['original_size']
         photo.compressed_size = optimization_result['compressed_size']
@@ -1422,18 +1877,26 @@ class AwsFaceRecognizer:
         db.commit()
         db.refresh(photo)
         
+        # Quasi-doublon d'une photo déjà analysée (rafale, ré-export): réutiliser son analyse
+        near_matches = self._reuse_near_duplicate_analysis(photo, image_bytes, event_id, db, event_context)
+        if near_matches is not None:
+            for uid in near_matches:
+                event_bus.publish(user_topic(uid), "match", {"photo_id": photo.id, "event_id": event_id})
+            return photo
+        
         # Indexer les faces de la photo et rechercher des correspondances côté utilisateurs
         # Utiliser les octets originaux (préparés) pour une meilleure empreinte faciale
         prepared_bytes = self._prepare_image_bytes(image_bytes)
-        self.ensure_collection(event_id)
-        
-        try:
-            self._maybe_purge_collection(event_id, db)
-        except Exception:
-            pass
-        
-        # Indexer les selfies des users de l'événement avant de matcher
-        self._maybe_ensure_event_users_indexed_for_photo(event_id, photo.id, db)
+        if event_context is None:
+            self.ensure_collection(event_id)
+            
+            try:
+                self._maybe_purge_collection(event_id, db)
+            except Exception:
+                pass
+            
+            # Indexer les selfies des users de l'événement avant de matcher
+            self._maybe_ensure_event_users_indexed_for_photo(event_id, photo.id, db)
         face_ids = self._index_photo_faces_and_get_ids(event_id, photo.id, prepared_bytes)
         print(f"[PHOTO-PIPELINE] photo_id={photo.id} event_id={event_id} face_ids_count={len(face_ids)}")
         
@@ -1447,18 +1910,13 @@ class AwsFaceRecognizer:
             except Exception:
                 pass
         
-        # Seuil commun aligné sur la logique selfie->photos
-        try:
-            env_thr = int(os.environ.get('AWS_MATCH_MIN_SIMILARITY', '70') or '70')
-        except Exception:
-            env_thr = 70
-        try:
-            cfg_thr = int(round(float(getattr(self, 'search_threshold', 0) or 0)))
-        except Exception:
-            cfg_thr = 0
-        threshold = max(env_thr, cfg_thr)
+        if event_context is not None:
+            threshold = int(event_context.get("threshold") or self._photo_match_threshold())
+        else:
+            threshold = self._photo_match_threshold()
         
         user_best: Dict[int, int] = {}
+        face_user_sims: Dict[str, Dict[int, int]] = {}  # face_id -> {user_id: similarity}
         _debug = os.environ.get('AWS_MATCH_DEBUG', '0') == '1'
         
         # Recherche collection classique
@@ -1487,11 +1945,12 @@ class AwsFaceRecognizer:
         if face_ids:
             coll_id = self._collection_id(event_id)
             with ThreadPoolExecutor(max_workers=MAX_PARALLEL_PER_REQUEST) as ex:
-                futures = {ex.submit(self._search_faces_retry, coll_id, fid, 0): fid for fid in face_ids}
+                futures = {ex.submit(bind_priority(self._search_faces_retry), coll_id, fid, 0): fid for fid in face_ids}
                 for fut in as_completed(futures):
                     resp = fut.result()
                     if not resp:
                         continue
+                    face_sims = face_user_sims.setdefault(futures[fut], {})
                     for fm in resp.get("FaceMatches", [])[:AWS_SEARCH_MAXFACES]:
                         ext = (fm.get("Face") or {}).get("ExternalImageId") or ""
                         if not (ext.startswith("user:") or ext.isdigit()):
@@ -1506,11 +1965,16 @@ class AwsFaceRecognizer:
                         prev = user_best.get(uid)
                         if prev is None or sim > prev:
                             user_best[uid] = sim
+                        if sim > face_sims.get(uid, -1):
+                            face_sims[uid] = sim
         
         if _debug and user_best:
             print(f"[AWS-MATCH][photo->{photo.id}] candidates (top): {sorted(user_best.items(), key=lambda x: -x[1])[:5]} threshold={threshold}")
         
-        allowed_user_ids = self._get_allowed_event_user_ids(event_id, db)
+        if event_context is not None:
+            allowed_user_ids = set(event_context.get("allowed_user_ids") or ())
+        else:
+            allowed_user_ids = self._get_allowed_event_user_ids(event_id, db)
         kept_user_ids: Dict[int, int] = {}
         print(f"[AWS-MATCH][photo->{photo.id}] user_best={user_best}, threshold={threshold}, allowed={allowed_user_ids}")
         
@@ -1548,6 +2012,8 @@ class AwsFaceRecognizer:
             print(f"[AWS-MATCH][photo->{photo.id}] kept_user_ids={kept_user_ids}")
         print(f"[PHOTO-PIPELINE] photo_id={photo.id} event_id={event_id} matched_user_ids_count={len(kept_user_ids)}")
         
+        # Associer chaque visage indexé à son meilleur utilisateur retenu (photo_faces.matched_user_id)
+        self._set_photo_face_matches(db, photo.id, face_user_sims, kept_user_ids)
         # Nettoyage: supprimer les FaceMatch non retenus pour cette photo
         try:
             from sqlalchemy import not_ as _not
@@ -1565,22 +2031,67 @@ class AwsFaceRecognizer:
                 pass
         
         # Réinitialiser la date d'expiration de toutes les photos de l'événement
-        try:
-            from datetime import datetime, timedelta
-            new_expiration = datetime.utcnow() + timedelta(days=30)
-            db.query(Photo).filter(
-                Photo.event_id == event_id,
-                Photo.expires_at.isnot(None)
-            ).update({
-                Photo.expires_at: new_expiration
-            }, synchronize_session=False)
-        except Exception:
-            pass
+        # (déjà fait une fois par prepare_event_for_batch quand un contexte est fourni)
+        if event_context is None:
+            try:
+                from datetime import datetime, timedelta
+                new_expiration = datetime.utcnow() + timedelta(days=30)
+                db.query(Photo).filter(
+                    Photo.event_id == event_id,
+                    Photo.expires_at.isnot(None)
+                ).update({
+                    Photo.expires_at: new_expiration
+                }, synchronize_session=False)
+            except Exception:
+                pass
         
         db.commit()
         print(f"[PROCESS-PHOTO-BYTES] DONE photo_id={photo.id} event_id={event_id} matches={len(kept_user_ids)}")
+        # Notifier les invités reconnus (flux SSE) au lieu d'attendre leur prochain poll
+        for uid in kept_user_ids:
+            event_bus.publish(user_topic(uid), "match", {"photo_id": photo.id, "event_id": event_id})
         return photo
 
+    def _reuse_near_duplicate_analysis(self, photo: Photo, image_bytes: bytes, event_id: int, db: Session,
+                                       event_context: Optional[Dict] = None) -> Optional[Dict[int, int]]:
+        """Enregistre le dHash de la photo; si une photo analysée de l'événement est à distance
+        <= PHOTO_NEAR_DUP_MAX_DISTANCE et de même cadrage (rapport largeur/hauteur), copie ses
+        visages/correspondances sans appeler Rekognition.
+
+        Retourne {user_id: score} des correspondances réutilisées, None si la photo doit être analysée.
+        """
+        if not settings.PHOTO_NEAR_DUP_ENABLED:
+            return None
+        from perceptual_hash import dhash_and_size, find_near_duplicate, record_hash, reuse_source_analysis
+        phash, size = dhash_and_size(image_bytes)
+        if not phash:
+            return None
+        try:
+            record_hash(db, event_id, photo.id, phash, size)
+            near = find_near_duplicate(db, event_id, photo.id, phash, size)
+            if not near:
+                db.commit()
+                return None
+            source_id, distance = near
+            if event_context is not None:
+                allowed_user_ids = set(event_context.get("allowed_user_ids") or ())
+            else:
+                allowed_user_ids = self._get_allowed_event_user_ids(event_id, db)
+            kept = reuse_source_analysis(db, event_id, photo.id, source_id, distance, allowed_user_ids)
+            # Les visages copiés tiennent lieu d'indexation: pas de réindexation ultérieure
+            photo.is_indexed = True
+            db.add(photo)
+            db.commit()
+            print(f"[PROCESS-PHOTO-BYTES] NEAR-DUP photo_id={photo.id} source={source_id} distance={distance} matches={len(kept)}")
+            return kept
+        except Exception as e:
+            print(f"[NearDup] photo_id={photo.id} reuse failed, full analysis: {e}")
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            return None
+
     def get_collection_snapshot(self, event_id: int) -> Dict:
         """DB-driven snapshot: reads from photo_faces + user_events tables instead of ListFaces."""
         coll_id = self._collection_id(event_id)
@@ -1590,6 +2101,8 @@ class AwsFaceRecognizer:
             pf_rows = session.query(PhotoFace).filter(PhotoFace.event_id == event_id).all()
             photos: Dict[str, Dict[str, object]] = {}
             for row in pf_rows:
+                if not _is_rekognition_face_row(row):
+                    continue
                 key = str(row.photo_id)
                 if key not in photos:
                     photos[key] = {"count": 0, "face_ids": []}
@@ -1621,6 +2134,21 @@ class AwsFaceRecognizer:
             except Exception:
                 pass
 
+    def _get_stored_face_boxes(self, db: Session, face_ids: List[str]) -> Dict[str, Dict[str, float]]:
+        """FaceId photo -> BoundingBox normalisée, lue depuis photo_faces (une requête par lot de 500)."""
+        boxes: Dict[str, Dict[str, float]] = {}
+        ids = [fid for fid in set(face_ids) if fid]
+        try:
+            for i in range(0, len(ids), 500):
+                rows = db.query(PhotoFace).filter(PhotoFace.face_id.in_(ids[i:i + 500])).all()
+                for row in rows:
+                    box = _photo_face_box(row)
+                    if box:
+                        boxes[row.face_id] = box
+        except Exception as e:
+            print(f"[PhotoFaceBoxes] lookup error: {e}")
+        return boxes
+
     def find_photo_matches_with_boxes(self, event_id: int, source_face_id: str, db: Session, limit: int = 10) -> List[Dict]:
         """Pour un FaceId donné (souvent un face utilisateur), retourne jusqu'à N photos
         correspondantes avec la bounding box exacte sur l'image originale.
@@ -1663,15 +2191,24 @@ class AwsFaceRecognizer:
         if not photo_matches:
             return []
 
-        # 3) Pour chaque photo, détecter les visages et identifier la box correspondant au photo_face_id
+        # 3) Boxes persistées à l'indexation (photo_faces); détection+crop seulement pour les anciennes lignes
+        stored_boxes = self._get_stored_face_boxes(db, [pfid for _, pfid, _ in photo_matches])
         results: List[Dict] = []
         for pid, pfid, sim in photo_matches:
+            if pfid in stored_boxes:
+                results.append({
+                    'photo_id': pid,
+                    'face_id_photo': pfid,
+                    'similarity': sim,
+                    'box': stored_boxes[pfid],
+                })
+                continue
             try:
                 p = db.query(Photo).filter(Photo.id == pid).first()
                 if not p:
                     continue
                 # Charger bytes image
-                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else p.photo_data
+                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else read_photo_bytes(p)
                 if not photo_input:
                     continue
                 img_bytes = self._prepare_image_bytes(photo_input)
@@ -1682,8 +2219,8 @@ class AwsFaceRecognizer:
                 if not boxes:
                     continue
                 matching_box = None
-                crops = self._crop_face_regions(img_bytes, boxes)
-                for idx, crop_bytes in enumerate(crops):
+                crops = self._crop_face_regions_with_boxes(img_bytes, boxes)
+                for face_detail, crop_bytes in crops:
                     r = self._search_faces_by_image_retry(coll_id, crop_bytes)
                     if not r:
                         continue
@@ -1694,7 +2231,7 @@ class AwsFaceRecognizer:
                             found = True
                             break
                     if found:
-                        bb = (boxes[idx].get('BoundingBox') or {})
+                        bb = (face_detail.get('BoundingBox') or {})
                         matching_box = {
                             'Left': float(bb.get('Left', 0.0)),
                             'Top': float(bb.get('Top', 0.0)),
@@ -1773,9 +2310,11 @@ class AwsFaceRecognizer:
         if not best_for_photo:
             return []
 
-        # 3) faceid_to_box is no longer available without ListFaces;
-        #    fast mode returns results without box, non-fast mode uses detect+crop.
-        faceid_to_box: Dict[str, Dict[str, float]] = {}
+        # 3) Boxes persistées dans photo_faces à l'indexation (pas de ListFaces ni de re-détection);
+        #    le mode non rapide ne fait detect+crop que pour les visages sans box stockée.
+        faceid_to_box: Dict[str, Dict[str, float]] = self._get_stored_face_boxes(
+            db, [pfid for (pfid, _sim) in best_for_photo.values()]
+        )
 
         # 4) Assembler résultats
         pairs = list(best_for_photo.items())  # [(pid, (pfid, sim_float))]
@@ -1814,13 +2353,21 @@ class AwsFaceRecognizer:
 
         results: List[Dict] = []
         for pid, (pfid, _sim_from_searchfaces) in pairs:
+            stored_box = faceid_to_box.get(pfid)
+            if stored_box:
+                results.append({
+                    'photo_id': pid,
+                    'similarity': round(max(0.0, min(100.0, float(_sim_from_searchfaces or 0.0))), 2),
+                    'box': dict(stored_box),
+                })
+                continue
             try:
                 p = db.query(Photo).filter(Photo.id == pid).first()
                 if not p:
                     continue
                 if int(getattr(p, 'event_id', 0) or 0) != int(event_id):
                     continue
-                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else p.photo_data
+                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else read_photo_bytes(p)
                 if not photo_input:
                     continue
                 img_bytes = self._prepare_image_bytes(photo_input)
@@ -1829,10 +2376,10 @@ class AwsFaceRecognizer:
                 boxes = self._detect_faces_boxes(img_bytes)
                 if not boxes:
                     continue
-                crops = self._crop_face_regions(img_bytes, boxes)
-                found_idx = None
+                crops = self._crop_face_regions_with_boxes(img_bytes, boxes)
+                found_detail = None
                 sim_crop: Optional[float] = None
-                for idx, crop_bytes in enumerate(crops):
+                for face_detail, crop_bytes in crops:
                     r = self._search_faces_by_image_retry(coll_id, crop_bytes)
                     if not r:
                         continue
@@ -1847,11 +2394,11 @@ class AwsFaceRecognizer:
                             matched = True
                             break
                     if matched:
-                        found_idx = idx
+                        found_detail = face_detail
                         break
-                if found_idx is None or found_idx < 0 or found_idx >= len(boxes):
+                if found_detail is None:
                     continue
-                bb = (boxes[found_idx].get('BoundingBox') or {})
+                bb = (found_detail.get('BoundingBox') or {})
                 box = {
                     'Left': float(bb.get('Left', 0.0)),
                     'Top': float(bb.get('Top', 0.0)),
@@ -1885,36 +2432,213 @@ class AwsFaceRecognizer:
           ]
         }
         """
+        graph, _entries = self._build_snapshot_graph_entries(event_id, db, per_user_limit, fast)
+        return graph
+
+    def _snapshot_user_fingerprints(self, event_id: int, db: Session) -> Dict[int, Tuple]:
+        """Empreinte par utilisateur: FaceId du selfie + (nombre, max id) de ses FaceMatch sur l'événement.
+
+        Un utilisateur dont l'empreinte n'a pas bougé garde ses faces du snapshot précédent.
+        """
+        from sqlalchemy import func as _func
+        ue_rows = db.query(UserEvent.user_id, UserEvent.rekognition_face_id).filter(UserEvent.event_id == event_id).all()
+        fm_rows = (
+            db.query(FaceMatch.user_id, _func.count(FaceMatch.id), _func.max(FaceMatch.id))
+            .join(Photo, Photo.id == FaceMatch.photo_id)
+            .filter(Photo.event_id == event_id)
+            .group_by(FaceMatch.user_id)
+            .all()
+        )
+        fm_by_user = {int(uid): (int(cnt or 0), int(mx or 0)) for uid, cnt, mx in fm_rows if uid is not None}
+        return {
+            int(uid): (fid or "", ) + fm_by_user.get(int(uid), (0, 0))
+            for uid, fid in ue_rows
+        }
+
+    def _snapshot_db_state(self, event_id: int, db: Session) -> Tuple:
+        """État en base dont dépend le graphe: (nombre, max id) des visages photo et des FaceMatch de
+        l'événement, (nombre, selfies indexés, max id) des inscriptions.
+
+        Lu en base plutôt que dans la version de collection du process: les index et suppressions
+        faits par un autre worker rendent aussi le graphe périmé.
+        """
+        from sqlalchemy import func as _func
+        pf = db.query(_func.count(PhotoFace.id), _func.max(PhotoFace.id)).filter(PhotoFace.event_id == event_id).one()
+        fm = (
+            db.query(_func.count(FaceMatch.id), _func.max(FaceMatch.id))
+            .join(Photo, Photo.id == FaceMatch.photo_id)
+            .filter(Photo.event_id == event_id)
+            .one()
+        )
+        ue = (
+            db.query(_func.count(UserEvent.id), _func.count(UserEvent.rekognition_face_id), _func.max(UserEvent.id))
+            .filter(UserEvent.event_id == event_id)
+            .one()
+        )
+        return tuple(int(v or 0) for v in (*pf, *fm, *ue))
+
+    def _build_snapshot_graph_entries(self, event_id: int, db: Session, per_user_limit: int, fast: bool,
+                                      previous_entries: Optional[Dict[int, Dict]] = None) -> Tuple[Dict, Dict[int, Dict]]:
+        """Construit le graphe en parallèle (borné) en ne recalculant que les utilisateurs modifiés."""
         self.ensure_collection(event_id)
-        # Récupérer les utilisateurs de l'événement
-        user_events = db.query(UserEvent).filter(UserEvent.event_id == event_id).all()
-        user_ids = [ue.user_id for ue in user_events]
-        # Statut selfie
-        users = db.query(User).filter(User.id.in_(user_ids)).all() if user_ids else []
+        fingerprints = self._snapshot_user_fingerprints(event_id, db)
+        user_ids = list(fingerprints.keys())
+        # Statut selfie (sans charger selfie_data)
         selfie_map: Dict[int, bool] = {}
-        for u in users:
-            selfie_map[int(u.id)] = bool(getattr(u, 'selfie_data', None) or getattr(u, 'selfie_path', None))
+        if user_ids:
+            for uid, has_data, path in db.query(User.id, User.selfie_data.isnot(None), User.selfie_path).filter(User.id.in_(user_ids)).all():
+                selfie_map[int(uid)] = bool(has_data or path)
 
-        graph_users = []
+        previous_entries = previous_entries or {}
+        entries: Dict[int, Dict] = {}
+        todo: List[int] = []
         for uid in user_ids:
+            prev = previous_entries.get(uid)
+            if prev is not None and prev.get('fp') == fingerprints[uid]:
+                entries[uid] = prev
+            else:
+                todo.append(uid)
+
+        def _compute(uid: int) -> List[Dict]:
+            # Une session par thread (Session SQLAlchemy non thread-safe)
+            session = SessionLocal()
             try:
                 # Sélectionne uniquement les plus FAIBLES similarités côté provider pour réduire la charge
-                faces_all = self.get_user_group_faces_with_boxes(event_id, uid, db,
-                                                                limit=per_user_limit or 20,
-                                                                order="asc",
-                                                                fast=bool(fast))
-            except Exception:
-                faces_all = []
-            graph_users.append({
-                'user_id': int(uid),
-                'selfie_available': bool(selfie_map.get(int(uid), False)),
-                'faces': faces_all,
-            })
+                return self.get_user_group_faces_with_boxes(event_id, uid, session,
+                                                            limit=per_user_limit or 20,
+                                                            order="asc",
+                                                            fast=bool(fast))
+            except Exception as e:
+                print(f"[SnapshotGraph] user_id={uid} event_id={event_id} error: {e}")
+                return []
+            finally:
+                try:
+                    session.close()
+                except Exception:
+                    pass
 
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, AWS_SNAPSHOT_GRAPH_WORKERS)) as ex:
+                futures = {ex.submit(bind_priority(_compute), uid): uid for uid in todo}
+                for fut in as_completed(futures):
+                    uid = futures[fut]
+                    entries[uid] = {'fp': fingerprints[uid], 'faces': fut.result()}
+
+        graph_users = [{
+            'user_id': int(uid),
+            'selfie_available': bool(selfie_map.get(int(uid), False)),
+            'faces': entries[uid]['faces'],
+        } for uid in user_ids]
+        print(f"[SnapshotGraph] event_id={event_id} users={len(user_ids)} recomputed={len(todo)}")
         return {
             'event_id': int(event_id),
             'users': graph_users,
-        }
+            'recomputed_users': len(todo),
+        }, entries
+
+    def _run_snapshot_graph_job(self, key: Tuple[int, int, bool]):
+        event_id, per_user_limit, fast = key
+        t0 = time.time()
+        session = SessionLocal()
+        try:
+            # État capturé avant la construction: un index concurrent rendra le résultat périmé
+            db_state = self._snapshot_db_state(event_id, session)
+            with self._snapshot_graph_lock:
+                prev = self._snapshot_graphs.get(key)
+            graph, entries = self._build_snapshot_graph_entries(
+                event_id, session, per_user_limit, fast, (prev or {}).get('entries')
+            )
+            with self._snapshot_graph_lock:
+                self._snapshot_graphs[key] = {
+                    'graph': graph,
+                    'entries': entries,
+                    'db_state': db_state,
+                    'built_at': time.time(),
+                    'build_seconds': round(time.time() - t0, 3),
+                    'error': None,
+                }
+                self._snapshot_graphs.move_to_end(key)
+                while len(self._snapshot_graphs) > max(1, AWS_SNAPSHOT_GRAPH_CACHE_SIZE):
+                    self._snapshot_graphs.popitem(last=False)
+        except Exception as e:
+            print(f"[SnapshotGraph] build failed event_id={event_id}: {e}")
+            with self._snapshot_graph_lock:
+                if key in self._snapshot_graphs:
+                    self._snapshot_graphs[key]['error'] = str(e)
+        finally:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def refresh_snapshot_graph_async(self, event_id: int, per_user_limit: int = 10, fast: bool = False) -> bool:
+        """Lance la reconstruction en tâche de fond (un seul job par clé). Retourne True si un job tourne."""
+        key = (int(event_id), int(per_user_limit), bool(fast))
+        with self._snapshot_graph_lock:
+            job = self._snapshot_graph_jobs.get(key)
+            if job is not None and job.is_alive():
+                return True
+            # Jobs terminés: ne garder que ceux en cours
+            for done_key in [k for k, t in self._snapshot_graph_jobs.items() if not t.is_alive()]:
+                del self._snapshot_graph_jobs[done_key]
+            job = threading.Thread(target=bind_priority(self._run_snapshot_graph_job, MAINTENANCE), args=(key,), daemon=True,
+                                   name=f"snapshot-graph-{event_id}")
+            self._snapshot_graph_jobs[key] = job
+            job.start()
+        return True
+
+    def get_snapshot_graph(self, event_id: int, per_user_limit: int = 10, fast: bool = False,
+                           refresh: bool = False) -> Dict:
+        """Retourne immédiatement le dernier snapshot graph connu avec son âge.
+
+        Si les visages/correspondances de l'événement ont changé en base depuis (ou si le snapshot
+        est trop vieux), une reconstruction incrémentale est lancée en tâche de fond; "status"
+        vaut alors "building".
+        """
+        key = (int(event_id), int(per_user_limit), bool(fast))
+        with self._snapshot_graph_lock:
+            state = self._snapshot_graphs.get(key)
+            if state is not None:
+                self._snapshot_graphs.move_to_end(key)
+            job = self._snapshot_graph_jobs.get(key)
+            building = job is not None and job.is_alive()
+        now = time.time()
+        stale = state is None or (now - state['built_at']) > AWS_SNAPSHOT_GRAPH_MAX_AGE
+        if not stale:
+            session = SessionLocal()
+            try:
+                stale = state.get('db_state') != self._snapshot_db_state(int(event_id), session)
+            except Exception as e:
+                print(f"[SnapshotGraph] state check failed event_id={event_id}: {e}")
+                stale = True
+            finally:
+                try:
+                    session.close()
+                except Exception:
+                    pass
+        if (stale or refresh) and not building:
+            building = self.refresh_snapshot_graph_async(event_id, per_user_limit, fast)
+
+        if state is None:
+            return {
+                'event_id': int(event_id),
+                'users': [],
+                'status': 'building',
+                'stale': True,
+                'built_at': None,
+                'age_seconds': None,
+            }
+        from datetime import datetime, timezone
+        out = dict(state['graph'])
+        out.update({
+            'status': 'building' if building else 'ready',
+            'stale': bool(stale),
+            'built_at': datetime.fromtimestamp(state['built_at'], tz=timezone.utc).isoformat(),
+            'age_seconds': round(now - state['built_at'], 1),
+            'build_seconds': state.get('build_seconds'),
+            'last_error': state.get('error'),
+        })
+        return out
 
     def compute_all_faces_similarity_to_user(self, event_id: int, user_id: int, db: Session,
                                              max_results_per_crop: int = 100) -> Dict:
@@ -1955,7 +2679,7 @@ class AwsFaceRecognizer:
         out_photos: List[Dict] = []
         for p in photos:
             try:
-                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else p.photo_data
+                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else read_photo_bytes(p)
                 if not photo_input:
                     continue
                 img_bytes = self._prepare_image_bytes(photo_input)
@@ -1972,8 +2696,7 @@ class AwsFaceRecognizer:
                     similarity_val: float = 0.0
                     matched = False
                     try:
-                        aws_metrics.inc('CompareFaces')
-                        cmp = self.client.compare_faces(
+                        cmp = self._rek_call('CompareFaces',
                             SourceImage={"Bytes": selfie_crop},
                             TargetImage={"Bytes": crop_bytes},
                             SimilarityThreshold=0,
@@ -2043,7 +2766,7 @@ class AwsFaceRecognizer:
         for p in photos:
             try:
                 checked += 1
-                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else p.photo_data
+                photo_input = p.file_path if (getattr(p, 'file_path', None) and os.path.exists(p.file_path)) else read_photo_bytes(p)
                 if not photo_input:
                     continue
                 img_bytes = self._prepare_image_bytes(photo_input)
@@ -2056,7 +2779,7 @@ class AwsFaceRecognizer:
                 best_sim = 0.0
                 for crop_bytes in crops:
                     try:
-                        cmp = self.client.compare_faces(
+                        cmp = self._rek_call('CompareFaces',
                             SourceImage={"Bytes": selfie_crop},
                             TargetImage={"Bytes": crop_bytes},
                             SimilarityThreshold=0,
@@ -2187,7 +2910,8 @@ class AwsFaceRecognizer:
             stale_pf_ids: List[int] = []
             for pf in all_pf:
                 if pf.photo_id not in valid_photo_ids:
-                    stale_face_ids.append(pf.face_id)
+                    if _is_rekognition_face_row(pf):
+                        stale_face_ids.append(pf.face_id)
                     stale_pf_ids.append(pf.id)
                 else:
                     kept += 1
@@ -2195,8 +2919,8 @@ class AwsFaceRecognizer:
             for i in range(0, len(stale_face_ids), 1000):
                 chunk = stale_face_ids[i:i + 1000]
                 try:
-                    aws_metrics.inc('DeleteFaces')
-                    self.client.delete_faces(CollectionId=coll_id, FaceIds=chunk)
+                    self._rek_call('DeleteFaces', CollectionId=coll_id, FaceIds=chunk)
+                    self._bump_collection_version(coll_id)
                     deleted += len(chunk)
                 except ClientError:
                     pass
@@ -1,6 +1,7 @@
-from typing import Dict
+from typing import Dict, Optional
 from threading import Lock, local
 from contextlib import contextmanager
+from bisect import bisect_left
 import time
 
 
@@ -21,8 +22,13 @@ class AwsMetrics:
         'DeleteFaces': 0.0,
         'CreateCollection': 0.0,
         'DescribeCollection': 0.0,
+        'CompareFaces': 0.001,          # $1.00 / 1000 images
     }
 
+    # Bornes supérieures (ms) des buckets de latence; un bucket de débordement est ajouté
+    LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+    THROTTLE_CODES = {'ThrottlingException', 'ProvisionedThroughputExceededException', 'LimitExceededException'}
+
     def __init__(self) -> None:
         self._lock = Lock()
         self._counts: Dict[str, int] = {}
@@ -30,6 +36,14 @@ class AwsMetrics:
         self._since_ts = time.time()
         self._action_start: Dict[str, float] = {}
         self._action_log: list[dict] = []
+        self._face_quality: Dict[str, int] = {'checked': 0, 'kept': 0}
+        self._face_quality_skips: Dict[str, int] = {}
+        self._latency: Dict[str, Dict] = {}
+        self._retries: Dict[str, int] = {}
+        self._throttles: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._bytes_sent: Dict[str, int] = {}
+        self._events: Dict[int, Dict] = {}
         self._tls = local()
 
     def inc(self, op: str, n: int = 1) -> None:
@@ -41,6 +55,86 @@ class AwsMetrics:
                 a = self._actions.setdefault(cur, {})
                 a[op] = a.get(op, 0) + n
 
+    def observe(self, op: str, latency_s: float, event_id: Optional[int] = None, bytes_sent: int = 0,
+                retries: int = 0, error_code: Optional[str] = None) -> None:
+        """Enregistre latence, octets envoyés, retries SDK et erreurs d'un appel (par opération et par événement)."""
+        latency_ms = max(0.0, float(latency_s) * 1000.0)
+        bucket = bisect_left(self.LATENCY_BUCKETS_MS, latency_ms)
+        throttled = bool(error_code) and (error_code in self.THROTTLE_CODES or 'Throttl' in error_code)
+        if event_id is None:
+            event_id = self._event_from_action(getattr(self._tls, 'action', None))
+        with self._lock:
+            h = self._latency.get(op)
+            if h is None:
+                h = {'buckets': [0] * (len(self.LATENCY_BUCKETS_MS) + 1), 'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0}
+                self._latency[op] = h
+            h['buckets'][bucket] += 1
+            h['count'] += 1
+            h['sum_ms'] += latency_ms
+            if latency_ms > h['max_ms']:
+                h['max_ms'] = latency_ms
+            if bytes_sent:
+                self._bytes_sent[op] = self._bytes_sent.get(op, 0) + int(bytes_sent)
+            if retries:
+                self._retries[op] = self._retries.get(op, 0) + int(retries)
+            if throttled:
+                self._throttles[op] = self._throttles.get(op, 0) + 1
+            elif error_code:
+                self._errors[op] = self._errors.get(op, 0) + 1
+            if event_id is not None:
+                ev = self._events.setdefault(int(event_id), {'calls': {}, 'bytes_sent': 0})
+                ev['calls'][op] = ev['calls'].get(op, 0) + 1
+                ev['bytes_sent'] += int(bytes_sent or 0)
+
+    def record_retry(self, op: str, n: int = 1) -> None:
+        """Retry applicatif (backoff après throttling), en plus des retries du SDK."""
+        with self._lock:
+            self._retries[op] = self._retries.get(op, 0) + n
+
+    def _event_from_action(self, action: Optional[str]) -> Optional[int]:
+        try:
+            if action and action.startswith('upload_event:'):
+                return int(action.split(':', 1)[1])
+            if action and action.startswith('selfie_update:event:'):
+                return int(action.split(':')[2])
+        except Exception:
+            pass
+        return None
+
+    def _latency_summary(self, h: Dict) -> Dict:
+        count = h['count']
+
+        def _percentile(q: float):
+            # Borne supérieure du bucket contenant le quantile (max observé pour le débordement)
+            target = q * count
+            cumulative = 0
+            for i, n in enumerate(h['buckets']):
+                cumulative += n
+                if n and cumulative >= target:
+                    if i < len(self.LATENCY_BUCKETS_MS):
+                        return float(min(self.LATENCY_BUCKETS_MS[i], h['max_ms']))
+                    return round(h['max_ms'], 1)
+            return None
+
+        labels = [f"le_{b}" for b in self.LATENCY_BUCKETS_MS] + [f"gt_{self.LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            'count': count,
+            'avg_ms': round(h['sum_ms'] / count, 1) if count else None,
+            'max_ms': round(h['max_ms'], 1),
+            'p50_ms': _percentile(0.50) if count else None,
+            'p95_ms': _percentile(0.95) if count else None,
+            'p99_ms': _percentile(0.99) if count else None,
+            'buckets': dict(zip(labels, h['buckets'])),
+        }
+
+    def record_face_quality(self, checked: int, kept: int, skipped: Dict[str, int]) -> None:
+        """Comptabilise les visages écartés par le filtre qualité avant IndexFaces."""
+        with self._lock:
+            self._face_quality['checked'] = self._face_quality.get('checked', 0) + int(checked)
+            self._face_quality['kept'] = self._face_quality.get('kept', 0) + int(kept)
+            for reason, n in (skipped or {}).items():
+                self._face_quality_skips[reason] = self._face_quality_skips.get(reason, 0) + int(n)
+
     def reset(self) -> None:
         with self._lock:
             self._counts = {}
@@ -48,6 +142,14 @@ class AwsMetrics:
             self._since_ts = time.time()
             self._action_start = {}
             self._action_log = []
+            self._face_quality = {'checked': 0, 'kept': 0}
+            self._face_quality_skips = {}
+            self._latency = {}
+            self._retries = {}
+            self._throttles = {}
+            self._errors = {}
+            self._bytes_sent = {}
+            self._events = {}
 
     def snapshot(self) -> Dict:
         with self._lock:
@@ -59,6 +161,24 @@ class AwsMetrics:
                 cost = float(c) * float(unit)
                 costs[op] = round(cost, 6)
                 total_cost += cost
+            skipped_total = sum(self._face_quality_skips.values())
+            face_quality = {
+                'checked': self._face_quality.get('checked', 0),
+                'kept': self._face_quality.get('kept', 0),
+                'skipped': dict(self._face_quality_skips),
+                'skipped_total': skipped_total,
+                # Chaque visage écarté = un IndexFaces (crop) évité
+                'estimated_savings_usd': round(skipped_total * self.PRICES_USD.get('IndexFaces', 0.0), 6),
+            }
+            events = {}
+            for eid, ev in self._events.items():
+                calls = dict(ev['calls'])
+                events[eid] = {
+                    'calls': calls,
+                    'total_calls': sum(calls.values()),
+                    'bytes_sent': ev['bytes_sent'],
+                    'cost_usd': round(sum(float(c) * float(self.PRICES_USD.get(op, 0.0)) for op, c in calls.items()), 6),
+                }
             return {
                 'since': self._since_ts,
                 'counts': counts,
@@ -66,6 +186,13 @@ class AwsMetrics:
                 'total_cost_usd': round(total_cost, 6),
                 'actions': self._actions,
                 'action_log': list(self._action_log),
+                'face_quality': face_quality,
+                'latency_ms': {op: self._latency_summary(h) for op, h in self._latency.items()},
+                'retries': dict(self._retries),
+                'throttles': dict(self._throttles),
+                'errors': dict(self._errors),
+                'bytes_sent': dict(self._bytes_sent),
+                'events': events,
             }
 
     # -------- Per-action helpers --------
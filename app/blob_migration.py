@@ -0,0 +1,329 @@
+"""
+Migration en arrière-plan des binaires photo existants vers le blob store.
+
+Parcourt par lots (BLOB_MIGRATION_BATCH_SIZE, ordre des id) les photos dont
+photo_data / thumbnail_data / preview_data sont encore en base, écrit chaque binaire
+dans le blob store, renseigne la clé et vide la colonne, puis fait de même pour
+photo_variants.data. Chaque lot est une transaction.
+
+Reprenable: l'état est la base elle-même (une ligne migrée n'est plus sélectionnée);
+un redémarrage reprend là où la migration s'est arrêtée. Pendant la transition, les
+lectures passent par blob_store.read_blob_or_column() (double lecture).
+
+Plusieurs workers: en PostgreSQL, une seule migration tourne à la fois pour toutes les
+instances (verrou consultatif tenu pendant l'exécution, libéré si le process meurt);
+start() dans les autres process est un no-op. Les lots restent verrouillés
+(FOR UPDATE SKIP LOCKED).
+
+Dernière phase (même sans blob store): taille et CRC-32 de la photo optimisée
+(optimized_size / optimized_crc32) des photos anciennes, nécessaires à l'export ZIP.
+Elle est lancée seule au démarrage (start(checksums_only=True)) et par un export qui
+rencontre des photos sans sommes (réponse 503 + Retry-After en attendant): l'export ne
+lit jamais les photos lui-même. Une photo dont les données sont illisibles reçoit
+optimized_size = UNREADABLE_SIZE: elle n'est plus retentée et l'export l'exclut.
+
+Usage:
+    from blob_migration import blob_migration
+
+    blob_migration.start()      # thread daemon, progression dans background_jobs
+    blob_migration.start(checksums_only=True)   # sommes de contrôle de l'export seulement
+    python blob_migration.py    # exécution directe (premier plan)
+"""
+
+import os
+import sys
+import threading
+import zlib
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import undefer
+
+from blob_store import get_blob_store, read_photo_bytes
+from database import SessionLocal, engine
+from job_registry import job_registry
+from models import Photo, PhotoVariant
+from settings import settings
+
+
+JOB_KIND = "blob_migration"
+# Verrou consultatif PostgreSQL: une seule migration pour toutes les instances
+RUN_LOCK_KEY = 123458
+# optimized_size d'une photo dont les données n'ont pas pu être lues
+UNREADABLE_SIZE = -1
+PHOTO_COLUMNS = (
+    ("photo_data", "blob_key"),
+    ("thumbnail_data", "thumbnail_blob_key"),
+    ("preview_data", "preview_blob_key"),
+)
+
+
+def _pending_photos_filter():
+    return or_(
+        and_(Photo.blob_key.is_(None), Photo.photo_data.isnot(None)),
+        and_(Photo.thumbnail_blob_key.is_(None), Photo.thumbnail_data.isnot(None)),
+        and_(Photo.preview_blob_key.is_(None), Photo.preview_data.isnot(None)),
+    )
+
+
+def _pending_variants_filter():
+    return and_(PhotoVariant.blob_key.is_(None), PhotoVariant.data.isnot(None))
+
+
+def pending_checksums_filter():
+    """Photos sans taille/CRC-32 d'export mais avec des données à lire."""
+    return and_(
+        or_(Photo.optimized_size.is_(None), Photo.optimized_crc32.is_(None)),
+        or_(Photo.blob_key.isnot(None), Photo.photo_data.isnot(None), Photo.file_path.isnot(None)),
+    )
+
+
+def _locked(query):
+    if engine.dialect.name == "postgresql":
+        return query.with_for_update(skip_locked=True)
+    return query
+
+
+class BlobMigration:
+    """Déplace les colonnes LargeBinary vers le blob store, lot par lot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.job_id: Optional[str] = None
+
+    def pending_counts(self) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            return {
+                "photos": int(db.query(func.count(Photo.id)).filter(_pending_photos_filter()).scalar() or 0),
+                "variants": int(db.query(func.count(PhotoVariant.id)).filter(_pending_variants_filter()).scalar() or 0),
+                "checksums": int(db.query(func.count(Photo.id)).filter(pending_checksums_filter()).scalar() or 0),
+            }
+        finally:
+            db.close()
+
+    def _acquire_run_lock(self):
+        """
+        Connexion tenant le verrou de migration (PostgreSQL), False s'il est tenu par une
+        autre instance. None hors PostgreSQL (un seul process).
+        """
+        if engine.dialect.name != "postgresql":
+            return None
+        conn = engine.connect()
+        try:
+            acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RUN_LOCK_KEY}).scalar())
+            # Verrou de session: il survit au commit, pas de transaction ouverte pendant la migration
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        return conn
+
+    @staticmethod
+    def _release_run_lock(conn) -> None:
+        if not conn:
+            return
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RUN_LOCK_KEY})
+            conn.commit()
+        except Exception as e:
+            print(f"[BlobMigration] unlock failed: {e}")
+        finally:
+            conn.close()
+
+    def _run_locked(self, job_id: str, move: bool, lock_conn):
+        try:
+            self.run(job_id, move)
+        finally:
+            self._release_run_lock(lock_conn)
+
+    def start(self, checksums_only: bool = False) -> Optional[str]:
+        """
+        Démarre la migration dans un thread daemon (no-op si déjà en cours, dans ce process ou
+        une autre instance). Sans blob store (ou avec checksums_only), seules les sommes de
+        contrôle de l'export sont complétées.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self.job_id
+            lock_conn = self._acquire_run_lock()
+            if lock_conn is False:
+                print("[BlobMigration] Already running on another instance")
+                return None
+            try:
+                move = not checksums_only and get_blob_store() is not None
+                if not checksums_only and not move:
+                    print("[BlobMigration] No blob store configured, backfilling export checksums only")
+                pending = self.pending_counts()
+                total = pending["checksums"] + (pending["photos"] + pending["variants"] if move else 0)
+                if not total:
+                    print("[BlobMigration] Nothing to migrate")
+                    self._release_run_lock(lock_conn)
+                    return None
+                self.job_id = job_registry.create(JOB_KIND, JOB_KIND, total=total)
+                self._thread = threading.Thread(target=self._run_locked, args=(self.job_id, move, lock_conn),
+                                                name="blob-migration", daemon=True)
+                self._thread.start()
+            except Exception:
+                self._release_run_lock(lock_conn)
+                raise
+            print(
+                f"[BlobMigration] started job_id={self.job_id} photos={pending['photos'] if move else 0} "
+                f"variants={pending['variants'] if move else 0} checksums={pending['checksums']}"
+            )
+            return self.job_id
+
+    def run(self, job_id: Optional[str] = None, move: bool = True):
+        if job_id and not job_registry.start(job_id):
+            return
+        store = get_blob_store()
+        phases = [self._backfill_checksums_batch]
+        if move and store is not None:
+            # Les photos déplacées reçoivent leurs sommes au passage: la dernière phase les saute
+            phases = [self._migrate_photos_batch, self._migrate_variants_batch] + phases
+        batch_size = max(1, int(settings.BLOB_MIGRATION_BATCH_SIZE or 20))
+        moved = failed = 0
+        try:
+            for migrate in phases:
+                last_id = 0
+                while True:
+                    if job_registry.is_cancelled(job_id):
+                        print(f"[BlobMigration] job_id={job_id} cancelled (moved={moved})")
+                        return
+                    result = migrate(store, last_id, batch_size)
+                    if result is None:
+                        break
+                    last_id = result["last_id"]
+                    moved += result["moved"]
+                    failed += result["failed"]
+                    job_registry.increment(job_id, processed=result["moved"], failed=result["failed"])
+            job_registry.finish(job_id, "done" if not failed else "partial",
+                                info=f"moved={moved} failed={failed}")
+            print(f"[BlobMigration] done job_id={job_id} moved={moved} failed={failed}")
+        except Exception as e:
+            print(f"[BlobMigration] job_id={job_id} error: {e}")
+            job_registry.finish(job_id, "failed", error=str(e)[:500])
+
+    def _migrate_photos_batch(self, store, after_id: int, batch_size: int) -> Optional[Dict[str, int]]:
+        db = SessionLocal()
+        try:
+            photos = _locked(
+                db.query(Photo)
+                .options(undefer(Photo.thumbnail_data), undefer(Photo.preview_data))
+                .filter(Photo.id > after_id, _pending_photos_filter())
+                .order_by(Photo.id.asc())
+                .limit(batch_size)
+            ).all()
+            if not photos:
+                return None
+            moved = failed = 0
+            for photo in photos:
+                try:
+                    for data_column, key_column in PHOTO_COLUMNS:
+                        data = getattr(photo, data_column)
+                        if data is None or getattr(photo, key_column):
+                            continue
+                        data = bytes(data)
+                        if data_column == "photo_data" and photo.optimized_crc32 is None:
+                            photo.optimized_size = len(data)
+                            photo.optimized_crc32 = zlib.crc32(data)
+                        setattr(photo, key_column, store.put(data, photo.content_type or "image/jpeg"))
+                        setattr(photo, data_column, None)
+                    moved += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"[BlobMigration] photo_id={photo.id} failed: {e}")
+            last_id = int(photos[-1].id)
+            db.commit()
+            return {"last_id": last_id, "moved": moved, "failed": failed}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _migrate_variants_batch(self, store, after_id: int, batch_size: int) -> Optional[Dict[str, int]]:
+        from photo_variants import MEDIA_TYPES
+
+        db = SessionLocal()
+        try:
+            variants = _locked(
+                db.query(PhotoVariant)
+                .filter(PhotoVariant.id > after_id, _pending_variants_filter())
+                .order_by(PhotoVariant.id.asc())
+                .limit(batch_size)
+            ).all()
+            if not variants:
+                return None
+            moved = failed = 0
+            for variant in variants:
+                try:
+                    variant.blob_key = store.put(bytes(variant.data), MEDIA_TYPES.get(variant.format, "image/jpeg"))
+                    variant.data = None
+                    moved += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"[BlobMigration] variant_id={variant.id} failed: {e}")
+            last_id = int(variants[-1].id)
+            db.commit()
+            return {"last_id": last_id, "moved": moved, "failed": failed}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _backfill_checksums_batch(self, store, after_id: int, batch_size: int) -> Optional[Dict[str, int]]:
+        db = SessionLocal()
+        try:
+            photos = _locked(
+                db.query(Photo)
+                .filter(Photo.id > after_id, pending_checksums_filter())
+                .order_by(Photo.id.asc())
+                .limit(batch_size)
+            ).all()
+            if not photos:
+                return None
+            moved = failed = 0
+            for photo in photos:
+                try:
+                    data = read_photo_bytes(photo)
+                    if data is None and photo.file_path and os.path.exists(photo.file_path):
+                        with open(photo.file_path, "rb") as f:
+                            data = f.read()
+                    if not data:
+                        # Plus retentée; exclue de l'export jusqu'à une nouvelle écriture de la photo
+                        photo.optimized_size = UNREADABLE_SIZE
+                        photo.optimized_crc32 = 0
+                        raise IOError("photo data unavailable")
+                    photo.optimized_size = len(data)
+                    photo.optimized_crc32 = zlib.crc32(data)
+                    moved += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"[BlobMigration] checksum photo_id={photo.id} failed: {e}")
+            last_id = int(photos[-1].id)
+            db.commit()
+            return {"last_id": last_id, "moved": moved, "failed": failed}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def status(self) -> Optional[Dict]:
+        return job_registry.latest(JOB_KIND, JOB_KIND)
+
+
+# Instance singleton
+blob_migration = BlobMigration()
+
+
+if __name__ == "__main__":
+    blob_migration.run(job_registry.create(JOB_KIND, JOB_KIND, total=sum(blob_migration.pending_counts().values())))
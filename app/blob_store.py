@@ -0,0 +1,312 @@
+"""
+Stockage des binaires photo hors de la base (blob store adressé par contenu).
+
+Les octets des photos (image optimisée, vignette, aperçu, variantes WebP/AVIF) sont
+écrits sous leur SHA-256; la base ne conserve que la clé (photos.blob_key,
+thumbnail_blob_key, preview_blob_key, photo_variants.blob_key). Deux contenus
+identiques partagent le même blob.
+
+Backends (BLOB_STORE_BACKEND, "db" par défaut: le blob store est activé explicitement):
+    - local: fichiers sous BLOB_STORE_LOCAL_ROOT/{ab}/{cd}/{sha256}, servis par
+             FileResponse (sendfile quand le serveur le permet). Choix explicite uniquement:
+             le disque doit être persistant et partagé par toutes les instances
+    - s3:    objets {BLOB_STORE_S3_PREFIX}/{ab}/{sha256} du bucket PHOTO_BUCKET_NAME,
+             servis en flux par morceaux
+    - auto:  s3 si PHOTO_BUCKET_NAME est configuré, sinon db (jamais local: le disque
+             d'un conteneur est éphémère et propre à chaque instance)
+    - db:    désactivé (défaut), les binaires restent dans les colonnes LargeBinary
+
+Transition: les lectures passent par read_photo_bytes() / read_blob_or_column(),
+qui lisent le blob si la clé existe et retombent sur la colonne sinon (double lecture);
+blob_migration.py vide progressivement les colonnes existantes.
+
+Usage:
+    from blob_store import get_blob_store, read_photo_bytes
+
+    store = get_blob_store()
+    if store is not None:
+        photo.blob_key = store.put(data)
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from typing import Dict, Iterable, Optional
+
+from settings import settings
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    """Blobs dans un répertoire local, écrits de manière atomique (fichier temporaire + rename)."""
+
+    backend = "local"
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data: bytes, content_type: str = "image/jpeg") -> str:
+        key = content_key(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key  # Contenu déjà présent (adressage par contenu)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore:
+    """Blobs dans le bucket photo, sous un préfixe dédié."""
+
+    backend = "s3"
+
+    def __init__(self, bucket: str, prefix: str):
+        self.bucket = bucket
+        self.prefix = (prefix or "blobs").strip("/")
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3", region_name=settings.AWS_REGION)
+        return self._client
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key[:2]}/{key}"
+
+    def put(self, data: bytes, content_type: str = "image/jpeg") -> str:
+        key = content_key(data)
+        # put_object est idempotent pour un même contenu: pas de HEAD préalable
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Body=data,
+            ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable",
+        )
+        return key
+
+    def get(self, key: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code", "") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            return int(self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))["ContentLength"])
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code", "") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterable[bytes]:
+        """Morceaux des octets [start, end] (fin incluse), lus en flux depuis S3."""
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.object_key(key), Range=f"bytes={start}-{end}"
+        )
+        return response["Body"].iter_chunks(chunk_size=STREAM_CHUNK_SIZE)
+
+    def open_stream(self, key: str) -> Optional[Dict]:
+        """Flux de l'objet: {"chunks": itérateur, "size": int}, None si absent."""
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code", "") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return {
+            "chunks": response["Body"].iter_chunks(chunk_size=STREAM_CHUNK_SIZE),
+            "size": int(response.get("ContentLength") or 0),
+        }
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _resolve_backend() -> str:
+    backend = (settings.BLOB_STORE_BACKEND or "db").strip().lower()
+    if backend == "auto":
+        return "s3" if settings.is_s3_configured else "db"
+    return backend if backend in ("local", "s3", "db") else "db"
+
+
+def get_blob_store():
+    """Blob store configuré (singleton), None si les binaires restent en base."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = _resolve_backend()
+                if backend == "local":
+                    _store = LocalBlobStore(settings.BLOB_STORE_LOCAL_ROOT)
+                elif backend == "s3":
+                    _store = S3BlobStore(settings.PHOTO_BUCKET_NAME, settings.BLOB_STORE_S3_PREFIX)
+                else:
+                    _store = False
+                print(f"[BlobStore] backend={backend}")
+    return _store or None
+
+
+def read_blob_or_column(blob_key: Optional[str], column_value) -> Optional[bytes]:
+    """Double lecture: blob si la clé est renseignée, sinon valeur de la colonne LargeBinary."""
+    if blob_key:
+        store = get_blob_store()
+        if store is not None:
+            try:
+                data = store.get(blob_key)
+                if data is not None:
+                    return data
+            except Exception as e:
+                print(f"[BlobStore] read failed key={blob_key}: {e}")
+        print(f"[BlobStore] blob missing key={blob_key}, falling back to column")
+    return bytes(column_value) if column_value else None
+
+
+def read_photo_bytes(photo) -> Optional[bytes]:
+    """Octets de la photo optimisée (blob, sinon photo_data)."""
+    blob_key = getattr(photo, "blob_key", None)
+    if blob_key:
+        data = read_blob_or_column(blob_key, None)
+        if data is not None:
+            return data
+    return read_blob_or_column(None, getattr(photo, "photo_data", None))
+
+
+def store_photo_blobs(photo, data: Optional[bytes], renditions: Optional[Dict[str, bytes]] = None) -> bool:
+    """
+    Écrit l'image optimisée et ses déclinaisons dans le blob store et vide les colonnes
+    binaires correspondantes. Sans blob store (ou en cas d'erreur), les octets restent en base.
+    """
+    renditions = renditions or {}
+    photo.photo_data = data
+    # Taille/CRC-32 de la photo servie: disposition des exports ZIP connue sans relire les octets
+    photo.optimized_size = len(data) if data else None
+    photo.optimized_crc32 = zlib.crc32(data) if data else None
+    photo.thumbnail_data = renditions.get("thumbnail")
+    photo.preview_data = renditions.get("preview")
+    store = get_blob_store()
+    if store is None or not data:
+        return False
+    try:
+        photo.blob_key = store.put(data)
+        photo.photo_data = None
+        for name in ("thumbnail", "preview"):
+            if renditions.get(name):
+                setattr(photo, f"{name}_blob_key", store.put(renditions[name]))
+                setattr(photo, f"{name}_data", None)
+        return True
+    except Exception as e:
+        print(f"[BlobStore] write failed photo_id={getattr(photo, 'id', None)}, keeping bytes in DB: {e}")
+        photo.photo_data = data
+        photo.thumbnail_data = renditions.get("thumbnail")
+        photo.preview_data = renditions.get("preview")
+        return False
+
+
+def photo_blob_keys(db, photo_ids: Iterable[int]) -> set:
+    """Clés des blobs d'un ensemble de photos (image, déclinaisons, variantes), à lire avant suppression."""
+    from models import Photo, PhotoVariant
+
+    ids = sorted({int(pid) for pid in photo_ids if pid})
+    if not ids:
+        return set()
+    keys = set()
+    for row in db.query(Photo.blob_key, Photo.thumbnail_blob_key, Photo.preview_blob_key).filter(Photo.id.in_(ids)).all():
+        keys.update(k for k in row if k)
+    keys.update(k for (k,) in db.query(PhotoVariant.blob_key).filter(
+        PhotoVariant.photo_id.in_(ids), PhotoVariant.blob_key.isnot(None)
+    ).all())
+    return keys
+
+
+def referenced_keys(db, keys: Iterable[str]) -> set:
+    """Clés encore référencées par une photo ou une variante."""
+    from sqlalchemy import or_
+    from models import Photo, PhotoVariant
+
+    wanted = sorted({k for k in keys if k})
+    if not wanted:
+        return set()
+    used = set()
+    rows = db.query(Photo.blob_key, Photo.thumbnail_blob_key, Photo.preview_blob_key).filter(
+        or_(
+            Photo.blob_key.in_(wanted),
+            Photo.thumbnail_blob_key.in_(wanted),
+            Photo.preview_blob_key.in_(wanted),
+        )
+    ).all()
+    for row in rows:
+        used.update(k for k in row if k)
+    used.update(k for (k,) in db.query(PhotoVariant.blob_key).filter(PhotoVariant.blob_key.in_(wanted)).all())
+    return used
+
+
+def delete_unreferenced(db, keys: Iterable[str]) -> int:
+    """Supprime les blobs qui ne sont plus référencés (après commit de la suppression des lignes)."""
+    store = get_blob_store()
+    keys = {k for k in keys if k}
+    if store is None or not keys:
+        return 0
+    deleted = 0
+    for key in keys - referenced_keys(db, keys):
+        try:
+            store.delete(key)
+            deleted += 1
+        except Exception as e:
+            print(f"[BlobStore] delete failed key={key}: {e}")
+    return deleted
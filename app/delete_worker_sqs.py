@@ -17,6 +17,8 @@ Architecture:
        si échec total: status=FAILED
     5. Le message SQS est supprimé à la fin (même en cas d'erreur)
 
+La file est accédée via job_queue.get_job_queue("delete") (SQS ou SQLite local).
+
 Robustesse:
     - Jobs en IN_PROGRESS sont repris au redémarrage du worker
     - Chaque photo est traitée individuellement (une erreur ne bloque pas les autres)
@@ -71,14 +73,13 @@ class DeleteWorkerSQS:
         self._stats_lock = threading.Lock()
         
         # Clients AWS (créés à la demande)
-        self._sqs_client = None
         self._s3_client = None
     
     @property
-    def sqs_client(self):
-        if self._sqs_client is None:
-            self._sqs_client = boto3.client("sqs", region_name=settings.AWS_REGION)
-        return self._sqs_client
+    def queue(self):
+        """File de jobs (SQS ou locale selon JOB_QUEUE_BACKEND)."""
+        from job_queue import get_job_queue
+        return get_job_queue("delete")
     
     @property
     def s3_client(self):
@@ -112,7 +113,7 @@ class DeleteWorkerSQS:
             daemon=True
         )
         self._thread.start()
-        print(f"[DeleteWorkerSQS] Worker started (queue={settings.delete_sqs_queue_url})")
+        print(f"[DeleteWorkerSQS] Worker started (backend={settings.JOB_QUEUE_BACKEND} queue={settings.delete_sqs_queue_url})")
     
     def stop(self, timeout: float = 30.0):
         """Arrête proprement le worker."""
@@ -131,7 +132,7 @@ class DeleteWorkerSQS:
     def get_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques du worker."""
         with self._stats_lock:
-            return {**self._stats, "running": self._running}
+            return {**self._stats, "running": self._running, "queue_backend": settings.JOB_QUEUE_BACKEND}
     
     def _recover_pending_jobs(self):
         """Reprend les jobs interrompus (status=IN_PROGRESS ou PENDING)."""
@@ -191,16 +192,12 @@ class DeleteWorkerSQS:
                 self._stats["last_poll_at"] = time.time()
             
             # Long polling SQS
-            response = self.sqs_client.receive_message(
-                QueueUrl=settings.delete_sqs_queue_url,
-                MaxNumberOfMessages=1,  # Un job à la fois
-                WaitTimeSeconds=settings.PHOTO_SQS_WAIT_TIME_SECONDS,
-                VisibilityTimeout=settings.DELETE_SQS_VISIBILITY_TIMEOUT,
-                MessageAttributeNames=["All"],
+            messages = self.queue.receive(
+                max_messages=1,  # Un job à la fois
+                wait_seconds=settings.PHOTO_SQS_WAIT_TIME_SECONDS,
+                visibility_timeout=settings.DELETE_SQS_VISIBILITY_TIMEOUT,
             )
             
-            messages = response.get("Messages", [])
-            
             if not messages:
                 # Aucun message, vérifier les jobs PENDING en DB (recovery)
                 self._process_pending_jobs_from_db()
@@ -289,6 +286,8 @@ class DeleteWorkerSQS:
         """Traite un job de suppression complet."""
         from database import SessionLocal, get_db_diagnostic_snapshot
         from models import DeleteJob, DeleteJobStatus, Photo, FaceMatch
+        from blob_store import delete_unreferenced, photo_blob_keys
+        from perceptual_hash import detach_near_duplicates, reanalyze_photos_async
         
         start_time = time.time()
         db = SessionLocal()
@@ -343,6 +342,11 @@ class DeleteWorkerSQS:
                 batch = photo_ids[i:i+batch_size]
                 print(f"[DELETE-JOB] job_id={job_id} processing batch {i//batch_size + 1}/{(total + batch_size - 1)//batch_size}")
                 
+                # Clés du blob store lues avant suppression des lignes
+                blob_keys = photo_blob_keys(db, batch)
+                # Quasi-doublons qui réutilisaient l'analyse d'une photo du lot
+                detached = detach_near_duplicates(db, batch)
+                
                 for photo_id in batch:
                     try:
                         # Récupérer la photo
@@ -380,6 +384,9 @@ class DeleteWorkerSQS:
                 # Commit par batch
                 try:
                     db.commit()
+                    # Blobs qui ne sont plus référencés (contenu partagé entre photos possible)
+                    delete_unreferenced(db, blob_keys)
+                    reanalyze_photos_async(detached)
                 except Exception as e:
                     print(f"[DELETE-JOB]   Commit failed: {e}")
                     db.rollback()
@@ -493,10 +500,7 @@ class DeleteWorkerSQS:
     def _delete_message(self, receipt_handle: str):
         """Supprime un message de la file SQS."""
         try:
-            self.sqs_client.delete_message(
-                QueueUrl=settings.delete_sqs_queue_url,
-                ReceiptHandle=receipt_handle
-            )
+            self.queue.delete(receipt_handle)
         except ClientError as e:
             print(f"[DeleteWorkerSQS] Failed to delete message: {e}")
 
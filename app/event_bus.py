@@ -0,0 +1,246 @@
+"""
+Bus d'événements pour la progression temps réel (flux SSE /api/events/stream).
+
+Remplace le polling des statuts (/api/rematch-status, /api/upload-jobs/{id}/status):
+les producteurs (registre des jobs, worker photo, matching) publient sur des topics,
+le endpoint SSE relaie aux clients abonnés.
+
+Topics:
+    - user:{id}          progression du rematch selfie, nouvelles photos matchées
+    - photographer:{id}  progression/complétion des lots d'upload
+    - job:{id}           progression d'un job du registre background_jobs
+
+Backends (EVENT_BUS_BACKEND):
+    - memory:   diffusion dans le processus courant uniquement
+    - postgres: diffusion locale immédiate + NOTIFY sur EVENT_BUS_PG_CHANNEL; chaque
+                processus abonné écoute (LISTEN) dans un thread dédié et relaie les
+                messages des autres processus à ses abonnés locaux
+    - auto:     postgres si DATABASE_URL est PostgreSQL, sinon memory
+
+publish() est thread-safe et non bloquant pour l'appelant (worker, pool de matching):
+un abonné lent perd ses événements les plus anciens, jamais le producteur.
+
+Usage:
+    from event_bus import event_bus, user_topic
+
+    event_bus.publish(user_topic(user_id), "match", {"photo_id": 42, "event_id": 7})
+"""
+
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+from settings import settings
+
+
+# Limite de payload NOTIFY PostgreSQL: 8000 octets
+PG_NOTIFY_MAX_BYTES = 7900
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{int(user_id)}"
+
+
+def photographer_topic(photographer_id: int) -> str:
+    return f"photographer:{int(photographer_id)}"
+
+
+def job_topic(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _resolve_backend() -> str:
+    backend = (settings.EVENT_BUS_BACKEND or "auto").strip().lower()
+    if backend == "auto":
+        url = os.getenv("DATABASE_URL", settings.DATABASE_URL) or ""
+        return "postgres" if url.startswith(("postgres://", "postgresql")) else "memory"
+    return backend if backend in ("memory", "postgres") else "memory"
+
+
+class Subscription:
+    """Abonnement d'un client SSE: file asyncio bornée alimentée depuis n'importe quel thread."""
+
+    def __init__(self, topics: Iterable[str], loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.topics: Set[str] = set(topics)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, int(maxsize)))
+        self.dropped = 0
+
+    def _put(self, message: Dict[str, Any]):
+        # Exécuté dans la boucle asyncio: abandonner le plus ancien si la file est pleine
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+    def push(self, message: Dict[str, Any]):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Boucle fermée: l'abonnement sera retiré par le endpoint
+            pass
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """Pub/sub en processus + diffusion inter-workers via PostgreSQL LISTEN/NOTIFY."""
+
+    def __init__(self):
+        self.backend = _resolve_backend()
+        self.channel = settings.EVENT_BUS_PG_CHANNEL or "face_events"
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {"published": 0, "delivered": 0, "remote_received": 0, "notify_errors": 0}
+        print(f"[EventBus] backend={self.backend} channel={self.channel}")
+
+    @property
+    def _origin(self) -> str:
+        # Calculé à chaque usage: le singleton peut être importé avant le fork des workers
+        return f"{os.getpid()}-{id(self)}"
+
+    # ---------- Abonnements ----------
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        """Crée un abonnement (à appeler depuis la boucle asyncio du endpoint)."""
+        sub = Subscription(topics, asyncio.get_running_loop(), settings.EVENT_BUS_SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            for topic in sub.topics:
+                self._subscribers.setdefault(topic, set()).add(sub)
+        if self.backend == "postgres":
+            self._ensure_listener()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for topic in sub.topics:
+                subs = self._subscribers.get(topic)
+                if subs is None:
+                    continue
+                subs.discard(sub)
+                if not subs:
+                    self._subscribers.pop(topic, None)
+
+    # ---------- Publication ----------
+
+    def publish(self, topic: str, event_type: str, data: Optional[Dict[str, Any]] = None):
+        """Publie un événement (best-effort: n'échoue jamais côté producteur)."""
+        message = {"topic": topic, "type": event_type, "data": data or {}, "ts": time.time()}
+        try:
+            self._stats["published"] += 1
+            self._deliver_local(message)
+            if self.backend == "postgres":
+                self._notify(message)
+        except Exception as e:
+            print(f"[EventBus] publish failed topic={topic} type={event_type}: {e}")
+
+    def _deliver_local(self, message: Dict[str, Any]):
+        with self._lock:
+            subs = list(self._subscribers.get(message["topic"], ()))
+        for sub in subs:
+            sub.push(message)
+        self._stats["delivered"] += len(subs)
+
+    def _notify(self, message: Dict[str, Any]):
+        envelope = dict(message, origin=self._origin)
+        payload = json.dumps(envelope, default=str)
+        if len(payload.encode("utf-8")) > PG_NOTIFY_MAX_BYTES:
+            # Trop volumineux pour NOTIFY: le client relira l'état via l'API
+            envelope["data"] = {"truncated": True}
+            payload = json.dumps(envelope, default=str)
+        try:
+            from sqlalchemy import text
+            from database import engine
+
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": self.channel, "payload": payload})
+        except Exception as e:
+            self._stats["notify_errors"] += 1
+            print(f"[EventBus] NOTIFY failed: {e}")
+
+    # ---------- Écoute PostgreSQL ----------
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen_loop, name="event-bus-listener", daemon=True)
+            self._listener.start()
+
+    def _listen_loop(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                import psycopg2
+
+                from database import DATABASE_URL
+
+                conn = psycopg2.connect(DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://", 1))
+                conn.set_isolation_level(0)  # autocommit, requis pour LISTEN
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                print(f"[EventBus] LISTEN {self.channel} (pid={os.getpid()})")
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._on_notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"[EventBus] listener error: {e} (retry in {backoff:.0f}s)")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _on_notify(self, payload: str):
+        try:
+            envelope = json.loads(payload)
+        except Exception:
+            return
+        if envelope.pop("origin", None) == self._origin:
+            return  # déjà livré localement par publish()
+        self._stats["remote_received"] += 1
+        self._deliver_local(envelope)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscriptions = {sub for subs in self._subscribers.values() for sub in subs}
+            topics = len(self._subscribers)
+        return {
+            "backend": self.backend,
+            "channel": self.channel,
+            "listener_alive": bool(self._listener and self._listener.is_alive()),
+            "subscriptions": len(subscriptions),
+            "topics": topics,
+            "dropped": sum(sub.dropped for sub in subscriptions),
+            **self._stats,
+        }
+
+
+# Instance singleton
+event_bus = EventBus()
@@ -7,7 +7,7 @@ import cv2
 import numpy as np
 from typing import List, Dict, Tuple, Optional
 from sqlalchemy.orm import Session
-from models import User, Photo, FaceMatch
+from models import User, Photo, FaceMatch, PhotoFace
 import uuid
 import io
 from PIL import Image
@@ -417,7 +417,8 @@ class FaceRecognizer:
         db.refresh(photo)
         
         # Traiter la reconnaissance faciale pour cet événement spécifique AVEC les données ORIGINALES
-        matches = self.process_photo_for_event(original_data, event_id, db)
+        # (les visages détectés sont ajoutés à photo_faces avec leur box, commit final ci-dessous)
+        matches = self.process_photo_for_event(original_data, event_id, db, photo_id=photo.id)
         
         # Sauvegarder les correspondances
         for match in matches:
@@ -445,10 +446,35 @@ class FaceRecognizer:
         print(f"🔄 Toutes les photos de l'événement {event_id} ont été réinitialisées à expirer le {new_expiration}")
         return photo
 
-    def process_photo_for_event(self, photo_data: bytes, event_id: int, db: Session) -> List[Dict]:
+    def _add_photo_faces(self, db: Session, event_id: int, photo_id: int,
+                         face_locations: List[Tuple[int, int, int, int]], image_shape,
+                         face_users: Dict[int, int]):
+        """Ajoute les visages détectés à photo_faces (box normalisée 0..1, sans commit).
+
+        face_users: index du visage -> user_id retenu pour ce visage
+        """
+        H, W = int(image_shape[0]), int(image_shape[1])
+        if not W or not H:
+            return
+        for i, (top, right, bottom, left) in enumerate(face_locations):
+            db.add(PhotoFace(
+                event_id=event_id,
+                photo_id=photo_id,
+                face_id=f"local:{photo_id}:{i}",
+                box_left=max(0.0, left / W),
+                box_top=max(0.0, top / H),
+                box_width=max(0.0, (right - left) / W),
+                box_height=max(0.0, (bottom - top) / H),
+                detection_source="local",
+                matched_user_id=face_users.get(i),
+            ))
+
+    def process_photo_for_event(self, photo_data: bytes, event_id: int, db: Session,
+                                photo_id: Optional[int] = None) -> List[Dict]:
         """Traite une photo et retourne les correspondances trouvées pour un événement spécifique.
 
         Accepte soit des données binaires d'image, soit un chemin de fichier (str).
+        Si photo_id est fourni, les visages détectés sont ajoutés à photo_faces (sans commit).
         """
         if not photo_data:
             return []
@@ -479,23 +505,34 @@ class FaceRecognizer:
             # Encodages des utilisateurs de l'événement (avec cache)
             user_encodings = self.get_user_encodings_for_event(db, event_id)
             if not user_encodings:
+                if photo_id is not None:
+                    self._add_photo_faces(db, event_id, photo_id, face_locations, np_img.shape, {})
                 return []
             user_ids = list(user_encodings.keys())
             user_matrix = np.array([user_encodings[uid] for uid in user_ids])
 
             # Calcul vectorisé des distances et déduplication par utilisateur
             best_by_user: Dict[int, int] = {}
-            for enc in face_encodings:
+            face_users: Dict[int, int] = {}
+            for face_idx, enc in enumerate(face_encodings):
                 try:
                     dists = face_recognition.face_distance(user_matrix, enc)
                 except Exception:
                     dists = np.array([face_recognition.face_distance([u], enc)[0] for u in user_matrix])
+                best_for_face: Optional[Tuple[int, int]] = None
                 for idx, dist in enumerate(dists):
                     if dist <= self.tolerance:
                         uid = user_ids[idx]
                         score = max(0, int((1 - float(dist)) * 100))
                         if (uid not in best_by_user) or (score > best_by_user[uid]):
                             best_by_user[uid] = score
+                        if best_for_face is None or score > best_for_face[1]:
+                            best_for_face = (uid, score)
+                if best_for_face is not None:
+                    face_users[face_idx] = best_for_face[0]
+
+            if photo_id is not None:
+                self._add_photo_faces(db, event_id, photo_id, face_locations, np_img.shape, face_users)
 
             matches = [{
                 'user_id': uid,
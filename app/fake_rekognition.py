@@ -0,0 +1,340 @@
+"""
+Client Rekognition local (faux) pour les benchmarks hors ligne.
+
+Implémente les appels utilisés par AwsFaceRecognizer (create_collection, index_faces,
+search_faces, search_faces_by_image, detect_faces, delete_faces, list_faces, compare_faces)
+avec les mêmes formats de réponse que boto3, en s'appuyant sur les embeddings dlib
+(face_recognition). Les collections sont stockées dans un fichier SQLite (WAL) partagé
+entre l'API et les workers, ce qui permet de tester tout le pipeline S3 -> SQS -> worker
+sur une seule machine.
+
+Activation: FACE_RECOGNIZER_PROVIDER=aws_fake
+
+Variables d'environnement:
+    FAKE_REKOGNITION_DB             Chemin du fichier SQLite (défaut: <tmp>/fake_rekognition.sqlite3)
+    FAKE_REKOGNITION_LATENCY_MS     Latence injectée moyenne par appel (défaut: 0)
+    FAKE_REKOGNITION_JITTER_MS      Variation aléatoire de la latence (défaut: 0)
+    FAKE_REKOGNITION_THROTTLE_RATE  Probabilité de ThrottlingException (0..1, défaut: 0)
+    FAKE_REKOGNITION_ERROR_RATE     Probabilité d'InternalServerError (0..1, défaut: 0)
+    FAKE_REKOGNITION_DISTANCE_SCALE Distance dlib correspondant à une similarité de 0
+                                    (défaut: 1.5, soit distance 0.6 -> similarité 60)
+"""
+
+import os
+import io
+import json
+import time
+import uuid
+import random
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from botocore.exceptions import ClientError
+from PIL import Image as _Image, ImageOps as _ImageOps, ImageStat as _ImageStat, ImageFilter as _ImageFilter
+
+
+FAKE_REKOGNITION_DB = os.environ.get(
+    "FAKE_REKOGNITION_DB", os.path.join(tempfile.gettempdir(), "fake_rekognition.sqlite3")
+)
+FAKE_REKOGNITION_LATENCY_MS = float(os.environ.get("FAKE_REKOGNITION_LATENCY_MS", "0") or "0")
+FAKE_REKOGNITION_JITTER_MS = float(os.environ.get("FAKE_REKOGNITION_JITTER_MS", "0") or "0")
+FAKE_REKOGNITION_THROTTLE_RATE = float(os.environ.get("FAKE_REKOGNITION_THROTTLE_RATE", "0") or "0")
+FAKE_REKOGNITION_ERROR_RATE = float(os.environ.get("FAKE_REKOGNITION_ERROR_RATE", "0") or "0")
+FAKE_REKOGNITION_DISTANCE_SCALE = float(os.environ.get("FAKE_REKOGNITION_DISTANCE_SCALE", "1.5") or "1.5")
+
+
+def _client_error(code: str, message: str, operation: str, status: int = 400) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status, "RetryAttempts": 0},
+        },
+        operation,
+    )
+
+
+class FakeRekognitionClient:
+    """Stand-in de boto3.client("rekognition") basé sur dlib + SQLite."""
+
+    def __init__(self, db_path: Optional[str] = None, latency_ms: Optional[float] = None,
+                 jitter_ms: Optional[float] = None, throttle_rate: Optional[float] = None,
+                 error_rate: Optional[float] = None):
+        self.db_path = db_path or FAKE_REKOGNITION_DB
+        self.latency_ms = FAKE_REKOGNITION_LATENCY_MS if latency_ms is None else float(latency_ms)
+        self.jitter_ms = FAKE_REKOGNITION_JITTER_MS if jitter_ms is None else float(jitter_ms)
+        self.throttle_rate = FAKE_REKOGNITION_THROTTLE_RATE if throttle_rate is None else float(throttle_rate)
+        self.error_rate = FAKE_REKOGNITION_ERROR_RATE if error_rate is None else float(error_rate)
+        self._local = threading.local()
+        self._init_db()
+        print(f"[FakeRekognition] db={self.db_path} latency={self.latency_ms}ms±{self.jitter_ms} "
+              f"throttle_rate={self.throttle_rate} error_rate={self.error_rate}")
+
+    # -------- Stockage --------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS collections (collection_id TEXT PRIMARY KEY, created_at REAL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS faces ("
+            " face_id TEXT PRIMARY KEY, collection_id TEXT NOT NULL, external_image_id TEXT,"
+            " image_id TEXT, encoding BLOB NOT NULL, bounding_box TEXT, confidence REAL, created_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_faces_collection ON faces (collection_id)")
+
+    def _require_collection(self, collection_id: str, operation: str):
+        row = self._conn().execute(
+            "SELECT 1 FROM collections WHERE collection_id = ?", (collection_id,)
+        ).fetchone()
+        if not row:
+            raise _client_error("ResourceNotFoundException", f"The collection id: {collection_id} does not exist", operation)
+
+    def _collection_faces(self, collection_id: str) -> Tuple[List[Dict], Optional[np.ndarray]]:
+        rows = self._conn().execute(
+            "SELECT face_id, external_image_id, image_id, encoding, bounding_box, confidence"
+            " FROM faces WHERE collection_id = ?", (collection_id,)
+        ).fetchall()
+        if not rows:
+            return [], None
+        faces = [{
+            "FaceId": r[0],
+            "ExternalImageId": r[1],
+            "ImageId": r[2],
+            "BoundingBox": json.loads(r[4] or "{}"),
+            "Confidence": float(r[5] or 99.0),
+        } for r in rows]
+        matrix = np.vstack([np.frombuffer(r[3], dtype=np.float64) for r in rows])
+        return faces, matrix
+
+    # -------- Simulation réseau --------
+    def _simulate(self, operation: str):
+        delay = self.latency_ms
+        if self.jitter_ms:
+            delay += random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            raise _client_error("ThrottlingException", "Rate exceeded (simulated)", operation)
+        if self.error_rate and random.random() < self.error_rate:
+            raise _client_error("InternalServerError", "Internal error (simulated)", operation, status=500)
+
+    @staticmethod
+    def _metadata() -> Dict:
+        return {"RequestId": str(uuid.uuid4()), "HTTPStatusCode": 200, "RetryAttempts": 0}
+
+    # -------- Analyse d'image (dlib) --------
+    def _load_image(self, image: Dict, operation: str) -> np.ndarray:
+        data = (image or {}).get("Bytes")
+        if not data:
+            raise _client_error("InvalidParameterException", "Image bytes are required", operation)
+        try:
+            pil_img = _ImageOps.exif_transpose(_Image.open(io.BytesIO(data)))
+            if pil_img.mode != "RGB":
+                pil_img = pil_img.convert("RGB")
+            return np.array(pil_img)
+        except Exception:
+            raise _client_error("InvalidImageFormatException", "Request has invalid image format", operation)
+
+    def _analyze(self, np_img: np.ndarray) -> List[Dict]:
+        """Retourne [{"box": (top, right, bottom, left), "encoding": ndarray, "detail": FaceDetail}]."""
+        # Importer le patch en premier pour corriger face_recognition_models (comme face_recognizer.py)
+        import face_recognition_patch  # noqa: F401
+        import face_recognition
+
+        H, W = np_img.shape[0], np_img.shape[1]
+        locations = face_recognition.face_locations(np_img, model="hog", number_of_times_to_upsample=1) or []
+        encodings = face_recognition.face_encodings(np_img, locations) if locations else []
+        faces: List[Dict] = []
+        for (top, right, bottom, left), enc in zip(locations, encodings):
+            crop = _Image.fromarray(np_img[max(0, top):bottom, max(0, left):right]).convert("L")
+            brightness = _ImageStat.Stat(crop).mean[0] / 255.0 * 100.0
+            # Netteté approximée par l'énergie des contours (0..100)
+            edges = _ImageStat.Stat(crop.filter(_ImageFilter.FIND_EDGES))
+            sharpness = min(100.0, edges.stddev[0] * 2.0)
+            faces.append({
+                "box": (top, right, bottom, left),
+                "encoding": np.asarray(enc, dtype=np.float64),
+                "detail": {
+                    "BoundingBox": {
+                        "Left": max(0.0, left / W),
+                        "Top": max(0.0, top / H),
+                        "Width": max(0.0, (right - left) / W),
+                        "Height": max(0.0, (bottom - top) / H),
+                    },
+                    "Confidence": 99.9,
+                    "Quality": {"Brightness": round(brightness, 2), "Sharpness": round(sharpness, 2)},
+                    "Pose": {"Yaw": 0.0, "Pitch": 0.0, "Roll": 0.0},
+                },
+            })
+        return faces
+
+    def _similarity(self, distances: np.ndarray) -> np.ndarray:
+        return np.clip(100.0 * (1.0 - distances / FAKE_REKOGNITION_DISTANCE_SCALE), 0.0, 100.0)
+
+    def _search(self, collection_id: str, encoding: np.ndarray, max_faces: int, threshold: float,
+                exclude_face_id: Optional[str] = None) -> List[Dict]:
+        faces, matrix = self._collection_faces(collection_id)
+        if matrix is None:
+            return []
+        sims = self._similarity(np.linalg.norm(matrix - encoding, axis=1))
+        order = np.argsort(-sims)
+        matches: List[Dict] = []
+        for idx in order:
+            if faces[idx]["FaceId"] == exclude_face_id:
+                continue
+            sim = float(sims[idx])
+            if sim < float(threshold):
+                break
+            matches.append({"Similarity": round(sim, 4), "Face": faces[idx]})
+            if len(matches) >= int(max_faces):
+                break
+        return matches
+
+    # -------- API Rekognition --------
+    def create_collection(self, CollectionId: str, **kwargs) -> Dict:
+        self._simulate("CreateCollection")
+        try:
+            self._conn().execute(
+                "INSERT INTO collections (collection_id, created_at) VALUES (?, ?)", (CollectionId, time.time())
+            )
+        except sqlite3.IntegrityError:
+            raise _client_error("ResourceAlreadyExistsException",
+                                f"The collection id: {CollectionId} already exists", "CreateCollection")
+        return {"StatusCode": 200, "CollectionArn": f"fake:collection/{CollectionId}",
+                "FaceModelVersion": "dlib", "ResponseMetadata": self._metadata()}
+
+    def detect_faces(self, Image: Dict, Attributes: Optional[List[str]] = None, **kwargs) -> Dict:
+        self._simulate("DetectFaces")
+        faces = self._analyze(self._load_image(Image, "DetectFaces"))
+        return {"FaceDetails": [f["detail"] for f in faces], "ResponseMetadata": self._metadata()}
+
+    def index_faces(self, CollectionId: str, Image: Dict, ExternalImageId: Optional[str] = None,
+                    MaxFaces: int = 100, **kwargs) -> Dict:
+        self._simulate("IndexFaces")
+        self._require_collection(CollectionId, "IndexFaces")
+        faces = self._analyze(self._load_image(Image, "IndexFaces"))
+        # Comme Rekognition: garder les plus grands visages
+        faces.sort(key=lambda f: f["detail"]["BoundingBox"]["Width"] * f["detail"]["BoundingBox"]["Height"], reverse=True)
+        kept, unindexed = faces[:int(MaxFaces)], faces[int(MaxFaces):]
+        image_id = str(uuid.uuid4())
+        records = []
+        conn = self._conn()
+        for f in kept:
+            face_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO faces (face_id, collection_id, external_image_id, image_id, encoding, bounding_box, confidence, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (face_id, CollectionId, ExternalImageId, image_id, f["encoding"].tobytes(),
+                 json.dumps(f["detail"]["BoundingBox"]), f["detail"]["Confidence"], time.time()),
+            )
+            records.append({
+                "Face": {
+                    "FaceId": face_id,
+                    "BoundingBox": f["detail"]["BoundingBox"],
+                    "ImageId": image_id,
+                    "ExternalImageId": ExternalImageId,
+                    "Confidence": f["detail"]["Confidence"],
+                },
+                "FaceDetail": f["detail"],
+            })
+        return {
+            "FaceRecords": records,
+            "UnindexedFaces": [{"Reasons": ["EXCEEDS_MAX_FACES"], "FaceDetail": f["detail"]} for f in unindexed],
+            "FaceModelVersion": "dlib",
+            "ResponseMetadata": self._metadata(),
+        }
+
+    def search_faces(self, CollectionId: str, FaceId: str, MaxFaces: int = 80,
+                     FaceMatchThreshold: float = 80.0, **kwargs) -> Dict:
+        self._simulate("SearchFaces")
+        self._require_collection(CollectionId, "SearchFaces")
+        row = self._conn().execute(
+            "SELECT encoding FROM faces WHERE collection_id = ? AND face_id = ?", (CollectionId, FaceId)
+        ).fetchone()
+        if not row:
+            raise _client_error("InvalidParameterException", f"FaceId {FaceId} not found in collection", "SearchFaces")
+        encoding = np.frombuffer(row[0], dtype=np.float64)
+        return {
+            "SearchedFaceId": FaceId,
+            "FaceMatches": self._search(CollectionId, encoding, MaxFaces, FaceMatchThreshold, exclude_face_id=FaceId),
+            "FaceModelVersion": "dlib",
+            "ResponseMetadata": self._metadata(),
+        }
+
+    def search_faces_by_image(self, CollectionId: str, Image: Dict, MaxFaces: int = 80,
+                              FaceMatchThreshold: float = 80.0, **kwargs) -> Dict:
+        self._simulate("SearchFacesByImage")
+        self._require_collection(CollectionId, "SearchFacesByImage")
+        faces = self._analyze(self._load_image(Image, "SearchFacesByImage"))
+        if not faces:
+            raise _client_error("InvalidParameterException", "There are no faces in the image. Should be at least 1.",
+                                "SearchFacesByImage")
+        # Comme Rekognition: recherche sur le plus grand visage
+        largest = max(faces, key=lambda f: f["detail"]["BoundingBox"]["Width"] * f["detail"]["BoundingBox"]["Height"])
+        return {
+            "SearchedFaceBoundingBox": largest["detail"]["BoundingBox"],
+            "SearchedFaceConfidence": largest["detail"]["Confidence"],
+            "FaceMatches": self._search(CollectionId, largest["encoding"], MaxFaces, FaceMatchThreshold),
+            "FaceModelVersion": "dlib",
+            "ResponseMetadata": self._metadata(),
+        }
+
+    def compare_faces(self, SourceImage: Dict, TargetImage: Dict, SimilarityThreshold: float = 80.0, **kwargs) -> Dict:
+        self._simulate("CompareFaces")
+        source = self._analyze(self._load_image(SourceImage, "CompareFaces"))
+        if not source:
+            raise _client_error("InvalidParameterException", "There are no faces in the source image.", "CompareFaces")
+        src = max(source, key=lambda f: f["detail"]["BoundingBox"]["Width"] * f["detail"]["BoundingBox"]["Height"])
+        matches, unmatched = [], []
+        for f in self._analyze(self._load_image(TargetImage, "CompareFaces")):
+            sim = float(self._similarity(np.array([np.linalg.norm(f["encoding"] - src["encoding"])]))[0])
+            if sim >= float(SimilarityThreshold):
+                matches.append({"Similarity": round(sim, 4), "Face": f["detail"]})
+            else:
+                unmatched.append(f["detail"])
+        return {
+            "SourceImageFace": {"BoundingBox": src["detail"]["BoundingBox"], "Confidence": src["detail"]["Confidence"]},
+            "FaceMatches": matches,
+            "UnmatchedFaces": unmatched,
+            "ResponseMetadata": self._metadata(),
+        }
+
+    def delete_faces(self, CollectionId: str, FaceIds: List[str], **kwargs) -> Dict:
+        self._simulate("DeleteFaces")
+        self._require_collection(CollectionId, "DeleteFaces")
+        conn = self._conn()
+        deleted: List[str] = []
+        for fid in FaceIds or []:
+            cur = conn.execute("DELETE FROM faces WHERE collection_id = ? AND face_id = ?", (CollectionId, fid))
+            if cur.rowcount:
+                deleted.append(fid)
+        return {"DeletedFaces": deleted, "ResponseMetadata": self._metadata()}
+
+    def list_faces(self, CollectionId: str, MaxResults: int = 1000, NextToken: Optional[str] = None, **kwargs) -> Dict:
+        self._simulate("ListFaces")
+        self._require_collection(CollectionId, "ListFaces")
+        offset = int(NextToken or 0)
+        faces, _ = self._collection_faces(CollectionId)
+        page = faces[offset:offset + int(MaxResults)]
+        out = {"Faces": page, "FaceModelVersion": "dlib", "ResponseMetadata": self._metadata()}
+        if offset + len(page) < len(faces):
+            out["NextToken"] = str(offset + len(page))
+        return out
+
+    def describe_collection(self, CollectionId: str, **kwargs) -> Dict:
+        self._simulate("DescribeCollection")
+        self._require_collection(CollectionId, "DescribeCollection")
+        count = self._conn().execute(
+            "SELECT COUNT(*) FROM faces WHERE collection_id = ?", (CollectionId,)
+        ).fetchone()[0]
+        return {"FaceCount": int(count), "FaceModelVersion": "dlib", "ResponseMetadata": self._metadata()}
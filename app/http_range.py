@@ -0,0 +1,143 @@
+"""
+Réponses binaires par morceaux avec prise en charge des requêtes HTTP Range (RFC 7233).
+
+Utilisé par /api/photo/{id}, /api/selfie/{user_id} et /api/photographer/logo/{user_id}:
+    - Accept-Ranges: bytes sur toutes les réponses
+    - une seule plage (bytes=a-b, bytes=a-, bytes=-n): 206 + Content-Range
+    - plage hors du contenu: 416 + Content-Range: bytes */taille
+    - plusieurs plages, unité inconnue ou syntaxe invalide: contenu complet (200)
+    - If-Range (ETag fort ou Last-Modified) différent: contenu complet (200)
+
+Le corps est toujours une StreamingResponse par morceaux de RANGE_CHUNK_SIZE lus au fil
+de l'envoi (fichier, blob store ou octets déjà en mémoire).
+
+Usage:
+    from http_range import bytes_range_response, file_range_response
+
+    return file_range_response(request, path, "image/jpeg", headers)
+"""
+
+import os
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Plage demandée entièrement hors du contenu (416)."""
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Plage (début, fin incluse) demandée par un en-tête Range, None si l'en-tête est absent
+    ou ignoré (plusieurs plages, unité autre que bytes, syntaxe invalide).
+    Lève RangeNotSatisfiable si la plage ne recouvre aucun octet.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or not spec or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    first, last = first.strip(), last.strip()
+    try:
+        if not first:
+            # Suffixe: les n derniers octets
+            length = int(last)
+            if length <= 0 or size <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start < 0 or (last and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request: Request, headers: Dict[str, str]) -> bool:
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == headers.get("ETag")
+    return if_range == headers.get("Last-Modified")
+
+
+def range_response(
+    request: Request,
+    size: int,
+    media_type: str,
+    headers: Dict[str, str],
+    open_chunks: Callable[[int, int], Iterable[bytes]],
+) -> Response:
+    """
+    Réponse 200/206/416 pour un contenu de `size` octets; open_chunks(début, fin incluse)
+    fournit les morceaux de la plage servie (appelé seulement si un corps est envoyé).
+    """
+    headers = dict(headers)
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = None
+    if _if_range_matches(request, headers):
+        try:
+            byte_range = parse_range_header(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    chunks = open_chunks(start, end) if size else iter(())
+    return StreamingResponse(chunks, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def iter_bytes(data: bytes, start: int, end: int, chunk_size: int = RANGE_CHUNK_SIZE) -> Iterator[bytes]:
+    view = memoryview(data)
+    for offset in range(start, end + 1, chunk_size):
+        yield bytes(view[offset:min(offset + chunk_size, end + 1)])
+
+
+def iter_file(path: str, start: int, end: int, chunk_size: int = RANGE_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def bytes_range_response(request: Request, data: bytes, media_type: str,
+                         headers: Optional[Dict[str, str]] = None) -> Response:
+    """Contenu déjà en mémoire (colonne LargeBinary, variante encodée)."""
+    data = bytes(data)
+    return range_response(
+        request, len(data), media_type, headers or {},
+        lambda start, end: iter_bytes(data, start, end),
+    )
+
+
+def file_range_response(request: Request, path: str, media_type: str,
+                        headers: Optional[Dict[str, str]] = None) -> Response:
+    """Fichier local lu morceau par morceau depuis la position demandée."""
+    return range_response(
+        request, os.path.getsize(path), media_type, headers or {},
+        lambda start, end: iter_file(path, start, end),
+    )
@@ -0,0 +1,361 @@
+"""
+Abstraction de file de jobs commune à SQSService, PhotoWorkerSQS et DeleteWorkerSQS.
+
+Deux backends, même sémantique (messages au format SQS: MessageId, ReceiptHandle, Body,
+Attributes.ApproximateReceiveCount):
+    - "sqs":    AWS SQS (défaut, production)
+    - "sqlite": file locale durable (SQLite WAL) avec visibility timeout, DLQ après
+                JOB_QUEUE_MAX_RECEIVE_COUNT réceptions, et long polling simulé.
+                Permet de faire tourner les workers hors ligne (benchmarks, dev).
+
+Sélection: JOB_QUEUE_BACKEND=sqs|sqlite. Seule la file change: les messages photo
+référencent la photo brute par sa clé S3, PHOTO_BUCKET_NAME reste donc requis.
+
+Usage:
+    from job_queue import get_job_queue
+
+    queue = get_job_queue("photo")   # ou "delete"
+    queue.send(json.dumps({...}))
+    for msg in queue.receive(max_messages=10, wait_seconds=20, visibility_timeout=300):
+        ...
+        queue.delete(msg["ReceiptHandle"])
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import boto3
+
+from settings import settings
+
+
+# Limite SQS: 10 messages par send_message_batch / delete_message_batch / receive_message
+SQS_MAX_BATCH = 10
+
+
+class JobQueue:
+    """Interface commune des backends de file."""
+
+    name: str = ""
+
+    def send(self, body: str, delay_seconds: int = 0) -> str:
+        raise NotImplementedError
+
+    def send_batch(self, bodies: List[str]) -> List[Optional[str]]:
+        """Envoie plusieurs messages; retourne les MessageId (None pour un échec) dans l'ordre."""
+        raise NotImplementedError
+
+    def receive(self, max_messages: int = 1, wait_seconds: int = 0,
+                visibility_timeout: Optional[int] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def delete(self, receipt_handle: str) -> None:
+        raise NotImplementedError
+
+    def delete_batch(self, receipt_handles: List[str]) -> List[str]:
+        """Supprime plusieurs messages; retourne les receipt handles en échec."""
+        raise NotImplementedError
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: int) -> None:
+        raise NotImplementedError
+
+    def dead_letters(self, limit: int = 50) -> List[Dict]:
+        """Derniers messages partis en DLQ (si le backend les expose)."""
+        return []
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend, "queue": self.name}
+
+    @property
+    def backend(self) -> str:
+        return type(self).__name__
+
+
+class SQSJobQueue(JobQueue):
+    """Backend AWS SQS (la DLQ est gérée par la redrive policy de la file)."""
+
+    def __init__(self, name: str, queue_url: str):
+        self.name = name
+        self.queue_url = queue_url
+        self._client = None
+
+    @property
+    def backend(self) -> str:
+        return "sqs"
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("sqs", region_name=settings.AWS_REGION)
+        return self._client
+
+    def send(self, body: str, delay_seconds: int = 0) -> str:
+        kwargs = {"QueueUrl": self.queue_url, "MessageBody": body}
+        if delay_seconds:
+            kwargs["DelaySeconds"] = int(delay_seconds)
+        response = self.client.send_message(**kwargs)
+        return response.get("MessageId", "unknown")
+
+    def send_batch(self, bodies: List[str]) -> List[Optional[str]]:
+        results: List[Optional[str]] = [None] * len(bodies)
+        for start in range(0, len(bodies), SQS_MAX_BATCH):
+            chunk = bodies[start:start + SQS_MAX_BATCH]
+            response = self.client.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{"Id": str(start + i), "MessageBody": b} for i, b in enumerate(chunk)],
+            )
+            for ok in response.get("Successful", []) or []:
+                results[int(ok["Id"])] = ok.get("MessageId")
+            for failed in response.get("Failed", []) or []:
+                print(f"[JobQueue:{self.name}] send_batch failed id={failed.get('Id')} code={failed.get('Code')}")
+        return results
+
+    def receive(self, max_messages: int = 1, wait_seconds: int = 0,
+                visibility_timeout: Optional[int] = None) -> List[Dict]:
+        kwargs = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": max(1, min(SQS_MAX_BATCH, int(max_messages))),
+            "WaitTimeSeconds": int(wait_seconds),
+            "MessageAttributeNames": ["All"],
+            "AttributeNames": ["ApproximateReceiveCount"],
+        }
+        if visibility_timeout is not None:
+            kwargs["VisibilityTimeout"] = int(visibility_timeout)
+        response = self.client.receive_message(**kwargs)
+        return response.get("Messages", []) or []
+
+    def delete(self, receipt_handle: str) -> None:
+        self.client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+
+    def delete_batch(self, receipt_handles: List[str]) -> List[str]:
+        failed: List[str] = []
+        for start in range(0, len(receipt_handles), SQS_MAX_BATCH):
+            chunk = receipt_handles[start:start + SQS_MAX_BATCH]
+            response = self.client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{"Id": str(i), "ReceiptHandle": rh} for i, rh in enumerate(chunk)],
+            )
+            for f in response.get("Failed", []) or []:
+                failed.append(chunk[int(f["Id"])])
+        return failed
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: int) -> None:
+        self.client.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=receipt_handle,
+            VisibilityTimeout=int(visibility_timeout),
+        )
+
+    def stats(self) -> Dict:
+        out = {"backend": "sqs", "queue": self.name, "queue_url": self.queue_url}
+        try:
+            attrs = self.client.get_queue_attributes(
+                QueueUrl=self.queue_url,
+                AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+            ).get("Attributes", {})
+            out["visible"] = int(attrs.get("ApproximateNumberOfMessages", 0))
+            out["in_flight"] = int(attrs.get("ApproximateNumberOfMessagesNotVisible", 0))
+        except Exception as e:
+            out["error"] = str(e)
+        return out
+
+
+class SQLiteJobQueue(JobQueue):
+    """File locale durable (SQLite WAL) avec la sémantique SQS.
+
+    - receive() rend les messages invisibles pendant visibility_timeout et génère un
+      nouveau ReceiptHandle à chaque réception (l'ancien devient invalide)
+    - au-delà de max_receive_count réceptions, le message part en DLQ (table dead_letters)
+    - wait_seconds simule le long polling (poll local toutes les 200 ms)
+    """
+
+    _POLL_INTERVAL = 0.2
+
+    def __init__(self, name: str, db_path: str, default_visibility_timeout: int = 300,
+                 max_receive_count: int = 5):
+        self.name = name
+        self.db_path = db_path
+        self.default_visibility_timeout = int(default_visibility_timeout)
+        self.max_receive_count = int(max_receive_count)
+        self._local = threading.local()
+        self._init_db()
+
+    @property
+    def backend(self) -> str:
+        return "sqlite"
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " message_id TEXT PRIMARY KEY, queue TEXT NOT NULL, body TEXT NOT NULL,"
+            " visible_at REAL NOT NULL, receive_count INTEGER NOT NULL DEFAULT 0,"
+            " receipt_handle TEXT, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_queue_visible ON messages (queue, visible_at)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_receipt ON messages (receipt_handle)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letters ("
+            " message_id TEXT PRIMARY KEY, queue TEXT NOT NULL, body TEXT NOT NULL,"
+            " receive_count INTEGER NOT NULL, created_at REAL NOT NULL, failed_at REAL NOT NULL)"
+        )
+
+    def send(self, body: str, delay_seconds: int = 0) -> str:
+        return self.send_batch([body], delay_seconds=delay_seconds)[0]
+
+    def send_batch(self, bodies: List[str], delay_seconds: int = 0) -> List[Optional[str]]:
+        now = time.time()
+        ids = [str(uuid.uuid4()) for _ in bodies]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO messages (message_id, queue, body, visible_at, receive_count, created_at)"
+                " VALUES (?, ?, ?, ?, 0, ?)",
+                [(mid, self.name, body, now + float(delay_seconds or 0), now) for mid, body in zip(ids, bodies)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    def _receive_once(self, max_messages: int, visibility_timeout: int) -> List[Dict]:
+        now = time.time()
+        conn = self._conn()
+        # BEGIN IMMEDIATE: un seul consommateur réserve un message donné (verrou d'écriture)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT message_id, body, receive_count, created_at FROM messages"
+                " WHERE queue = ? AND visible_at <= ? ORDER BY created_at LIMIT ?",
+                (self.name, now, int(max_messages) * 2),
+            ).fetchall()
+            messages: List[Dict] = []
+            for message_id, body, receive_count, created_at in rows:
+                if int(receive_count) >= self.max_receive_count:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO dead_letters (message_id, queue, body, receive_count, created_at, failed_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (message_id, self.name, body, int(receive_count), created_at, now),
+                    )
+                    conn.execute("DELETE FROM messages WHERE message_id = ?", (message_id,))
+                    print(f"[JobQueue:{self.name}] message {message_id} moved to DLQ after {receive_count} receives")
+                    continue
+                if len(messages) >= int(max_messages):
+                    break
+                receipt = str(uuid.uuid4())
+                conn.execute(
+                    "UPDATE messages SET visible_at = ?, receive_count = receive_count + 1, receipt_handle = ?"
+                    " WHERE message_id = ?",
+                    (now + float(visibility_timeout), receipt, message_id),
+                )
+                messages.append({
+                    "MessageId": message_id,
+                    "ReceiptHandle": receipt,
+                    "Body": body,
+                    "Attributes": {"ApproximateReceiveCount": str(int(receive_count) + 1)},
+                })
+            conn.execute("COMMIT")
+            return messages
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def receive(self, max_messages: int = 1, wait_seconds: int = 0,
+                visibility_timeout: Optional[int] = None) -> List[Dict]:
+        vt = self.default_visibility_timeout if visibility_timeout is None else int(visibility_timeout)
+        deadline = time.time() + max(0, int(wait_seconds))
+        while True:
+            messages = self._receive_once(max(1, min(SQS_MAX_BATCH, int(max_messages))), vt)
+            if messages or time.time() >= deadline:
+                return messages
+            time.sleep(self._POLL_INTERVAL)
+
+    def delete(self, receipt_handle: str) -> None:
+        self._conn().execute("DELETE FROM messages WHERE receipt_handle = ?", (receipt_handle,))
+
+    def delete_batch(self, receipt_handles: List[str]) -> List[str]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM messages WHERE receipt_handle = ?", [(rh,) for rh in receipt_handles])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            return list(receipt_handles)
+        return []
+
+    def change_visibility(self, receipt_handle: str, visibility_timeout: int) -> None:
+        self._conn().execute(
+            "UPDATE messages SET visible_at = ? WHERE receipt_handle = ?",
+            (time.time() + float(visibility_timeout), receipt_handle),
+        )
+
+    def dead_letters(self, limit: int = 50) -> List[Dict]:
+        rows = self._conn().execute(
+            "SELECT message_id, body, receive_count, failed_at FROM dead_letters"
+            " WHERE queue = ? ORDER BY failed_at DESC LIMIT ?",
+            (self.name, int(limit)),
+        ).fetchall()
+        return [{"MessageId": r[0], "Body": r[1], "ReceiveCount": r[2], "FailedAt": r[3]} for r in rows]
+
+    def stats(self) -> Dict:
+        now = time.time()
+        conn = self._conn()
+        visible = conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE queue = ? AND visible_at <= ?", (self.name, now)
+        ).fetchone()[0]
+        in_flight = conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE queue = ? AND visible_at > ?", (self.name, now)
+        ).fetchone()[0]
+        dead = conn.execute("SELECT COUNT(*) FROM dead_letters WHERE queue = ?", (self.name,)).fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "queue": self.name,
+            "db_path": self.db_path,
+            "visible": int(visible),
+            "in_flight": int(in_flight),
+            "dead_letters": int(dead),
+        }
+
+
+# Instances singleton par nom de file
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(name: str) -> JobQueue:
+    """Retourne la file "photo" ou "delete" selon JOB_QUEUE_BACKEND."""
+    with _queues_lock:
+        queue = _queues.get(name)
+        if queue is not None:
+            return queue
+        backend = (settings.JOB_QUEUE_BACKEND or "sqs").strip().lower()
+        visibility = settings.DELETE_SQS_VISIBILITY_TIMEOUT if name == "delete" else settings.PHOTO_SQS_VISIBILITY_TIMEOUT
+        if backend == "sqlite":
+            queue = SQLiteJobQueue(
+                name,
+                os.path.abspath(settings.JOB_QUEUE_SQLITE_PATH),
+                default_visibility_timeout=visibility,
+                max_receive_count=settings.JOB_QUEUE_MAX_RECEIVE_COUNT,
+            )
+        else:
+            url = settings.delete_sqs_queue_url if name == "delete" else settings.PHOTO_SQS_QUEUE_URL
+            queue = SQSJobQueue(name, url)
+        _queues[name] = queue
+        print(f"[JobQueue] queue={name} backend={queue.backend}")
+        return queue
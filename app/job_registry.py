@@ -0,0 +1,280 @@
+"""
+Registre partagé des jobs d'arrière-plan (table background_jobs).
+
+Remplace les dicts en mémoire REMATCH_STATUS / UPLOAD_JOBS, propres à chaque worker
+Gunicorn: le statut d'un job est lisible depuis n'importe quel worker ou instance.
+
+Coalescence des rematchs selfie:
+    - create(kind, subject_key) passe les jobs pending/running du même sujet en
+      "superseded" et leur demande l'arrêt (cancel_requested)
+    - start(job_id) échoue pour un job déjà remplacé: il n'est jamais exécuté
+    - un job en cours appelle is_cancelled(job_id) entre deux étapes et s'arrête
+
+Usage:
+    from job_registry import job_registry
+
+    job_id = job_registry.create("selfie_rematch", f"user:{user_id}", user_id=user_id)
+    if job_registry.start(job_id):
+        ...
+        job_registry.finish(job_id, "done", matched=12)
+
+Chaque changement d'état (create/start/increment/finish) est publié sur l'event bus
+(topics job:{id} et user:{user_id}) pour le flux SSE, après commit.
+"""
+
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from database import SessionLocal
+from event_bus import event_bus, job_topic, user_topic
+from models import BackgroundJob
+
+
+ACTIVE_STATUSES = ("pending", "running")
+MAX_ERRORS = 50
+
+
+def _ts(value: Optional[datetime]) -> Optional[float]:
+    try:
+        return value.timestamp() if value else None
+    except Exception:
+        return None
+
+
+def _to_dict(job: BackgroundJob) -> Dict[str, Any]:
+    try:
+        details = json.loads(job.details_json) if job.details_json else {}
+    except Exception:
+        details = {}
+    data = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "user_id": job.user_id,
+        "event_id": job.event_id,
+        "total": int(job.total or 0),
+        "processed": int(job.processed or 0),
+        "failed": int(job.failed or 0),
+        "matched": int(job.matched or 0),
+        "errors": details.get("errors", []),
+        "created_at": _ts(job.created_at),
+        "started_at": _ts(job.started_at),
+        "finished_at": _ts(job.finished_at),
+    }
+    for key in ("error", "info"):
+        if details.get(key):
+            data[key] = details[key]
+    return data
+
+
+class JobRegistry:
+    """Accès au registre background_jobs (une courte transaction par opération)."""
+
+    def create(self, kind: str, subject_key: str, user_id: Optional[int] = None,
+               event_id: Optional[int] = None, total: int = 0, supersede: bool = True,
+               status: str = "pending", info: Optional[str] = None) -> str:
+        """Crée un job; remplace (supersede) les jobs actifs du même sujet si demandé."""
+        job_id = str(uuid.uuid4())
+        db = SessionLocal()
+        try:
+            if supersede:
+                superseded = db.query(BackgroundJob).filter(
+                    BackgroundJob.kind == kind,
+                    BackgroundJob.subject_key == subject_key,
+                    BackgroundJob.status.in_(ACTIVE_STATUSES),
+                ).update(
+                    {
+                        BackgroundJob.status: "superseded",
+                        BackgroundJob.cancel_requested: True,
+                        BackgroundJob.finished_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+                if superseded:
+                    print(f"[JobRegistry] kind={kind} subject={subject_key} superseded={superseded}")
+            now = datetime.utcnow()
+            db.add(BackgroundJob(
+                id=job_id,
+                kind=kind,
+                subject_key=subject_key,
+                user_id=user_id,
+                event_id=event_id,
+                status=status,
+                total=int(total or 0),
+                details_json=json.dumps({"info": info}) if info else None,
+                created_at=now,
+                finished_at=now if status not in ACTIVE_STATUSES else None,
+            ))
+            db.commit()
+            self._publish(db, job_id)
+            return job_id
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self, job_id: str) -> bool:
+        """Passe le job en running. False si le job a été remplacé/annulé entre-temps."""
+        db = SessionLocal()
+        try:
+            updated = db.query(BackgroundJob).filter(
+                BackgroundJob.id == job_id,
+                BackgroundJob.status == "pending",
+                BackgroundJob.cancel_requested.is_(False),
+            ).update(
+                {BackgroundJob.status: "running", BackgroundJob.started_at: datetime.utcnow()},
+                synchronize_session=False,
+            )
+            db.commit()
+            if updated:
+                self._publish(db, job_id)
+            return bool(updated)
+        except Exception as e:
+            db.rollback()
+            print(f"[JobRegistry] start failed job_id={job_id}: {e}")
+            return False
+        finally:
+            db.close()
+
+    def is_cancelled(self, job_id: Optional[str]) -> bool:
+        if not job_id:
+            return False
+        db = SessionLocal()
+        try:
+            row = db.query(BackgroundJob.cancel_requested).filter(BackgroundJob.id == job_id).first()
+            return bool(row and row[0])
+        except Exception:
+            return False
+        finally:
+            db.close()
+
+    def increment(self, job_id: Optional[str], processed: int = 0, failed: int = 0, matched: int = 0,
+                  error: Optional[str] = None) -> None:
+        """Incrémente les compteurs de manière atomique (et ajoute une erreur si fournie)."""
+        if not job_id:
+            return
+        db = SessionLocal()
+        try:
+            db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(
+                {
+                    BackgroundJob.processed: BackgroundJob.processed + int(processed),
+                    BackgroundJob.failed: BackgroundJob.failed + int(failed),
+                    BackgroundJob.matched: BackgroundJob.matched + int(matched),
+                },
+                synchronize_session=False,
+            )
+            if error:
+                self._append_error(db, job_id, error)
+            db.commit()
+            self._publish(db, job_id)
+        except Exception as e:
+            db.rollback()
+            print(f"[JobRegistry] increment failed job_id={job_id}: {e}")
+        finally:
+            db.close()
+
+    def append_error(self, job_id: Optional[str], message: str) -> None:
+        if not job_id:
+            return
+        db = SessionLocal()
+        try:
+            self._append_error(db, job_id, message)
+            db.commit()
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    def finish(self, job_id: Optional[str], status: str = "done", matched: Optional[int] = None,
+               error: Optional[str] = None, info: Optional[str] = None) -> None:
+        """Termine un job (sauf s'il a été remplacé: son statut superseded est conservé)."""
+        if not job_id:
+            return
+        db = SessionLocal()
+        try:
+            job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+            if not job or job.status == "superseded":
+                return
+            job.status = status
+            job.finished_at = datetime.utcnow()
+            if matched is not None:
+                job.matched = int(matched)
+            if error or info:
+                details = self._details(job)
+                if error:
+                    details["error"] = error
+                if info:
+                    details["info"] = info
+                job.details_json = json.dumps(details)
+            db.commit()
+            self._publish(db, job_id)
+        except Exception as e:
+            db.rollback()
+            print(f"[JobRegistry] finish failed job_id={job_id}: {e}")
+        finally:
+            db.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+            return _to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def latest(self, kind: str, subject_key: str) -> Optional[Dict[str, Any]]:
+        """Dernier job (hors remplacés) d'un sujet."""
+        db = SessionLocal()
+        try:
+            job = (
+                db.query(BackgroundJob)
+                .filter(
+                    BackgroundJob.kind == kind,
+                    BackgroundJob.subject_key == subject_key,
+                    BackgroundJob.status != "superseded",
+                )
+                .order_by(BackgroundJob.created_at.desc())
+                .first()
+            )
+            return _to_dict(job) if job else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _details(job: BackgroundJob) -> Dict[str, Any]:
+        try:
+            return json.loads(job.details_json) if job.details_json else {}
+        except Exception:
+            return {}
+
+    @staticmethod
+    def _publish(db, job_id: str) -> None:
+        """Publie l'état courant du job (best-effort, après commit)."""
+        try:
+            job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+            if not job:
+                return
+            data = _to_dict(job)
+            event_bus.publish(job_topic(job_id), "job", data)
+            if job.user_id:
+                event_bus.publish(user_topic(job.user_id), "job", data)
+        except Exception as e:
+            print(f"[JobRegistry] publish failed job_id={job_id}: {e}")
+
+    def _append_error(self, db, job_id: str, message: str) -> None:
+        job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+        if not job:
+            return
+        details = self._details(job)
+        errors = details.get("errors") or []
+        if len(errors) < MAX_ERRORS:
+            errors.append(str(message)[:500])
+        details["errors"] = errors
+        job.details_json = json.dumps(details)
+
+
+# Instance singleton
+job_registry = JobRegistry()
@@ -32,9 +32,10 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from sqlalchemy import text as _text
 from typing import List
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import time
 import os
+import asyncio
 import shutil
 import uuid
 import json
@@ -65,15 +66,34 @@ print("[BOOT] core imports finished", flush=True)
 # car l'app utilise maintenant uniquement OpenCV/Haar (thread-safe) pour la validation selfie
 
 # ========== THREAD POOL POUR LE MATCHING ==========
-# ThreadPoolExecutor séparé pour isoler le matching des workers Gunicorn
+# Pools séparés pour isoler le matching des workers Gunicorn
 # Cela évite que les workers soient bloqués pendant le matching (qui peut prendre 30-60s)
+# Un pool par classe de priorité: un rematch d'événement (maintenance) n'occupe plus le
+# thread qui sert les selfies (interactive).
+from priority_limiter import PriorityExecutor, PriorityLimiter, INTERACTIVE, BULK, MAINTENANCE, priority_context
 _MATCHING_THREAD_POOL_SIZE = int(os.getenv("MATCHING_THREAD_POOL_SIZE", "1"))
-_MATCHING_THREAD_POOL = ThreadPoolExecutor(
-    max_workers=_MATCHING_THREAD_POOL_SIZE,
-    thread_name_prefix="MatchingWorker"
+_MATCHING_INTERACTIVE_POOL_SIZE = int(os.getenv("MATCHING_INTERACTIVE_POOL_SIZE", "2"))
+_MATCHING_THREAD_POOL = PriorityExecutor(
+    "MatchingWorker",
+    {
+        INTERACTIVE: _MATCHING_INTERACTIVE_POOL_SIZE,
+        BULK: _MATCHING_THREAD_POOL_SIZE,
+        MAINTENANCE: _MATCHING_THREAD_POOL_SIZE,
+    },
+)
+print(f"[Init] ThreadPool matching initialisé avec {_MATCHING_THREAD_POOL_SIZE} workers (+{_MATCHING_INTERACTIVE_POOL_SIZE} interactive)")
+# Un matching à la fois par classe non interactive; les selfies disposent d'un slot réservé
+_MATCHING_SEMAPHORE = PriorityLimiter(
+    "matching",
+    int(os.getenv("MATCHING_CONCURRENCY", "2")),
+    {INTERACTIVE: 1},
+)
+# Pool borné pour les put_object S3 des uploads photographe (partagé par toutes les requêtes):
+# la latence d'un upload suit le fichier le plus lent, pas la somme des fichiers
+_S3_UPLOAD_POOL = ThreadPoolExecutor(
+    max_workers=max(1, int(settings.UPLOAD_S3_CONCURRENCY or 1)),
+    thread_name_prefix="S3Upload",
 )
-print(f"[Init] ThreadPool matching initialisé avec {_MATCHING_THREAD_POOL_SIZE} workers")
-_MATCHING_SEMAPHORE = threading.BoundedSemaphore(1)
 
 # NOTE: load_dotenv() est appelé en haut du fichier, après le chargement SSM
 
@@ -310,7 +330,7 @@ class BulkShowInGeneralRequest(BaseModel):
 
 # ========== PAGINATION CURSOR-BASED (PROD-READY) ==========
 import base64
-from schemas import PhotoMeta, PaginatedPhotosResponse
+from schemas import PhotoMeta, PaginatedPhotosResponse, UrlToken, UrlTokenRequest, FaceQualityGateOverride
 from sqlalchemy import exists, and_
 
 def encode_cursor(uploaded_at: datetime, photo_id: int) -> str:
@@ -458,10 +478,13 @@ def build_paginated_photo_query(
 from auth import verify_password, get_password_hash, create_access_token, get_current_user, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from recognizer_factory import get_face_recognizer
 from photo_optimizer import PhotoOptimizer
+from blob_store import delete_unreferenced, get_blob_store, photo_blob_keys, read_blob_or_column, read_photo_bytes
+from http_range import bytes_range_response, file_range_response, range_response
+from photo_cache import photo_cache
+from photo_delivery import photo_delivery
 from aws_metrics import aws_metrics
 import requests
 from auto_face_recognition import update_face_recognition_for_event
-from collections import OrderedDict
 from urllib.parse import urlencode
 from base64 import urlsafe_b64encode
 
@@ -539,6 +562,42 @@ def _startup_create_tables():
         from add_event_email_featured_photo import add_event_email_featured_photo
         add_event_email_featured_photo()
 
+        # Ajouter la surcharge par événement du filtre qualité visage (avant IndexFaces)
+        from add_event_face_quality_gate import add_event_face_quality_gate
+        add_event_face_quality_gate()
+
+        # Ajouter les bounding boxes / matched_user_id sur photo_faces
+        from add_photo_face_boxes_columns import add_photo_face_boxes_columns
+        add_photo_face_boxes_columns()
+
+        # Ajouter photos.content_sha256 (déduplication des uploads par contenu)
+        from add_photo_content_hash_column import add_photo_content_hash_column
+        add_photo_content_hash_column()
+
+        # Ajouter le hash perceptuel (quasi-doublons) et la table photo_hash_bands
+        from add_photo_perceptual_hash import add_photo_perceptual_hash
+        add_photo_perceptual_hash()
+
+        # Ajouter les déclinaisons vignette/aperçu (photos.thumbnail_data / preview_data)
+        from add_photo_renditions_columns import add_photo_renditions_columns
+        add_photo_renditions_columns()
+
+        # Créer la table photo_variants (déclinaisons WebP/AVIF selon l'en-tête Accept)
+        from add_photo_variants_table import run_migration as add_photo_variants_table
+        add_photo_variants_table()
+
+        # Ajouter les clés du blob store (photos.*blob_key, photo_variants.blob_key)
+        from add_photo_blob_keys import add_photo_blob_keys
+        add_photo_blob_keys()
+
+        # Ajouter taille/CRC-32 de la photo optimisée (export ZIP en flux)
+        from add_photo_export_checksums import add_photo_export_checksums
+        add_photo_export_checksums()
+
+        # Créer la table background_jobs (registre partagé rematch selfie / uploads async)
+        from add_background_jobs_table import run_migration as add_background_jobs_table
+        add_background_jobs_table()
+
         # Créer la table d'historique minimal des ajouts de quota photo
         from add_photographer_photo_quota_logs_table import run_migration as add_quota_logs_table
         add_quota_logs_table()
@@ -1159,15 +1218,35 @@ def _find_social_login_users(db: Session, provider: str, subject: str, email: st
         seen_ids.add(user.id)
     return unique_users
 
-# État en mémoire pour suivre l'avancement du rematching de selfie par utilisateur
-REMATCH_STATUS: Dict[int, Dict[str, Any]] = {}
+# L'avancement du rematching de selfie et des jobs d'upload asynchrones est suivi dans le
+# registre partagé background_jobs (job_registry), lisible depuis n'importe quel worker.
+from job_registry import job_registry
+from event_bus import event_bus, user_topic, photographer_topic, job_topic
+
 
-# Registre en mémoire des jobs d'upload asynchrones
-# key = job_id, value = {
-#   id, event_id, photographer_id, status: pending|running|done|error,
-#   total, processed, failed, started_at, finished_at, errors: [str],
-# }
-UPLOAD_JOBS: Dict[str, Dict[str, Any]] = {}
+def _set_rematch_status(user_id: int, payload: Dict[str, Any], job_id: Optional[str]) -> None:
+    """Publie l'état terminal du rematch selfie d'un utilisateur dans le registre partagé.
+
+    Le job est créé par l'appelant (job_registry.create) avant de planifier le matching:
+    cette fonction ne fait que le clôturer, elle n'en crée jamais un nouveau qui
+    remplacerait le job en cours. Sans job_id (registre indisponible), rien n'est publié.
+    """
+    status = payload.get("status")
+    if job_id is None:
+        print(f"[RematchStatus] No job_id, status={status} not recorded for user_id={user_id}")
+        return
+    if status in ("pending", "running"):
+        return
+    try:
+        job_registry.finish(
+            job_id,
+            status,
+            matched=payload.get("matched"),
+            error=str(payload["error"]) if payload.get("error") else None,
+            info=payload.get("info"),
+        )
+    except Exception as e:
+        print(f"[RematchStatus] Failed to record status={status} user_id={user_id}: {e}")
 
 # Helper pour trouver un événement par code (tolérant: trim, insensible à la casse, ignore les espaces internes)
 def find_event_by_code(db: Session, code: str) -> Event:
@@ -1473,7 +1552,7 @@ def _photo_is_email_renderable(photo: Photo | None) -> bool:
         return False
     if not str(getattr(photo, "content_type", "") or "").startswith("image/"):
         return False
-    if getattr(photo, "photo_data", None):
+    if getattr(photo, "blob_key", None) or getattr(photo, "photo_data", None):
         return True
     file_path = getattr(photo, "file_path", None)
     return bool(file_path and os.path.exists(file_path))
@@ -1521,6 +1600,12 @@ def _notify_event_users_photos_available(event_id: int) -> Dict[str, Any]:
             if _photo_is_email_renderable(featured_photo):
                 featured_photo_url = _absolute_public_url(f"/api/photo/{featured_photo.id}")
 
+        # Préchauffer le cache photo: les invités ouvrent tous la même photo et la même page
+        try:
+            _prewarm_photo_cache(event_id, featured_photo.id if featured_photo_url else None)
+        except Exception as e:
+            print(f"[PhotoCache] prewarm failed event_id={event_id}: {e}")
+
         findme_logo_url = None
         findme_logo_path = Path(__file__).resolve().parent / "static" / "img" / "findme-logo.png"
         if findme_logo_path.exists():
@@ -1666,7 +1751,12 @@ def _startup_photo_queue():
         from settings import settings
         delete_queue_url = (settings.DELETE_SQS_QUEUE_URL or "").strip()
         photo_queue_url = (settings.PHOTO_SQS_QUEUE_URL or "").strip()
-        if not delete_queue_url:
+        if settings.uses_local_job_queue:
+            # File locale SQLite: files photo/delete distinctes par nom, pas d'URL requise
+            from delete_worker_sqs import start_delete_worker
+            start_delete_worker()
+            print(f"[Startup] Delete worker started (backend=sqlite path={settings.JOB_QUEUE_SQLITE_PATH})")
+        elif not delete_queue_url:
             print("[Startup] Delete worker NOT started: DELETE_SQS_QUEUE_URL is empty. Bulk deletions will be synchronous (limited).")
         elif delete_queue_url == photo_queue_url:
             print(
@@ -1757,15 +1847,19 @@ def _startup_autostart_gdrive_listeners():
         # Ne pas bloquer le démarrage si GDrive échoue
         pass
 
-# Cache léger en mémoire pour les cadres/encodages par photo (LRU ~128 entrées)
-PHOTO_FACES_CACHE: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
-PHOTO_FACES_CACHE_MAX = 128
-
-# État en mémoire pour suivre l'avancement du rematching de selfie par utilisateur
-REMATCH_STATUS: Dict[int, Dict[str, Any]] = {}
-
-# Registre en mémoire des jobs d'upload asynchrones
-UPLOAD_JOBS: Dict[str, Dict[str, Any]] = {}
+# Migration des binaires photo vers le blob store (arrière-plan, reprenable)
+@app.on_event("startup")
+def _startup_blob_migration():
+    try:
+        if os.environ.get("DISABLE_BACKGROUND_TASKS") == "1":
+            print("[Startup] Blob migration not started: DISABLE_BACKGROUND_TASKS=1")
+            return
+        from blob_migration import blob_migration
+        # Sans migration automatique: seulement les sommes de contrôle de l'export ZIP
+        blob_migration.start(checksums_only=not settings.BLOB_MIGRATION_AUTO_START)
+    except Exception as e:
+        # Ne pas bloquer le démarrage: les lectures restent en double lecture
+        print(f"[Startup] Warning: blob migration not started: {e}")
 
 # Registre en mémoire des jobs d'ingestion Google Drive
 GDRIVE_JOBS: Dict[str, Dict[str, Any]] = {}
@@ -2736,11 +2830,16 @@ async def admin_snapshot_graph(
     event_id: int,
     per_user_limit: int = 20,
     fast: bool = True,
+    refresh: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Retourne un graphe visuel (groupé par utilisateur) pour l'événement.
     AWS uniquement.
+
+    Sert immédiatement le dernier snapshot (avec age_seconds / status); la construction
+    tourne en tâche de fond et ne recalcule que les utilisateurs modifiés.
+    refresh=true force une reconstruction.
     """
     if current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Seuls les admins peuvent accéder à cette route")
@@ -2754,7 +2853,7 @@ async def admin_snapshot_graph(
         raise HTTPException(status_code=400, detail="Endpoint disponible uniquement avec le provider AWS")
 
     try:
-        graph = face_recognizer.build_snapshot_graph(event_id, db, per_user_limit=per_user_limit, fast=bool(fast))
+        graph = face_recognizer.get_snapshot_graph(event_id, per_user_limit=per_user_limit, fast=bool(fast), refresh=bool(refresh))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la construction du snapshot: {e}")
 
@@ -2802,6 +2901,52 @@ async def reset_aws_usage(current_user: User = Depends(get_current_user)):
     aws_metrics.reset()
     return {"status": "ok"}
 
+@app.get("/api/admin/events/{event_id}/face-quality-gate")
+async def get_event_face_quality_gate(
+    event_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Retourne le filtre qualité visage d'un événement (surcharge stockée + valeurs effectives)."""
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Seuls les admins peuvent accéder à cette route")
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Événement non trouvé")
+    try:
+        override = json.loads(event.face_quality_gate) if event.face_quality_gate else None
+    except Exception:
+        override = None
+    effective = None
+    if hasattr(face_recognizer, "get_face_quality_gate"):
+        effective = face_recognizer.get_face_quality_gate(event_id)
+    return {"event_id": event_id, "override": override, "effective": effective}
+
+@app.put("/api/admin/events/{event_id}/face-quality-gate")
+async def set_event_face_quality_gate(
+    event_id: int,
+    payload: Optional[FaceQualityGateOverride] = Body(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Définit (ou supprime avec un corps vide/null) la surcharge du filtre qualité visage d'un
+    événement. Clés inconnues ou valeurs invalides: 422.
+    """
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Seuls les admins peuvent accéder à cette route")
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Événement non trouvé")
+    override = payload.model_dump(exclude_none=True) if payload is not None else {}
+    event.face_quality_gate = json.dumps(override) if override else None
+    db.commit()
+    effective = None
+    if hasattr(face_recognizer, "invalidate_face_quality_gate"):
+        face_recognizer.invalidate_face_quality_gate(event_id)
+        effective = face_recognizer.get_face_quality_gate(event_id)
+    return {"event_id": event_id, "override": override or None, "effective": effective}
+
 @app.get("/api/admin/rekognition/threshold")
 async def get_rekognition_threshold(current_user: User = Depends(get_current_user)):
     if current_user.user_type != UserType.ADMIN:
@@ -2882,7 +3027,7 @@ async def admin_eval_recognition(
     unmatched = []
     errors = []
     for p in photos:
-        photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else p.photo_data
+        photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else read_photo_bytes(p)
         if not photo_input:
             unmatched.append({"photo_id": p.id, "filename": p.filename, "reason": "no_file_or_data"})
             continue
@@ -4528,224 +4673,48 @@ async def delete_my_selfie(
     current_user.selfie_content_type = None
     db.commit()
     db.query(FaceMatch).filter(FaceMatch.user_id == current_user.id).delete()
+    _release_photo_faces(db, current_user.id)
     db.commit()
     return {"message": "Selfie supprimé avec succès"}
 
 # === GESTION DES SELFIES ===
 
-def _is_selfie_matching_disabled() -> bool:
-    return os.getenv("SELFIE_MATCHING_DISABLED", "0").strip().lower() in {"1", "true", "yes", "on"}
-
-def _validate_and_rematch_selfie_background(user_id: int, file_data: bytes, strict: bool):
+def _release_photo_faces(db, user_id: int, photo_ids=None):
     """
-    Fonction de validation et matching en arrière-plan (OPTIMISÉE).
-    - Valide le selfie (1 visage, qualité OK)
-    - Si invalide : supprime le selfie et notifie l'échec
-    - Si valide : supprime anciennes correspondances et lance le matching
+    Détache les visages photo (photo_faces.matched_user_id) d'un utilisateur dont les
+    FaceMatch viennent d'être supprimés, pour qu'un nouveau match puisse les rattacher.
+    photo_ids: sous-requête limitant aux photos concernées (toutes si None).
     """
-    if _is_selfie_matching_disabled():
-        print(f"[SelfieValidationBg] SELFIE_MATCHING_DISABLED=1 -> skipping ALL DB + FaceMatch logic for user_id={user_id}")
-        try:
-            REMATCH_STATUS[user_id] = {
-                "status": "disabled",
-                "info": "Selfie matching disabled via SELFIE_MATCHING_DISABLED",
-                "finished_at": time.time(),
-            }
-        except Exception:
-            pass
-        return
-
-    session = next(get_db())
-    try:
-        user = session.query(User).filter(User.id == user_id).first()
-        if not user:
-            print(f"[SelfieValidationBg] User {user_id} not found")
-            try:
-                REMATCH_STATUS[user_id] = {
-                    "status": "error",
-                    "error": "user_not_found",
-                    "finished_at": time.time(),
-                }
-            except Exception:
-                pass
-            return
-        
-        # 1. VALIDATION (si strict activé)
-        strict_env = os.getenv("SELFIE_VALIDATION_STRICT", "true").strip().lower() not in {"false", "0", "no"}
-        if strict and strict_env:
-            try:
-                print(f"[SelfieValidationBg] Step=validation strict user_id={user_id}, strict={strict}")
-                print(f"[SelfieValidationBg] Validating selfie for user_id={user_id}")
-                validate_selfie_image(file_data)
-                print(f"[SelfieValidationBg] ✅ Validation succeeded for user_id={user_id}")
-            except HTTPException as e:
-                print(f"[SelfieValidationBg] Validation failed for user_id={user_id}: {e.detail}")
-                user.selfie_data = None
-                user.selfie_status = "invalid"
-                user.selfie_error = e.detail
-                session.commit()
-                try:
-                    REMATCH_STATUS[user_id] = {
-                        "status": "validation_failed",
-                        "error": e.detail,
-                        "finished_at": time.time(),
-                    }
-                except Exception:
-                    pass
-                return
-            except Exception as e:
-                print(f"[SelfieValidationBg] Validation error for user_id={user_id}: {e}")
-                user.selfie_data = None
-                user.selfie_status = "invalid"
-                user.selfie_error = str(e)[:500]
-                session.commit()
-                try:
-                    REMATCH_STATUS[user_id] = {
-                        "status": "validation_failed",
-                        "error": str(e),
-                        "finished_at": time.time(),
-                    }
-                except Exception:
-                    pass
-                return
-        
-        # 2. SUPPRESSION DES ANCIENNES CORRESPONDANCES (optimisé avec subquery)
-        user_events = session.query(UserEvent.event_id).filter(UserEvent.user_id == user_id).all()
-        event_ids = [ue.event_id for ue in user_events]
-        print(f"[SelfieValidationBg] Step=delete-old-matches user_id={user_id}, event_ids={event_ids}")
-        
-        if event_ids:
-            from sqlalchemy import delete, and_, select
-            # DELETE optimisé avec subquery (pas de fetch des photo_ids)
-            stmt = delete(FaceMatch).where(
-                and_(
-                    FaceMatch.user_id == user_id,
-                    FaceMatch.photo_id.in_(
-                        select(Photo.id).where(Photo.event_id.in_(event_ids))
-                    )
-                )
-            )
-            result = session.execute(stmt)
-            session.commit()
-            deleted_count = result.rowcount if hasattr(result, 'rowcount') else 0
-            print(f"[SelfieValidationBg] Deleted {deleted_count} old face matches")
-        
-        # 3. MATCHING (rematching de tous les événements)
-        print(f"[SelfieValidationBg] Starting rematch for user_id={user_id}")
-        try:
-            REMATCH_STATUS[user_id] = {
-                "status": "running",
-                "started_at": time.time(),
-                "matched": 0,
-            }
-        except Exception:
-            print(f"[SelfieValidationBg] Failed to update status for user_id={user_id} (running)")
-        
-        _can_index_missing = os.getenv("SELFIE_MATCH_CAN_INDEX_MISSING_PHOTOS", "0").strip().lower() in {"1", "true", "yes"}
-        _index_limit = int(os.getenv("SELFIE_MATCH_INDEX_LIMIT", "5") or "5")
-
-        events = session.query(UserEvent).filter(UserEvent.user_id == user_id).all()
-        total_matches = 0
-        t_match_start = time.time()
-        with _MATCHING_SEMAPHORE:
-            print(f"[SelfieValidationBg] Step=rematch-loop user_id={user_id}, events={[ue.event_id for ue in events]}")
-            for ue in events:
-                try:
-                    from aws_metrics import aws_metrics as _m
-                    with _m.action_context(f"selfie_update:event:{ue.event_id}:user:{user_id}"):
-                        if _can_index_missing:
-                            try:
-                                from sqlalchemy import func, or_ as _or
-                                missing_photos = (
-                                    session.query(Photo)
-                                    .filter(
-                                        Photo.event_id == ue.event_id,
-                                        _or(Photo.is_indexed.is_(False), Photo.is_indexed.is_(None))
-                                    )
-                                    .limit(_index_limit)
-                                    .all()
-                                )
-                                if missing_photos and hasattr(face_recognizer, 'ensure_event_photos_indexed'):
-                                    print(f"[SelfieValidationBg] indexing {len(missing_photos)} missing photos (limit={_index_limit}) event_id={ue.event_id}")
-                                    for p in missing_photos:
-                                        try:
-                                            photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else p.photo_data
-                                            if not photo_input:
-                                                continue
-                                            img_bytes = face_recognizer._prepare_image_bytes(photo_input)
-                                            if img_bytes:
-                                                face_recognizer._index_photo_faces_and_get_ids(ue.event_id, p.id, img_bytes)
-                                                p.is_indexed = True
-                                        except Exception as _ie:
-                                            print(f"[SelfieValidationBg] index photo {p.id} failed: {_ie}")
-                                    try:
-                                        session.commit()
-                                    except Exception:
-                                        session.rollback()
-                            except Exception as _e:
-                                print(f"[SelfieValidationBg] ensure photos indexed failed: {_e}")
-                        else:
-                            print(f"[SelfieValidationBg] skip photo indexing (disabled) event_id={ue.event_id}")
-
-                        print(f"[SelfieValidationBg] Step=match-user-selfie user_id={user_id}, event_id={ue.event_id}")
-                        if hasattr(face_recognizer, 'match_user_selfie_with_photos_event'):
-                            matched = face_recognizer.match_user_selfie_with_photos_event(user, ue.event_id, session)
-                            print(f"[SelfieValidationBg] match result user_id={user_id} event_id={ue.event_id} matched={matched}")
-                            total_matches += int(matched or 0)
-                        else:
-                            matched = face_recognizer.match_user_selfie_with_photos(user, session)
-                            print(f"[SelfieValidationBg] match result (legacy) user_id={user_id} event_id={ue.event_id} matched={matched}")
-                            total_matches += int(matched or 0)
-                except Exception as e:
-                    print(f"[SelfieValidationBg] Error matching event {ue.event_id}: {e}")
-                    continue
-        
-        print(f"[SelfieValidationBg] Rematch completed user_id={user_id}, total_matches={total_matches} elapsed={time.time() - t_match_start:.3f}s")
-        try:
-            REMATCH_STATUS[user_id] = {
-                "status": "done",
-                "finished_at": time.time(),
-                "matched": int(total_matches or 0),
-            }
-        except Exception:
-            print(f"[SelfieValidationBg] Failed to update status for user_id={user_id} (done)")
-
-    except Exception as e:
-        print(f"[SelfieValidationBg] Unexpected error for user_id={user_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        try:
-            session.rollback()
-        except Exception:
-            pass
-        try:
-            REMATCH_STATUS[user_id] = {
-                "status": "error",
-                "error": str(e),
-                "finished_at": time.time(),
-            }
-        except Exception:
-            pass
-    finally:
-        try:
-            session.close()
-        except Exception:
-            pass
+    from models import PhotoFace
+    query = db.query(PhotoFace).filter(PhotoFace.matched_user_id == user_id)
+    if photo_ids is not None:
+        query = query.filter(PhotoFace.photo_id.in_(photo_ids))
+    query.update({PhotoFace.matched_user_id: None}, synchronize_session=False)
 
+def _is_selfie_matching_disabled() -> bool:
+    return os.getenv("SELFIE_MATCHING_DISABLED", "0").strip().lower() in {"1", "true", "yes", "on"}
 
-def _rematch_selfie_background_only(user_id: int, file_data: bytes):
+def _rematch_selfie_background_only(user_id: int, file_data: bytes, job_id: Optional[str]):
     """
     Matching ONLY en arrière-plan (validation déjà faite en synchrone).
     Supprime anciennes correspondances puis lance le matching par événement.
+
+    job_id: job du registre partagé, créé par l'appelant (None seulement si le registre
+    est indisponible). Un job remplacé par un selfie plus récent n'est pas exécuté, et
+    un job en cours s'arrête entre deux événements s'il est annulé.
     """
+    if job_id is not None and not job_registry.start(job_id):
+        logger.info(f"[SelfieMatchBg] job_id={job_id} superseded before start, skipping user_id={user_id}")
+        return
+
     if _is_selfie_matching_disabled():
         logger.info(f"[SelfieMatchBg] SELFIE_MATCHING_DISABLED=1 -> skipping for user_id={user_id}")
         try:
-            REMATCH_STATUS[user_id] = {
+            _set_rematch_status(user_id, {
                 "status": "disabled",
                 "info": "Selfie matching disabled via SELFIE_MATCHING_DISABLED",
                 "finished_at": time.time(),
-            }
+            }, job_id)
         except Exception:
             pass
         return
@@ -4756,7 +4725,7 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
         if not user:
             logger.warning(f"[SelfieMatchBg] User {user_id} not found")
             try:
-                REMATCH_STATUS[user_id] = {"status": "error", "error": "user_not_found", "finished_at": time.time()}
+                _set_rematch_status(user_id, {"status": "error", "error": "user_not_found", "finished_at": time.time()}, job_id)
             except Exception:
                 pass
             return
@@ -4777,16 +4746,13 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
                 )
             )
             result = session.execute(stmt)
+            _release_photo_faces(session, user_id, select(Photo.id).where(Photo.event_id.in_(event_ids)))
             session.commit()
             deleted_count = result.rowcount if hasattr(result, 'rowcount') else 0
             logger.info(f"[SelfieMatchBg] Deleted {deleted_count} old face matches for user_id={user_id}")
 
         # Matching
         logger.info(f"[SelfieMatchBg] Starting rematch for user_id={user_id}")
-        try:
-            REMATCH_STATUS[user_id] = {"status": "running", "started_at": time.time(), "matched": 0}
-        except Exception:
-            pass
 
         _can_index_missing = os.getenv("SELFIE_MATCH_CAN_INDEX_MISSING_PHOTOS", "0").strip().lower() in {"1", "true", "yes"}
         _index_limit = int(os.getenv("SELFIE_MATCH_INDEX_LIMIT", "5") or "5")
@@ -4794,8 +4760,11 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
         events = session.query(UserEvent).filter(UserEvent.user_id == user_id).all()
         total_matches = 0
         t_match_start = time.time()
-        with _MATCHING_SEMAPHORE:
+        with _MATCHING_SEMAPHORE.slot():
             for ue in events:
+                if job_registry.is_cancelled(job_id):
+                    logger.info(f"[SelfieMatchBg] job_id={job_id} superseded, stopping user_id={user_id} matched_so_far={total_matches}")
+                    return
                 try:
                     from aws_metrics import aws_metrics as _m
                     with _m.action_context(f"selfie_update:event:{ue.event_id}:user:{user_id}"):
@@ -4815,7 +4784,7 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
                                     logger.info(f"[SelfieMatchBg] indexing {len(missing_photos)} missing photos (limit={_index_limit}) event_id={ue.event_id}")
                                     for p in missing_photos:
                                         try:
-                                            photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else p.photo_data
+                                            photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else read_photo_bytes(p)
                                             if not photo_input:
                                                 continue
                                             img_bytes = face_recognizer._prepare_image_bytes(photo_input)
@@ -4839,6 +4808,7 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
                         else:
                             matched = face_recognizer.match_user_selfie_with_photos(user, session)
                         total_matches += int(matched or 0)
+                        job_registry.increment(job_id, processed=1, matched=int(matched or 0))
                         logger.info(f"[SelfieMatchBg] match result user_id={user_id} event_id={ue.event_id} matched={matched}")
                 except Exception as e:
                     logger.error(f"[SelfieMatchBg] Error matching event {ue.event_id}: {e}")
@@ -4846,7 +4816,7 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
 
         logger.info(f"[SelfieMatchBg] Rematch completed for user_id={user_id}, total_matches={total_matches} elapsed={time.time() - t_match_start:.3f}s")
         try:
-            REMATCH_STATUS[user_id] = {"status": "done", "finished_at": time.time(), "matched": int(total_matches or 0)}
+            _set_rematch_status(user_id, {"status": "done", "finished_at": time.time(), "matched": int(total_matches or 0)}, job_id)
         except Exception:
             pass
 
@@ -4859,7 +4829,7 @@ def _rematch_selfie_background_only(user_id: int, file_data: bytes):
         except Exception:
             pass
         try:
-            REMATCH_STATUS[user_id] = {"status": "error", "error": str(e), "finished_at": time.time()}
+            _set_rematch_status(user_id, {"status": "error", "error": str(e), "finished_at": time.time()}, job_id)
         except Exception:
             pass
     finally:
@@ -4976,11 +4946,12 @@ async def upload_selfie(
     if _is_selfie_matching_disabled():
         logger.info(f"[SelfieUpload] req_id={req_id} SELFIE_MATCHING_DISABLED=1 -> skipping matching for user_id={current_user.id}")
         try:
-            REMATCH_STATUS[current_user.id] = {
+            disabled_job_id = job_registry.create("selfie_rematch", f"user:{current_user.id}", user_id=current_user.id)
+            _set_rematch_status(current_user.id, {
                 "status": "disabled",
                 "info": "Selfie matching disabled via SELFIE_MATCHING_DISABLED",
                 "finished_at": time.time(),
-            }
+            }, disabled_job_id)
         except Exception:
             pass
         logger.info(f"[PERF][upload-selfie] req_id={req_id} total took {time.time() - _t_total:.3f}s")
@@ -4991,11 +4962,19 @@ async def upload_selfie(
         }
 
     # Matching ASYNC en thread pool (ne valide plus, juste le matching)
+    # Un nouveau job remplace les rematchs encore en attente/en cours de cet utilisateur
+    rematch_job_id = None
+    try:
+        rematch_job_id = job_registry.create("selfie_rematch", f"user:{current_user.id}", user_id=current_user.id)
+    except Exception as e:
+        logger.warning(f"[SelfieUpload] req_id={req_id} could not register rematch job: {e}")
     try:
         future = _MATCHING_THREAD_POOL.submit(
+            INTERACTIVE,
             _rematch_selfie_background_only,
             current_user.id,
             compressed_data,
+            rematch_job_id,
         )
         logger.info(f"[SelfieUpload] req_id={req_id} Matching scheduled in thread pool for user_id={current_user.id}")
         logger.info(f"[PERF][upload-selfie] req_id={req_id} total took {time.time() - _t_total:.3f}s")
@@ -5006,7 +4985,8 @@ async def upload_selfie(
         }
     except Exception as e:
         logger.error(f"[SelfieUpload] req_id={req_id} ERROR submitting to thread pool: {e}")
-        _rematch_selfie_background_only(current_user.id, compressed_data)
+        with priority_context(INTERACTIVE):
+            _rematch_selfie_background_only(current_user.id, compressed_data, rematch_job_id)
         logger.info(f"[PERF][upload-selfie] req_id={req_id} total took {time.time() - _t_total:.3f}s")
         return {
             "message": "Selfie validé et traité avec succès",
@@ -5021,7 +5001,7 @@ def get_rematch_status(
 ):
     """Retourne l'état du rematching de selfie pour l'utilisateur courant."""
     try:
-        st = REMATCH_STATUS.get(current_user.id)
+        st = job_registry.latest("selfie_rematch", f"user:{current_user.id}")
         if not st:
             # Fallback robuste (multi-workers): déduire via DB si possible
             if not (current_user.selfie_data or current_user.selfie_path):
@@ -5480,7 +5460,7 @@ async def admin_rematch_event(
     
     # Lancer le rematch dans le thread pool
     try:
-        _MATCHING_THREAD_POOL.submit(_rematch_event_via_selfies, event_id)
+        _MATCHING_THREAD_POOL.submit(MAINTENANCE, _rematch_event_via_selfies, event_id)
         print(f"[Admin] Event rematch scheduled in thread pool for event_id={event_id}")
     except Exception as e:
         print(f"[Admin] ERROR submitting rematch to thread pool: {e}")
@@ -5695,7 +5675,7 @@ async def photographer_rematch_event(
     
     # Lancer le rematch dans le thread pool
     try:
-        _MATCHING_THREAD_POOL.submit(_rematch_event_via_selfies, event_id)
+        _MATCHING_THREAD_POOL.submit(MAINTENANCE, _rematch_event_via_selfies, event_id)
         print(f"[Photographer] Event rematch scheduled in thread pool for event_id={event_id}")
     except Exception as e:
         print(f"[Photographer] ERROR submitting rematch to thread pool: {e}")
@@ -5722,55 +5702,333 @@ async def get_image(filename: str):
     # Si aucune image n'est trouv+�e
     raise HTTPException(status_code=404, detail=f"Image non trouv+�e: {filename}")
 
-@app.get("/api/photo/{photo_id}")
-async def get_photo_by_id(
-    photo_id: int,
-    request: Request,
-    db: Session = Depends(get_db)
-):
-    """
-    Servir une photo depuis la base de données par son ID.
-    
-    CACHE OPTIMISÉ:
-    - Cache-Control: public, max-age=3600 (1h), immutable
-    - ETag basé sur (photo_id, uploaded_at) pour invalidation si photo modifiée
-    - Support If-None-Match: retourne 304 Not Modified si cache valide
-    - Support If-Modified-Since: retourne 304 si non modifié
-    
-    NOTE: Pas de cache serveur pour éviter les problèmes de mémoire.
-    Le navigateur/CDN cache avec les headers HTTP.
-    """
-    from sqlalchemy.orm import load_only
-    
-    # Charger uniquement les métadonnées d'abord (pas photo_data)
-    photo_meta = db.query(Photo).options(
-        load_only(Photo.id, Photo.uploaded_at, Photo.content_type, Photo.file_path)
-    ).filter(Photo.id == photo_id).first()
-    
-    if not photo_meta:
-        raise HTTPException(status_code=404, detail="Photo non trouvée")
-    
-    # Générer ETag basé sur (photo_id, uploaded_at) pour invalidation si modifiée
-    # Plus robuste que juste photo_id car permet de détecter les modifications
-    ts = photo_meta.uploaded_at.isoformat() if photo_meta.uploaded_at else "0"
-    etag = f'"{photo_id}-{hashlib.md5(ts.encode()).hexdigest()[:8]}"'
-    
-    # Vérifier If-None-Match (ETag validation)
-    if_none_match = request.headers.get("If-None-Match")
-    if if_none_match and if_none_match == etag:
-        return Response(
-            status_code=304,
-            headers={
-                "ETag": etag,
-                "Cache-Control": "public, max-age=3600, immutable"
+# Déclinaisons servies par /api/photo/{id}?size= (full = photo optimisée ~1920 px)
+PHOTO_RENDITION_SIZES = ("thumbnail", "preview", "full")
+
+
+def _load_photo_rendition(db: Session, photo_id: int, rendition: str) -> Optional[bytes]:
+    """Vignette/aperçu d'une photo; générés et enregistrés au premier accès s'ils manquent (bloquant)."""
+    if rendition == "thumbnail":
+        key_column, data_column = Photo.thumbnail_blob_key, Photo.thumbnail_data
+    else:
+        key_column, data_column = Photo.preview_blob_key, Photo.preview_data
+    row = db.query(key_column, data_column).filter(Photo.id == photo_id).first()
+    data = read_blob_or_column(row[0], row[1]) if row else None
+    if data:
+        return data
+    row = db.query(Photo.blob_key, Photo.photo_data).filter(Photo.id == photo_id).first()
+    source = read_blob_or_column(row[0], row[1]) if row else None
+    if not source:
+        return None
+    renditions = PhotoOptimizer.create_renditions(source)
+    if not renditions:
+        return None
+    values = {
+        Photo.thumbnail_data: renditions.get("thumbnail"),
+        Photo.preview_data: renditions.get("preview"),
+    }
+    store = get_blob_store()
+    if store is not None:
+        try:
+            values = {
+                Photo.thumbnail_blob_key: store.put(renditions["thumbnail"]) if renditions.get("thumbnail") else None,
+                Photo.preview_blob_key: store.put(renditions["preview"]) if renditions.get("preview") else None,
             }
-        )
+        except Exception as e:
+            print(f"[BlobStore] rendition write failed photo_id={photo_id}, keeping bytes in DB: {e}")
+    try:
+        db.query(Photo).filter(Photo.id == photo_id).update(values, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[PhotoRendition] save failed photo_id={photo_id}: {e}")
+    return renditions.get(rendition)
+
+
+def _load_full_photo_bytes(db: Session, photo_id: int):
+    """Octets de la photo complète (blob store ou base, sinon fichier local) et leur type MIME. 404 si absents."""
+    # Charger les données binaires (requête séparée pour éviter de charger inutilement)
+    photo = db.query(Photo).filter(Photo.id == photo_id).first()
     
-    # Vérifier If-Modified-Since (pour anciens navigateurs/CDN)
-    if_modified_since = request.headers.get("If-Modified-Since")
-    if if_modified_since and photo_meta.uploaded_at:
+    content_bytes: bytes | None = None
+    try:
+        content_bytes = read_photo_bytes(photo)
+    except Exception:
+        content_bytes = None
+    if content_bytes is None and getattr(photo, "file_path", None):
         try:
-            # Parse RFC 7231 date format
+            fp = photo.file_path
+            if fp and os.path.exists(fp):
+                with open(fp, "rb") as f:
+                    content_bytes = f.read()
+        except Exception:
+            content_bytes = None
+    if not content_bytes:
+        raise HTTPException(status_code=404, detail="Données de photo non disponibles")
+    return content_bytes, photo.content_type or "image/jpeg"
+
+
+def _blob_response(request: Request, key: Optional[str], media_type: str, headers: dict) -> Optional[Response]:
+    """Réponse servie directement depuis le blob store (fichier local ou flux S3), None si indisponible.
+
+    Les requêtes Range sont servies en 206 (lecture à partir de l'offset demandé)."""
+    store = get_blob_store() if key else None
+    if store is None:
+        return None
+    try:
+        path = store.local_path(key)
+        if path:
+            # Lecture du fichier par morceaux, sans charger l'image en mémoire
+            return file_range_response(request, path, media_type, headers)
+        if store.backend == "s3":
+            if request.headers.get("Range"):
+                size = store.size(key)
+                if size is not None:
+                    return range_response(
+                        request, size, media_type, headers,
+                        lambda start, end: store.iter_range(key, start, end),
+                    )
+                return None
+            # Sans Range: un seul GET S3, taille lue dans sa réponse
+            stream = store.open_stream(key)
+            if stream is not None:
+                stream_headers = dict(headers)
+                stream_headers["Accept-Ranges"] = "bytes"
+                if stream["size"]:
+                    stream_headers["Content-Length"] = str(stream["size"])
+                return StreamingResponse(stream["chunks"], media_type=media_type, headers=stream_headers)
+    except Exception as e:
+        print(f"[BlobStore] serve failed key={key}: {e}")
+    return None
+
+
+def _photo_blob_response(request: Request, db: Session, photo_meta: Photo, rendition: str, fmt: str,
+                         headers: dict) -> Optional[Response]:
+    """
+    Réponse directe depuis le blob store pour (photo, déclinaison, format): variante déjà
+    calculée, sinon blob JPEG source quand aucun encodage n'est à faire. None si indisponible.
+    """
+    from photo_variants import MEDIA_TYPES, egress_counters, find_variant
+    variant = find_variant(db, photo_meta.id, rendition, fmt) if fmt != "jpeg" else None
+    if variant is not None and variant.blob_key:
+        response = _blob_response(request, variant.blob_key, MEDIA_TYPES[fmt], headers)
+        if response is not None:
+            egress_counters.record(fmt, int(variant.size_bytes or 0), int(variant.source_size_bytes or 0))
+            return response
+    # Variante absente (à encoder) ou encore en base: pas de réponse directe
+    if fmt != "jpeg" and (variant is None or variant.data):
+        return None
+    if rendition == "full":
+        source_key, source_type = photo_meta.blob_key, photo_meta.content_type or "image/jpeg"
+    else:
+        source_key = getattr(photo_meta, f"{rendition}_blob_key")
+        source_type = "image/jpeg"
+    return _blob_response(request, source_key, source_type, headers)
+
+
+def _serve_photo_variant(db: Session, photo_id: int, rendition: str, fmt: str,
+                         jpeg_bytes: bytes) -> Optional[bytes]:
+    """Variante WebP/AVIF d'une déclinaison JPEG, encodée et enregistrée au premier accès (bloquant)."""
+    from photo_variants import encode_variant, save_variant
+    try:
+        data = encode_variant(jpeg_bytes, fmt)
+    except Exception as e:
+        print(f"[PhotoVariants] encode failed photo_id={photo_id} {rendition}/{fmt}: {e}")
+        return None
+    return save_variant(db, photo_id, rendition, fmt, len(jpeg_bytes), data)
+
+
+def _photo_redirect(db: Session, photo_meta: Photo, rendition: str, fmt: str):
+    """
+    (url, max-age) de redirection vers le blob S3 de la déclinaison/du format demandés,
+    None si l'application doit servir les octets (binaire encore en base, variante à encoder).
+    """
+    from photo_variants import MEDIA_TYPES, find_variant
+    variant = find_variant(db, photo_meta.id, rendition, fmt) if fmt != "jpeg" else None
+    if variant is not None and variant.blob_key:
+        return photo_delivery.redirect_for(variant.blob_key, MEDIA_TYPES[fmt])
+    if fmt != "jpeg" and variant is None:
+        # Première demande de ce format: encodée par l'application, redirigée ensuite
+        return None
+    if rendition == "full":
+        return photo_delivery.redirect_for(photo_meta.blob_key, photo_meta.content_type or "image/jpeg")
+    return photo_delivery.redirect_for(getattr(photo_meta, f"{rendition}_blob_key"), "image/jpeg")
+
+
+def _photo_etag(photo_id: int, rendition: str, fmt: str, uploaded_at) -> str:
+    """ETag de /api/photo/{id} (aussi clé du cache photo): (photo_id, déclinaison, format, uploaded_at)."""
+    ts = uploaded_at.isoformat() if uploaded_at else "0"
+    ts_hash = hashlib.md5(ts.encode()).hexdigest()[:8]
+    etag_parts = [str(photo_id)]
+    if rendition != "full":
+        etag_parts.append(rendition)
+    if fmt != "jpeg":
+        etag_parts.append(fmt)
+    return f'"{"-".join(etag_parts + [ts_hash])}"'
+
+
+def _build_photo_payload(photo_id: int, rendition: str, fmt: str):
+    """
+    Octets servis pour (photo, déclinaison, format): (octets, type MIME, taille du JPEG source).
+    Bloquant, avec sa propre session: exécuté hors de la boucle asyncio et partagé par les
+    requêtes coalescées du cache photo. 404 (HTTPException) si la photo n'a pas de données.
+    """
+    from photo_variants import MEDIA_TYPES, find_variant, variant_bytes
+    db = SessionLocal()
+    try:
+        variant = find_variant(db, photo_id, rendition, fmt) if fmt != "jpeg" else None
+        if variant is not None and (variant.blob_key or variant.data):
+            data = variant_bytes(variant)
+            if data:
+                return data, MEDIA_TYPES[fmt], int(variant.source_size_bytes or 0)
+        
+        content_bytes: bytes | None = None
+        media_type = "image/jpeg"
+        if rendition != "full":
+            content_bytes = _load_photo_rendition(db, photo_id, rendition)
+        if not content_bytes:
+            # Photo complète (ou déclinaison impossible: photo sur disque uniquement)
+            content_bytes, media_type = _load_full_photo_bytes(db, photo_id)
+        
+        # Première demande de ce format: encoder et enregistrer (None: le JPEG est plus léger)
+        if fmt != "jpeg" and variant is None and media_type == "image/jpeg":
+            data = _serve_photo_variant(db, photo_id, rendition, fmt, content_bytes)
+            if data:
+                return data, MEDIA_TYPES[fmt], len(content_bytes)
+        return content_bytes, media_type, len(content_bytes)
+    finally:
+        db.close()
+
+
+def _prewarm_photo_cache(event_id: int, featured_photo_id: Optional[int] = None) -> int:
+    """
+    Préchauffe le cache photo avant l'envoi des emails: photo mise en avant (taille
+    complète, si elle n'est pas servie depuis le blob store) et vignettes de la première page de l'onglet Général, en JPEG et dans
+    chaque format moderne activé. Bloquant (tâche de fond). Retourne le nombre d'entrées ajoutées.
+    """
+    from photo_variants import enabled_formats
+    if not (photo_cache.enabled and settings.PHOTO_CACHE_PREWARM_ENABLED):
+        return 0
+    db = SessionLocal()
+    try:
+        base_query = db.query(Photo.id, Photo.uploaded_at, Photo.content_type).filter(Photo.event_id == event_id)
+        has_general_photos = db.query(
+            exists().where(and_(Photo.event_id == event_id, Photo.show_in_general.is_(True)))
+        ).scalar()
+        if has_general_photos:
+            base_query = base_query.filter(Photo.show_in_general.is_(True))
+        page_size = max(0, int(settings.PHOTO_CACHE_PREWARM_PAGE_SIZE or 0))
+        rows = base_query.order_by(Photo.uploaded_at.desc(), Photo.id.desc()).limit(page_size).all()
+        targets = [(row, "thumbnail") for row in rows]
+        if featured_photo_id:
+            featured = db.query(Photo.id, Photo.uploaded_at, Photo.content_type, Photo.blob_key).filter(
+                Photo.id == featured_photo_id, Photo.event_id == event_id
+            ).first()
+            # Taille complète servie en flux depuis le blob store: seulement si encore en base
+            if featured is not None and not (featured.blob_key and get_blob_store() is not None):
+                targets.insert(0, (featured, "full"))
+    finally:
+        db.close()
+    
+    formats = ("jpeg",) + tuple(enabled_formats())
+    warmed = 0
+    for row, rendition in targets:
+        row_formats = formats if (row.content_type or "image/jpeg") == "image/jpeg" else ("jpeg",)
+        for fmt in row_formats:
+            key = _photo_etag(row.id, rendition, fmt, row.uploaded_at)
+            if photo_cache.contains(key):
+                continue
+            try:
+                photo_cache.put(key, _build_photo_payload(row.id, rendition, fmt))
+                warmed += 1
+            except HTTPException:
+                break  # Photo sans données: inutile d'essayer les autres formats
+            except Exception as e:
+                print(f"[PhotoCache] prewarm failed photo_id={row.id} {rendition}/{fmt}: {e}")
+    print(f"[PhotoCache] prewarmed event_id={event_id} entries={warmed}")
+    return warmed
+
+
+@app.get("/api/photo/{photo_id}")
+async def get_photo_by_id(
+    photo_id: int,
+    request: Request,
+    size: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Servir une photo depuis la base de données par son ID.
+    
+    size: thumbnail (~320 px, grilles), preview (~1024 px, visionneuse) ou full (défaut).
+    Les déclinaisons sont produites à l'ingestion par PhotoOptimizer.
+    
+    RANGE: Accept-Ranges: bytes; une plage unique est servie en 206 (416 si hors contenu),
+    le corps est envoyé par morceaux.
+    
+    FORMAT: WebP/AVIF si l'en-tête Accept les annonce (Vary: Accept), sinon JPEG.
+    Les variantes sont encodées au premier accès puis conservées (photo_variants).
+    
+    BLOB STORE: les binaires déjà migrés sont servis sans passer par la base
+    (FileResponse pour le stockage local, flux par morceaux depuis S3).
+    
+    CACHE OPTIMISÉ:
+    - Cache-Control: public, max-age=3600 (1h), immutable
+    - ETag basé sur (photo_id, uploaded_at) pour invalidation si photo modifiée
+    - Support If-None-Match: retourne 304 Not Modified si cache valide
+    - Support If-Modified-Since: retourne 304 si non modifié
+    
+    REDIRECTION: avec PHOTO_DELIVERY_MODE=presigned|cdn, les binaires du blob store S3
+    sont servis par un 302 vers une URL signée (S3 ou CloudFront).
+    
+    CACHE SERVEUR: photo_cache (LRU mémoire borné en octets + disque local), clé = ETag;
+    les requêtes concurrentes pour une même entrée absente partagent un seul chargement.
+    La taille complète et les requêtes Range passent d'abord par le blob store (flux),
+    le cache sert les vignettes/aperçus, les variantes et les binaires encore en base.
+    """
+    from sqlalchemy.orm import load_only
+    
+    # Charger uniquement les métadonnées d'abord (pas photo_data)
+    photo_meta = db.query(Photo).options(
+        load_only(
+            Photo.id, Photo.uploaded_at, Photo.content_type, Photo.file_path,
+            Photo.blob_key, Photo.thumbnail_blob_key, Photo.preview_blob_key,
+        )
+    ).filter(Photo.id == photo_id).first()
+    
+    if not photo_meta:
+        raise HTTPException(status_code=404, detail="Photo non trouvée")
+    
+    rendition = (size or "full").strip().lower()
+    if rendition not in PHOTO_RENDITION_SIZES:
+        raise HTTPException(status_code=400, detail="size invalide (thumbnail, preview ou full)")
+    
+    # Format négocié (les photos stockées hors JPEG sont servies telles quelles)
+    from photo_variants import MEDIA_TYPES, egress_counters, find_variant, negotiate_format
+    fmt = "jpeg"
+    if (photo_meta.content_type or "image/jpeg") == "image/jpeg":
+        fmt = negotiate_format(request.headers.get("Accept"))
+    
+    # Générer ETag basé sur (photo_id, uploaded_at) pour invalidation si modifiée
+    # Plus robuste que juste photo_id car permet de détecter les modifications
+    etag = _photo_etag(photo_id, rendition, fmt, photo_meta.uploaded_at)
+    
+    # Vérifier If-None-Match (ETag validation)
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and if_none_match == etag:
+        return Response(
+            status_code=304,
+            headers={
+                "ETag": etag,
+                "Cache-Control": "public, max-age=3600, immutable",
+                "Vary": "Accept",
+            }
+        )
+    
+    # Vérifier If-Modified-Since (pour anciens navigateurs/CDN)
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since and photo_meta.uploaded_at:
+        try:
+            # Parse RFC 7231 date format
             from email.utils import parsedate_to_datetime
             ims_dt = parsedate_to_datetime(if_modified_since)
             # Si la photo n'a pas été modifiée depuis
@@ -5779,32 +6037,13 @@ async def get_photo_by_id(
                     status_code=304,
                     headers={
                         "ETag": etag,
-                        "Cache-Control": "public, max-age=3600, immutable"
+                        "Cache-Control": "public, max-age=3600, immutable",
+                        "Vary": "Accept",
                     }
                 )
         except Exception:
             pass  # Ignorer les dates mal formatées
     
-    # Charger les données binaires (requête séparée pour éviter de charger inutilement)
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
-    
-    content_bytes: bytes | None = None
-    if getattr(photo, "photo_data", None):
-        try:
-            content_bytes = bytes(photo.photo_data)
-        except Exception:
-            content_bytes = None
-    if content_bytes is None and getattr(photo, "file_path", None):
-        try:
-            fp = photo.file_path
-            if fp and os.path.exists(fp):
-                with open(fp, "rb") as f:
-                    content_bytes = f.read()
-        except Exception:
-            content_bytes = None
-    if not content_bytes:
-        raise HTTPException(status_code=404, detail="Données de photo non disponibles")
-    
     # Générer Last-Modified header
     last_modified = None
     if photo_meta.uploaded_at:
@@ -5814,15 +6053,54 @@ async def get_photo_by_id(
     headers = {
         "Cache-Control": "public, max-age=3600, immutable",  # 1h + immutable pour CDN
         "ETag": etag,
+        "Vary": "Accept",  # Le format dépend de l'en-tête Accept (cache CDN par format)
     }
     if last_modified:
         headers["Last-Modified"] = last_modified
     
-    return Response(
-        content=content_bytes,
-        media_type=photo.content_type or "image/jpeg",
-        headers=headers
-    )
+    # Mode redirigé (PHOTO_DELIVERY_MODE): 302 vers S3/CDN, les octets ne transitent plus par l'application
+    if photo_delivery.mode() != "proxy":
+        redirect = _photo_redirect(db, photo_meta, rendition, fmt)
+        if redirect is not None:
+            url, max_age = redirect
+            return RedirectResponse(
+                url,
+                status_code=302,
+                headers={"Cache-Control": f"private, max-age={max_age}", "Vary": "Accept"},
+            )
+    
+    loop = asyncio.get_running_loop()
+    
+    def load():
+        # Lecture/encodage bloquants hors de la boucle asyncio
+        return loop.run_in_executor(None, _build_photo_payload, photo_id, rendition, fmt)
+    
+    # Taille complète et requêtes Range: servies en flux depuis le blob store (fichier local
+    # ou S3 par morceaux) sans charger l'image entière; le cache ne garde que les petites
+    # déclinaisons et les variantes (ou ce qui n'existe qu'en base)
+    if rendition == "full" or request.headers.get("Range") or not photo_cache.enabled:
+        response = _photo_blob_response(request, db, photo_meta, rendition, fmt, headers)
+        if response is not None:
+            return response
+    
+    # Cache photo (mémoire + disque, requêtes concurrentes coalescées)
+    if photo_cache.enabled:
+        content_bytes, media_type, jpeg_size = await photo_cache.get_or_load(etag, load)
+        if fmt != "jpeg" and media_type == MEDIA_TYPES[fmt]:
+            egress_counters.record(fmt, len(content_bytes), jpeg_size)
+        return bytes_range_response(request, content_bytes, media_type, headers)
+    
+    # Variante encore en base: servie sans relire le JPEG
+    variant = find_variant(db, photo_id, rendition, fmt) if fmt != "jpeg" else None
+    if variant is not None and variant.data:
+        egress_counters.record(fmt, len(variant.data), int(variant.source_size_bytes or 0))
+        return bytes_range_response(request, variant.data, MEDIA_TYPES[fmt], headers)
+    
+    content_bytes, media_type, jpeg_size = await load()
+    if fmt != "jpeg" and media_type == MEDIA_TYPES[fmt]:
+        egress_counters.record(fmt, len(content_bytes), jpeg_size)
+    return bytes_range_response(request, content_bytes, media_type, headers)
+
 
 @app.get("/api/photo/{photo_id}/faces")
 async def get_photo_faces(
@@ -5830,39 +6108,68 @@ async def get_photo_faces(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Retourne les cadres des visages détectés pour une photo, et indique si l'un matche l'utilisateur courant.
+    """Retourne les cadres des visages d'une photo, et indique si l'un matche l'utilisateur courant.
 
     Réponse:
     {
-      "image_width": int,
-      "image_height": int,
+      "image_width": int | null,
+      "image_height": int | null,
       "boxes": [
         {"top": float, "left": float, "width": float, "height": float, "matched": bool, "confidence": int}
       ]
     }
-    Toutes les positions sont normalisées entre 0 et 1 par rapport à l'image analysée.
+    Toutes les positions sont normalisées entre 0 et 1 par rapport à l'image originale.
+    Les boxes sont lues depuis photo_faces (persistées à l'indexation); la détection Haar
+    n'est utilisée qu'en repli pour les photos sans box, et son résultat est persisté.
     """
+    from sqlalchemy import and_ as _and
+    from models import PhotoFace
+
+    # Une seule requête indexée: visages de la photo + score du FaceMatch de l'utilisateur
+    # courant quand le visage lui est associé. matched vient du FaceMatch (source de vérité):
+    # un matched_user_id resté en place après suppression des correspondances est ignoré
+    rows = (
+        db.query(PhotoFace, FaceMatch.id, FaceMatch.confidence_score)
+        .outerjoin(
+            FaceMatch,
+            _and(
+                FaceMatch.photo_id == PhotoFace.photo_id,
+                FaceMatch.user_id == PhotoFace.matched_user_id,
+                FaceMatch.user_id == current_user.id,
+            ),
+        )
+        .filter(PhotoFace.photo_id == photo_id)
+        .all()
+    )
+    boxed_rows = [row for row in rows if row[0].box_width is not None and row[0].box_height is not None]
+    if boxed_rows:
+        boxes: List[Dict[str, Any]] = []
+        for pf, match_id, score in boxed_rows:
+            matched = match_id is not None
+            boxes.append({
+                "top": max(0.0, float(pf.box_top or 0.0)),
+                "left": max(0.0, float(pf.box_left or 0.0)),
+                "width": min(1.0, float(pf.box_width)),
+                "height": min(1.0, float(pf.box_height)),
+                "matched": matched,
+                "confidence": int(score) if (matched and score is not None) else None,
+            })
+        return {"image_width": None, "image_height": None, "boxes": boxes}
+
     # Récupérer la photo
     photo = db.query(Photo).filter(Photo.id == photo_id).first()
     if not photo:
         raise HTTPException(status_code=404, detail="Photo non trouvée")
+    # Photo déjà indexée sans aucun visage: rien à détecter
+    if not rows and getattr(photo, "is_indexed", False):
+        return {"image_width": None, "image_height": None, "boxes": []}
 
-    # Cache LRU: retourner si déjà calculé récemment
+    # Charger les octets de l'image depuis le blob store, la base ou le chemin de fichier
+    image_bytes: bytes | None = None
     try:
-        if photo_id in PHOTO_FACES_CACHE:
-            entry = PHOTO_FACES_CACHE.pop(photo_id)
-            PHOTO_FACES_CACHE[photo_id] = entry
-            return entry
+        image_bytes = read_photo_bytes(photo)
     except Exception:
-        pass
-
-    # Charger les octets de l'image depuis la base ou le chemin de fichier
-    image_bytes: bytes | None = None
-    if getattr(photo, "photo_data", None):
-        try:
-            image_bytes = bytes(photo.photo_data)
-        except Exception:
-            image_bytes = None
+        image_bytes = None
     if image_bytes is None and getattr(photo, "file_path", None):
         try:
             fp = photo.file_path
@@ -5924,18 +6231,34 @@ async def get_photo_faces(
             }
             boxes.append(box)
 
-        result = {
+        # Persister le résultat Haar pour ne plus re-détecter cette photo
+        if boxes and photo.event_id:
+            try:
+                for i, b in enumerate(boxes):
+                    db.add(PhotoFace(
+                        event_id=photo.event_id,
+                        photo_id=photo_id,
+                        face_id=f"haar:{photo_id}:{i}",
+                        box_left=b["left"],
+                        box_top=b["top"],
+                        box_width=b["width"],
+                        box_height=b["height"],
+                        detection_source="haar",
+                    ))
+                db.commit()
+            except Exception as e:
+                # Requête concurrente ayant déjà persisté les mêmes visages
+                print(f"[get_photo_faces] persist haar boxes skipped photo_id={photo_id}: {e}")
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+
+        return {
             "image_width": work_w,
             "image_height": work_h,
             "boxes": boxes,
         }
-        try:
-            PHOTO_FACES_CACHE[photo_id] = result
-            if len(PHOTO_FACES_CACHE) > PHOTO_FACES_CACHE_MAX:
-                PHOTO_FACES_CACHE.popitem(last=False)
-        except Exception:
-            pass
-        return result
     except HTTPException:
         raise
     except Exception as e:
@@ -5945,9 +6268,10 @@ async def get_photo_faces(
 @app.get("/api/selfie/{user_id}")
 async def get_selfie_by_user_id(
     user_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    """Servir un selfie avec fallback robuste: fichier > blob DB > 404"""
+    """Servir un selfie avec fallback robuste: fichier > blob DB > 404 (Range pris en charge)"""
     user = db.query(User).filter(User.id == user_id).first()
 
     if not user:
@@ -5960,12 +6284,8 @@ async def get_selfie_by_user_id(
             if _os.path.isfile(user.selfie_path):
                 import mimetypes
                 ct = mimetypes.guess_type(user.selfie_path)[0] or "image/jpeg"
-                with open(user.selfie_path, "rb") as f:
-                    data = f.read()
-                return Response(
-                    content=data,
-                    media_type=ct,
-                    headers={"Cache-Control": "public, max-age=3600"}
+                return file_range_response(
+                    request, user.selfie_path, ct, {"Cache-Control": "public, max-age=3600"}
                 )
         except Exception:
             pass  # Fallback au blob DB
@@ -5973,10 +6293,8 @@ async def get_selfie_by_user_id(
     # Priorité 2: blob DB (selfie_data)
     if user.selfie_data:
         ct = user.selfie_content_type or "image/jpeg"
-        return Response(
-            content=user.selfie_data,
-            media_type=ct,
-            headers={"Cache-Control": "public, max-age=3600"}
+        return bytes_range_response(
+            request, user.selfie_data, ct, {"Cache-Control": "public, max-age=3600"}
         )
 
     # Aucun selfie disponible
@@ -5986,6 +6304,7 @@ async def get_selfie_by_user_id(
 @app.get("/api/photographer/logo/{user_id}")
 async def get_photographer_logo(
     user_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     photographer = db.query(User).filter(
@@ -6000,10 +6319,8 @@ async def get_photographer_logo(
     if not media_type.startswith("image/"):
         media_type = "image/png"
 
-    return Response(
-        content=photographer.logo_data,
-        media_type=media_type,
-        headers={"Cache-Control": "public, max-age=3600"},
+    return bytes_range_response(
+        request, photographer.logo_data, media_type, {"Cache-Control": "public, max-age=3600"}
     )
 
 # === ROUTES ADMIN ===
@@ -6054,8 +6371,14 @@ async def delete_photo(
         
         # Supprimer l'enregistrement de la base de données
         logger.info(f"delete_photo: deleting DB record photo_id={photo_id}")
+        blob_keys = photo_blob_keys(db, [photo.id])
+        from perceptual_hash import detach_near_duplicates, reanalyze_photos_async
+        detached = detach_near_duplicates(db, [photo.id])
         db.delete(photo)
         db.commit()
+        delete_unreferenced(db, blob_keys)
+        # Quasi-doublons qui réutilisaient l'analyse de cette photo: analyse complète
+        reanalyze_photos_async(detached)
         
         logger.info(f"delete_photo: success photo_id={photo_id}")
         return {"message": "Photo supprimée avec succès"}
@@ -6194,9 +6517,12 @@ async def delete_multiple_photos(
         valid_photo_ids = valid_photo_ids[:MAX_SYNC_DELETE]
     
     photos = db.query(Photo).filter(Photo.id.in_(valid_photo_ids)).all()
+    blob_keys = photo_blob_keys(db, [photo.id for photo in photos])
     
     deleted_count = 0
     try:
+        from perceptual_hash import detach_near_duplicates, reanalyze_photos_async
+        detached = detach_near_duplicates(db, [photo.id for photo in photos])
         for photo in photos:
             # Supprimer les correspondances de visages associées
             logger.info(f"delete_multiple_photos: deleting face_matches for photo_id={photo.id}")
@@ -6224,6 +6550,8 @@ async def delete_multiple_photos(
             deleted_count += 1
         
         db.commit()
+        delete_unreferenced(db, blob_keys)
+        reanalyze_photos_async(detached)
         logger.info(f"delete_multiple_photos: success deleted={deleted_count}")
         return {"message": f"{deleted_count} photos supprimées avec succès", "deleted_count": deleted_count}
     except Exception as e:
@@ -6553,6 +6881,9 @@ async def admin_delete_photographer(
     
     # Supprimer les photos upload+�es par ce photographe
     photos = db.query(Photo).filter(Photo.photographer_id == photographer_id).all()
+    blob_keys = photo_blob_keys(db, [photo.id for photo in photos])
+    from perceptual_hash import detach_near_duplicates, reanalyze_photos_async
+    detached = detach_near_duplicates(db, [photo.id for photo in photos])
     for photo in photos:
         # Supprimer les correspondances de visages
         db.query(FaceMatch).filter(FaceMatch.photo_id == photo.id).delete()
@@ -6565,6 +6896,8 @@ async def admin_delete_photographer(
     # Supprimer le photographe
     db.delete(photographer)
     db.commit()
+    delete_unreferenced(db, blob_keys)
+    reanalyze_photos_async(detached)
     
     return {"message": "Photographe supprim+� avec succ+�s"}
 
@@ -6801,6 +7134,7 @@ async def admin_delete_user(
 
         # Supprimer les FaceMatch de cet utilisateur
         db.query(FaceMatch).filter(FaceMatch.user_id == user_id).delete()
+        _release_photo_faces(db, user_id)
 
         # Supprimer les tokens de réinitialisation de mot de passe
         db.query(PasswordResetToken).filter(PasswordResetToken.user_id == user_id).delete()
@@ -7193,10 +7527,111 @@ async def get_event_photos(
             "show_in_general": photo.show_in_general,
             "processing_status": photo.processing_status,
             "error_message": photo.error_message,
+            "near_duplicate_of": getattr(photo, "near_duplicate_of", None),
+            "near_duplicate_distance": getattr(photo, "near_duplicate_distance", None),
         })
     
     return photo_list
 
+def _ensure_upload_batch(db: Session, upload_batch_id: str, event_id: int, photographer_id: int,
+                         total_photos: int = 0):
+    """Retourne le lot d'upload photographe, créé s'il n'existe pas (tolère la course)."""
+    upload_batch = (
+        db.query(PhotographerUploadBatch)
+        .filter(PhotographerUploadBatch.upload_batch_id == upload_batch_id)
+        .first()
+    )
+    if not upload_batch:
+        try:
+            upload_batch = PhotographerUploadBatch(
+                upload_batch_id=upload_batch_id,
+                event_id=event_id,
+                photographer_id=photographer_id,
+                total_photos=total_photos,
+                status="PROCESSING",
+            )
+            db.add(upload_batch)
+            db.commit()
+            db.refresh(upload_batch)
+        except IntegrityError:
+            db.rollback()
+            upload_batch = (
+                db.query(PhotographerUploadBatch)
+                .filter(PhotographerUploadBatch.upload_batch_id == upload_batch_id)
+                .first()
+            )
+    return upload_batch
+
+
+def _upload_file_size(file: UploadFile) -> int:
+    """Taille d'un UploadFile sans le charger en mémoire (fichier spoolé par Starlette)."""
+    try:
+        f = file.file
+        pos = f.tell()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(pos)
+        return int(size)
+    except Exception:
+        return int(getattr(file, "size", 0) or 0)
+
+
+def _upload_file_to_s3(s3_service, file: UploadFile, event_id: int, photo_id: int) -> str:
+    """
+    Envoie un fichier vers S3 par morceaux (exécuté dans _S3_UPLOAD_POOL). Le format est
+    déterminé par la signature du fichier. Retourne la clé S3.
+    """
+    from streaming_upload import sniff_image_type, SNIFF_BYTES
+    file.file.seek(0)
+    detected = sniff_image_type(file.file.read(SNIFF_BYTES))
+    if detected is None:
+        raise ValueError("Unsupported image format")
+    file.file.seek(0)
+    content_type, extension = detected
+    result = s3_service.upload_photo_stream(
+        file.file,
+        event_id=event_id,
+        photo_id=photo_id,
+        content_type=content_type,
+        extension=extension,
+    )
+    return result["s3_key"]
+
+
+def _mark_uploaded_photos(db: Session, uploaded: List[Dict[str, Any]], failed: Dict[int, str],
+                          batch_id: str, commit: bool = True) -> None:
+    """Enregistre les clés S3 (un executemany) et passe les photos en échec à FAILED."""
+    from sqlalchemy import update as _sa_update
+    from models import PhotoProcessingStatus
+    try:
+        if uploaded:
+            db.execute(_sa_update(Photo), [
+                {"id": job["photo_id"], "s3_key": job["s3_key"], "content_sha256": job.get("sha256")}
+                if job.get("sha256") else {"id": job["photo_id"], "s3_key": job["s3_key"]}
+                for job in uploaded
+            ])
+        if failed:
+            db.execute(_sa_update(Photo), [
+                {
+                    "id": photo_id,
+                    "processing_status": PhotoProcessingStatus.FAILED.value,
+                    "error_message": error[:2000],
+                }
+                for photo_id, error in failed.items()
+            ])
+        if commit:
+            db.commit()
+    except Exception as e:
+        print(f"[UPLOAD] batch={batch_id} ERROR photo update {type(e).__name__}: {e}")
+        if commit:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+        else:
+            raise
+
+
 @app.post("/api/photographer/events/{event_id}/upload-photos")
 async def upload_photos_to_event(
     event_id: int,
@@ -7211,10 +7646,10 @@ async def upload_photos_to_event(
     """Upload de photos pour un événement spécifique.
 
     NOUVEAU WORKFLOW PROD-READY (S3 + SQS):
-    1. Créer une entrée Photo en DB avec status=PENDING
-    2. Upload de l'image vers S3 (pas de fichier temp local persistant)
-    3. Envoyer un message SQS avec {photo_id, event_id, s3_key}
-    4. Retourner 200 seulement si DB + S3 + SQS sont OK
+    1. Créer toutes les entrées Photo en DB (status=PENDING) en une seule instruction
+    2. Upload des images vers S3 en parallèle (pool borné _S3_UPLOAD_POOL)
+    3. Envoyer les messages SQS {photo_id, event_id, s3_key} par lots de 10
+    4. Les fichiers en échec sont marqués FAILED et leur quota recrédité en une fois
 
     Autorisations:
     - Photographe propriétaire de l'événement
@@ -7248,30 +7683,9 @@ async def upload_photos_to_event(
             parsed_total_photos = 0
 
     if effective_upload_batch_id:
-        upload_batch = (
-            db.query(PhotographerUploadBatch)
-            .filter(PhotographerUploadBatch.upload_batch_id == effective_upload_batch_id)
-            .first()
+        _ensure_upload_batch(
+            db, effective_upload_batch_id, event_id, effective_photographer_id, parsed_total_photos
         )
-        if not upload_batch:
-            try:
-                upload_batch = PhotographerUploadBatch(
-                    upload_batch_id=effective_upload_batch_id,
-                    event_id=event_id,
-                    photographer_id=effective_photographer_id,
-                    total_photos=parsed_total_photos,
-                    status="PROCESSING",
-                )
-                db.add(upload_batch)
-                db.commit()
-                db.refresh(upload_batch)
-            except IntegrityError:
-                db.rollback()
-                upload_batch = (
-                    db.query(PhotographerUploadBatch)
-                    .filter(PhotographerUploadBatch.upload_batch_id == effective_upload_batch_id)
-                    .first()
-                )
     
     if not files:
         raise HTTPException(status_code=400, detail="Aucun fichier fourni")
@@ -7317,117 +7731,211 @@ async def upload_photos_to_event(
             _total_size_bytes = 0
             print(f"[UPLOAD] batch={batch_id} event={event_id} files_received={len(files)} workflow=s3_sqs photographer={effective_photographer_id}")
 
+            # Lot photographe: réserver le total avant la mise en file (progression par compteurs)
+            from upload_batch_progress import reserve_batch_total, apply_batch_deltas
+            if effective_upload_batch_id:
+                try:
+                    reserve_batch_total(db, effective_upload_batch_id, image_files_count)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    print(f"[UPLOAD-BATCH] reserve total error batch_id={effective_upload_batch_id}: {e}")
+
+            # 1. Fichiers retenus (taille lue sans charger le contenu; vides = échec immédiat)
+            pending_files = []
             for file in files:
                 if not (getattr(file, "content_type", "") or "").startswith("image/"):
                     continue
-
-                photo = None
-                s3_key = None
-
-                try:
-                    _t0 = time.perf_counter()
-                    # 1. Lire les bytes de l'image (pas de fichier temp persistant)
-                    image_bytes = await file.read()
-                    _t_read = time.perf_counter()
-                
-                    if not image_bytes:
-                        failed_uploads.append({
+                _file_size = _upload_file_size(file)
+                if not _file_size:
+                    failed_uploads.append({
+                        "filename": file.filename,
+                        "error": "Empty file"
+                    })
+                    continue
+                _total_size_bytes += _file_size
+                pending_files.append(file)
+
+            # 1b. Déduplication par contenu (SHA-256) avant toute écriture S3 / mise en file:
+            # une photo déjà présente dans l'événement renvoie la photo existante
+            loop = asyncio.get_running_loop()
+            from photo_dedup import sha256_fileobj, find_existing_photos, match_counts
+            duplicate_photos: List[Dict[str, Any]] = []
+            file_hashes: List[str] = []
+            if pending_files:
+                _t_hash = time.perf_counter()
+                digests = await asyncio.gather(
+                    *(loop.run_in_executor(_S3_UPLOAD_POOL, sha256_fileobj, file.file) for file in pending_files)
+                )
+                existing = find_existing_photos(db, event_id, digests)
+                unique_files = []
+                in_request: Dict[str, Dict[str, Any]] = {}
+                for file, digest in zip(pending_files, digests):
+                    if digest in existing or digest in in_request:
+                        duplicate_photos.append({
                             "filename": file.filename,
-                            "error": "Empty file"
+                            "sha256": digest,
+                            "photo_id": existing[digest]["photo_id"] if digest in existing else None,
+                            "status": existing[digest]["status"] if digest in existing else "queued",
                         })
                         continue
-
-                    _file_size = len(image_bytes)
-                    _total_size_bytes += _file_size
-                    print(f"[UPLOAD] batch={batch_id} file={file.filename!r} size_bytes={_file_size} t_read_ms={int((_t_read - _t0) * 1000)}")
-
-                    # 2. Créer l'entrée Photo en DB avec status=PENDING
-                    unique_filename = f"{uuid.uuid4()}.jpg"
-                    photo = Photo(
-                        filename=unique_filename,
-                        original_filename=file.filename,
-                        content_type=file.content_type or "image/jpeg",
-                        photo_type="uploaded",
-                        photographer_id=effective_photographer_id,
-                        event_id=event_id,
-                        upload_batch_id=effective_upload_batch_id,
-                        processing_status=PhotoProcessingStatus.PENDING.value,
-                    )
-                    db.add(photo)
+                    in_request[digest] = {}
+                    unique_files.append(file)
+                    file_hashes.append(digest)
+                pending_files = unique_files
+                print(f"[UPLOAD] batch={batch_id} duplicates={len(duplicate_photos)} t_hash_ms={int((time.perf_counter() - _t_hash) * 1000)}")
+
+            # 2. Toutes les entrées Photo (PENDING) en une seule instruction INSERT ... RETURNING
+            # (une requête concurrente a pu insérer le même contenu entre-temps: l'index unique
+            # lève une IntegrityError, les fichiers concernés deviennent des doublons)
+            from photo_dedup import release_failed_hashes, is_duplicate_hash_error
+            photo_ids: List[int] = []
+            concurrent: Dict[str, Dict[str, Any]] = {}
+            _t0 = time.perf_counter()
+            _insert_requested = bool(pending_files)
+            from sqlalchemy import insert as _sa_insert
+            for _attempt in range(3):
+                if not pending_files:
+                    break
+                rows = [
+                    {
+                        "filename": f"{uuid.uuid4()}.jpg",
+                        "original_filename": file.filename,
+                        "content_type": file.content_type or "image/jpeg",
+                        "photo_type": "uploaded",
+                        "photographer_id": effective_photographer_id,
+                        "event_id": event_id,
+                        "upload_batch_id": effective_upload_batch_id,
+                        "processing_status": PhotoProcessingStatus.PENDING.value,
+                        "content_sha256": digest,
+                    }
+                    for file, digest in zip(pending_files, file_hashes)
+                ]
+                try:
+                    release_failed_hashes(db, event_id, file_hashes)
+                    photo_ids = list(db.scalars(
+                        _sa_insert(Photo).returning(Photo.id, sort_by_parameter_order=True),
+                        rows,
+                    ))
                     db.commit()
-                    db.refresh(photo)
-                    _t_db = time.perf_counter()
-                    print(f"[UPLOAD] batch={batch_id} file={file.filename!r} photo_id={photo.id} t_db_write_ms={int((_t_db - _t_read) * 1000)}")
-
-                    # 3. Upload vers S3
-                    extension = file.filename.rsplit(".", 1)[-1].lower() if "." in file.filename else "jpg"
-                    s3_key = s3_service.upload_photo(
-                        image_bytes=image_bytes,
-                        event_id=event_id,
-                        photo_id=photo.id,
-                        content_type=file.content_type or "image/jpeg",
-                        extension=extension
+                    break
+                except Exception as e:
+                    db.rollback()
+                    if not (isinstance(e, IntegrityError) and is_duplicate_hash_error(e)) or _attempt == 2:
+                        print(f"[UPLOAD] batch={batch_id} ERROR bulk insert {type(e).__name__}: {e}")
+                        for file in pending_files:
+                            failed_uploads.append({"filename": file.filename, "error": str(e)})
+                        pending_files, file_hashes = [], []
+                        break
+                    existing = find_existing_photos(db, event_id, file_hashes)
+                    print(f"[UPLOAD] batch={batch_id} concurrent duplicates={len(existing)}, retrying insert")
+                    unique_files, unique_hashes = [], []
+                    for file, digest in zip(pending_files, file_hashes):
+                        if digest in existing:
+                            concurrent[digest] = existing[digest]
+                            duplicate_photos.append({
+                                "filename": file.filename,
+                                "sha256": digest,
+                                "photo_id": existing[digest]["photo_id"],
+                                "status": existing[digest]["status"],
+                            })
+                            continue
+                        unique_files.append(file)
+                        unique_hashes.append(digest)
+                    pending_files, file_hashes = unique_files, unique_hashes
+            if _insert_requested:
+                print(f"[UPLOAD] batch={batch_id} photos_inserted={len(photo_ids)} t_db_write_ms={int((time.perf_counter() - _t0) * 1000)}")
+
+            # Doublons internes à la requête: rattachés à la photo créée (ou concurrente) pour la même empreinte
+            new_ids_by_hash = dict(zip(file_hashes, photo_ids))
+            for dup in duplicate_photos:
+                if dup["photo_id"] is None:
+                    dup["photo_id"] = new_ids_by_hash.get(dup["sha256"]) or (concurrent.get(dup["sha256"]) or {}).get("photo_id")
+            counts = match_counts(db, [dup["photo_id"] for dup in duplicate_photos])
+            for dup in duplicate_photos:
+                dup["matches"] = counts.get(dup["photo_id"], 0)
+
+            # 3. Upload S3 concurrent (pool borné): latence = fichier le plus lent
+            _t_s3_start = time.perf_counter()
+            s3_service.client  # créer le client boto3 ici (création non thread-safe), partagé ensuite
+            s3_results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        _S3_UPLOAD_POOL, _upload_file_to_s3, s3_service, file, event_id, photo_id
                     )
-                    _t_s3 = time.perf_counter()
-                    print(f"[UPLOAD] batch={batch_id} file={file.filename!r} photo_id={photo.id} t_s3_upload_ms={int((_t_s3 - _t_db) * 1000)}")
-
-                    # 4. Mettre à jour la photo avec la clé S3
-                    photo.s3_key = s3_key
-                    db.commit()
-                    _t_s3_commit = time.perf_counter()
+                    for file, photo_id in zip(pending_files, photo_ids)
+                ),
+                return_exceptions=True,
+            )
+            print(f"[UPLOAD] batch={batch_id} s3_uploads={len(s3_results)} t_s3_upload_ms={int((time.perf_counter() - _t_s3_start) * 1000)}")
+
+            uploaded = []
+            failed_photos: Dict[int, str] = {}
+            for file, photo_id, result in zip(pending_files, photo_ids, s3_results):
+                if isinstance(result, BaseException):
+                    print(f"[UPLOAD] batch={batch_id} file={file.filename!r} photo_id={photo_id} ERROR {type(result).__name__}: {result}")
+                    failed_photos[photo_id] = f"Upload failed: {result}"
+                    failed_uploads.append({"filename": file.filename, "error": str(result)})
+                else:
+                    uploaded.append({"photo_id": photo_id, "event_id": event_id, "s3_key": result, "filename": file.filename})
 
-                    # 5. Envoyer le message SQS
-                    message_id = sqs_service.send_photo_job(
-                        photo_id=photo.id,
-                        event_id=event_id,
-                        s3_key=s3_key
-                    )
-                    _t_sqs = time.perf_counter()
-                    print(f"[UPLOAD] batch={batch_id} file={file.filename!r} photo_id={photo.id} t_sqs_ms={int((_t_sqs - _t_s3_commit) * 1000)} t_file_total_ms={int((_t_sqs - _t0) * 1000)}")
+            # 4. Clés S3 (et échecs S3) enregistrées avant la mise en file
+            _mark_uploaded_photos(db, uploaded, failed_photos, batch_id)
+            failed_photos = {}
 
+            # 5. Mise en file par lots de 10 (send_message_batch)
+            _t_sqs = time.perf_counter()
+            message_ids = sqs_service.send_photo_jobs(uploaded) if uploaded else []
+            for job, message_id in zip(uploaded, message_ids):
+                if message_id:
                     enqueued_jobs.append({
-                        "photo_id": photo.id,
-                        "filename": file.filename,
-                        "s3_key": s3_key,
+                        "photo_id": job["photo_id"],
+                        "filename": job["filename"],
+                        "s3_key": job["s3_key"],
                         "message_id": message_id,
                         "status": "queued"
                     })
-                    
+                else:
+                    failed_photos[job["photo_id"]] = "Upload failed: queue send error"
+                    failed_uploads.append({"filename": job["filename"], "error": "Queue send error"})
+            print(f"[UPLOAD] batch={batch_id} enqueued={len(enqueued_jobs)} t_sqs_ms={int((time.perf_counter() - _t_sqs) * 1000)}")
+
+            # 6. Échecs de mise en file + progression du lot (échecs et doublons) en une transaction
+            if failed_photos or (effective_upload_batch_id and (failed_uploads or duplicate_photos)):
+                try:
+                    _mark_uploaded_photos(db, [], failed_photos, batch_id, commit=False)
+                    if effective_upload_batch_id and (failed_uploads or duplicate_photos):
+                        # Un doublon est déjà traité: compté comme succès du lot
+                        apply_batch_deltas(
+                            db, effective_upload_batch_id,
+                            processed=len(failed_uploads) + len(duplicate_photos),
+                            success=len(duplicate_photos),
+                            error=len(failed_uploads),
+                        )
+                    db.commit()
                 except Exception as e:
-                    print(f"[UPLOAD] batch={batch_id} file={file.filename!r} ERROR {type(e).__name__}: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    
-                    failed_uploads.append({
-                        "filename": file.filename,
-                        "error": str(e)
-                    })
-                    
-                    # Rollback: marquer la photo comme FAILED si elle a été créée
-                    if photo and photo.id:
-                        try:
-                            photo.processing_status = PhotoProcessingStatus.FAILED.value
-                            photo.error_message = f"Upload failed: {str(e)}"
-                            db.commit()
-                        except Exception:
-                            try:
-                                db.rollback()
-                            except Exception:
-                                pass
-        
+                    print(f"[UPLOAD] batch={batch_id} ERROR batch progress {type(e).__name__}: {e}")
+                    try:
+                        db.rollback()
+                    except Exception:
+                        pass
+
             _batch_elapsed_ms = int((time.perf_counter() - _batch_start) * 1000)
-            print(f"[UPLOAD] batch={batch_id} event={event_id} SUMMARY enqueued={len(enqueued_jobs)} failed={len(failed_uploads)} total_size_bytes={_total_size_bytes} t_batch_ms={_batch_elapsed_ms}")
+            print(f"[UPLOAD] batch={batch_id} event={event_id} SUMMARY enqueued={len(enqueued_jobs)} duplicates={len(duplicate_photos)} failed={len(failed_uploads)} total_size_bytes={_total_size_bytes} t_batch_ms={_batch_elapsed_ms}")
 
             response = {
                 "message": f"{len(enqueued_jobs)} photos en queue pour traitement (S3+SQS)",
                 "workflow": "s3_sqs",
                 "enqueued": len(enqueued_jobs),
                 "failed": len(failed_uploads),
+                "duplicates": len(duplicate_photos),
                 "jobs": enqueued_jobs,
             }
             
             if failed_uploads:
                 response["failed_uploads"] = failed_uploads
+            if duplicate_photos:
+                response["duplicate_photos"] = duplicate_photos
 
             consumed_quota = len(enqueued_jobs)
 
@@ -7583,6 +8091,306 @@ async def upload_photos_to_event(
             )
         raise
 
+@app.post("/api/photographer/events/{event_id}/upload-photos-stream")
+async def upload_photos_to_event_stream(
+    event_id: int,
+    request: Request,
+    file_count: int,
+    upload_batch_id: Optional[str] = None,
+    total_photos: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Upload de photos en flux (workflow S3 + SQS).
+
+    Le corps multipart/form-data est lu au fil de l'eau: chaque fichier est identifié par
+    sa signature, haché (SHA-256) et envoyé vers S3 par parts (multipart upload) pendant
+    sa réception. Ni fichier temporaire, ni fichier entier en mémoire: une part au plus
+    (UPLOAD_STREAM_PART_SIZE_MB) par requête.
+
+    file_count: nombre de fichiers envoyés, réservé sur le quota en une fois (all-or-nothing);
+    les fichiers au-delà sont refusés et le quota non consommé est recrédité.
+    """
+    from models import PhotoProcessingStatus
+    from streaming_upload import MultipartStream, S3StreamingWriter, sniff_image_type, SNIFF_BYTES
+    from upload_batch_progress import reserve_batch_total, apply_batch_deltas
+    from photo_dedup import find_existing_photos, match_counts, release_failed_hashes, is_duplicate_hash_error
+
+    if current_user.user_type not in (UserType.PHOTOGRAPHER, UserType.ADMIN):
+        raise HTTPException(status_code=403, detail="Accès réservé")
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Événement non trouvé")
+    if current_user.user_type == UserType.PHOTOGRAPHER and event.photographer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Vous n'êtes pas propriétaire de cet événement")
+    effective_photographer_id = current_user.id if current_user.user_type == UserType.PHOTOGRAPHER else event.photographer_id
+    if not effective_photographer_id:
+        raise _missing_photographer_quota_subject_response(event_id)
+    effective_photographer_id = int(effective_photographer_id)
+
+    if not settings.is_sqs_configured:
+        raise HTTPException(
+            status_code=400,
+            detail="Upload en flux indisponible (S3/SQS non configuré): utiliser /upload-photos",
+        )
+    if not (request.headers.get("content-type") or "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Corps multipart/form-data attendu")
+    if file_count <= 0:
+        raise HTTPException(status_code=400, detail="Aucun fichier annoncé")
+
+    effective_upload_batch_id = (upload_batch_id or "").strip() or None
+    if effective_upload_batch_id:
+        _ensure_upload_batch(
+            db, effective_upload_batch_id, event_id, effective_photographer_id, max(0, int(total_photos or 0))
+        )
+
+    reserved_quota = int(file_count)
+    if not _reserve_photographer_photo_quota(db, effective_photographer_id, reserved_quota):
+        current_quota = _get_photographer_photo_quota(db, effective_photographer_id)
+        raise _insufficient_quota_response(effective_photographer_id, reserved_quota, current_quota)
+    print(f"[QUOTA] upload-photos-stream event={event_id} photographer={effective_photographer_id} reserved={reserved_quota}")
+
+    from s3_service import get_s3_service, get_sqs_service
+    s3_service = get_s3_service()
+    sqs_service = get_sqs_service()
+    s3_client = s3_service.client
+    loop = asyncio.get_running_loop()
+
+    batch_id = str(uuid.uuid4())[:8]
+    _batch_start = time.perf_counter()
+    uploaded: List[Dict[str, Any]] = []
+    failed_uploads: List[Dict[str, Any]] = []
+    failed_photos: Dict[int, str] = {}
+    enqueued_jobs: List[Dict[str, Any]] = []
+    duplicate_photos: List[Dict[str, Any]] = []
+    stream_hashes: Dict[str, int] = {}
+    consumed_quota = 0
+    files_seen = 0
+    current: Optional[Dict[str, Any]] = None
+
+    def _fail(item: Dict[str, Any], error: str):
+        if item.get("writer") is not None:
+            item["writer"].abort()
+        item["error"] = item.get("error") or error
+
+    async def _start_file(item: Dict[str, Any]):
+        header = bytes(item["header"])
+        if not header:
+            return _fail(item, "Empty file")
+        detected = sniff_image_type(header)
+        if detected is None:
+            return _fail(item, "Unsupported image format")
+        content_type, extension = detected
+        photo = Photo(
+            filename=f"{uuid.uuid4()}.jpg",
+            original_filename=item["filename"],
+            content_type=content_type,
+            photo_type="uploaded",
+            photographer_id=effective_photographer_id,
+            event_id=event_id,
+            upload_batch_id=effective_upload_batch_id,
+            processing_status=PhotoProcessingStatus.PENDING.value,
+        )
+        db.add(photo)
+        db.commit()
+        item["photo_id"] = photo.id
+        item["s3_key"] = s3_service.generate_s3_key(event_id, photo.id, extension)
+        item["writer"] = S3StreamingWriter(
+            s3_client, settings.PHOTO_BUCKET_NAME, item["s3_key"], content_type=content_type
+        )
+        if item["writer"].write(header):
+            await loop.run_in_executor(_S3_UPLOAD_POOL, item["writer"].flush)
+
+    async def _end_file(item: Dict[str, Any]):
+        if not item["error"] and item["writer"] is None:
+            await _start_file(item)
+        if not item["error"]:
+            result = await loop.run_in_executor(_S3_UPLOAD_POOL, item["writer"].complete)
+            print(f"[UPLOAD] batch={batch_id} file={item['filename']!r} photo_id={item['photo_id']} streamed size_bytes={result['size']} parts={result['parts']}")
+            # Empreinte connue en fin de flux: un doublon est retiré avant toute mise en file
+            digest = result["sha256"]
+            existing_id = stream_hashes.get(digest)
+            if existing_id is None:
+                existing = find_existing_photos(db, event_id, [digest])
+                existing_id = existing[digest]["photo_id"] if digest in existing else None
+            if existing_id is None:
+                # Réserver l'empreinte tout de suite: l'index unique départage les uploads concurrents
+                try:
+                    release_failed_hashes(db, event_id, [digest])
+                    db.query(Photo).filter(Photo.id == item["photo_id"]).update(
+                        {Photo.content_sha256: digest}, synchronize_session=False
+                    )
+                    db.commit()
+                except IntegrityError as e:
+                    db.rollback()
+                    if not is_duplicate_hash_error(e):
+                        raise
+                    existing = find_existing_photos(db, event_id, [digest])
+                    existing_id = existing[digest]["photo_id"] if digest in existing else None
+                    if existing_id is None:
+                        raise
+                    print(f"[UPLOAD] batch={batch_id} file={item['filename']!r} concurrent duplicate of photo_id={existing_id}")
+            if existing_id is not None:
+                await loop.run_in_executor(_S3_UPLOAD_POOL, s3_service.delete_photo, item["s3_key"])
+                db.query(Photo).filter(Photo.id == item["photo_id"]).delete(synchronize_session=False)
+                db.commit()
+                duplicate_photos.append({"filename": item["filename"], "sha256": digest, "photo_id": existing_id})
+                return
+            stream_hashes[digest] = item["photo_id"]
+            uploaded.append({
+                "photo_id": item["photo_id"],
+                "event_id": event_id,
+                "s3_key": item["s3_key"],
+                "filename": item["filename"],
+                "sha256": result["sha256"],
+            })
+            return
+        failed_uploads.append({"filename": item["filename"], "error": item["error"]})
+        if item.get("photo_id"):
+            failed_photos[item["photo_id"]] = f"Upload failed: {item['error']}"
+
+    async def _handle(event):
+        nonlocal current, files_seen
+        kind = event[0]
+        if kind == "file_start":
+            files_seen += 1
+            current = {"filename": event[2], "header": bytearray(), "writer": None, "photo_id": None, "error": None}
+            if files_seen > reserved_quota:
+                current["error"] = "Fichier non annoncé dans file_count"
+            return
+        if current is None:
+            return
+        try:
+            if kind == "data":
+                if current["error"]:
+                    return
+                if current["writer"] is None:
+                    current["header"].extend(event[1])
+                    if len(current["header"]) >= SNIFF_BYTES:
+                        await _start_file(current)
+                elif current["writer"].write(event[1]):
+                    await loop.run_in_executor(_S3_UPLOAD_POOL, current["writer"].flush)
+            elif kind == "file_end":
+                item, current = current, None
+                await _end_file(item)
+        except Exception as e:
+            print(f"[UPLOAD] batch={batch_id} file={current and current['filename']!r} ERROR {type(e).__name__}: {e}")
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            if kind == "file_end":
+                _fail(item, str(e))
+                failed_uploads.append({"filename": item["filename"], "error": item["error"]})
+                if item.get("photo_id"):
+                    failed_photos[item["photo_id"]] = f"Upload failed: {item['error']}"
+            else:
+                _fail(current, str(e))
+
+    try:
+        if effective_upload_batch_id:
+            try:
+                reserve_batch_total(db, effective_upload_batch_id, reserved_quota)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"[UPLOAD-BATCH] reserve total error batch_id={effective_upload_batch_id}: {e}")
+
+        print(f"[UPLOAD] batch={batch_id} event={event_id} files_announced={reserved_quota} workflow=s3_sqs_stream photographer={effective_photographer_id}")
+        try:
+            stream = MultipartStream(request.headers.get("content-type", ""))
+            async for chunk in request.stream():
+                for event in stream.feed(chunk):
+                    await _handle(event)
+            for event in stream.close():
+                await _handle(event)
+        except Exception as e:
+            # Corps interrompu ou invalide: le fichier en cours est en échec, les précédents sont gardés
+            print(f"[UPLOAD] batch={batch_id} ERROR stream {type(e).__name__}: {e}")
+            if current is not None:
+                _fail(current, f"Upload interrupted: {e}")
+                failed_uploads.append({"filename": current["filename"], "error": current["error"]})
+                if current.get("photo_id"):
+                    failed_photos[current["photo_id"]] = f"Upload failed: {current['error']}"
+                current = None
+
+        # Clés S3 enregistrées avant la mise en file, puis envoi par lots de 10
+        _mark_uploaded_photos(db, uploaded, failed_photos, batch_id)
+        failed_photos = {}
+        message_ids = sqs_service.send_photo_jobs(uploaded) if uploaded else []
+        for job, message_id in zip(uploaded, message_ids):
+            if message_id:
+                enqueued_jobs.append({
+                    "photo_id": job["photo_id"],
+                    "filename": job["filename"],
+                    "s3_key": job["s3_key"],
+                    "sha256": job["sha256"],
+                    "message_id": message_id,
+                    "status": "queued"
+                })
+            else:
+                failed_photos[job["photo_id"]] = "Upload failed: queue send error"
+                failed_uploads.append({"filename": job["filename"], "error": "Queue send error"})
+        consumed_quota = len(enqueued_jobs)
+
+        # Échecs + fichiers annoncés mais jamais reçus: comptés en erreur dans le lot
+        # (les doublons, déjà traités, comptent comme succès)
+        missing = max(0, reserved_quota - files_seen)
+        extra = max(0, files_seen - reserved_quota)  # refusés, hors total du lot
+        batch_errors = len(failed_uploads) - extra + missing
+        if failed_photos or (effective_upload_batch_id and (batch_errors or duplicate_photos)):
+            try:
+                _mark_uploaded_photos(db, [], failed_photos, batch_id, commit=False)
+                if effective_upload_batch_id and (batch_errors or duplicate_photos):
+                    apply_batch_deltas(
+                        db, effective_upload_batch_id,
+                        processed=batch_errors + len(duplicate_photos),
+                        success=len(duplicate_photos),
+                        error=batch_errors,
+                    )
+                db.commit()
+            except Exception as e:
+                print(f"[UPLOAD] batch={batch_id} ERROR batch progress {type(e).__name__}: {e}")
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+
+        _batch_elapsed_ms = int((time.perf_counter() - _batch_start) * 1000)
+        print(f"[UPLOAD] batch={batch_id} event={event_id} SUMMARY enqueued={len(enqueued_jobs)} failed={len(failed_uploads)} missing={missing} t_batch_ms={_batch_elapsed_ms}")
+    finally:
+        unused_quota = reserved_quota - consumed_quota
+        if unused_quota > 0:
+            _release_photographer_photo_quota(db, effective_photographer_id, unused_quota)
+            print(
+                f"[QUOTA] upload-photos-stream event={event_id} photographer={effective_photographer_id} "
+                f"reserved={reserved_quota} consumed={consumed_quota} released_unused={unused_quota}"
+            )
+
+    current_quota_after = _get_photographer_photo_quota(db, effective_photographer_id)
+    response = {
+        "message": f"{len(enqueued_jobs)} photos en queue pour traitement (S3+SQS, flux)",
+        "workflow": "s3_sqs_stream",
+        "enqueued": len(enqueued_jobs),
+        "failed": len(failed_uploads),
+        "duplicates": len(duplicate_photos),
+        "jobs": enqueued_jobs,
+        "photos_remaining": current_quota_after,
+        "quota": {
+            "reserved": reserved_quota,
+            "consumed": consumed_quota,
+            "photos_remaining": current_quota_after,
+        },
+    }
+    if failed_uploads:
+        response["failed_uploads"] = failed_uploads
+    if duplicate_photos:
+        counts = match_counts(db, [dup["photo_id"] for dup in duplicate_photos])
+        for dup in duplicate_photos:
+            dup["matches"] = counts.get(dup["photo_id"], 0)
+        response["duplicate_photos"] = duplicate_photos
+    return response
+
 @app.post("/api/photographer/events/{event_id}/upload-photos-async")
 async def upload_photos_to_event_async(
     event_id: int,
@@ -7633,19 +8441,14 @@ async def upload_photos_to_event_async(
     temp_files: List[Dict[str, str]] = []
     try:
         # Créer un job
-        job_id = str(uuid.uuid4())
-        UPLOAD_JOBS[job_id] = {
-            "id": job_id,
-            "event_id": event_id,
-            "photographer_id": current_user.id,
-            "status": "pending",
-            "total": reserved_quota,
-            "processed": 0,
-            "failed": 0,
-            "errors": [],
-            "started_at": time.time(),
-            "finished_at": None,
-        }
+        job_id = job_registry.create(
+            "upload",
+            f"photographer:{current_user.id}",
+            user_id=current_user.id,
+            event_id=event_id,
+            total=reserved_quota,
+            supersede=False,
+        )
 
         # Sauvegarder temporairement tous les fichiers pour détacher le job de la requête HTTP
         for f in image_files_async:
@@ -7666,10 +8469,8 @@ async def upload_photos_to_event_async(
         raise
 
     def _process_job(job_key: str, event_id_local: int, photographer_id_local: int, temp_files_local: List[Dict[str, str]]):
-        job = UPLOAD_JOBS.get(job_key)
-        if not job:
+        if not job_registry.start(job_key):
             return
-        job["status"] = "running"
         # Sous-batches automatiques
         SUB_BATCH_SIZE = int(os.environ.get("UPLOAD_SUB_BATCH_SIZE", "25"))
         try:
@@ -7680,20 +8481,20 @@ async def upload_photos_to_event_async(
                     if hasattr(face_recognizer, 'prepare_event_for_batch'):
                         face_recognizer.prepare_event_for_batch(event_id_local, _db)
                 except Exception as _e:
-                    job["errors"].append(f"prepare_event_for_batch: {_e}")
+                    job_registry.append_error(job_key, f"prepare_event_for_batch: {_e}")
 
                 from aws_metrics import aws_metrics as _m
                 with _m.action_context(f"upload_event_async:{event_id_local}"):
                     for i in range(0, len(temp_files_local), SUB_BATCH_SIZE):
                         sub = temp_files_local[i:i+SUB_BATCH_SIZE]
                         for item in sub:
+                            _failed, _error = 0, None
                             try:
                                 photo = face_recognizer.process_and_save_photo_for_event(
                                     item["path"], item["original"], photographer_id_local, event_id_local, _db
                                 )
                             except Exception as e:
-                                job["failed"] += 1
-                                job["errors"].append(f"{item['original']}: {e}")
+                                _failed, _error = 1, f"{item['original']}: {e}"
                             finally:
                                 try:
                                     if os.path.exists(item["path"]):
@@ -7705,7 +8506,7 @@ async def upload_photos_to_event_async(
                                     _gc.collect()
                                 except Exception:
                                     pass
-                            job["processed"] += 1
+                            job_registry.increment(job_key, processed=1, failed=_failed, error=_error)
                         # Optionnel: lancer un rematch léger après chaque sous-batch
                         # (désactivé) Pas de rematch automatique à la fin du sous-batch async
             finally:
@@ -7713,12 +8514,10 @@ async def upload_photos_to_event_async(
                     _db.close()
                 except Exception:
                     pass
-            job["status"] = "done"
-            job["finished_at"] = time.time()
+            job_registry.finish(job_key, "done")
         except Exception as e:
-            job["status"] = "error"
-            job["errors"].append(str(e))
-            job["finished_at"] = time.time()
+            job_registry.append_error(job_key, str(e))
+            job_registry.finish(job_key, "error", error=str(e))
 
     if background_tasks is not None:
         background_tasks.add_task(_process_job, job_id, event_id, current_user.id, temp_files)
@@ -7741,14 +8540,142 @@ async def upload_photos_to_event_async(
 
 @app.get("/api/upload-jobs/{job_id}/status")
 async def get_upload_job_status(job_id: str, current_user: User = Depends(get_current_user)):
-    job = UPLOAD_JOBS.get(job_id)
-    if not job:
+    job = job_registry.get(job_id)
+    if not job or job.get("kind") != "upload":
         raise HTTPException(status_code=404, detail="Job introuvable")
+    job["photographer_id"] = job.get("user_id")
     # Autorisation: admin ou propriétaire
     if current_user.user_type != UserType.ADMIN and job.get("photographer_id") != current_user.id:
         raise HTTPException(status_code=403, detail="Accès refusé")
     return job
 
+
+def _sse_format(message: Dict[str, Any]) -> str:
+    payload = json.dumps({"topic": message.get("topic"), "ts": message.get("ts"), **(message.get("data") or {})}, default=str)
+    return f"event: {message.get('type') or 'message'}\ndata: {payload}\n\n"
+
+
+def _event_stream_user(raw_token: str, purpose: Optional[str] = None):
+    """
+    Authentifie un flux (SSE, export ZIP): JWT de session de l'en-tête, ou jeton d'URL
+    émis pour `purpose`. Session courte, aucune connexion DB gardée pendant le flux.
+    """
+    from auth import verify_token, verify_url_token
+    _db = SessionLocal()
+    try:
+        if purpose is None:
+            user = verify_token(raw_token, _db)
+        else:
+            user_id = verify_url_token(raw_token, purpose)
+            user = _db.query(User).filter(User.id == user_id).first()
+            if user is None:
+                raise HTTPException(status_code=401, detail="Could not validate credentials")
+        if not user.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+        return user.id, user.user_type
+    finally:
+        _db.close()
+
+
+async def _stream_request_user(request: Request, token: Optional[str], purpose: str):
+    """
+    (user_id, user_type) d'une requête de flux: en-tête Authorization (JWT de session), sinon
+    paramètre `token`, qui doit être un jeton d'URL émis pour cet usage (POST /api/url-tokens).
+    Le JWT de session n'est jamais accepté dans l'URL (historique, logs, Referer).
+    """
+    auth_header = request.headers.get("authorization") or ""
+    if auth_header.startswith("Bearer "):
+        return await asyncio.to_thread(_event_stream_user, auth_header.split(" ", 1)[1])
+    if not token:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return await asyncio.to_thread(_event_stream_user, token, purpose)
+
+
+def _photos_zip_purpose(scope: str, event_id: int) -> str:
+    return f"photos_zip:{scope}:{int(event_id)}"
+
+
+@app.post("/api/url-tokens", response_model=UrlToken)
+async def create_url_token_endpoint(
+    payload: UrlTokenRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Jeton court (URL_TOKEN_TTL_SECONDS) pour une URL qui ne peut pas porter d'en-tête
+    Authorization: flux SSE (purpose=event_stream, `?token=` de /api/events/stream) ou lien
+    de téléchargement ZIP d'un événement (purpose=photos_zip, event_id, scope user|event).
+    Le jeton n'est valable que pour cet usage; les droits sur l'événement sont vérifiés
+    par le téléchargement lui-même.
+    """
+    from auth import create_url_token
+    if payload.purpose == "photos_zip":
+        if payload.event_id is None:
+            raise HTTPException(status_code=400, detail="event_id requis pour photos_zip")
+        purpose = _photos_zip_purpose(payload.scope, payload.event_id)
+    else:
+        purpose = "event_stream"
+    ttl = max(10, int(settings.URL_TOKEN_TTL_SECONDS or 120))
+    return {"token": create_url_token(current_user.id, purpose, ttl), "expires_in": ttl}
+
+
+@app.get("/api/events/stream")
+async def stream_events(request: Request, token: Optional[str] = None, job_id: Optional[str] = None):
+    """
+    Flux Server-Sent Events: progression des jobs (rematch selfie, uploads), des lots
+    d'upload et nouvelles photos matchées. Remplace le polling de /api/rematch-status et
+    /api/upload-jobs/{job_id}/status (toujours disponibles en fallback).
+
+    EventSource ne pouvant pas envoyer d'en-tête Authorization, le paramètre `token` accepte
+    un jeton d'URL court (POST /api/url-tokens, purpose=event_stream), vérifié à l'ouverture
+    du flux; l'en-tête reste prioritaire s'il est présent.
+    """
+    user_id, user_type = await _stream_request_user(request, token, "event_stream")
+
+    topics = [user_topic(user_id)]
+    if user_type == UserType.PHOTOGRAPHER:
+        topics.append(photographer_topic(user_id))
+    if job_id:
+        job = await asyncio.to_thread(job_registry.get, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job introuvable")
+        if user_type != UserType.ADMIN and job.get("user_id") != user_id:
+            raise HTTPException(status_code=403, detail="Accès refusé")
+        topics.append(job_topic(job_id))
+
+    heartbeat = max(1, int(settings.EVENT_STREAM_HEARTBEAT_SECONDS or 15))
+
+    async def _stream():
+        # Abonnement avant l'état initial: aucun événement perdu entre les deux
+        sub = event_bus.subscribe(topics)
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            snapshots = []
+            if job_id:
+                snapshots.append(await asyncio.to_thread(job_registry.get, job_id))
+            if user_type == UserType.USER:
+                snapshots.append(await asyncio.to_thread(
+                    job_registry.latest, "selfie_rematch", f"user:{user_id}"
+                ))
+            for snapshot in snapshots:
+                if snapshot:
+                    yield _sse_format({"topic": job_topic(snapshot["id"]), "type": "job", "data": snapshot, "ts": time.time()})
+            while True:
+                if await request.is_disconnected():
+                    break
+                message = await sub.get(timeout=heartbeat)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_format(message)
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/user/events")
 async def get_user_events(
     current_user: User = Depends(get_current_user),
@@ -7837,6 +8764,108 @@ async def get_user_event_photos(
     return result
 
 
+def _zip_slug(name: str) -> str:
+    import unicodedata
+    ascii_name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^A-Za-z0-9]+", "-", ascii_name).strip("-").lower()[:60] or "evenement"
+
+
+def _build_event_zip(user_id: int, user_type, event_id: int, scope: str):
+    """
+    Archive, nombre de photos exclues et nom de fichier de l'export (bloquant, session
+    dédiée). 403/404 si non autorisé, 503 + Retry-After pendant le calcul des sommes.
+    """
+    from photo_export import EXPORT_RETRY_AFTER_SECONDS, ExportNotReady, build_photo_archive
+    db = SessionLocal()
+    try:
+        event = db.query(Event).filter(Event.id == event_id).first()
+        if not event:
+            raise HTTPException(status_code=404, detail="Événement non trouvé")
+        query = db.query(Photo).filter(Photo.event_id == event_id)
+        if scope == "user":
+            if user_type != UserType.USER:
+                raise HTTPException(status_code=403, detail="Seuls les utilisateurs peuvent accéder à cette route")
+            registered = db.query(UserEvent).filter(
+                UserEvent.user_id == user_id, UserEvent.event_id == event_id
+            ).first()
+            if not registered:
+                raise HTTPException(status_code=403, detail="Vous n'êtes pas inscrit à cet événement")
+            query = query.filter(Photo.id.in_(db.query(FaceMatch.photo_id).filter(FaceMatch.user_id == user_id)))
+            filename = f"{_zip_slug(event.name)}-mes-photos.zip"
+        else:
+            if user_type != UserType.ADMIN and not (
+                user_type == UserType.PHOTOGRAPHER and event.photographer_id == user_id
+            ):
+                raise HTTPException(status_code=404, detail="Événement non trouvé")
+            filename = f"{_zip_slug(event.name)}-photos.zip"
+        try:
+            archive, etag, excluded = build_photo_archive(db, query)
+        except ExportNotReady as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Export en préparation ({e.pending} photos en cours d'indexation), réessayez plus tard",
+                headers={"Retry-After": str(EXPORT_RETRY_AFTER_SECONDS)},
+            )
+        return archive, etag, excluded, filename
+    finally:
+        db.close()
+
+
+async def _event_zip_response(request: Request, token: Optional[str], event_id: int, scope: str):
+    """
+    Réponse ZIP en flux (stored, sans compression): Content-Length connu d'avance,
+    reprise via Range/If-Range sur l'ETag de l'archive, mémoire constante.
+    """
+    from photo_export import read_photo_slice
+    user_id, user_type = await _stream_request_user(request, token, _photos_zip_purpose(scope, event_id))
+    archive, etag, excluded, filename = await asyncio.to_thread(_build_event_zip, user_id, user_type, event_id, scope)
+    
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        # Photos sans données lisibles, absentes de l'archive
+        "X-Export-Excluded-Photos": str(excluded),
+    }
+    print(f"[PhotoExport] event_id={event_id} scope={scope} user_id={user_id} "
+          f"entries={len(archive.entries)} excluded={excluded} size={archive.size} range={request.headers.get('Range')}")
+    return range_response(
+        request, archive.size, "application/zip", headers,
+        lambda start, end: archive.iter_range(start, end, read_photo_slice),
+    )
+
+
+@app.get("/api/user/events/{event_id}/photos.zip")
+async def download_user_event_photos_zip(
+    event_id: int,
+    request: Request,
+    token: Optional[str] = None
+):
+    """
+    Archive ZIP des photos où l'utilisateur apparaît, produite en flux.
+    
+    Lien de téléchargement direct du navigateur: paramètre `token` = jeton d'URL
+    (POST /api/url-tokens, purpose=photos_zip, scope=user); l'en-tête Authorization reste
+    prioritaire. Range pris en charge (un nouveau jeton est nécessaire après expiration).
+    """
+    return await _event_zip_response(request, token, event_id, "user")
+
+
+@app.get("/api/photographer/events/{event_id}/photos.zip")
+async def download_event_photos_zip(
+    event_id: int,
+    request: Request,
+    token: Optional[str] = None
+):
+    """
+    Archive ZIP de toutes les photos de l'événement (photographe propriétaire ou admin), en
+    flux. `token`: jeton d'URL (purpose=photos_zip, scope=event) pour un lien direct.
+    """
+    return await _event_zip_response(request, token, event_id, "event")
+
+
 @app.get("/api/user/events/{event_id}/all-photos")
 async def get_all_event_photos(
     event_id: int,
@@ -8089,7 +9118,7 @@ async def admin_debug_user_matching(
     for p in sample_photos:
         tried += 1
         # Préparer bytes originaux (meilleure qualité)
-        photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else p.photo_data
+        photo_input = p.file_path if (p.file_path and os.path.exists(p.file_path)) else read_photo_bytes(p)
         if not photo_input:
             continue
         try:
@@ -8451,7 +9480,8 @@ async def register_complete(
 
     # ── 8. Lancement du matching asynchrone en arrière-plan ───────────────────
     try:
-        _MATCHING_THREAD_POOL.submit(_rematch_selfie_background_only, db_user.id, compressed_data)
+        rematch_job_id = job_registry.create("selfie_rematch", f"user:{db_user.id}", user_id=db_user.id)
+        _MATCHING_THREAD_POOL.submit(INTERACTIVE, _rematch_selfie_background_only, db_user.id, compressed_data, rematch_job_id)
         logger.info(f"[register-complete] req_id={req_id} matching scheduled for user_id={db_user.id}")
     except Exception as e:
         logger.warning(f"[register-complete] req_id={req_id} could not schedule matching: {e}")
@@ -8553,6 +9583,7 @@ async def delete_event(
     
     # Supprimer les photos associ+�es +� cet +�v+�nement
     photos = db.query(Photo).filter(Photo.event_id == event_id).all()
+    blob_keys = photo_blob_keys(db, [photo.id for photo in photos])
     for photo in photos:
         # Supprimer le fichier physique
         try:
@@ -8571,6 +9602,7 @@ async def delete_event(
     # Supprimer l'+�v+�nement
     db.delete(event)
     db.commit()
+    delete_unreferenced(db, blob_keys)
     return {"message": "+�v+�nement supprim+� avec succ+�s"}
 
 @app.put("/api/admin/events/{event_id}")
@@ -8631,6 +9663,7 @@ async def admin_delete_event(
     
     # Supprimer toutes les photos associ+�es +� cet +�v+�nement
     photos = db.query(Photo).filter(Photo.event_id == event_id).all()
+    blob_keys = photo_blob_keys(db, [photo.id for photo in photos])
     for photo in photos:
         # Supprimer les correspondances de visages
         db.query(FaceMatch).filter(FaceMatch.photo_id == photo.id).delete()
@@ -8646,6 +9679,7 @@ async def admin_delete_event(
     # Supprimer l'+�v+�nement
     db.delete(event)
     db.commit()
+    delete_unreferenced(db, blob_keys)
     
     return {"message": "+�v+�nement supprim+� avec succ+�s"}
 
@@ -8681,6 +9715,8 @@ async def get_photo_optimization_stats(
     if current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Seuls les admins peuvent accéder aux statistiques")
     
+    from photo_variants import variant_stats
+    
     # Récupérer toutes les photos avec métadonnées d'optimisation
     photos = db.query(Photo).filter(
         Photo.original_size.isnot(None),
@@ -8695,7 +9731,10 @@ async def get_photo_optimization_stats(
             "total_space_saved_mb": 0,
             "average_compression_ratio": 0,
             "photos_by_quality": {},
-            "expired_photos_count": 0
+            "expired_photos_count": 0,
+            "format_variants": variant_stats(db),
+            "photo_cache": photo_cache.stats(),
+            "delivery": photo_delivery.stats()
         }
     
     # Calculer les statistiques
@@ -8725,7 +9764,47 @@ async def get_photo_optimization_stats(
         "total_space_saved_mb": stats['space_saved_mb'],
         "average_compression_ratio": stats['average_compression_ratio'],
         "photos_by_quality": quality_stats,
-        "expired_photos_count": expired_count
+        "expired_photos_count": expired_count,
+        # Tailles WebP/AVIF vs JPEG et octets économisés en sortie (processus courant)
+        "format_variants": variant_stats(db),
+        # Cache /api/photo/{id} du processus courant (hits mémoire/disque, coalescences)
+        "photo_cache": photo_cache.stats(),
+        # Mode de diffusion (proxy / presigned / cdn) et redirections émises
+        "delivery": photo_delivery.stats()
+    }
+
+@app.get("/api/admin/blob-migration/status")
+async def get_blob_migration_status(
+    current_user: User = Depends(get_current_user)
+):
+    """État de la migration des binaires photo vers le blob store (admin uniquement)"""
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Seuls les admins peuvent accéder à cette fonctionnalité")
+    
+    from blob_migration import blob_migration
+    store = get_blob_store()
+    return {
+        "backend": store.backend if store is not None else "db",
+        "pending": blob_migration.pending_counts(),
+        "job": blob_migration.status(),
+    }
+
+@app.post("/api/admin/blob-migration/start")
+async def start_blob_migration(
+    current_user: User = Depends(get_current_user)
+):
+    """Démarrer (ou reprendre) la migration des binaires photo vers le blob store (admin uniquement)"""
+    if current_user.user_type != UserType.ADMIN:
+        raise HTTPException(status_code=403, detail="Seuls les admins peuvent accéder à cette fonctionnalité")
+    if get_blob_store() is None:
+        raise HTTPException(status_code=400, detail="Aucun blob store configuré (BLOB_STORE_BACKEND=db)")
+    
+    from blob_migration import blob_migration
+    job_id = blob_migration.start()
+    return {
+        "job_id": job_id,
+        "started": job_id is not None,
+        "pending": blob_migration.pending_counts(),
     }
 
 @app.get("/api/admin/photo-optimization/estimate")
@@ -8778,8 +9857,11 @@ async def cleanup_expired_photos(
     
     deleted_count = 0
     space_freed = 0
+    blob_keys = photo_blob_keys(db, [photo.id for photo in expired_photos])
     
     try:
+        from perceptual_hash import detach_near_duplicates, reanalyze_photos_async
+        detached = detach_near_duplicates(db, [photo.id for photo in expired_photos])
         for photo in expired_photos:
             # Calculer l'espace libéré
             if photo.compressed_size:
@@ -8793,6 +9875,8 @@ async def cleanup_expired_photos(
             deleted_count += 1
         
         db.commit()
+        delete_unreferenced(db, blob_keys)
+        reanalyze_photos_async(detached)
         
         return {
             "message": f"{deleted_count} photos expirées supprimées avec succès",
@@ -9225,6 +10309,31 @@ async def get_queue_stats(
     except Exception as e:
         result["sqs_worker"] = {"error": str(e)}
     
+    # Profondeur de la file photo (SQS ou SQLite local) et DLQ locale
+    if settings.is_sqs_configured:
+        try:
+            from job_queue import get_job_queue
+            result["job_queue"] = get_job_queue("photo").stats()
+        except Exception as e:
+            result["job_queue"] = {"error": str(e)}
+    
+    # Limiteurs par classe de priorité (interactive / bulk / maintenance)
+    try:
+        from aws_face_recognizer import _rekognition_limiter
+        result["priority"] = {
+            "rekognition": _rekognition_limiter.stats(),
+            "matching": _MATCHING_SEMAPHORE.stats(),
+            "matching_pool": _MATCHING_THREAD_POOL.stats(),
+        }
+    except Exception as e:
+        result["priority"] = {"error": str(e)}
+    
+    # Bus d'événements (flux SSE)
+    try:
+        result["event_bus"] = event_bus.stats()
+    except Exception as e:
+        result["event_bus"] = {"error": str(e)}
+    
     # Stats de la queue legacy
     try:
         from photo_queue import get_photo_queue
@@ -9466,13 +10575,14 @@ async def clear_cache(
     if current_user.user_type != UserType.ADMIN:
         raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
     
-    from response_cache import user_photos_cache, event_cache, user_cache
+    from response_cache import user_photos_cache, event_cache, user_cache, rekognition_search_cache
     
     user_photos_cache.clear()
     event_cache.clear()
     user_cache.clear()
+    rekognition_search_cache.clear()
     
     return {
         "message": "Caches vidés avec succès",
-        "cleared": ["user_photos_cache", "event_cache", "user_cache"]
+        "cleared": ["user_photos_cache", "event_cache", "user_cache", "rekognition_search_cache"]
         }
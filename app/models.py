@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Table, LargeBinary, Float, Index, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, DateTime, Boolean, Table, LargeBinary, Float, Index, Text, text
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from database import Base
 import enum
@@ -35,6 +35,8 @@ class Event(Base):
     date = Column(DateTime(timezone=True), nullable=True)
     photographer_id = Column(Integer, ForeignKey("users.id"))
     email_featured_photo_id = Column(Integer, nullable=True)
+    # Surcharge JSON du filtre qualité visage avant IndexFaces (null = défauts env)
+    face_quality_gate = Column(Text, nullable=True)
 
     photographer = relationship("User", foreign_keys=[photographer_id], back_populates="events")
     photos = relationship("Photo", back_populates="event")
@@ -111,6 +113,19 @@ class Photo(Base):
     original_filename = Column(String)
     file_path = Column(String, nullable=True)  # Gardé pour compatibilité
     photo_data = Column(LargeBinary, nullable=True)  # Données binaires de la photo
+    # Déclinaisons JPEG pour les galeries (/api/photo/{id}?size=thumbnail|preview),
+    # chargées uniquement à la demande
+    thumbnail_data = deferred(Column(LargeBinary, nullable=True))
+    preview_data = deferred(Column(LargeBinary, nullable=True))
+    # Clés (SHA-256) des binaires dans le blob store: remplacent photo_data / thumbnail_data /
+    # preview_data, vidées une fois le blob écrit (voir blob_store.py)
+    blob_key = Column(String(64), nullable=True, index=True)
+    thumbnail_blob_key = Column(String(64), nullable=True, index=True)
+    preview_blob_key = Column(String(64), nullable=True, index=True)
+    # Taille et CRC-32 de la photo optimisée: disposition déterministe des exports ZIP
+    # (optimized_size = -1: données illisibles, photo exclue des exports; voir blob_migration.py)
+    optimized_size = Column(Integer, nullable=True)
+    optimized_crc32 = Column(BigInteger, nullable=True)
     content_type = Column(String, default="image/jpeg")  # Type MIME de l'image
     photo_type = Column(String)  # 'group', 'selfie', 'uploaded'
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -141,11 +156,26 @@ class Photo(Base):
     show_in_general = Column(Boolean, nullable=True, default=None)
     # Indique si la photo a été indexée côté Rekognition
     is_indexed = Column(Boolean, nullable=True, default=False)
+    # Empreinte SHA-256 du fichier uploadé (déduplication par événement)
+    content_sha256 = Column(String(64), nullable=True)
+    # dHash 64 bits (hex) pour la détection des quasi-doublons (rafales, ré-exports)
+    perceptual_hash = Column(String(16), nullable=True)
+    # Dimensions de l'image hashée (orientation appliquée): une source de quasi-doublon doit
+    # avoir le même rapport largeur/hauteur pour que ses boîtes de visages soient réutilisables
+    image_width = Column(Integer, nullable=True)
+    image_height = Column(Integer, nullable=True)
+    # Photo source dont l'analyse (visages, FaceMatch) a été réutilisée, et distance de Hamming
+    near_duplicate_of = Column(Integer, nullable=True, index=True)
+    near_duplicate_distance = Column(Integer, nullable=True)
 
     # Index pour accélérer les filtres courants
     __table_args__ = (
         Index('idx_photos_user', 'user_id'),
         Index('idx_photos_event', 'event_id'),
+        # Une seule photo par contenu et par événement (uploads concurrents du même fichier)
+        Index('uq_photos_event_sha256', 'event_id', 'content_sha256', unique=True,
+              postgresql_where=text('content_sha256 IS NOT NULL'),
+              sqlite_where=text('content_sha256 IS NOT NULL')),
     )
     
     # Relations
@@ -164,6 +194,8 @@ class PhotographerUploadBatch(Base):
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
     photographer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_photos = Column(Integer, nullable=False, default=0)
+    # Fichiers annoncés par les requêtes d'upload du lot (doublons et échecs inclus)
+    reserved_photos = Column(Integer, nullable=False, default=0)
     processed_count = Column(Integer, nullable=False, default=0)
     success_count = Column(Integer, nullable=False, default=0)
     error_count = Column(Integer, nullable=False, default=0)
@@ -242,10 +274,55 @@ class GoogleDriveIntegration(Base):
     photographer = relationship("User")
 
 
+class PhotoHashBand(Base):
+    """Index par événement des dHash: une ligne par bande de 16 bits (4 par photo).
+
+    Deux hashes à distance de Hamming <= 3 partagent au moins une bande (principe des
+    tiroirs): les candidats quasi-doublons sont lus par égalité (event_id, band, value).
+    """
+    __tablename__ = "photo_hash_bands"
+
+    id = Column(Integer, primary_key=True, index=True)
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False, index=True)
+    event_id = Column(Integer, nullable=False)
+    band = Column(Integer, nullable=False)
+    value = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_photo_hash_bands_lookup', 'event_id', 'band', 'value'),
+    )
+
+
+class PhotoVariant(Base):
+    """Déclinaison d'une photo dans un format moderne (WebP/AVIF), encodée au premier accès.
+
+    data et blob_key sont NULL quand l'encodage est plus lourd que le JPEG source: le JPEG est alors servi.
+    """
+    __tablename__ = "photo_variants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False)
+    rendition = Column(String, nullable=False)  # thumbnail | preview | full
+    format = Column(String, nullable=False)  # webp | avif
+    data = Column(LargeBinary, nullable=True)
+    blob_key = Column(String(64), nullable=True, index=True)  # Octets dans le blob store (remplace data)
+    size_bytes = Column(Integer, nullable=True)
+    source_size_bytes = Column(Integer, nullable=True)  # Taille du JPEG équivalent
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('uq_photo_variants_photo_rendition_format', 'photo_id', 'rendition', 'format', unique=True),
+    )
+
+
 class PhotoFace(Base):
     """Tracks FaceIds returned by Rekognition IndexFaces per photo.
 
     Replaces the expensive ListFaces scan to find which FaceIds belong to a photo.
+    Also stores the face bounding box (normalized 0..1 on the original image) and the
+    matched user, so /api/photo/{id}/faces and the admin graph never re-detect faces.
+    Rows from the local/Haar detectors use synthetic face_ids ("local:..."/"haar:...")
+    and are never sent to Rekognition.
     """
     __tablename__ = "photo_faces"
 
@@ -253,11 +330,19 @@ class PhotoFace(Base):
     event_id = Column(Integer, ForeignKey("events.id"), nullable=False, index=True)
     photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False, index=True)
     face_id = Column(String, nullable=False, index=True)
+    box_left = Column(Float, nullable=True)
+    box_top = Column(Float, nullable=True)
+    box_width = Column(Float, nullable=True)
+    box_height = Column(Float, nullable=True)
+    quality = Column(Float, nullable=True)  # Sharpness Rekognition (0..100) si disponible
+    detection_source = Column(String, nullable=True)  # rekognition | local | haar
+    matched_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = (
         Index('uq_photo_faces_photo_face', 'photo_id', 'face_id', unique=True),
         Index('idx_photo_faces_event', 'event_id'),
+        Index('idx_photo_faces_matched_user', 'matched_user_id'),
     )
 
     photo = relationship("Photo")
@@ -394,4 +479,41 @@ class DeleteJob(Base):
         Index('idx_delete_jobs_created', 'created_at'),
     )
     
-    photographer = relationship("User")
\ No newline at end of file
+    photographer = relationship("User")
+
+class BackgroundJob(Base):
+    """
+    Registre partagé (entre workers Gunicorn et instances) des jobs d'arrière-plan:
+    rematch selfie, uploads asynchrones. Le statut est lisible depuis n'importe quel worker.
+
+    Coalescence: un nouveau job pour le même (kind, subject_key) passe les jobs
+    pending/running précédents en "superseded" (cancel_requested=True); un job en cours
+    vérifie cancel_requested entre deux étapes et s'arrête de lui-même.
+    """
+    __tablename__ = "background_jobs"
+
+    # UUID du job (exposé dans l'API)
+    id = Column(String, primary_key=True)
+    # Type de job: selfie_rematch | upload
+    kind = Column(String, nullable=False)
+    # Sujet de coalescence (ex: "user:42")
+    subject_key = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    event_id = Column(Integer, nullable=True)
+    # pending | running | done | error | superseded | disabled
+    status = Column(String, nullable=False, default="pending")
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    matched = Column(Integer, nullable=False, default=0)
+    # Détails libres (JSON): errors, info, error
+    details_json = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('idx_background_jobs_subject', 'kind', 'subject_key', 'status'),
+        Index('idx_background_jobs_created', 'created_at'),
+    )
@@ -0,0 +1,314 @@
+"""
+Détection des quasi-doublons à l'ingestion (hash perceptuel dHash 64 bits).
+
+Les rafales et ré-exports (recadrage léger, recompression, redimensionnement) produisent
+des photos différentes octet par octet (SHA-256 distinct) mais visuellement identiques.
+Pour ces photos, l'analyse de la photo source (visages, correspondances) est réutilisée
+au lieu de rappeler Rekognition (IndexFaces + SearchFaces par visage).
+
+Index (table photo_hash_bands):
+    le dHash est découpé en 4 bandes de 16 bits, une ligne par bande. Deux hashes à
+    distance de Hamming <= 3 partagent au moins une bande identique (principe des
+    tiroirs): les candidats sont lus par égalité (event_id, band, value), puis la
+    distance exacte est calculée en numpy.
+
+Les boîtes des visages étant normalisées (0..1), elles ne restent valables que si l'image a
+le même cadrage: une source n'est retenue que si ses dimensions ont le même rapport
+largeur/hauteur (à ASPECT_TOLERANCE près). Un recadrage proche en dHash est donc analysé.
+
+Une photo réutilisant une analyse:
+    - reçoit photos.near_duplicate_of / near_duplicate_distance
+    - reçoit des copies des PhotoFace de la source (face_id "near:{face_id}",
+      detection_source "near_duplicate": jamais envoyées à Rekognition)
+    - reçoit des copies des FaceMatch de la source (utilisateurs autorisés)
+    - n'est pas indexée dans la collection: le matching selfie l'ajoute quand sa
+      source est retrouvée (expand_near_duplicates)
+
+Suppression d'une source (near_duplicate_of n'a pas de clé étrangère): les chemins de
+suppression appellent detach_near_duplicates avant le commit (visages copiés retirés,
+is_indexed remis à False) puis reanalyze_photos_async après, qui relance l'analyse complète
+des dérivées depuis l'original S3 (à défaut, la photo stockée).
+
+Usage:
+    from perceptual_hash import dhash_from_bytes, find_near_duplicate, record_hash
+
+    phash, size = dhash_and_size(image_bytes)
+    record_hash(db, event_id, photo.id, phash, size)
+    near = find_near_duplicate(db, event_id, photo.id, phash, size)
+    if near:
+        source_id, distance = near
+"""
+
+import threading
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models import FaceMatch, Photo, PhotoFace, PhotoHashBand, PhotoProcessingStatus
+from settings import settings
+
+
+HASH_SIZE = 8
+BAND_COUNT = 4
+BAND_HEX = (HASH_SIZE * HASH_SIZE // 4) // BAND_COUNT
+# Au-delà, trop de sources candidates partagent une bande: la photo est simplement analysée
+MAX_CANDIDATES = 500
+NEAR_FACE_PREFIX = "near:"
+NEAR_DETECTION_SOURCE = "near_duplicate"
+# Écart relatif toléré entre les rapports largeur/hauteur (arrondis d'un redimensionnement)
+ASPECT_TOLERANCE = 0.01
+# Orientations EXIF qui échangent largeur et hauteur
+_EXIF_TRANSPOSED = (5, 6, 7, 8)
+
+
+def max_distance() -> int:
+    """Distance de Hamming maximale acceptée (bornée par le nombre de bandes - 1)."""
+    return max(0, min(int(settings.PHOTO_NEAR_DUP_MAX_DISTANCE or 0), BAND_COUNT - 1))
+
+
+def dhash_hex(img: Image.Image, hash_size: int = HASH_SIZE) -> str:
+    """dHash: pixel gauche > pixel droit sur une vignette (hash_size+1, hash_size) en niveaux de gris."""
+    try:
+        resample = Image.Resampling.LANCZOS  # Pillow >= 9
+    except Exception:
+        resample = Image.LANCZOS  # type: ignore[attr-defined]
+    pixels = np.asarray(img.convert("L").resize((hash_size + 1, hash_size), resample=resample), dtype=np.int16)
+    bits = (pixels[:, :-1] > pixels[:, 1:]).ravel()
+    return np.packbits(bits).tobytes().hex()
+
+
+def dhash_and_size(image_bytes: bytes) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """dHash et dimensions (largeur, hauteur) d'une image encodée, orientation EXIF appliquée.
+
+    (None, None) si l'image est illisible.
+    """
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            width, height = img.size
+            try:
+                if img.getexif().get(0x0112) in _EXIF_TRANSPOSED:
+                    width, height = height, width
+            except Exception:
+                pass
+            img.draft("L", (64, 64))  # JPEG: décodage réduit, suffisant pour une vignette 9x8
+            return dhash_hex(ImageOps.exif_transpose(img)), (int(width), int(height))
+    except Exception as e:
+        print(f"[NearDup] dhash failed: {e}")
+        return None, None
+
+
+def dhash_from_bytes(image_bytes: bytes) -> Optional[str]:
+    """dHash d'une image encodée (orientation EXIF appliquée), None si illisible."""
+    return dhash_and_size(image_bytes)[0]
+
+
+def same_aspect(size: Optional[Tuple[int, int]], width: Optional[int], height: Optional[int]) -> bool:
+    """True si les deux images ont le même rapport largeur/hauteur (boîtes normalisées transposables)."""
+    if not size or not width or not height or not size[0] or not size[1]:
+        return False
+    ratio = (size[0] / size[1]) / (width / height)
+    return abs(ratio - 1.0) <= ASPECT_TOLERANCE
+
+
+def hash_bands(phash: str) -> List[int]:
+    return [int(phash[i * BAND_HEX:(i + 1) * BAND_HEX], 16) for i in range(BAND_COUNT)]
+
+
+def hamming_distances(phash: str, candidates: List[str]) -> np.ndarray:
+    """Distances de Hamming entre un hash et une liste de hashes (vectorisé)."""
+    if not candidates:
+        return np.zeros(0, dtype=np.int64)
+    target = np.frombuffer(bytes.fromhex(phash), dtype=np.uint8)
+    others = np.frombuffer(b"".join(bytes.fromhex(h) for h in candidates), dtype=np.uint8).reshape(-1, len(target))
+    return np.unpackbits(np.bitwise_xor(others, target), axis=1).sum(axis=1)
+
+
+def record_hash(db: Session, event_id: int, photo_id: int, phash: str,
+                size: Optional[Tuple[int, int]] = None) -> None:
+    """Enregistre le hash de la photo, ses dimensions et ses bandes (remplace un enregistrement précédent). Sans commit."""
+    db.query(PhotoHashBand).filter(PhotoHashBand.photo_id == photo_id).delete(synchronize_session=False)
+    db.query(Photo).filter(Photo.id == photo_id).update(
+        {
+            Photo.perceptual_hash: phash,
+            Photo.image_width: size[0] if size else None,
+            Photo.image_height: size[1] if size else None,
+        },
+        synchronize_session=False,
+    )
+    db.add_all([
+        PhotoHashBand(photo_id=photo_id, event_id=event_id, band=band, value=value)
+        for band, value in enumerate(hash_bands(phash))
+    ])
+
+
+def find_near_duplicate(db: Session, event_id: int, photo_id: int, phash: str,
+                        size: Optional[Tuple[int, int]] = None) -> Optional[Tuple[int, int]]:
+    """
+    Photo source la plus proche de l'événement (analysée, elle-même non dérivée, même rapport
+    largeur/hauteur que la photo: sans dimensions connues, aucune source n'est retenue).
+
+    Retourne (source_photo_id, distance) ou None.
+    """
+    if not size:
+        return None
+    limit = max_distance()
+    bands = hash_bands(phash)
+    rows = (
+        db.query(Photo.id, Photo.perceptual_hash, Photo.image_width, Photo.image_height)
+        .join(PhotoHashBand, PhotoHashBand.photo_id == Photo.id)
+        .filter(
+            PhotoHashBand.event_id == event_id,
+            or_(*[and_(PhotoHashBand.band == band, PhotoHashBand.value == value) for band, value in enumerate(bands)]),
+            Photo.id != photo_id,
+            Photo.event_id == event_id,
+            Photo.processing_status == PhotoProcessingStatus.DONE.value,
+            Photo.near_duplicate_of.is_(None),
+            Photo.perceptual_hash.isnot(None),
+        )
+        .distinct()
+        .limit(MAX_CANDIDATES)
+        .all()
+    )
+    rows = [row for row in rows if same_aspect(size, row[2], row[3])]
+    if not rows:
+        return None
+    distances = hamming_distances(phash, [row[1] for row in rows])
+    # Plus proche d'abord, puis la plus ancienne photo à distance égale
+    matches = sorted(
+        (int(distance), int(row[0]))
+        for row, distance in zip(rows, distances.tolist())
+        if distance <= limit
+    )
+    if not matches:
+        return None
+    distance, source_id = matches[0]
+    return source_id, distance
+
+
+def reuse_source_analysis(db: Session, event_id: int, photo_id: int, source_id: int, distance: int,
+                          allowed_user_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """
+    Copie les visages et correspondances de la photo source sur la photo. Sans commit.
+
+    Retourne {user_id: confidence_score} des correspondances copiées.
+    """
+    allowed = set(allowed_user_ids) if allowed_user_ids is not None else None
+    db.query(PhotoFace).filter(PhotoFace.photo_id == photo_id).delete(synchronize_session=False)
+    db.query(FaceMatch).filter(FaceMatch.photo_id == photo_id).delete(synchronize_session=False)
+
+    for face in db.query(PhotoFace).filter(PhotoFace.photo_id == source_id).all():
+        matched_user_id = face.matched_user_id
+        if allowed is not None and matched_user_id not in allowed:
+            matched_user_id = None
+        db.add(PhotoFace(
+            event_id=event_id,
+            photo_id=photo_id,
+            face_id=f"{NEAR_FACE_PREFIX}{face.face_id}",
+            box_left=face.box_left,
+            box_top=face.box_top,
+            box_width=face.box_width,
+            box_height=face.box_height,
+            quality=face.quality,
+            detection_source=NEAR_DETECTION_SOURCE,
+            matched_user_id=matched_user_id,
+        ))
+
+    kept: Dict[int, int] = {}
+    for user_id, score in db.query(FaceMatch.user_id, FaceMatch.confidence_score).filter(FaceMatch.photo_id == source_id):
+        if user_id is None or (allowed is not None and user_id not in allowed):
+            continue
+        kept[int(user_id)] = max(int(score or 0), kept.get(int(user_id), 0))
+    for user_id, score in kept.items():
+        db.add(FaceMatch(photo_id=photo_id, user_id=user_id, confidence_score=score))
+
+    db.query(Photo).filter(Photo.id == photo_id).update(
+        {Photo.near_duplicate_of: source_id, Photo.near_duplicate_distance: int(distance)},
+        synchronize_session=False,
+    )
+    return kept
+
+
+def expand_near_duplicates(db: Session, photo_ids: Iterable[int]) -> Dict[int, int]:
+    """Quasi-doublons des photos données: {photo_id dérivée: photo_id source}."""
+    ids = sorted({int(pid) for pid in photo_ids if pid})
+    if not ids:
+        return {}
+    rows = db.query(Photo.id, Photo.near_duplicate_of).filter(Photo.near_duplicate_of.in_(ids)).all()
+    return {int(pid): int(source_id) for pid, source_id in rows}
+
+
+def detach_near_duplicates(db: Session, source_ids: Iterable[int]) -> List[int]:
+    """
+    Détache les dérivées des photos sources sur le point d'être supprimées (hors photos
+    supprimées elles-mêmes): visages copiés retirés, near_duplicate_of effacé, is_indexed
+    remis à False. Les FaceMatch copiés restent (même image) jusqu'à la réanalyse. Sans commit.
+
+    Retourne les ids des dérivées, à passer à reanalyze_photos_async après le commit.
+    """
+    ids = sorted({int(pid) for pid in source_ids if pid})
+    derived: List[int] = []
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows = db.query(Photo.id).filter(Photo.near_duplicate_of.in_(chunk), Photo.id.notin_(ids)).all()
+        derived.extend(int(row[0]) for row in rows)
+    for i in range(0, len(derived), 500):
+        chunk = derived[i:i + 500]
+        db.query(PhotoFace).filter(
+            PhotoFace.photo_id.in_(chunk),
+            PhotoFace.detection_source == NEAR_DETECTION_SOURCE,
+        ).delete(synchronize_session=False)
+        db.query(Photo).filter(Photo.id.in_(chunk)).update(
+            {Photo.near_duplicate_of: None, Photo.near_duplicate_distance: None, Photo.is_indexed: False},
+            synchronize_session=False,
+        )
+    if derived:
+        print(f"[NearDup] {len(derived)} derived photos detached from deleted sources")
+    return derived
+
+
+def _reanalyze_photos(photo_ids: List[int]) -> None:
+    from blob_store import read_photo_bytes
+    from database import SessionLocal
+    from recognizer_factory import get_face_recognizer
+
+    recognizer = get_face_recognizer()
+    if not hasattr(recognizer, "process_photo_from_bytes"):
+        return
+    for photo_id in photo_ids:
+        db = SessionLocal()
+        try:
+            photo = db.query(Photo).filter(Photo.id == photo_id).first()
+            if photo is None or photo.event_id is None:
+                continue
+            image_bytes = None
+            if photo.s3_key and settings.is_s3_configured:
+                # Original uploadé: même entrée que le premier traitement
+                from s3_service import get_s3_service
+                image_bytes = get_s3_service().download_photo(photo.s3_key)
+            if image_bytes is None:
+                image_bytes = read_photo_bytes(photo)
+            if not image_bytes:
+                print(f"[NearDup] photo_id={photo_id} reanalysis skipped: no image data")
+                continue
+            recognizer.process_photo_from_bytes(photo_id, image_bytes, int(photo.event_id), db)
+            print(f"[NearDup] photo_id={photo_id} reanalyzed after source deletion")
+        except Exception as e:
+            # La photo reste is_indexed=False: ensure_event_photos_indexed l'indexera
+            print(f"[NearDup] photo_id={photo_id} reanalysis failed: {e}")
+            try:
+                db.rollback()
+            except Exception:
+                pass
+        finally:
+            db.close()
+
+
+def reanalyze_photos_async(photo_ids: Iterable[int]) -> None:
+    """Relance l'analyse complète (visages, correspondances) des photos en arrière-plan."""
+    ids = sorted({int(pid) for pid in photo_ids if pid})
+    if ids:
+        threading.Thread(target=_reanalyze_photos, args=(ids,), daemon=True, name="near-dup-reanalyze").start()
@@ -0,0 +1,241 @@
+"""
+Cache des octets servis par /api/photo/{id} (mémoire LRU + disque local).
+
+Quand l'email « photos disponibles » part vers des centaines d'invités, tous ouvrent la
+même photo mise en avant et la même première page de vignettes en quelques minutes.
+Chaque entrée est indexée par l'ETag de la réponse (photo, déclinaison, format, date
+d'upload): une photo modifiée change de clé, aucune invalidation n'est nécessaire.
+Les réponses qui existent en blob store (taille complète, requêtes Range) ne passent pas
+par le cache: elles sont servies en flux sans charger l'image entière.
+
+Niveaux:
+    - mémoire: LRU borné en octets (PHOTO_CACHE_MEMORY_MB) par processus
+    - disque:  PHOTO_CACHE_DISK_DIR, partagé par les workers d'une même machine, borné à
+               PHOTO_CACHE_DISK_MB (LRU: une lecture rafraîchit la date du fichier, les moins
+               récemment utilisés sont supprimés)
+
+Coalescence (single-flight): les requêtes concurrentes pour une même clé absente attendent
+le chargement lancé par la première au lieu de relire la base chacune. Le chargement est
+une tâche indépendante: une requête annulée (client déconnecté) ne l'interrompt pas.
+
+Usage:
+    from photo_cache import photo_cache
+
+    payload = await photo_cache.get_or_load(etag, load)   # load: coroutine -> payload | None
+    photo_cache.put(etag, payload)                        # préchauffage depuis un thread
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from settings import settings
+
+
+# (octets, type MIME, taille du JPEG équivalent pour les compteurs d'egress)
+Payload = Tuple[bytes, str, int]
+
+
+class PhotoCache:
+    """Cache à deux niveaux, indexé par ETag, avec coalescence des chargements concurrents."""
+
+    def __init__(self):
+        self.enabled = bool(settings.PHOTO_CACHE_ENABLED)
+        self.memory_limit = max(0, int(settings.PHOTO_CACHE_MEMORY_MB or 0)) * 1024 * 1024
+        self.max_item = max(0, int(settings.PHOTO_CACHE_MAX_ITEM_MB or 0)) * 1024 * 1024
+        self.disk_limit = max(0, int(settings.PHOTO_CACHE_DISK_MB or 0)) * 1024 * 1024
+        self.disk_dir = os.path.abspath(settings.PHOTO_CACHE_DISK_DIR) if self.disk_limit else None
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Payload]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # Calculé à la première écriture
+        self._disk_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    # ---------- Mémoire ----------
+
+    def _get_memory(self, key: str) -> Optional[Payload]:
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+            return payload
+
+    def _put_memory(self, key: str, payload: Payload):
+        size = len(payload[0])
+        if size > self.memory_limit:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous[0])
+            self._memory[key] = payload
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_limit and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted[0])
+                self._stats["evictions"] += 1
+
+    # ---------- Disque ----------
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.disk_dir, digest[:2], digest)
+
+    def _get_disk(self, key: str) -> Optional[Payload]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                header, _, data = f.read().partition(b"\n")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"[PhotoCache] disk read failed: {e}")
+            return None
+        try:
+            # Date de dernier accès pour _trim_disk (atime n'est pas fiable: noatime/relatime)
+            os.utime(path)
+        except OSError:
+            pass
+        media_type, _, jpeg_size = header.decode("ascii", "replace").partition(" ")
+        try:
+            return data, media_type, int(jpeg_size or 0)
+        except ValueError:
+            return None
+
+    def _disk_usage(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _trim_disk(self):
+        """Supprime les fichiers les moins récemment utilisés (mtime) jusqu'à 90% du budget disque."""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+                except OSError:
+                    pass
+        total = sum(size for _, size, _ in entries)
+        target = int(self.disk_limit * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def _put_disk(self, key: str, payload: Payload):
+        if not self.disk_dir:
+            return
+        data, media_type, jpeg_size = payload
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(f"{media_type} {int(jpeg_size)}\n".encode("ascii"))
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[PhotoCache] disk write failed: {e}")
+            return
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._disk_usage()
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_limit:
+                self._trim_disk()
+
+    # ---------- API ----------
+
+    def cacheable(self, payload: Optional[Payload]) -> bool:
+        return bool(self.enabled and payload and len(payload[0]) <= self.max_item)
+
+    def put(self, key: str, payload: Payload):
+        """Ajoute une entrée aux deux niveaux (bloquant: disque)."""
+        if not self.cacheable(payload):
+            return
+        self._put_memory(key, payload)
+        self._put_disk(key, payload)
+
+    def contains(self, key: str) -> bool:
+        if self._get_memory(key) is not None:
+            return True
+        return bool(self.disk_dir and os.path.exists(self._disk_path(key)))
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[Optional[Payload]]]) -> Optional[Payload]:
+        loop = asyncio.get_running_loop()
+        if self.disk_dir:
+            payload = await loop.run_in_executor(None, self._get_disk, key)
+            if payload is not None:
+                self._stats["disk_hits"] += 1
+                self._put_memory(key, payload)
+                return payload
+        self._stats["misses"] += 1
+        payload = await load()
+        if self.cacheable(payload):
+            self._put_memory(key, payload)
+            if self.disk_dir:
+                loop.run_in_executor(None, self._put_disk, key, payload)
+        return payload
+
+    def _load_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Récupérer l'exception même si plus personne n'attend la tâche
+        if not task.cancelled():
+            task.exception()
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Optional[Payload]]]) -> Optional[Payload]:
+        """Entrée en cache, sinon chargée une seule fois pour toutes les requêtes concurrentes."""
+        payload = self._get_memory(key)
+        if payload is not None:
+            self._stats["memory_hits"] += 1
+            return payload
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, load))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._load_done(k, t))
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, memory_bytes = len(self._memory), self._memory_bytes
+        return {
+            "enabled": self.enabled,
+            "memory_entries": entries,
+            "memory_mb": round(memory_bytes / (1024 * 1024), 2),
+            "memory_limit_mb": round(self.memory_limit / (1024 * 1024), 2),
+            "disk_mb": round((self._disk_bytes or 0) / (1024 * 1024), 2) if self.disk_dir else None,
+            "disk_limit_mb": round(self.disk_limit / (1024 * 1024), 2),
+            **self._stats,
+        }
+
+
+# Instance singleton
+photo_cache = PhotoCache()
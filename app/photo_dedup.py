@@ -0,0 +1,121 @@
+"""
+Déduplication des photos par contenu (SHA-256) au sein d'un événement.
+
+Une photo déjà présente dans l'événement (même empreinte, statut différent de FAILED)
+n'est ni réécrite en stockage, ni remise en file, ni réanalysée par Rekognition:
+l'upload renvoie la photo existante et ses correspondances.
+
+Couvre les ré-uploads depuis l'interface web, les re-synchronisations Google Drive
+(journal d'ingestion perdu) et les lots relancés.
+
+L'index unique partiel uq_photos_event_sha256 garantit l'unicité quand deux requêtes
+envoient le même fichier en même temps: l'insertion perdante lève une IntegrityError
+(is_duplicate_hash_error) et l'upload la traite comme un doublon. Une photo FAILED
+cède son empreinte (release_failed_hashes) à la nouvelle photo du même contenu.
+
+Usage:
+    from photo_dedup import sha256_fileobj, find_existing_photos
+
+    digest = sha256_fileobj(upload.file)
+    existing = find_existing_photos(db, event_id, [digest])
+    if digest in existing:
+        ...  # court-circuit: existing[digest]["photo_id"]
+"""
+
+import hashlib
+from typing import Dict, Iterable, List
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from models import FaceMatch, Photo, PhotoProcessingStatus
+
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data or b"").hexdigest()
+
+
+def sha256_fileobj(fileobj) -> str:
+    """Empreinte d'un fichier lu par morceaux (le curseur est remis au début)."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def find_existing_photos(db: Session, event_id: int, hashes: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Photos de l'événement ayant l'une des empreintes (hors FAILED), en une requête.
+
+    Retourne {sha256: {"photo_id", "status"}} (la plus ancienne photo par empreinte).
+    """
+    wanted = sorted({h for h in hashes if h})
+    if not wanted:
+        return {}
+    rows = (
+        db.query(Photo.id, Photo.content_sha256, Photo.processing_status)
+        .filter(
+            Photo.event_id == event_id,
+            Photo.content_sha256.in_(wanted),
+            or_(
+                Photo.processing_status.is_(None),
+                Photo.processing_status != PhotoProcessingStatus.FAILED.value,
+            ),
+        )
+        .order_by(Photo.id.asc())
+        .all()
+    )
+    existing: Dict[str, Dict] = {}
+    for photo_id, digest, status in rows:
+        existing.setdefault(digest, {"photo_id": int(photo_id), "status": status})
+    return existing
+
+
+def release_failed_hashes(db: Session, event_id: int, hashes: Iterable[str]) -> None:
+    """
+    Retire l'empreinte des photos FAILED de l'événement ayant l'un de ces contenus, avant
+    l'insertion de la nouvelle photo (sans commit). Un ré-upload d'une photo en échec crée
+    une nouvelle photo: l'ancienne ne doit plus occuper l'index unique.
+    """
+    wanted = sorted({h for h in hashes if h})
+    if not wanted:
+        return
+    (
+        db.query(Photo)
+        .filter(
+            Photo.event_id == event_id,
+            Photo.content_sha256.in_(wanted),
+            Photo.processing_status == PhotoProcessingStatus.FAILED.value,
+        )
+        .update({Photo.content_sha256: None}, synchronize_session=False)
+    )
+
+
+def is_duplicate_hash_error(exc: Exception) -> bool:
+    """IntegrityError levée par l'index unique (event_id, content_sha256)."""
+    error_text = str(getattr(exc, "orig", exc)).lower()
+    return "uq_photos_event_sha256" in error_text or (
+        "unique" in error_text and "content_sha256" in error_text
+    )
+
+
+def match_counts(db: Session, photo_ids: List[int]) -> Dict[int, int]:
+    """Nombre de FaceMatch par photo (une requête groupée)."""
+    ids = sorted({int(pid) for pid in photo_ids if pid})
+    if not ids:
+        return {}
+    rows = (
+        db.query(FaceMatch.photo_id, func.count(FaceMatch.id))
+        .filter(FaceMatch.photo_id.in_(ids))
+        .group_by(FaceMatch.photo_id)
+        .all()
+    )
+    return {int(pid): int(count) for pid, count in rows}
@@ -0,0 +1,134 @@
+"""
+Diffusion des photos par redirection vers S3 ou un CDN (PHOTO_DELIVERY_MODE).
+
+En mode "proxy" (défaut), /api/photo/{id} renvoie les octets: chaque vignette de galerie
+traverse les workers de l'application. Dans les modes redirigés, le endpoint vérifie la
+photo, négocie la déclinaison/le format puis répond 302 vers l'objet du blob store S3:
+
+    - presigned: URL S3 pré-signée (GET) valable PHOTO_SIGNED_URL_TTL_SECONDS
+    - cdn:       https://PHOTO_CDN_DOMAIN/{clé}, signée CloudFront (canned policy) si
+                 PHOTO_CDN_KEY_PAIR_ID / PHOTO_CDN_PRIVATE_KEY sont fournis
+
+Les clés du blob store sont des SHA-256 du contenu: l'URL change avec le contenu
+(versionnement naturel) et l'objet est servi avec Cache-Control immutable. Les URL signées
+sont réutilisées tant qu'il leur reste plus de la moitié de leur durée de validité, pour
+que navigateurs et CDN retrouvent la même URL; l'échéance CloudFront est alignée sur des
+tranches de TTL/2 pour être identique d'un worker à l'autre.
+
+Les binaires encore en base (migration en cours) restent servis par l'application.
+
+Usage:
+    from photo_delivery import photo_delivery
+
+    redirect = photo_delivery.redirect_for(blob_key, "image/webp")
+    if redirect is not None:
+        url, max_age = redirect
+"""
+
+import datetime
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from blob_store import get_blob_store
+from settings import settings
+
+
+class PhotoDelivery:
+    """Construit (et réutilise) les URL de redirection vers les blobs S3."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._urls: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._cdn_signer = None
+        self._stats = {"redirects": 0, "signed": 0}
+
+    @property
+    def ttl(self) -> int:
+        return max(60, int(settings.PHOTO_SIGNED_URL_TTL_SECONDS or 3600))
+
+    def mode(self) -> str:
+        """Mode effectif: proxy si le mode demandé n'est pas utilisable (pas de blob store S3, pas de CDN)."""
+        mode = (settings.PHOTO_DELIVERY_MODE or "proxy").strip().lower()
+        if mode not in ("presigned", "cdn"):
+            return "proxy"
+        store = get_blob_store()
+        if store is None or store.backend != "s3":
+            return "proxy"
+        if mode == "cdn" and not settings.PHOTO_CDN_DOMAIN:
+            return "proxy"
+        return mode
+
+    def _cloudfront_signer(self):
+        if self._cdn_signer is None:
+            from botocore.signers import CloudFrontSigner
+            from cryptography.hazmat.primitives import hashes, serialization
+            from cryptography.hazmat.primitives.asymmetric import padding
+
+            pem = settings.PHOTO_CDN_PRIVATE_KEY.replace("\\n", "\n").encode()
+            private_key = serialization.load_pem_private_key(pem, password=None)
+
+            def rsa_signer(message: bytes) -> bytes:
+                return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+
+            self._cdn_signer = CloudFrontSigner(settings.PHOTO_CDN_KEY_PAIR_ID, rsa_signer)
+        return self._cdn_signer
+
+    def _sign(self, mode: str, store, key: str, media_type: str) -> Tuple[str, float]:
+        """(url, échéance epoch) pour un blob."""
+        object_key = store.object_key(key)
+        if mode == "presigned":
+            url = store.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": store.bucket, "Key": object_key, "ResponseContentType": media_type},
+                ExpiresIn=self.ttl,
+            )
+            return url, time.time() + self.ttl
+
+        url = f"https://{settings.PHOTO_CDN_DOMAIN.strip().rstrip('/')}/{object_key}"
+        if not (settings.PHOTO_CDN_KEY_PAIR_ID and settings.PHOTO_CDN_PRIVATE_KEY):
+            # Distribution publique (origine S3 protégée par OAC): URL stable, sans échéance
+            return url, float("inf")
+        # Échéance alignée sur des tranches de TTL/2: même URL signée sur tous les workers
+        step = self.ttl / 2
+        expires_at = math.ceil((time.time() + self.ttl) / step) * step
+        signed = self._cloudfront_signer().generate_presigned_url(
+            url, date_less_than=datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc)
+        )
+        return signed, expires_at
+
+    def redirect_for(self, key: Optional[str], media_type: str) -> Optional[Tuple[str, int]]:
+        """(url, max-age de la redirection) pour un blob S3, None si la photo doit être servie par l'application."""
+        if not key:
+            return None
+        mode = self.mode()
+        if mode == "proxy":
+            return None
+        store = get_blob_store()
+        now = time.time()
+        with self._lock:
+            cached = self._urls.get((key, media_type))
+        if cached is None or cached[1] - now < self.ttl / 2:
+            try:
+                cached = self._sign(mode, store, key, media_type)
+            except Exception as e:
+                print(f"[PhotoDelivery] signing failed key={key} mode={mode}: {e}")
+                return None
+            with self._lock:
+                if len(self._urls) > 10000:
+                    self._urls.clear()
+                self._urls[(key, media_type)] = cached
+                self._stats["signed"] += 1
+        url, expires_at = cached
+        self._stats["redirects"] += 1
+        # Le navigateur peut réutiliser la redirection tant que l'URL cible reste valide
+        max_age = self.ttl if expires_at == float("inf") else max(0, int(expires_at - now) - 60)
+        return url, max_age
+
+    def stats(self) -> Dict:
+        return {"mode": self.mode(), "ttl_seconds": self.ttl, **self._stats}
+
+
+# Instance singleton
+photo_delivery = PhotoDelivery()
@@ -0,0 +1,208 @@
+"""
+Export ZIP en flux des photos d'un événement (photos matchées d'un invité, ou événement
+complet pour le photographe).
+
+L'archive est construite à la volée à partir des métadonnées (zip_stream.StoredZip):
+    - entrées = photos optimisées (celles servies par /api/photo/{id}), triées par id,
+      nommées {rang}_{nom d'origine}; taille et CRC-32 lus dans photos.optimized_size /
+      optimized_crc32. Tant que des photos anciennes n'ont pas ces sommes, l'export lève
+      ExportNotReady (503 + Retry-After) et les complète en arrière-plan (blob_migration,
+      phase checksums): l'export ne lit aucune photo avant d'envoyer le premier octet et
+      une archive servie n'est jamais incomplète en silence
+    - ETag = empreinte de la liste (id, taille, CRC, nom): une reprise via Range + If-Range
+      n'est acceptée que si l'archive est restée identique
+    - octets lus entrée par entrée: fichier du blob store local à partir de l'offset,
+      GET S3 avec Range, sinon colonne photo_data / fichier local
+
+Les photos sans données (ou illisibles lors du calcul des sommes) sont ignorées: elles ne
+peuvent pas être servies non plus; leur nombre est renvoyé avec l'archive
+(en-tête X-Export-Excluded-Photos).
+
+Usage:
+    from photo_export import build_photo_archive
+
+    try:
+        archive, etag, excluded = build_photo_archive(db, photos_query)
+    except ExportNotReady as e:
+        ...  # 503, Retry-After: EXPORT_RETRY_AFTER_SECONDS
+    chunks = archive.iter_range(0, archive.size - 1, read_photo_slice)
+"""
+
+import hashlib
+import os
+import re
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, load_only
+
+from blob_migration import blob_migration, pending_checksums_filter
+from blob_store import get_blob_store, read_photo_bytes
+from database import SessionLocal
+from http_range import iter_bytes, iter_file
+from models import Photo
+from zip_stream import StoredZip, ZipEntry
+
+
+# Délai suggéré au client pendant le calcul des sommes manquantes
+EXPORT_RETRY_AFTER_SECONDS = 30
+# Taille maximale des listes IN() du comptage des photos en attente
+_PENDING_CHUNK = 500
+
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+    "image/heic": ".heic",
+    "image/avif": ".avif",
+}
+
+
+class ExportNotReady(Exception):
+    """Des photos de l'export n'ont pas encore leur taille / CRC-32."""
+
+    def __init__(self, pending: int):
+        super().__init__(f"{pending} photos without checksums")
+        self.pending = pending
+
+
+def _read_full_photo(photo: Photo) -> Optional[bytes]:
+    """Octets de la photo optimisée (blob store, colonne, sinon fichier local)."""
+    data = read_photo_bytes(photo)
+    if data is None and photo.file_path and os.path.exists(photo.file_path):
+        with open(photo.file_path, "rb") as f:
+            data = f.read()
+    return data
+
+
+def _entry_name(rank: int, photo: Photo) -> str:
+    base = os.path.basename((photo.original_filename or photo.filename or "").replace("\\", "/"))
+    stem = os.path.splitext(base)[0]
+    stem = re.sub(r"[\x00-\x1f/\\:*?\"<>|]+", "_", stem).strip(" .") or f"photo_{photo.id}"
+    extension = EXTENSIONS.get((photo.content_type or "image/jpeg").lower(), ".jpg")
+    return f"{rank:04d}_{stem[:120]}{extension}"
+
+
+def _has_checksums(photo: Photo) -> bool:
+    return photo.optimized_size is not None and photo.optimized_crc32 is not None and photo.optimized_size >= 0
+
+
+def exportable_photos(db, photos: List[Photo]) -> Tuple[List[Photo], int]:
+    """
+    Photos dont la taille et le CRC-32 sont connus, et nombre de photos exclues (sans
+    données, ou illisibles lors du calcul des sommes).
+
+    Lève ExportNotReady si des photos avec données attendent encore leurs sommes: elles sont
+    complétées en arrière-plan et le client réessaie plus tard.
+    """
+    exportable = [p for p in photos if _has_checksums(p)]
+    missing_ids = [p.id for p in photos if p.optimized_size is None or p.optimized_crc32 is None]
+    pending = 0
+    for i in range(0, len(missing_ids), _PENDING_CHUNK):
+        chunk = missing_ids[i:i + _PENDING_CHUNK]
+        pending += int(
+            db.query(func.count(Photo.id)).filter(Photo.id.in_(chunk), pending_checksums_filter()).scalar() or 0
+        )
+    if pending:
+        print(f"[PhotoExport] {pending} photos without checksums, starting backfill")
+        try:
+            blob_migration.start(checksums_only=True)
+        except Exception as e:
+            print(f"[PhotoExport] checksum backfill not started: {e}")
+        raise ExportNotReady(pending)
+    return exportable, len(photos) - len(exportable)
+
+
+def build_photo_archive(db, photos_query: Query) -> Tuple[StoredZip, str, int]:
+    """
+    Archive (disposition complète), ETag et nombre de photos exclues pour un ensemble de
+    photos. Lève ExportNotReady tant que des sommes sont en cours de calcul.
+    """
+    photos = (
+        photos_query.options(load_only(
+            Photo.id, Photo.filename, Photo.original_filename, Photo.content_type,
+            Photo.uploaded_at, Photo.file_path, Photo.blob_key,
+            Photo.optimized_size, Photo.optimized_crc32,
+        ))
+        .order_by(Photo.id.asc())
+        .all()
+    )
+    photos, excluded = exportable_photos(db, photos)
+    entries = []
+    digest = hashlib.sha256()
+    for rank, photo in enumerate(photos, start=1):
+        name = _entry_name(rank, photo)
+        entry = ZipEntry(
+            name,
+            photo.optimized_size,
+            photo.optimized_crc32,
+            photo.uploaded_at.replace(tzinfo=None) if photo.uploaded_at else None,
+            ref=(photo.id, photo.blob_key, photo.file_path),
+        )
+        entries.append(entry)
+        digest.update(f"{photo.id}:{entry.size}:{entry.crc32}:{name}\n".encode("utf-8"))
+    return StoredZip(entries), f'"zip-{digest.hexdigest()[:24]}"', excluded
+
+
+def _invalidate_checksums(photo_id: int):
+    db = SessionLocal()
+    try:
+        db.query(Photo).filter(Photo.id == photo_id).update(
+            {Photo.optimized_size: None, Photo.optimized_crc32: None}, synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[PhotoExport] checksum reset failed photo_id={photo_id}: {e}")
+    finally:
+        db.close()
+
+
+def _source_chunks(entry: ZipEntry, start: int, stop: int) -> Iterator[bytes]:
+    photo_id, blob_key, file_path = entry.ref
+    store = get_blob_store() if blob_key else None
+    if store is not None:
+        path = store.local_path(blob_key)
+        if path:
+            yield from iter_file(path, start, stop - 1)
+            return
+        if store.backend == "s3":
+            yield from store.iter_range(blob_key, start, stop - 1)
+            return
+    db = SessionLocal()
+    try:
+        photo = db.query(Photo).filter(Photo.id == photo_id).first()
+        data = _read_full_photo(photo) if photo is not None else None
+    finally:
+        db.close()
+    if data is None:
+        raise IOError(f"photo_id={photo_id} data unavailable")
+    yield from iter_bytes(data, start, min(stop, len(data)) - 1)
+
+
+def read_photo_slice(entry: ZipEntry, start: int, stop: int) -> Iterator[bytes]:
+    """
+    Octets [start, stop) des données d'une entrée. La longueur est vérifiée (sinon la
+    disposition de l'archive serait fausse); le CRC-32 l'est quand l'entrée est lue en entier,
+    un écart remet à zéro les sommes de la photo pour le prochain export.
+    """
+    expected = stop - start
+    sent = 0
+    crc = 0
+    whole = start == 0 and stop == entry.size
+    for chunk in _source_chunks(entry, start, stop):
+        chunk = chunk[:expected - sent]
+        if not chunk:
+            break
+        sent += len(chunk)
+        if whole:
+            crc = zlib.crc32(chunk, crc)
+        yield chunk
+    if sent != expected or (whole and crc != entry.crc32):
+        _invalidate_checksums(entry.ref[0])
+        if sent != expected:
+            # Interrompre le flux: le client reprendra (Range) avec une archive recalculée
+            raise IOError(f"photo_id={entry.ref[0]} size changed ({sent}/{expected} bytes)")
+        print(f"[PhotoExport] CRC mismatch photo_id={entry.ref[0]}, checksums reset")
@@ -5,6 +5,7 @@ Ce module fournit des fonctionnalités pour :
 - Compression intelligente des images
 - Gestion de la rétention des photos
 - Calcul des statistiques d'optimisation
+- Génération des déclinaisons (vignette, aperçu) servies par /api/photo/{id}?size=
 - Nettoyage automatique des photos expirées
 """
 
@@ -36,13 +37,21 @@ class PhotoOptimizer:
         'ultra': {'quality': 95, 'max_size': (2560, 1440)}
     }
     
+    # Déclinaisons pour les galeries (plus grand côté borné), de la plus grande à la plus petite:
+    # chacune est réduite depuis la précédente
+    RENDITIONS = {
+        'preview': {'quality': 80, 'max_size': (1024, 1024)},
+        'thumbnail': {'quality': 75, 'max_size': (320, 320)},
+    }
+    
     @classmethod
     def optimize_image(
         cls, 
         image_data: bytes, 
         photo_type: str = 'uploaded',
         quality_profile: str = 'high',
-        retention_days: Optional[int] = None
+        retention_days: Optional[int] = None,
+        with_renditions: bool = False
     ) -> Dict[str, Any]:
         """
         Optimise une image en la compressant et en calculant les métadonnées.
@@ -52,6 +61,7 @@ class PhotoOptimizer:
             photo_type: Type de photo ('uploaded', 'selfie', etc.)
             quality_profile: Profil de qualité ('low', 'medium', 'high', 'ultra')
             retention_days: Durée de rétention personnalisée
+            with_renditions: Génère aussi les déclinaisons vignette/aperçu (clé 'renditions')
             
         Returns:
             Dict contenant les données optimisées et métadonnées
@@ -95,6 +105,7 @@ class PhotoOptimizer:
             
             compressed_data = output_buffer.getvalue()
             compressed_size = len(compressed_data)
+            renditions = cls._encode_renditions(optimized_image) if with_renditions else {}
             
             # Calculer le ratio de compression
             compression_ratio = round((1 - compressed_size / original_size) * 100, 2) if original_size > 0 else 0
@@ -112,7 +123,8 @@ class PhotoOptimizer:
                 'quality_level': quality,
                 'retention_days': retention,
                 'expires_at': expires_at,
-                'profile_used': quality_profile
+                'profile_used': quality_profile,
+                'renditions': renditions
             }
             
         except Exception as e:
@@ -127,9 +139,44 @@ class PhotoOptimizer:
                 'quality_level': cls.DEFAULT_QUALITY,
                 'retention_days': retention_days or cls.DEFAULT_RETENTION_DAYS,
                 'expires_at': datetime.utcnow() + timedelta(days=retention_days or cls.DEFAULT_RETENTION_DAYS),
-                'profile_used': 'fallback'
+                'profile_used': 'fallback',
+                'renditions': {}
             }
     
+    @classmethod
+    def create_renditions(cls, image_data: bytes) -> Dict[str, bytes]:
+        """
+        Génère les déclinaisons d'une image déjà optimisée (photos antérieures aux déclinaisons).
+        
+        Returns:
+            {'preview': bytes, 'thumbnail': bytes}, vide si l'image est illisible
+        """
+        try:
+            image = Image.open(io.BytesIO(image_data))
+            # JPEG: décodage réduit à la taille utile de la plus grande déclinaison
+            image.draft('RGB', cls.RENDITIONS['preview']['max_size'])
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            return cls._encode_renditions(image)
+        except Exception as e:
+            logger.error(f"Erreur lors de la génération des déclinaisons: {e}")
+            return {}
+    
+    @classmethod
+    def _encode_renditions(cls, image: Image.Image) -> Dict[str, bytes]:
+        """
+        Encode les déclinaisons en JPEG progressif, chacune réduite depuis la précédente.
+        """
+        renditions = {}
+        current = image
+        for name, profile in cls.RENDITIONS.items():
+            current = cls._resize_image(current, profile['max_size'])
+            buffer = io.BytesIO()
+            current.save(buffer, format='JPEG', quality=profile['quality'], optimize=True, progressive=True)
+            renditions[name] = buffer.getvalue()
+        return renditions
+    
     @classmethod
     def _resize_image(cls, image: Image.Image, max_size: tuple) -> Image.Image:
         """
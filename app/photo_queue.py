@@ -16,12 +16,22 @@ PROBLÈMES CONNUS (résolus avec S3+SQS):
 Pour activer le nouveau workflow, configurez:
 - PHOTO_BUCKET_NAME: bucket S3 pour les photos
 - PHOTO_SQS_QUEUE_URL: URL de la file SQS
+
+Ordonnancement (FairShareScheduler):
+- Une sous-file par événement (ou par photographe, PHOTO_QUEUE_FAIR_KEY=photographer),
+  servies en round-robin pondéré: un gros upload ne bloque plus les petits événements.
+- Poids par sous-file via PHOTO_QUEUE_LANE_WEIGHTS="event:12=3,photographer:4=2" (défaut 1):
+  une sous-file de poids w est servie w fois par tour.
+- Les retries passent par un tas de délais avec backoff exponentiel, puis reprennent leur
+  place en tête de leur sous-file (plus de threading.Timer hors ordonnancement).
 """
 import os
 import time
+import heapq
+import itertools
 import threading
-import queue
 import uuid
+from collections import OrderedDict, deque
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, field
 from datetime import datetime
@@ -33,6 +43,30 @@ from database import SessionLocal
 QUEUE_MAX_SIZE = int(os.environ.get("PHOTO_QUEUE_MAX_SIZE", "1000"))
 MAX_WORKERS = int(os.environ.get("PHOTO_QUEUE_WORKERS", "3"))  # Nombre de workers parallèles
 WORKER_BATCH_SIZE = int(os.environ.get("PHOTO_QUEUE_BATCH_SIZE", "5"))  # Photos traitées par batch
+FAIR_KEY = os.environ.get("PHOTO_QUEUE_FAIR_KEY", "event").strip().lower()  # event | photographer
+RETRY_BASE_SECONDS = float(os.environ.get("PHOTO_QUEUE_RETRY_BASE_SECONDS", "5"))
+RETRY_MAX_SECONDS = float(os.environ.get("PHOTO_QUEUE_RETRY_MAX_SECONDS", "120"))
+
+
+def parse_lane_weights(raw: Optional[str]) -> Dict[str, int]:
+    """Poids des sous-files depuis "event:12=3,photographer:4=2" (entrées invalides ignorées)."""
+    weights: Dict[str, int] = {}
+    for item in (raw or "").split(","):
+        lane, sep, weight = item.strip().partition("=")
+        lane = lane.strip().lower()
+        kind, _, subject = lane.partition(":")
+        if not sep or kind not in ("event", "photographer") or not subject.strip().isdigit():
+            if item.strip():
+                print(f"[PhotoQueue] invalid lane weight ignored: {item.strip()!r}")
+            continue
+        try:
+            weights[f"{kind}:{int(subject)}"] = max(1, int(weight))
+        except ValueError:
+            print(f"[PhotoQueue] invalid lane weight ignored: {item.strip()!r}")
+    return weights
+
+
+LANE_WEIGHTS = parse_lane_weights(os.environ.get("PHOTO_QUEUE_LANE_WEIGHTS", ""))
 
 
 @dataclass
@@ -51,6 +85,141 @@ class PhotoJob:
     attempts: int = 0
     max_attempts: int = 3
 
+    @property
+    def lane(self) -> str:
+        """Sous-file d'ordonnancement du job (équité par événement ou par photographe)."""
+        if FAIR_KEY == "photographer":
+            return f"photographer:{self.photographer_id}"
+        return f"event:{self.event_id}"
+
+
+class FairShareScheduler:
+    """
+    File bornée thread-safe à sous-files (lanes) servies en round-robin pondéré.
+
+    - put(job): ajoute en fin de sous-file (False si la capacité totale est atteinte)
+    - put_delayed(job, delay): programme un retry; à échéance le job revient en tête de sa sous-file
+    - get(timeout): prochain job selon le round-robin (None si timeout ou fermeture)
+    Une sous-file de poids w est servie w fois par tour.
+    """
+
+    def __init__(self, maxsize: int = QUEUE_MAX_SIZE, weights: Optional[Dict[str, int]] = None):
+        self.maxsize = maxsize
+        self._lanes: "OrderedDict[str, deque]" = OrderedDict()
+        self._weights: Dict[str, int] = {}
+        self._dispatched: Dict[str, int] = {}
+        self._delayed: List[tuple] = []  # (ready_at, seq, job)
+        self._seq = itertools.count()
+        self._size = 0
+        self._current: Optional[str] = None
+        self._credit = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for lane, weight in (weights or {}).items():
+            self.set_weight(lane, weight)
+
+    def set_weight(self, lane: str, weight: int):
+        """Fixe le poids d'une sous-file (nombre de jobs servis par tour, défaut 1)."""
+        with self._cond:
+            self._weights[lane] = max(1, int(weight))
+
+    def put(self, job: PhotoJob) -> bool:
+        with self._cond:
+            if self._closed or self._size >= self.maxsize:
+                return False
+            self._lanes.setdefault(job.lane, deque()).append(job)
+            self._size += 1
+            self._cond.notify()
+            return True
+
+    def put_delayed(self, job: PhotoJob, delay: float):
+        """Programme un job (retry) après `delay` secondes (hors capacité: un retry n'est jamais refusé)."""
+        with self._cond:
+            heapq.heappush(self._delayed, (time.time() + max(0.0, delay), next(self._seq), job))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[PhotoJob]:
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while not self._closed:
+                self._promote_due()
+                job = self._next_job()
+                if job is not None:
+                    return job
+                now = time.time()
+                wait = None if deadline is None else deadline - now
+                if self._delayed:
+                    until_due = self._delayed[0][0] - now
+                    wait = until_due if wait is None else min(wait, until_due)
+                if wait is not None and wait <= 0:
+                    if deadline is not None and now >= deadline:
+                        return None
+                    continue
+                self._cond.wait(wait)
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return self._size
+
+    def lane_stats(self) -> Dict[str, Dict[str, int]]:
+        """Profondeur, poids et jobs servis par sous-file (retries en attente inclus)."""
+        with self._cond:
+            delayed_by_lane: Dict[str, int] = {}
+            for _ready_at, _seq, job in self._delayed:
+                delayed_by_lane[job.lane] = delayed_by_lane.get(job.lane, 0) + 1
+            lanes = set(self._lanes) | set(delayed_by_lane)
+            return {
+                lane: {
+                    "depth": len(self._lanes.get(lane, ())),
+                    "delayed": delayed_by_lane.get(lane, 0),
+                    "weight": self._weights.get(lane, 1),
+                    "dispatched": self._dispatched.get(lane, 0),
+                }
+                for lane in sorted(lanes)
+            }
+
+    def delayed_count(self) -> int:
+        with self._cond:
+            return len(self._delayed)
+
+    def _promote_due(self):
+        now = time.time()
+        while self._delayed and self._delayed[0][0] <= now:
+            _ready_at, _seq, job = heapq.heappop(self._delayed)
+            # Retry: reprend sa place en tête de sa sous-file (ordre conservé); compté dans la
+            # taille comme tout job en sous-file (_next_job décrémente), quitte à dépasser maxsize
+            self._lanes.setdefault(job.lane, deque()).appendleft(job)
+            self._size += 1
+
+    def _next_job(self) -> Optional[PhotoJob]:
+        if not self._lanes:
+            return None
+        # Continuer la sous-file courante tant qu'elle a du crédit
+        if self._current in self._lanes and self._credit > 0:
+            lane = self._current
+        else:
+            # Passer à la sous-file suivante: la courante est replacée en fin de tour
+            if self._current in self._lanes:
+                self._lanes.move_to_end(self._current)
+            lane = next(iter(self._lanes))
+            self._current = lane
+            self._credit = self._weights.get(lane, 1)
+        jobs = self._lanes[lane]
+        job = jobs.popleft()
+        self._credit -= 1
+        if not jobs:
+            del self._lanes[lane]
+            self._credit = 0
+        self._size -= 1
+        self._dispatched[lane] = self._dispatched.get(lane, 0) + 1
+        return job
+
 
 class PhotoQueue:
     """
@@ -59,7 +228,7 @@ class PhotoQueue:
     """
     
     def __init__(self):
-        self._queue = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+        self._queue = FairShareScheduler(maxsize=QUEUE_MAX_SIZE, weights=LANE_WEIGHTS)
         self._jobs: Dict[str, PhotoJob] = {}  # job_id -> PhotoJob
         self._jobs_lock = threading.Lock()
         self._workers: List[threading.Thread] = []
@@ -100,12 +269,8 @@ class PhotoQueue:
         print("[PhotoQueue] Stopping workers...")
         self._running = False
         
-        # Envoyer des sentinelles pour débloquer les workers
-        for _ in self._workers:
-            try:
-                self._queue.put(None, timeout=1)
-            except queue.Full:
-                pass
+        # Débloquer les workers en attente
+        self._queue.close()
         
         # Attendre que les workers se terminent
         for worker in self._workers:
@@ -119,22 +284,19 @@ class PhotoQueue:
         Ajoute un job à la queue.
         Retourne True si succès, False si la queue est pleine.
         """
-        try:
-            self._queue.put(job, block=False)
-            
-            with self._jobs_lock:
-                self._jobs[job.job_id] = job
-            
-            with self._stats_lock:
-                self._stats["total_enqueued"] += 1
-                self._stats["current_queue_size"] = self._queue.qsize()
-            
-            print(f"[PhotoQueue] Job {job.job_id} enqueued (queue size: {self._queue.qsize()})")
-            return True
-            
-        except queue.Full:
+        if not self._queue.put(job):
             print(f"[PhotoQueue] Queue is full, cannot enqueue job {job.job_id}")
             return False
+        
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+        
+        with self._stats_lock:
+            self._stats["total_enqueued"] += 1
+            self._stats["current_queue_size"] = self._queue.qsize()
+        
+        print(f"[PhotoQueue] Job {job.job_id} enqueued lane={job.lane} (queue size: {self._queue.qsize()})")
+        return True
     
     def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Récupère le statut d'un job."""
@@ -159,7 +321,10 @@ class PhotoQueue:
             return {
                 **self._stats,
                 "current_queue_size": self._queue.qsize(),
+                "delayed_retries": self._queue.delayed_count(),
                 "total_jobs": len(self._jobs),
+                "fair_key": FAIR_KEY,
+                "lanes": self._queue.lane_stats(),
             }
     
     def _worker_loop(self):
@@ -171,9 +336,8 @@ class PhotoQueue:
                 # Récupérer un job avec timeout pour pouvoir vérifier _running régulièrement
                 job = self._queue.get(timeout=1.0)
                 
-                # Sentinel pour arrêt propre
                 if job is None:
-                    break
+                    continue
                 
                 # Traiter le job
                 with self._stats_lock:
@@ -186,10 +350,6 @@ class PhotoQueue:
                         self._stats["workers_active"] -= 1
                         self._stats["current_queue_size"] = self._queue.qsize()
                     
-                    self._queue.task_done()
-                    
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"[{threading.current_thread().name}] Unexpected error: {e}")
                 traceback.print_exc()
@@ -260,9 +420,10 @@ class PhotoQueue:
             # Réessayer si pas trop de tentatives
             if job.attempts < job.max_attempts:
                 job.status = "pending"
-                print(f"[{threading.current_thread().name}] Job {job.job_id} will be retried (attempt {job.attempts}/{job.max_attempts})")
-                # Remettre en queue avec un délai
-                threading.Timer(5.0, lambda: self._requeue_job(job)).start()
+                delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** (job.attempts - 1)))
+                print(f"[{threading.current_thread().name}] Job {job.job_id} will be retried in {delay:.0f}s (attempt {job.attempts}/{job.max_attempts})")
+                # Remettre dans sa sous-file après un backoff exponentiel
+                self._queue.put_delayed(job, delay)
             else:
                 job.status = "failed"
                 with self._stats_lock:
@@ -284,8 +445,8 @@ class PhotoQueue:
                         pass
         
         finally:
-            # Nettoyer le fichier temporaire
-            if os.path.exists(job.temp_path):
+            # Nettoyer le fichier temporaire (conservé si un retry est programmé)
+            if job.status != "pending" and os.path.exists(job.temp_path):
                 try:
                     os.remove(job.temp_path)
                     print(f"[{threading.current_thread().name}] Cleaned up temp file: {job.temp_path}")
@@ -305,18 +466,6 @@ class PhotoQueue:
                 gc.collect()
             except Exception:
                 pass
-    
-    def _requeue_job(self, job: PhotoJob):
-        """Remet un job en queue après un délai."""
-        try:
-            self._queue.put(job, block=False)
-            print(f"[PhotoQueue] Job {job.job_id} requeued")
-        except queue.Full:
-            print(f"[PhotoQueue] Could not requeue job {job.job_id}: queue full")
-            job.status = "failed"
-            job.error = "Queue full during retry"
-            with self._stats_lock:
-                self._stats["total_failed"] += 1
 
 
 # Instance globale singleton
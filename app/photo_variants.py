@@ -0,0 +1,217 @@
+"""
+Déclinaisons WebP/AVIF des photos, choisies selon l'en-tête Accept de /api/photo/{id}.
+
+Les photos et leurs déclinaisons (thumbnail, preview, full) sont stockées en JPEG; les
+navigateurs récents acceptent WebP (et souvent AVIF), 25 à 50% plus légers à qualité égale.
+Chaque variante (photo, déclinaison, format) est encodée au premier accès depuis le JPEG
+puis conservée dans la table photo_variants avec sa taille et celle du JPEG source.
+Une variante plus lourde que le JPEG est conservée sans données: le JPEG est servi.
+Avec un blob store configuré, les octets sont écrits dans le blob store (blob_key).
+
+Formats:
+    - webp: Pillow (libwebp)
+    - avif: Pillow avec le plugin optionnel pillow-avif-plugin; ignoré s'il est absent
+
+Les octets servis et économisés sont comptés par processus pour
+/api/admin/photo-optimization/stats.
+
+Usage:
+    from photo_variants import negotiate_format, find_variant, create_variant
+
+    fmt = negotiate_format(request.headers.get("Accept"))
+    if fmt != "jpeg":
+        row = find_variant(db, photo_id, "thumbnail", fmt)
+"""
+
+import io
+import threading
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, features
+from sqlalchemy import case, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from blob_store import get_blob_store, read_blob_or_column
+from models import PhotoVariant
+from settings import settings
+
+try:
+    import pillow_avif  # noqa: F401  (enregistre l'encodeur AVIF auprès de Pillow)
+    AVIF_PLUGIN_AVAILABLE = True
+except Exception:
+    AVIF_PLUGIN_AVAILABLE = False
+
+
+MEDIA_TYPES = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+
+def _encoder_available(fmt: str) -> bool:
+    if fmt == "webp":
+        return bool(features.check("webp"))
+    if fmt == "avif":
+        return AVIF_PLUGIN_AVAILABLE or "AVIF" in Image.SAVE
+    return fmt == "jpeg"
+
+
+def enabled_formats() -> Tuple[str, ...]:
+    """Formats modernes activés (PHOTO_VARIANT_FORMATS) et encodables, par ordre de préférence."""
+    wanted = [f.strip().lower() for f in (settings.PHOTO_VARIANT_FORMATS or "").split(",") if f.strip()]
+    return tuple(f for f in wanted if f in MEDIA_TYPES and f != "jpeg" and _encoder_available(f))
+
+
+_ENABLED_FORMATS = enabled_formats()
+
+
+def _accepted_types(accept_header: Optional[str]) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for item in (accept_header or "").split(","):
+        parts = [p.strip() for p in item.split(";")]
+        media_type = parts[0].lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[media_type] = q
+    return accepted
+
+
+def negotiate_format(accept_header: Optional[str]) -> str:
+    """Premier format activé explicitement accepté par le client (q > 0), sinon jpeg.
+
+    Les jokers (image/*, */*) ne suffisent pas: certains clients les envoient sans décoder WebP.
+    """
+    accepted = _accepted_types(accept_header)
+    for fmt in _ENABLED_FORMATS:
+        if accepted.get(MEDIA_TYPES[fmt], 0.0) > 0:
+            return fmt
+    return "jpeg"
+
+
+def encode_variant(jpeg_bytes: bytes, fmt: str) -> bytes:
+    """Réencode un JPEG en WebP/AVIF (bloquant: à exécuter hors de la boucle asyncio)."""
+    with Image.open(io.BytesIO(jpeg_bytes)) as image:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        if fmt == "webp":
+            image.save(buffer, format="WEBP", quality=int(settings.PHOTO_WEBP_QUALITY), method=4)
+        elif fmt == "avif":
+            image.save(buffer, format="AVIF", quality=int(settings.PHOTO_AVIF_QUALITY), speed=6)
+        else:
+            raise ValueError(f"Unsupported variant format: {fmt}")
+        return buffer.getvalue()
+
+
+def find_variant(db: Session, photo_id: int, rendition: str, fmt: str) -> Optional[PhotoVariant]:
+    """Variante déjà calculée (ni data ni blob_key: plus lourde que le JPEG, servir le JPEG)."""
+    return (
+        db.query(PhotoVariant)
+        .filter(
+            PhotoVariant.photo_id == photo_id,
+            PhotoVariant.rendition == rendition,
+            PhotoVariant.format == fmt,
+        )
+        .first()
+    )
+
+
+def variant_bytes(variant: PhotoVariant) -> Optional[bytes]:
+    """Octets d'une variante (blob store, sinon colonne data)."""
+    return read_blob_or_column(variant.blob_key, variant.data)
+
+
+def save_variant(db: Session, photo_id: int, rendition: str, fmt: str, jpeg_size: int,
+                 data: Optional[bytes]) -> Optional[bytes]:
+    """Enregistre une variante encodée; retourne les octets à servir (None: servir le JPEG)."""
+    keep = data if data and len(data) < int(jpeg_size) else None
+    blob_key = None
+    store = get_blob_store()
+    if keep is not None and store is not None:
+        try:
+            blob_key = store.put(keep, MEDIA_TYPES[fmt])
+        except Exception as e:
+            print(f"[PhotoVariants] blob write failed photo_id={photo_id} {rendition}/{fmt}, keeping bytes in DB: {e}")
+    try:
+        db.add(PhotoVariant(
+            photo_id=photo_id,
+            rendition=rendition,
+            format=fmt,
+            data=keep if blob_key is None else None,
+            blob_key=blob_key,
+            size_bytes=len(data) if data else None,
+            source_size_bytes=int(jpeg_size),
+        ))
+        db.commit()
+    except IntegrityError:
+        # Calculée en parallèle par une autre requête
+        db.rollback()
+    except Exception as e:
+        db.rollback()
+        print(f"[PhotoVariants] save failed photo_id={photo_id} {rendition}/{fmt}: {e}")
+    return keep
+
+
+class EgressCounters:
+    """Octets servis en WebP/AVIF et économie par rapport au JPEG (processus courant)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def record(self, fmt: str, served_bytes: int, jpeg_bytes: int):
+        with self._lock:
+            c = self._counters.setdefault(fmt, {"served": 0, "bytes_served": 0, "bytes_saved": 0})
+            c["served"] += 1
+            c["bytes_served"] += int(served_bytes)
+            c["bytes_saved"] += max(0, int(jpeg_bytes) - int(served_bytes))
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {fmt: dict(c) for fmt, c in self._counters.items()}
+
+
+egress_counters = EgressCounters()
+
+
+def variant_stats(db: Session) -> Dict:
+    """Tailles enregistrées par format/déclinaison et compteurs d'egress du processus."""
+    rows = (
+        db.query(
+            PhotoVariant.format,
+            PhotoVariant.rendition,
+            func.count(PhotoVariant.id),
+            func.sum(case((or_(PhotoVariant.data.isnot(None), PhotoVariant.blob_key.isnot(None)), 1), else_=0)),
+            func.coalesce(func.sum(PhotoVariant.size_bytes), 0),
+            func.coalesce(func.sum(PhotoVariant.source_size_bytes), 0),
+        )
+        .group_by(PhotoVariant.format, PhotoVariant.rendition)
+        .all()
+    )
+    by_format: Dict[str, Dict] = {}
+    for fmt, rendition, count, kept, size_bytes, jpeg_bytes in rows:
+        entry = by_format.setdefault(fmt, {"renditions": {}})
+        entry["renditions"][rendition] = {
+            "variants": int(count),
+            "smaller_than_jpeg": int(kept or 0),
+            "size_mb": round(int(size_bytes) / (1024 * 1024), 2),
+            "jpeg_size_mb": round(int(jpeg_bytes) / (1024 * 1024), 2),
+            "average_saving_ratio": round((1 - int(size_bytes) / int(jpeg_bytes)) * 100, 2) if jpeg_bytes else 0,
+        }
+    egress = egress_counters.snapshot()
+    for fmt, counters in egress.items():
+        by_format.setdefault(fmt, {"renditions": {}})["egress"] = {
+            "served": counters["served"],
+            "served_mb": round(counters["bytes_served"] / (1024 * 1024), 2),
+            "saved_mb": round(counters["bytes_saved"] / (1024 * 1024), 2),
+        }
+    return {"enabled_formats": list(_ENABLED_FORMATS), "formats": by_format}
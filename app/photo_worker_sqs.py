@@ -12,6 +12,23 @@ Architecture:
        met à jour la DB (status=DONE ou FAILED)
     4. Si succès: supprime le message SQS. Si échec: laisse le message pour retry/DLQ.
 
+Concurrence:
+    - Les messages sont reçus par lots (PHOTO_SQS_MAX_MESSAGES, max 10) et traités dans un
+      pool de threads borné (PHOTO_WORKER_COUNT). On ne reçoit que ce que le pool peut
+      absorber: un message n'est jamais reçu sans slot libre pour le traiter, et un lot
+      n'occupe jamais plus de tâches que de threads libres (_plan_chunks).
+    - Un thread heartbeat prolonge la visibilité (change_message_visibility) des messages
+      encore en cours lorsqu'il reste moins de PHOTO_SQS_HEARTBEAT_SECONDS, pour éviter
+      qu'un traitement Rekognition lent ne soit redélivré (double indexation).
+    - Les acquittements sont regroupés et envoyés via delete_message_batch.
+    - Un lot reçu est regroupé par event_id: chaque groupe partage une session DB et un
+      contexte d'événement préparé une fois (prepare_event_for_batch, réutilisé pendant
+      PHOTO_WORKER_EVENT_CONTEXT_TTL, invités de l'événement relus à chaque groupe), et ses
+      statuts sont écrits en une transaction.
+
+La file est accédée via job_queue.get_job_queue("photo"): SQS en production, ou file
+locale SQLite (JOB_QUEUE_BACKEND=sqlite) avec la même sémantique de visibility timeout.
+
 Gestion idempotente des messages orphelins:
     - PhotoNotFoundError: La photo référencée n'existe plus en DB. Cela peut arriver si:
         * Une suppression en masse a été effectuée pendant que le message était en queue
@@ -35,14 +52,18 @@ import json
 import time
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 import boto3
 from botocore.exceptions import ClientError
 
 from settings import settings
 from aws_face_recognizer import PhotoNotFoundError
+from event_bus import event_bus, photographer_topic
+from job_queue import SQS_MAX_BATCH
+from priority_limiter import priority_context, BULK
 
 
 # État global du worker
@@ -64,20 +85,37 @@ class PhotoWorkerSQS:
             "total_processed": 0,
             "total_failed": 0,
             "total_received": 0,
+            "total_duplicates": 0,
             "last_poll_at": None,
             "last_error": None,
         }
         self._stats_lock = threading.Lock()
         
+        # Pool de traitement et messages en vol: receipt_handle -> {message_id, visible_until}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        self._inflight_cond = threading.Condition()
+        self._active_jobs = 0
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        # Acquittements en attente d'un delete_message_batch
+        self._pending_acks: List[str] = []
+        self._acks_lock = threading.Lock()
+        
+        # Contextes d'événement préparés: event_id -> (prepared_at, contexte sans allowed_user_ids)
+        self._event_contexts: Dict[int, tuple] = {}
+        self._event_contexts_lock = threading.Lock()
+        # Verrou de préparation par événement (une seule préparation à la fois par événement),
+        # retiré avec le contexte expiré (_prune_event_contexts)
+        self._event_context_locks: Dict[int, threading.Lock] = {}
+        
         # Clients AWS (créés à la demande)
-        self._sqs_client = None
         self._s3_client = None
     
     @property
-    def sqs_client(self):
-        if self._sqs_client is None:
-            self._sqs_client = boto3.client("sqs", region_name=settings.AWS_REGION)
-        return self._sqs_client
+    def queue(self):
+        """File de jobs (SQS ou locale selon JOB_QUEUE_BACKEND)."""
+        from job_queue import get_job_queue
+        return get_job_queue("photo")
     
     @property
     def s3_client(self):
@@ -89,6 +127,8 @@ class PhotoWorkerSQS:
         """Démarre le worker dans un thread daemon."""
         if not settings.is_sqs_configured:
             print("[PhotoWorkerSQS] SQS not configured, worker disabled")
+            if settings.uses_local_job_queue and not settings.PHOTO_BUCKET_NAME:
+                print("[PhotoWorkerSQS]   JOB_QUEUE_BACKEND=sqlite still needs PHOTO_BUCKET_NAME (raw photos are staged on S3)")
             print(f"[PhotoWorkerSQS]   PHOTO_BUCKET_NAME={settings.PHOTO_BUCKET_NAME}")
             print(f"[PhotoWorkerSQS]   PHOTO_SQS_QUEUE_URL={settings.PHOTO_SQS_QUEUE_URL}")
             return
@@ -102,13 +142,26 @@ class PhotoWorkerSQS:
             return
         
         self._running = True
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._concurrency(),
+            thread_name_prefix="PhotoWorkerSQS-job",
+        )
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop,
+            name="PhotoWorkerSQS-heartbeat",
+            daemon=True
+        )
+        self._heartbeat_thread.start()
         self._thread = threading.Thread(
             target=self._worker_loop,
             name="PhotoWorkerSQS",
             daemon=True
         )
         self._thread.start()
-        print(f"[PhotoWorkerSQS] Worker started (queue={settings.PHOTO_SQS_QUEUE_URL})")
+        print(
+            f"[PhotoWorkerSQS] Worker started (backend={settings.JOB_QUEUE_BACKEND} queue={settings.PHOTO_SQS_QUEUE_URL} "
+            f"concurrency={self._concurrency()} batch={settings.PHOTO_SQS_MAX_MESSAGES})"
+        )
     
     def stop(self, timeout: float = 30.0):
         """Arrête proprement le worker."""
@@ -118,16 +171,40 @@ class PhotoWorkerSQS:
         print("[PhotoWorkerSQS] Stopping worker...")
         self._running = False
         
+        with self._inflight_cond:
+            self._inflight_cond.notify_all()
+        
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=timeout)
         
+        # Laisser les jobs en cours se terminer (le heartbeat tourne encore), puis acquitter
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._flush_acks()
+        
+        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+            self._heartbeat_thread.join(timeout=5.0)
+        
         self._thread = None
+        self._heartbeat_thread = None
         print("[PhotoWorkerSQS] Worker stopped")
     
     def get_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques du worker."""
         with self._stats_lock:
-            return {**self._stats, "running": self._running}
+            stats = {**self._stats, "running": self._running, "queue_backend": settings.JOB_QUEUE_BACKEND}
+        with self._inflight_cond:
+            stats["inflight"] = len(self._inflight)
+            stats["active_jobs"] = self._active_jobs
+        with self._acks_lock:
+            stats["pending_acks"] = len(self._pending_acks)
+        stats["concurrency"] = self._concurrency()
+        return stats
+    
+    @staticmethod
+    def _concurrency() -> int:
+        return max(1, int(settings.PHOTO_WORKER_COUNT or 1))
     
     def _worker_loop(self):
         """Boucle principale du worker."""
@@ -147,35 +224,51 @@ class PhotoWorkerSQS:
         print(f"[PhotoWorkerSQS] Worker loop ended")
     
     def _poll_and_process(self):
-        """Effectue un poll SQS et traite les messages reçus."""
+        """Effectue un poll SQS, regroupe les messages par événement et les soumet au pool."""
         try:
+            self._flush_acks()
+            
+            # Ne recevoir que si un thread du pool est libre
+            with self._inflight_cond:
+                while self._running and self._active_jobs >= self._concurrency():
+                    self._inflight_cond.wait(timeout=1.0)
+                free_threads = self._concurrency() - self._active_jobs
+                busy = self._active_jobs > 0
+            if not self._running:
+                return
+            
             with self._stats_lock:
                 self._stats["last_poll_at"] = time.time()
             
-            # Long polling SQS
-            response = self.sqs_client.receive_message(
-                QueueUrl=settings.PHOTO_SQS_QUEUE_URL,
-                MaxNumberOfMessages=settings.PHOTO_SQS_MAX_MESSAGES,
-                WaitTimeSeconds=settings.PHOTO_SQS_WAIT_TIME_SECONDS,
-                VisibilityTimeout=settings.PHOTO_SQS_VISIBILITY_TIMEOUT,
-                MessageAttributeNames=["All"],
+            # Long polling SQS (raccourci si des jobs sont en cours, pour acquitter rapidement)
+            visibility_timeout = settings.PHOTO_SQS_VISIBILITY_TIMEOUT
+            messages = self.queue.receive(
+                max_messages=max(1, min(SQS_MAX_BATCH, settings.PHOTO_SQS_MAX_MESSAGES)),
+                wait_seconds=min(settings.PHOTO_SQS_WAIT_TIME_SECONDS, 1) if busy else settings.PHOTO_SQS_WAIT_TIME_SECONDS,
+                visibility_timeout=visibility_timeout,
             )
             
-            messages = response.get("Messages", [])
-            
             if not messages:
-                # Aucun message, attendre un peu avant le prochain poll
-                time.sleep(settings.PHOTO_WORKER_POLL_INTERVAL)
+                if not busy:
+                    # Aucun message, attendre un peu avant le prochain poll
+                    time.sleep(settings.PHOTO_WORKER_POLL_INTERVAL)
                 return
             
             with self._stats_lock:
                 self._stats["total_received"] += len(messages)
             
-            for message in messages:
-                if not self._running:
-                    break
-                
-                self._process_message(message)
+            received_at = time.time()
+            with self._inflight_cond:
+                for message in messages:
+                    self._inflight[message.get("ReceiptHandle")] = {
+                        "message_id": message.get("MessageId", "unknown"),
+                        "visible_until": received_at + visibility_timeout,
+                    }
+            
+            for task in self._plan_chunks(messages, free_threads):
+                with self._inflight_cond:
+                    self._active_jobs += 1
+                self._executor.submit(self._run_task, task)
         
         except ClientError as e:
             error_code = e.response.get("Error", {}).get("Code", "")
@@ -185,102 +278,351 @@ class PhotoWorkerSQS:
             else:
                 raise
     
-    def _process_message(self, message: Dict):
+    @staticmethod
+    def _plan_chunks(messages: List[Dict], free_threads: int) -> List[List[tuple]]:
         """
-        Traite un message SQS individuel.
+        Répartit un lot reçu en au plus free_threads tâches (une par thread libre).
+
+        Les messages sont regroupés par event_id. Moins de groupes que de threads: les plus
+        gros groupes sont découpés pour occuper les threads libres. Plus de groupes que de
+        threads: les groupes sont répartis (du plus gros au moins chargé) et une tâche traite
+        ses groupes l'un après l'autre. Retourne [[(event_id, [(message, body), ...]), ...], ...];
+        event_id=None pour les messages malformés.
+        """
+        groups: Dict[Any, List[tuple]] = {}
+        for message in messages:
+            try:
+                body = json.loads(message.get("Body", "{}"))
+            except Exception:
+                body = {}
+            if not isinstance(body, dict):
+                body = {}
+            try:
+                event_id = int(body.get("event_id")) if body.get("event_id") is not None else None
+            except (TypeError, ValueError):
+                event_id = None
+            groups.setdefault(event_id, []).append((message, body))
+        
+        slots = max(1, free_threads)
+        ordered = sorted(groups.items(), key=lambda group: len(group[1]), reverse=True)
+        if len(ordered) >= slots:
+            tasks: List[List[tuple]] = [[] for _ in range(slots)]
+            loads = [0] * slots
+            for event_id, items in ordered:
+                target = loads.index(min(loads))
+                tasks[target].append((event_id, items))
+                loads[target] += len(items)
+            return [task for task in tasks if task]
+        
+        # Un thread par groupe, puis les threads restants au groupe aux plus gros morceaux
+        shares = [1] * len(ordered)
+        for _ in range(slots - len(ordered)):
+            candidates = [i for i, (_e, items) in enumerate(ordered) if shares[i] < len(items)]
+            if not candidates:
+                break
+            best = max(candidates, key=lambda i: -(-len(ordered[i][1]) // shares[i]))
+            shares[best] += 1
+        tasks = []
+        for (event_id, items), share in zip(ordered, shares):
+            size = -(-len(items) // share)
+            for start in range(0, len(items), size):
+                tasks.append([(event_id, items[start:start + size])])
+        return tasks
+    
+    def _run_task(self, groups: List[tuple]):
+        """Exécute les groupes d'une tâche (un par événement) puis libère le thread et les messages."""
+        try:
+            for event_id, items in groups:
+                try:
+                    # Ingestion = classe bulk: ne consomme jamais les slots Rekognition réservés aux selfies
+                    with priority_context(BULK):
+                        self._process_group(event_id, items)
+                except Exception as e:
+                    print(f"[PhotoWorkerSQS] Unexpected error in job thread event_id={event_id}: {e}")
+                    traceback.print_exc()
+        finally:
+            with self._inflight_cond:
+                for _event_id, items in groups:
+                    for message, _body in items:
+                        self._inflight.pop(message.get("ReceiptHandle"), None)
+                self._active_jobs -= 1
+                self._inflight_cond.notify_all()
+    
+    def _heartbeat_loop(self):
+        """Prolonge la visibilité des messages en cours et vide les acquittements en attente."""
+        heartbeat = max(5, int(settings.PHOTO_SQS_HEARTBEAT_SECONDS or 60))
+        tick = min(5.0, heartbeat / 2.0)
+        while self._running or self._executor is not None:
+            time.sleep(tick)
+            self._flush_acks()
+            
+            now = time.time()
+            with self._inflight_cond:
+                due = [
+                    (handle, info) for handle, info in self._inflight.items()
+                    if info["visible_until"] - now < heartbeat
+                ]
+            for handle, info in due:
+                timeout = settings.PHOTO_SQS_VISIBILITY_TIMEOUT
+                try:
+                    self.queue.change_visibility(handle, timeout)
+                except Exception as e:
+                    print(f"[PhotoWorkerSQS] Heartbeat failed message_id={info['message_id']}: {e}")
+                    continue
+                with self._inflight_cond:
+                    if handle in self._inflight:
+                        self._inflight[handle]["visible_until"] = time.time() + timeout
+                print(f"[PhotoWorkerSQS] Heartbeat message_id={info['message_id']} visibility_extended_s={timeout}")
+    
+    def _process_group(self, event_id: Optional[int], items: List[tuple]):
+        """
+        Traite un groupe de messages SQS du même événement avec une seule session DB.
+        
+        L'événement est préparé une fois (collection, purge, selfies, utilisateurs autorisés),
+        les statuts PROCESSING puis DONE/FAILED sont écrits pour tout le groupe en une
+        transaction; le coût par photo se limite à la détection et l'indexation.
         
         Gestion idempotente des messages SQS:
+        - Message malformé: suppression (évite une boucle infinie)
+        - Photo déjà DONE (redélivrance): acquittement sans retraitement
         - PhotoNotFoundError: cas logique (suppression async, rollback) → WARNING + suppression du message
-        - Autres erreurs: log ERROR + laisser le message pour retry/DLQ
+        - Autres erreurs: log ERROR + statut FAILED + laisser le message pour retry/DLQ
         """
-        receipt_handle = message.get("ReceiptHandle")
-        message_id = message.get("MessageId", "unknown")
-        photo_id = None
-        event_id = None
+        from database import SessionLocal
+        from models import Photo
         
-        try:
-            # Parser le corps du message
-            body = json.loads(message.get("Body", "{}"))
+        jobs: List[Dict[str, Any]] = []
+        for message, body in items:
+            receipt_handle = message.get("ReceiptHandle")
+            message_id = message.get("MessageId", "unknown")
             photo_id = body.get("photo_id")
-            event_id = body.get("event_id")
             s3_key = body.get("s3_key")
-            
-            if not all([photo_id, event_id, s3_key]):
+            if event_id is None or not photo_id or not s3_key:
                 print(f"[PhotoWorkerSQS] Invalid message {message_id}: missing required fields")
                 print(f"[PhotoWorkerSQS]   body={body}")
                 # Supprimer le message malformé pour éviter une boucle infinie
-                self._delete_message(receipt_handle)
+                self._ack(receipt_handle)
+                continue
+            jobs.append({
+                "photo_id": int(photo_id),
+                "s3_key": s3_key,
+                "receipt_handle": receipt_handle,
+                "message_id": message_id,
+            })
+        if not jobs:
+            return
+        
+        db = SessionLocal()
+        try:
+            # Statuts actuels en une requête: idempotence et messages orphelins
+            photo_ids = [job["photo_id"] for job in jobs]
+            current = {
+                row[0]: (row[1], row[2])
+                for row in db.query(Photo.id, Photo.processing_status, Photo.upload_batch_id)
+                .filter(Photo.id.in_(photo_ids)).all()
+            }
+            todo: List[Dict[str, Any]] = []
+            for job in jobs:
+                photo_id = job["photo_id"]
+                if photo_id not in current:
+                    print(f"[PhotoWorkerSQS] WARNING: Photo {photo_id} not found in DB, discarding SQS message (event_id={event_id}, message_id={job['message_id']})")
+                    self._ack(job["receipt_handle"])
+                    with self._stats_lock:
+                        self._stats["total_processed"] += 1  # Compté comme "traité" (message consommé)
+                elif current[photo_id][0] == "DONE":
+                    print(f"[PhotoWorkerSQS] photo_id={photo_id} already DONE, skipping duplicate message_id={job['message_id']}")
+                    self._ack(job["receipt_handle"])
+                    with self._stats_lock:
+                        self._stats["total_duplicates"] += 1
+                else:
+                    job["prev_status"], job["upload_batch_id"] = current[photo_id]
+                    todo.append(job)
+            if not todo:
                 return
             
+            self._set_photos_status(db, [job["photo_id"] for job in todo], "PROCESSING")
+            
+            _t_prep = time.perf_counter()
+            event_context = self._get_event_context(event_id, db)
+            print(
+                f"[PhotoWorkerSQS] event_id={event_id} group_size={len(todo)} "
+                f"t_prepare_ms={int((time.perf_counter() - _t_prep) * 1000)}"
+            )
+            
+            outcomes: List[Dict[str, Any]] = []
+            for job in todo:
+                outcome = self._process_job(db, event_id, job, event_context)
+                if outcome:
+                    outcomes.append(outcome)
+                # Ne pas garder les photo_data du groupe dans l'identity map de la session
+                db.expunge_all()
+            
+            self._finalize_group(db, outcomes)
+        finally:
+            try:
+                db.close()
+            except Exception:
+                pass
+    
+    def _process_job(self, db, event_id: int, job: Dict[str, Any], event_context: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        """Traite une photo du groupe. Retourne {job, status, error} (None si message obsolète)."""
+        photo_id = job["photo_id"]
+        s3_key = job["s3_key"]
+        try:
             _t0 = time.perf_counter()
             print(f"[PhotoWorkerSQS] photo_id={photo_id} event_id={event_id} START s3_key={s3_key}")
-
-            # Mettre à jour le statut en DB: PROCESSING
-            self._update_photo_status(photo_id, "PROCESSING")
-            _t_status = time.perf_counter()
-
+            
             # Récupérer l'image depuis S3
             image_bytes = self._download_from_s3(s3_key)
             _t_s3_dl = time.perf_counter()
-
+            
             if not image_bytes:
                 raise ValueError(f"Failed to download image from S3: {s3_key}")
-
-            print(f"[PhotoWorkerSQS] photo_id={photo_id} s3_downloaded size_bytes={len(image_bytes)} t_s3_dl_ms={int((_t_s3_dl - _t_status) * 1000)}")
-
+            
+            print(f"[PhotoWorkerSQS] photo_id={photo_id} s3_downloaded size_bytes={len(image_bytes)} t_s3_dl_ms={int((_t_s3_dl - _t0) * 1000)}")
+            
             # Traiter la photo avec reconnaissance faciale
-            self._process_photo(photo_id, event_id, image_bytes)
+            self._process_photo(photo_id, event_id, image_bytes, db, event_context)
             _t_process = time.perf_counter()
-
-            # Succès: mettre à jour le statut et supprimer le message SQS
-            self._update_photo_status(photo_id, "DONE")
-            batch_state = self._recalculate_upload_batch_for_photo(photo_id)
-            if batch_state:
-                self._send_upload_batch_completion_email_if_needed(batch_state.get("batch_id", ""))
-            self._delete_message(receipt_handle)
-            _t_done = time.perf_counter()
-
-            with self._stats_lock:
-                self._stats["total_processed"] += 1
-
-            print(f"[PhotoWorkerSQS] photo_id={photo_id} DONE t_rekognition_ms={int((_t_process - _t_s3_dl) * 1000)} t_total_ms={int((_t_done - _t0) * 1000)}")
+            
+            print(f"[PhotoWorkerSQS] photo_id={photo_id} processed t_rekognition_ms={int((_t_process - _t_s3_dl) * 1000)} t_total_ms={int((_t_process - _t0) * 1000)}")
+            return {"job": job, "status": "DONE", "error": None}
         
-        except PhotoNotFoundError as e:
+        except PhotoNotFoundError:
             # Cas logique: la photo n'existe plus en DB (suppression async, rollback, etc.)
             # Ce n'est PAS une erreur à retenter - le message SQS est simplement obsolète
-            print(f"[PhotoWorkerSQS] WARNING: Photo {photo_id} not found in DB, discarding SQS message (event_id={event_id}, message_id={message_id})")
-            
-            # Supprimer le message SQS pour éviter les retries inutiles
-            self._delete_message(receipt_handle)
-            
-            # Ne pas compter comme échec - c'est un cas normal dans un système async
+            print(f"[PhotoWorkerSQS] WARNING: Photo {photo_id} not found in DB, discarding SQS message (event_id={event_id}, message_id={job['message_id']})")
+            self._ack(job["receipt_handle"])
             with self._stats_lock:
                 self._stats["total_processed"] += 1  # Compté comme "traité" (message consommé)
-            
-            # Note: on ne met pas à jour le statut en DB car la photo n'existe plus
-            return
+            return None
         
         except Exception as e:
             error_msg = f"{type(e).__name__}: {str(e)}"
-            print(f"[PhotoWorkerSQS] ERROR processing message {message_id}: {error_msg}")
+            print(f"[PhotoWorkerSQS] ERROR processing message {job['message_id']}: {error_msg}")
             traceback.print_exc()
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            return {"job": job, "status": "FAILED", "error": error_msg}
+    
+    def _finalize_group(self, db, outcomes: List[Dict[str, Any]]):
+        """
+        Écrit les statuts finaux du groupe et la progression des lots d'upload en une
+        transaction (compteurs atomiques), puis acquitte les succès.
+        """
+        from models import Photo
+        from upload_batch_progress import transition_deltas, apply_batch_deltas
+        
+        if not outcomes:
+            return
+        
+        batch_deltas: Dict[str, List[int]] = {}
+        batch_states: List[Dict[str, Any]] = []
+        try:
+            for o in outcomes:
+                job = o["job"]
+                values = {Photo.processing_status: o["status"]}
+                if o["error"]:
+                    values[Photo.error_message] = o["error"][:2000]  # Limiter la taille
+                # Transition conditionnelle: une seule finalisation comptée par traitement
+                updated = db.query(Photo).filter(
+                    Photo.id == job["photo_id"],
+                    Photo.processing_status == "PROCESSING",
+                ).update(values, synchronize_session=False)
+                batch_id = (job.get("upload_batch_id") or "").strip()
+                if updated and batch_id:
+                    deltas = transition_deltas(job.get("prev_status"), o["status"])
+                    acc = batch_deltas.setdefault(batch_id, [0, 0, 0])
+                    for i, d in enumerate(deltas):
+                        acc[i] += d
+            for batch_id, (processed, success, error) in batch_deltas.items():
+                state = apply_batch_deltas(db, batch_id, processed=processed, success=success, error=error)
+                if state:
+                    batch_states.append(state)
+            db.commit()
+        except Exception as e:
+            print(f"[PhotoWorkerSQS] Failed to update photo statuses: {e}")
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            # Statuts non persistés: ne pas acquitter, les messages seront retentés
+            return
+        
+        failed = [o for o in outcomes if o["status"] == "FAILED"]
+        with self._stats_lock:
+            self._stats["total_processed"] += len(outcomes) - len(failed)
+            self._stats["total_failed"] += len(failed)
+            if failed:
+                self._stats["last_error"] = failed[-1]["error"]
+        
+        for state in batch_states:
+            if state.get("photographer_id"):
+                # Progression temps réel du lot (flux SSE du photographe)
+                event_bus.publish(
+                    photographer_topic(state["photographer_id"]),
+                    "upload_batch_completed" if state.get("completed") else "upload_batch_progress",
+                    state,
+                )
+            if state.get("completed"):
+                self._send_upload_batch_completion_email_if_needed(state["batch_id"])
+        
+        # Succès: supprimer les messages. Échecs: laisser pour retry via VisibilityTimeout ou DLQ
+        for o in outcomes:
+            if o["status"] == "DONE":
+                self._ack(o["job"]["receipt_handle"])
+                print(f"[PhotoWorkerSQS] photo_id={o['job']['photo_id']} DONE")
+    
+    def _get_event_context(self, event_id: int, db) -> Optional[Dict[str, Any]]:
+        """
+        Contexte d'événement préparé une fois puis partagé par les groupes du même événement
+        pendant PHOTO_WORKER_EVENT_CONTEXT_TTL secondes (None si le moteur ne le supporte pas).
+
+        La préparation est faite sous un verrou propre à l'événement (les groupes du même
+        événement l'attendent, les autres événements ne sont pas bloqués). Les invités de
+        l'événement (allowed_user_ids) ne sont pas gardés en cache: relus à chaque groupe pour
+        qu'un invité arrivé entre-temps soit matché.
+        """
+        from recognizer_factory import get_face_recognizer
+        face_recognizer = get_face_recognizer()
+        if not hasattr(face_recognizer, "prepare_event_for_batch"):
+            return None
+        
+        ttl = float(settings.PHOTO_WORKER_EVENT_CONTEXT_TTL or 0)
+        with self._event_contexts_lock:
+            self._prune_event_contexts(ttl)
+            event_lock = self._event_context_locks.setdefault(event_id, threading.Lock())
+        with event_lock:
+            cached = self._event_contexts.get(event_id)
+            if cached and ttl > 0 and time.time() - cached[0] < ttl:
+                context = dict(cached[1])
+                context["allowed_user_ids"] = face_recognizer._get_allowed_event_user_ids(event_id, db)
+                return context
             
-            with self._stats_lock:
-                self._stats["total_failed"] += 1
-                self._stats["last_error"] = error_msg
-            
-            # Mettre à jour le statut en DB: FAILED avec le message d'erreur
-            if photo_id:
-                try:
-                    self._update_photo_status(photo_id, "FAILED", error_msg)
-                    batch_state = self._recalculate_upload_batch_for_photo(photo_id)
-                    if batch_state:
-                        self._send_upload_batch_completion_email_if_needed(batch_state.get("batch_id", ""))
-                except Exception:
-                    pass
-            
-            # NE PAS supprimer le message SQS en cas d'échec réel
-            # Il sera retenté après le VisibilityTimeout ou envoyé en DLQ
+            context = face_recognizer.prepare_event_for_batch(event_id, db)
+            if not isinstance(context, dict):
+                return None
+            shared = {k: v for k, v in context.items() if k != "allowed_user_ids"}
+            with self._event_contexts_lock:
+                self._event_contexts[event_id] = (time.time(), shared)
+            return context
+    
+    def _prune_event_contexts(self, ttl: float):
+        """
+        Retire les contextes expirés et les verrous des événements sans préparation en cours
+        (appelé sous _event_contexts_lock): la mémoire reste bornée aux événements actifs.
+        Un verrou retiré pendant qu'un thread s'apprête à le prendre coûte au pire une
+        préparation en double.
+        """
+        now = time.time()
+        for event_id, (prepared_at, _context) in list(self._event_contexts.items()):
+            if ttl <= 0 or now - prepared_at >= ttl:
+                del self._event_contexts[event_id]
+        for event_id, lock in list(self._event_context_locks.items()):
+            if event_id not in self._event_contexts and not lock.locked():
+                del self._event_context_locks[event_id]
     
     def _download_from_s3(self, s3_key: str) -> Optional[bytes]:
         """Télécharge un fichier depuis S3."""
@@ -298,109 +640,20 @@ class PhotoWorkerSQS:
                 print(f"[PhotoWorkerSQS] S3 error: {e}")
             return None
     
-    def _process_photo(self, photo_id: int, event_id: int, image_bytes: bytes):
-        """Traite une photo avec reconnaissance faciale."""
-        from database import SessionLocal
+    def _process_photo(self, photo_id: int, event_id: int, image_bytes: bytes, db, event_context: Optional[Dict] = None):
+        """Traite une photo avec reconnaissance faciale (session et contexte partagés par le groupe)."""
         from recognizer_factory import get_face_recognizer
         
-        db = SessionLocal()
-        try:
-            face_recognizer = get_face_recognizer()
-            
-            # Utiliser la nouvelle méthode qui travaille avec des bytes
-            face_recognizer.process_photo_from_bytes(
-                photo_id=photo_id,
-                image_bytes=image_bytes,
-                event_id=event_id,
-                db=db
-            )
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
-
-    def _recalculate_upload_batch_for_photo(self, photo_id: int) -> Dict[str, Any] | None:
-        """Recalcule l'état d'un lot d'upload à partir des photos déjà persistées."""
-        from database import SessionLocal
-        from models import Photo, PhotographerUploadBatch, PhotoProcessingStatus
-
-        db = SessionLocal()
-        try:
-            photo = db.query(Photo).filter(Photo.id == photo_id).first()
-            if not photo or not getattr(photo, "upload_batch_id", None):
-                print(f"[UPLOAD-BATCH] skipped no_batch photo_id={photo_id}")
-                return None
-
-            batch_id = str(photo.upload_batch_id).strip()
-            batch = db.query(PhotographerUploadBatch).filter(
-                PhotographerUploadBatch.upload_batch_id == batch_id
-            ).first()
-            if not batch:
-                return None
-
-            lot_photos = db.query(Photo).filter(Photo.upload_batch_id == batch_id)
-            actual_total = lot_photos.count()
-            processed_count = lot_photos.filter(
-                Photo.processing_status.in_([
-                    PhotoProcessingStatus.DONE.value,
-                    PhotoProcessingStatus.FAILED.value,
-                ])
-            ).count()
-            success_count = lot_photos.filter(
-                Photo.processing_status == PhotoProcessingStatus.DONE.value
-            ).count()
-            error_count = lot_photos.filter(
-                Photo.processing_status == PhotoProcessingStatus.FAILED.value
-            ).count()
-
-            total_photos = max(int(batch.total_photos or 0), int(actual_total or 0))
-            batch.total_photos = total_photos
-            batch.processed_count = processed_count
-            batch.success_count = success_count
-            batch.error_count = error_count
-
-            is_completed = total_photos > 0 and processed_count >= total_photos
-            if is_completed and error_count == 0:
-                batch.status = "DONE"
-            elif is_completed and error_count > 0 and success_count > 0:
-                batch.status = "PARTIAL"
-            elif is_completed and success_count == 0 and error_count > 0:
-                batch.status = "FAILED"
-            else:
-                batch.status = "PENDING" if processed_count == 0 else "PROCESSING"
-
-            batch.completed_at = datetime.utcnow() if is_completed else None
-            db.commit()
-
-            print(
-                f"[UPLOAD-BATCH] progress batch_id={batch_id} total={total_photos} "
-                f"processed={processed_count} success={success_count} error={error_count} status={batch.status}"
-            )
-            if is_completed:
-                print(f"[UPLOAD-BATCH] completed batch_id={batch_id} status={batch.status}")
-
-            return {
-                "batch_id": batch_id,
-                "total_photos": total_photos,
-                "processed_count": processed_count,
-                "success_count": success_count,
-                "error_count": error_count,
-                "status": batch.status,
-                "completed": is_completed,
-            }
-        except Exception as e:
-            print(f"[UPLOAD-BATCH] error photo_id={photo_id}: {type(e).__name__}: {e}")
-            try:
-                db.rollback()
-            except Exception:
-                pass
-            return None
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
+        face_recognizer = get_face_recognizer()
+        
+        # Utiliser la nouvelle méthode qui travaille avec des bytes
+        face_recognizer.process_photo_from_bytes(
+            photo_id=photo_id,
+            image_bytes=image_bytes,
+            event_id=event_id,
+            db=db,
+            event_context=event_context,
+        )
 
     def _send_upload_batch_completion_email_if_needed(self, batch_id: str) -> bool:
         """Envoie une notification email au photographe si le lot est terminé et non encore notifié."""
@@ -513,40 +766,48 @@ class PhotoWorkerSQS:
             except Exception:
                 pass
     
-    def _update_photo_status(self, photo_id: int, status: str, error_message: str = None):
-        """Met à jour le statut d'une photo en DB."""
-        from database import SessionLocal
+    def _set_photos_status(self, db, photo_ids: List[int], status: str):
+        """Met à jour le statut de plusieurs photos en une transaction."""
         from models import Photo
         
-        db = SessionLocal()
+        if not photo_ids:
+            return
         try:
-            photo = db.query(Photo).filter(Photo.id == photo_id).first()
-            if photo:
-                photo.processing_status = status
-                if error_message:
-                    photo.error_message = error_message[:2000]  # Limiter la taille
-                db.commit()
+            db.query(Photo).filter(Photo.id.in_(photo_ids)).update(
+                {Photo.processing_status: status}, synchronize_session=False
+            )
+            db.commit()
         except Exception as e:
             print(f"[PhotoWorkerSQS] Failed to update photo status: {e}")
             try:
                 db.rollback()
             except Exception:
                 pass
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     
-    def _delete_message(self, receipt_handle: str):
-        """Supprime un message de la file SQS."""
+    def _ack(self, receipt_handle: str):
+        """Marque un message comme traité; il sera supprimé au prochain delete_message_batch."""
+        if not receipt_handle:
+            return
+        with self._acks_lock:
+            self._pending_acks.append(receipt_handle)
+            full_batch = len(self._pending_acks) >= SQS_MAX_BATCH
+        if full_batch:
+            self._flush_acks()
+    
+    def _flush_acks(self):
+        """Supprime de la file les messages acquittés (delete_message_batch, par 10)."""
+        with self._acks_lock:
+            handles, self._pending_acks = self._pending_acks, []
+        if not handles:
+            return
         try:
-            self.sqs_client.delete_message(
-                QueueUrl=settings.PHOTO_SQS_QUEUE_URL,
-                ReceiptHandle=receipt_handle
-            )
-        except ClientError as e:
-            print(f"[PhotoWorkerSQS] Failed to delete message: {e}")
+            failed = self.queue.delete_batch(handles)
+        except Exception as e:
+            print(f"[PhotoWorkerSQS] Failed to delete message batch: {e}")
+            failed = handles
+        if failed:
+            # Handles expirés: le message sera redélivré puis ignoré (photo déjà DONE)
+            print(f"[PhotoWorkerSQS] delete_message_batch failed for {len(failed)}/{len(handles)} messages")
 
 
 # Instance singleton du worker
@@ -0,0 +1,194 @@
+"""
+Classes de priorité et limiteurs de concurrence à slots réservés.
+
+Trois classes:
+    - interactive: travail déclenché par un utilisateur qui attend (selfie -> photos)
+    - bulk:        ingestion de photos (worker SQS, uploads)
+    - maintenance: rematch d'événement, snapshots admin, purges
+
+PriorityLimiter(total, reserved): chaque classe dispose de `reserved[classe]` slots que
+les autres ne peuvent pas prendre; le reste (total - somme des réservés) est partagé.
+Quand un slot partagé se libère, les demandes interactives en attente passent avant bulk
+et maintenance. Un selfie uploadé pendant un gros upload obtient donc toujours un slot.
+
+La classe courante est portée par le thread (priority_context) pour que les appels
+profonds (ex: AwsFaceRecognizer._rek_call) la connaissent sans la passer en paramètre.
+Les pools internes doivent propager la classe avec bind_priority(fn).
+
+Usage:
+    from priority_limiter import INTERACTIVE, priority_context
+
+    with priority_context(INTERACTIVE):
+        face_recognizer.match_user_selfie_with_photos_event(user, event_id, db)
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+MAINTENANCE = "maintenance"
+PRIORITY_CLASSES = (INTERACTIVE, BULK, MAINTENANCE)
+
+# Rang de service des slots partagés (plus petit = servi d'abord)
+_RANK = {INTERACTIVE: 0, BULK: 1, MAINTENANCE: 2}
+
+_local = threading.local()
+
+
+def current_priority() -> str:
+    """Classe de priorité du thread courant (bulk par défaut)."""
+    return getattr(_local, "priority", None) or BULK
+
+
+@contextmanager
+def priority_context(priority: str):
+    """Exécute le bloc avec la classe de priorité donnée pour le thread courant."""
+    if priority not in _RANK:
+        priority = BULK
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def bind_priority(fn: Callable, priority: Optional[str] = None) -> Callable:
+    """Enveloppe fn pour qu'elle s'exécute (dans un autre thread) avec la priorité courante."""
+    priority = priority or current_priority()
+
+    def _run(*args, **kwargs):
+        with priority_context(priority):
+            return fn(*args, **kwargs)
+
+    return _run
+
+
+class PriorityLimiter:
+    """Limiteur de concurrence à slots réservés par classe + slots partagés priorisés."""
+
+    def __init__(self, name: str, total: int, reserved: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.reserved = {cls: max(0, int((reserved or {}).get(cls, 0))) for cls in PRIORITY_CLASSES}
+        self.total = max(int(total), sum(self.reserved.values()), 1)
+        self.shared = self.total - sum(self.reserved.values())
+        self._cond = threading.Condition()
+        self._reserved_used = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._shared_used = 0
+        self._waiting = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._acquired = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._timeouts = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._wait_seconds = {cls: 0.0 for cls in PRIORITY_CLASSES}
+
+    def _try_acquire(self, cls: str) -> Optional[str]:
+        if self._reserved_used[cls] < self.reserved[cls]:
+            self._reserved_used[cls] += 1
+            return "reserved"
+        if self._shared_used < self.shared:
+            # Céder les slots partagés aux classes plus prioritaires en attente
+            if any(self._waiting[c] > 0 for c in PRIORITY_CLASSES if _RANK[c] < _RANK[cls]):
+                return None
+            self._shared_used += 1
+            return "shared"
+        return None
+
+    def acquire(self, priority: Optional[str] = None, timeout: Optional[float] = None) -> Optional[str]:
+        """Prend un slot. Retourne un jeton ('reserved'/'shared') ou None si timeout."""
+        cls = priority if priority in _RANK else current_priority()
+        deadline = None if timeout is None else time.time() + timeout
+        t0 = time.time()
+        with self._cond:
+            token = self._try_acquire(cls)
+            if token is None:
+                self._waiting[cls] += 1
+                try:
+                    while token is None:
+                        remaining = None if deadline is None else deadline - time.time()
+                        if remaining is not None and remaining <= 0:
+                            self._timeouts[cls] += 1
+                            return None
+                        self._cond.wait(remaining)
+                        token = self._try_acquire(cls)
+                finally:
+                    self._waiting[cls] -= 1
+            self._acquired[cls] += 1
+            self._wait_seconds[cls] += time.time() - t0
+            return token
+
+    def release(self, priority: str, token: Optional[str]):
+        if token is None:
+            return
+        cls = priority if priority in _RANK else BULK
+        with self._cond:
+            if token == "reserved":
+                self._reserved_used[cls] = max(0, self._reserved_used[cls] - 1)
+            else:
+                self._shared_used = max(0, self._shared_used - 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, timeout: Optional[float] = None):
+        """Contexte avec slot. Yield True si obtenu, False après timeout (l'appelant décide)."""
+        cls = priority if priority in _RANK else current_priority()
+        token = self.acquire(cls, timeout=timeout)
+        try:
+            yield token is not None
+        finally:
+            self.release(cls, token)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "name": self.name,
+                "total": self.total,
+                "shared": self.shared,
+                "shared_in_use": self._shared_used,
+                "classes": {
+                    cls: {
+                        "reserved": self.reserved[cls],
+                        "reserved_in_use": self._reserved_used[cls],
+                        "waiting": self._waiting[cls],
+                        "acquired": self._acquired[cls],
+                        "timeouts": self._timeouts[cls],
+                        "avg_wait_ms": round(
+                            self._wait_seconds[cls] * 1000.0 / self._acquired[cls], 1
+                        ) if self._acquired[cls] else 0.0,
+                    }
+                    for cls in PRIORITY_CLASSES
+                },
+            }
+
+
+class PriorityExecutor:
+    """
+    Pool de threads par classe de priorité (concurrence réservée): un rematch d'événement
+    (maintenance) ne peut plus occuper le thread qui sert les selfies (interactive).
+    Chaque tâche s'exécute dans le priority_context de sa classe.
+    """
+
+    def __init__(self, name: str, workers: Dict[str, int]):
+        self.name = name
+        self._pools = {
+            cls: ThreadPoolExecutor(
+                max_workers=max(1, int(workers.get(cls, 1))),
+                thread_name_prefix=f"{name}-{cls}",
+            )
+            for cls in PRIORITY_CLASSES
+        }
+        self._workers = {cls: max(1, int(workers.get(cls, 1))) for cls in PRIORITY_CLASSES}
+
+    def submit(self, priority: str, fn: Callable, *args, **kwargs):
+        cls = priority if priority in _RANK else BULK
+        return self._pools[cls].submit(bind_priority(fn, cls), *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> Dict:
+        return {"name": self.name, "workers": dict(self._workers)}
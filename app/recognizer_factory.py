@@ -1,18 +1,39 @@
 import os
+import threading
 
 
-def get_face_recognizer():
-    """Retourne une instance du recognizer selon la variable d'env FACE_RECOGNIZER_PROVIDER."""
-    provider = os.environ.get("FACE_RECOGNIZER_PROVIDER", "local").strip().lower()
+# Une instance par provider et par process: caches (collections connues, FaceId, filtre qualité,
+# versions de collection) et client/limiteur partagés par l'app, les workers et les threads.
+_recognizers = {}
+_recognizers_lock = threading.Lock()
+
+
+def _create_face_recognizer(provider: str):
     if provider == "azure":
         from azure_face_recognizer import AzureFaceRecognizer
         return AzureFaceRecognizer()
     if provider == "aws":
         from aws_face_recognizer import AwsFaceRecognizer
         return AwsFaceRecognizer()
+    if provider == "aws_fake":
+        # Pipeline AWS complet avec un Rekognition local (dlib + SQLite) pour les benchmarks hors ligne
+        from aws_face_recognizer import AwsFaceRecognizer
+        from fake_rekognition import FakeRekognitionClient
+        return AwsFaceRecognizer(client=FakeRekognitionClient())
     else:
         # Défaut: implémentation locale gratuite
         from face_recognizer import FaceRecognizer
         return FaceRecognizer()
 
 
+def get_face_recognizer():
+    """Retourne l'instance (singleton par process) du recognizer selon FACE_RECOGNIZER_PROVIDER."""
+    provider = os.environ.get("FACE_RECOGNIZER_PROVIDER", "local").strip().lower()
+    recognizer = _recognizers.get(provider)
+    if recognizer is None:
+        with _recognizers_lock:
+            recognizer = _recognizers.get(provider)
+            if recognizer is None:
+                recognizer = _create_face_recognizer(provider)
+                _recognizers[provider] = recognizer
+    return recognizer
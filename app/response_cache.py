@@ -2,6 +2,7 @@
 Cache en mémoire pour les réponses des endpoints utilisateur.
 Réduit la charge sur la DB et AWS pendant les uploads massifs.
 """
+import os
 import time
 import threading
 from typing import Any, Optional, Dict, Callable
@@ -104,6 +105,12 @@ class LRUCache:
 user_photos_cache = LRUCache(max_size=500, default_ttl=30.0)  # Cache court pour les métadonnées photos
 event_cache = LRUCache(max_size=200, default_ttl=120.0)  # Cache plus long pour les événements
 user_cache = LRUCache(max_size=200, default_ttl=60.0)  # Cache pour images + infos utilisateur (limité à 200 pour éviter trop de RAM)
+# Réponses SearchFaces/SearchFacesByImage, clés versionnées par collection: version locale + état
+# en base de l'événement (voir AwsFaceRecognizer._search_cache_key), valables entre process.
+rekognition_search_cache = LRUCache(
+    max_size=int(os.environ.get("AWS_SEARCH_CACHE_MAX", "2000") or "2000"),
+    default_ttl=float(os.environ.get("AWS_SEARCH_CACHE_TTL", "300") or "300"),
+)
 
 
 def cache_response(
@@ -180,5 +187,6 @@ def get_cache_stats() -> Dict[str, Any]:
         "user_photos_cache": user_photos_cache.get_stats(),
         "event_cache": event_cache.get_stats(),
         "user_cache": user_cache.get_stats(),
+        "rekognition_search_cache": rekognition_search_cache.get_stats(),
     }
 
@@ -6,7 +6,7 @@ Utilisé par l'endpoint d'upload et le worker SQS.
 """
 
 import json
-from typing import Optional
+from typing import Dict, List, Optional
 
 import boto3
 from botocore.exceptions import ClientError
@@ -71,6 +71,28 @@ class S3Service:
         print(f"[S3Service] Uploaded {len(image_bytes)} bytes to s3://{settings.PHOTO_BUCKET_NAME}/{s3_key}")
         return s3_key
     
+    def upload_photo_stream(
+        self,
+        fileobj,
+        event_id: int,
+        photo_id: int,
+        content_type: str = "image/jpeg",
+        extension: str = "jpg"
+    ) -> Dict:
+        """
+        Upload une photo vers S3 par morceaux (multipart au-delà d'une part), sans
+        charger le fichier entier en mémoire.
+        
+        Returns:
+            Dict: {s3_key, size, sha256, parts}
+        """
+        from streaming_upload import stream_fileobj_to_s3
+        
+        s3_key = self.generate_s3_key(event_id, photo_id, extension)
+        result = stream_fileobj_to_s3(self.client, settings.PHOTO_BUCKET_NAME, s3_key, fileobj, content_type)
+        print(f"[S3Service] Streamed {result['size']} bytes ({result['parts']} part(s)) to s3://{settings.PHOTO_BUCKET_NAME}/{s3_key}")
+        return dict(result, s3_key=s3_key)
+    
     def download_photo(self, s3_key: str) -> Optional[bytes]:
         """
         Télécharge une photo depuis S3.
@@ -174,16 +196,17 @@ class S3Service:
 
 
 class SQSService:
-    """Service pour les opérations SQS."""
+    """Service pour l'envoi des jobs (file SQS ou locale selon JOB_QUEUE_BACKEND)."""
     
-    def __init__(self):
-        self._client = None
+    @property
+    def photo_queue(self):
+        from job_queue import get_job_queue
+        return get_job_queue("photo")
     
     @property
-    def client(self):
-        if self._client is None:
-            self._client = boto3.client("sqs", region_name=settings.AWS_REGION)
-        return self._client
+    def delete_queue(self):
+        from job_queue import get_job_queue
+        return get_job_queue("delete")
     
     def send_photo_job(self, photo_id: int, event_id: int, s3_key: str) -> str:
         """
@@ -207,15 +230,44 @@ class SQSService:
             "s3_key": s3_key,
         })
         
-        response = self.client.send_message(
-            QueueUrl=settings.PHOTO_SQS_QUEUE_URL,
-            MessageBody=message_body,
-        )
-        
-        message_id = response.get("MessageId", "unknown")
+        message_id = self.photo_queue.send(message_body)
         print(f"[SQSService] Sent message {message_id} for photo_id={photo_id}")
         return message_id
     
+    def send_photo_jobs(self, jobs: List[Dict]) -> List[Optional[str]]:
+        """
+        Envoie plusieurs jobs photo par lots de 10 (send_message_batch).
+        
+        Args:
+            jobs: Liste de {photo_id, event_id, s3_key}
+        
+        Returns:
+            List[Optional[str]]: MessageId par job, dans l'ordre (None si l'envoi a échoué)
+        """
+        from job_queue import SQS_MAX_BATCH
+        
+        results: List[Optional[str]] = []
+        for start in range(0, len(jobs), SQS_MAX_BATCH):
+            chunk = jobs[start:start + SQS_MAX_BATCH]
+            bodies = [
+                json.dumps({
+                    "job_type": "process_photo",
+                    "photo_id": job["photo_id"],
+                    "event_id": job["event_id"],
+                    "s3_key": job["s3_key"],
+                })
+                for job in chunk
+            ]
+            try:
+                results.extend(self.photo_queue.send_batch(bodies))
+            except Exception as e:
+                # Lot entier en échec: les photos concernées seront marquées FAILED par l'appelant
+                print(f"[SQSService] send_batch failed for {len(chunk)} photo jobs: {e}")
+                results.extend([None] * len(chunk))
+        sent = sum(1 for r in results if r)
+        print(f"[SQSService] Sent {sent}/{len(jobs)} photo job messages (batches of {SQS_MAX_BATCH})")
+        return results
+    
     def send_delete_job(self, job_id: str, photographer_id: int) -> str:
         """
         Envoie un message dans la file SQS pour traiter un job de suppression.
@@ -236,15 +288,7 @@ class SQSService:
             "photographer_id": photographer_id,
         })
         
-        # Utiliser la queue de suppression (ou la queue par défaut)
-        queue_url = settings.delete_sqs_queue_url
-        
-        response = self.client.send_message(
-            QueueUrl=queue_url,
-            MessageBody=message_body,
-        )
-        
-        message_id = response.get("MessageId", "unknown")
+        message_id = self.delete_queue.send(message_body)
         print(f"[SQSService] Sent delete job message {message_id} for job_id={job_id}")
         return message_id
 
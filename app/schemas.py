@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Literal, Optional, List
 from datetime import datetime
 from models import UserType
 from fastapi import UploadFile
@@ -53,6 +53,29 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
 
+class UrlTokenRequest(BaseModel):
+    """Jeton d'URL à émettre: flux SSE, ou export ZIP d'un événement (scope user|event)."""
+    purpose: Literal["event_stream", "photos_zip"]
+    event_id: Optional[int] = None
+    scope: Literal["user", "event"] = "user"
+
+class UrlToken(BaseModel):
+    token: str
+    expires_in: int
+
+class FaceQualityGateOverride(BaseModel):
+    """Surcharge du filtre qualité visage d'un événement (champ absent/null = défaut env)."""
+    enabled: Optional[bool] = None
+    min_sharpness: Optional[float] = Field(None, ge=0, le=100)
+    min_brightness: Optional[float] = Field(None, ge=0, le=100)
+    max_brightness: Optional[float] = Field(None, ge=0, le=100)
+    max_yaw: Optional[float] = Field(None, ge=0, le=180)
+    max_pitch: Optional[float] = Field(None, ge=0, le=180)
+    min_face_px: Optional[int] = Field(None, ge=0)
+
+    class Config:
+        extra = "forbid"
+
 # Schémas pour les photos
 class PhotoBase(BaseModel):
     original_filename: str
@@ -39,6 +39,54 @@ class Settings(BaseSettings):
     PHOTO_BUCKET_NAME: str = ""
     # Préfixe pour les photos brutes (format: {prefix}/event_{event_id}/{photo_id}.jpg)
     PHOTO_S3_RAW_PREFIX: str = "raw"
+    # Nombre d'uploads S3 simultanés (pool partagé par les requêtes d'upload photographe)
+    UPLOAD_S3_CONCURRENCY: int = 8
+    # Taille des parts (Mo, min 5) des uploads S3 en flux (multipart upload)
+    UPLOAD_STREAM_PART_SIZE_MB: int = 8
+    
+    # ========== Blob Store (binaires photo hors base) ==========
+    # Backend des binaires photo: "db" (défaut: binaires conservés dans les colonnes
+    # LargeBinary), "s3", "auto" (s3 si PHOTO_BUCKET_NAME, sinon db) ou "local" (disque
+    # persistant partagé par toutes les instances). Opt-in: configurer le bucket pour les
+    # photos brutes n'active pas le blob store
+    BLOB_STORE_BACKEND: str = "db"
+    # Racine du backend local (fichiers adressés par SHA-256)
+    BLOB_STORE_LOCAL_ROOT: str = "./blob_store"
+    # Préfixe des blobs dans le bucket photo (backend s3)
+    BLOB_STORE_S3_PREFIX: str = "blobs"
+    # Migration en arrière-plan des binaires existants (photo_data, déclinaisons, variantes)
+    # au démarrage. Désactivée par défaut: la lancer via /api/admin/blob-migration une fois
+    # le backend vérifié (les colonnes migrées sont vidées)
+    BLOB_MIGRATION_AUTO_START: bool = False
+    # Nombre de photos migrées par transaction
+    BLOB_MIGRATION_BATCH_SIZE: int = 20
+    
+    # ========== Diffusion photo (redirection S3 / CDN) ==========
+    # "proxy": octets servis par l'application; "presigned": 302 vers une URL S3 pré-signée;
+    # "cdn": 302 vers PHOTO_CDN_DOMAIN (URL signée CloudFront si une paire de clés est fournie).
+    # Les modes redirigés ne s'appliquent qu'aux binaires déjà dans le blob store S3.
+    PHOTO_DELIVERY_MODE: str = "proxy"
+    # Durée de validité des URL signées (S3 ou CloudFront)
+    PHOTO_SIGNED_URL_TTL_SECONDS: int = 3600
+    # Domaine CloudFront devant le bucket photo (ex: d123.cloudfront.net)
+    PHOTO_CDN_DOMAIN: str = ""
+    # Signature CloudFront (optionnelle): ID de la clé publique et clé privée PEM
+    PHOTO_CDN_KEY_PAIR_ID: str = ""
+    PHOTO_CDN_PRIVATE_KEY: str = ""
+    
+    # ========== Cache photo (/api/photo/{id}) ==========
+    # Cache à deux niveaux des octets servis (mémoire LRU + disque local), clé = ETag
+    PHOTO_CACHE_ENABLED: bool = True
+    # Budget mémoire du cache LRU par processus
+    PHOTO_CACHE_MEMORY_MB: int = 64
+    # Taille max d'une entrée (au-delà, servie sans cache)
+    PHOTO_CACHE_MAX_ITEM_MB: int = 4
+    # Niveau disque partagé par les workers d'une même machine (0 = désactivé)
+    PHOTO_CACHE_DISK_DIR: str = "/tmp/photo_cache"
+    PHOTO_CACHE_DISK_MB: int = 512
+    # Préchauffage (photo mise en avant + vignettes de la 1re page) à l'envoi des emails
+    PHOTO_CACHE_PREWARM_ENABLED: bool = True
+    PHOTO_CACHE_PREWARM_PAGE_SIZE: int = 100
     
     # ========== SQS Queue (Photo Processing) ==========
     # URL de la file SQS pour le traitement des photos
@@ -47,8 +95,11 @@ class Settings(BaseSettings):
     PHOTO_SQS_VISIBILITY_TIMEOUT: int = 300  # 5 minutes
     # Temps d'attente long polling SQS en secondes
     PHOTO_SQS_WAIT_TIME_SECONDS: int = 20
-    # Nombre max de messages reçus par batch
-    PHOTO_SQS_MAX_MESSAGES: int = 1
+    # Nombre max de messages reçus par batch (max SQS: 10). Un lot plein amortit le long
+    # polling et la préparation de l'événement; le heartbeat couvre les messages en attente
+    PHOTO_SQS_MAX_MESSAGES: int = 10
+    # Heartbeat: prolonge la visibilité d'un message en cours quand il reste moins de N secondes
+    PHOTO_SQS_HEARTBEAT_SECONDS: int = 60
     
     # ========== SQS Queue (Delete Jobs) ==========
     # URL de la file SQS pour les jobs de suppression (si vide, utilise PHOTO_SQS_QUEUE_URL)
@@ -58,13 +109,41 @@ class Settings(BaseSettings):
     # Taille des lots pour la suppression (nombre de photos par itération)
     DELETE_BATCH_SIZE: int = 50
     
+    # ========== Job Queue Backend ==========
+    # Backend des files photo/delete: "sqs" (AWS) ou "sqlite" (file locale durable, WAL).
+    # Le traitement photo asynchrone exige PHOTO_BUCKET_NAME dans les deux cas (photos brutes
+    # sur S3); sans bucket, l'ingestion passe par la file en mémoire
+    JOB_QUEUE_BACKEND: str = "sqs"
+    # Fichier SQLite utilisé par le backend local
+    JOB_QUEUE_SQLITE_PATH: str = "./job_queue.sqlite3"
+    # Nombre de réceptions avant envoi en DLQ (backend local; en SQS: redrive policy)
+    JOB_QUEUE_MAX_RECEIVE_COUNT: int = 5
+
+    # ========== Event Bus (progression temps réel / SSE) ==========
+    # Backend de diffusion entre workers: "auto" (postgres si DATABASE_URL est PostgreSQL),
+    # "postgres" (LISTEN/NOTIFY) ou "memory" (processus courant uniquement)
+    EVENT_BUS_BACKEND: str = "auto"
+    # Canal PostgreSQL utilisé pour LISTEN/NOTIFY
+    EVENT_BUS_PG_CHANNEL: str = "face_events"
+    # Nombre max d'événements en attente par abonné (les plus anciens sont abandonnés)
+    EVENT_BUS_SUBSCRIBER_QUEUE_SIZE: int = 100
+    # Intervalle (s) des commentaires keep-alive du flux SSE
+    EVENT_STREAM_HEARTBEAT_SECONDS: int = 15
+    # Validité (s) des jetons d'URL (flux SSE, liens de téléchargement ZIP) émis par
+    # POST /api/url-tokens: vérifiés à l'ouverture de la connexion seulement
+    URL_TOKEN_TTL_SECONDS: int = 120
+
     # ========== Photo Worker ==========
     # Active/désactive le worker de traitement des photos
     PHOTO_WORKER_ENABLED: bool = True
-    # Nombre de workers (threads) pour le traitement des photos
-    PHOTO_WORKER_COUNT: int = 1
+    # Nombre de workers (threads) pour le traitement des photos (pool borné par worker SQS).
+    # Le temps d'un job est surtout de l'attente réseau (S3, Rekognition): 4 threads par
+    # process; les appels Rekognition restent plafonnés par AWS_CONCURRENT_REQUESTS
+    PHOTO_WORKER_COUNT: int = 4
     # Délai entre les polls SQS en secondes (si aucun message)
     PHOTO_WORKER_POLL_INTERVAL: float = 1.0
+    # Durée (s) pendant laquelle la préparation d'un événement est réutilisée par le worker
+    PHOTO_WORKER_EVENT_CONTEXT_TTL: int = 60
     # Active/désactive la bulk réindexation des users dans le chemin nominal de traitement photo
     PHOTO_PROCESSING_BULK_INDEX_USERS: bool = True
     
@@ -85,6 +164,16 @@ class Settings(BaseSettings):
     AWS_REKOGNITION_TINY_FACE_AREA: float = 0.015
     AWS_REKOGNITION_SEARCH_QUALITY_FILTER: str = "AUTO"
     AWS_REKOGNITION_PURGE_AUTO: bool = True
+    # Filtre qualité des visages avant IndexFaces (surcharge par événement: events.face_quality_gate).
+    # Désactivé par défaut: activation par événement (PUT /api/admin/events/{id}/face-quality-gate)
+    # puis globale une fois les seuils validés sur les compteurs aws_metrics
+    AWS_FACE_QUALITY_GATE_ENABLED: bool = False
+    AWS_FACE_QUALITY_MIN_SHARPNESS: float = 8.0
+    AWS_FACE_QUALITY_MIN_BRIGHTNESS: float = 15.0
+    AWS_FACE_QUALITY_MAX_BRIGHTNESS: float = 98.0
+    AWS_FACE_QUALITY_MAX_YAW: float = 60.0
+    AWS_FACE_QUALITY_MAX_PITCH: float = 45.0
+    AWS_FACE_QUALITY_MIN_FACE_PX: int = 40
     
     # ========== AWS Concurrent Requests ==========
     AWS_CONCURRENT_REQUESTS: int = 10
@@ -129,6 +218,15 @@ class Settings(BaseSettings):
     AWS_MATCH_DEBUG: bool = False
     # Active le fallback CompareFaces (coûteux)
     ENABLE_COMPARE_FACES_FALLBACK: bool = False
+    # Réutilise l'analyse (visages, FaceMatch) d'une photo quasi identique de l'événement (dHash)
+    PHOTO_NEAR_DUP_ENABLED: bool = True
+    # Distance de Hamming max entre dHash 64 bits (0..3, bornée par l'index à 4 bandes)
+    PHOTO_NEAR_DUP_MAX_DISTANCE: int = 3
+    # Formats modernes servis selon l'en-tête Accept, par ordre de préférence
+    # (avif nécessite le plugin pillow-avif-plugin; ignoré s'il est absent)
+    PHOTO_VARIANT_FORMATS: str = "avif,webp"
+    PHOTO_WEBP_QUALITY: int = 78
+    PHOTO_AVIF_QUALITY: int = 55
     
     class Config:
         # Nom du fichier .env à charger (si présent)
@@ -139,10 +237,19 @@ class Settings(BaseSettings):
         # Sensibilité à la casse des variables d'environnement
         case_sensitive = True
     
+    @property
+    def uses_local_job_queue(self) -> bool:
+        """True si les files photo/delete utilisent le backend local SQLite."""
+        return (self.JOB_QUEUE_BACKEND or "").strip().lower() == "sqlite"
+    
     @property
     def is_sqs_configured(self) -> bool:
-        """Vérifie si SQS est configuré pour le traitement asynchrone."""
-        return bool(self.PHOTO_SQS_QUEUE_URL and self.PHOTO_BUCKET_NAME)
+        """
+        Vérifie si la file photo (SQS ou locale) est configurée pour le traitement asynchrone.
+        PHOTO_BUCKET_NAME est requis quel que soit le backend: la file ne transporte que la clé
+        S3 de la photo brute (l'upload la dépose dans le bucket, le worker l'y relit).
+        """
+        return bool((self.PHOTO_SQS_QUEUE_URL or self.uses_local_job_queue) and self.PHOTO_BUCKET_NAME)
     
     @property
     def is_s3_configured(self) -> bool:
@@ -156,8 +263,8 @@ class Settings(BaseSettings):
     
     @property
     def is_delete_sqs_configured(self) -> bool:
-        """Vérifie si SQS est configuré pour les suppressions asynchrones."""
-        return bool(self.DELETE_SQS_QUEUE_URL)
+        """Vérifie si la file de suppression (SQS ou locale) est configurée."""
+        return bool(self.DELETE_SQS_QUEUE_URL or self.uses_local_job_queue)
 
 
 @lru_cache()
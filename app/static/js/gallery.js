@@ -106,7 +106,8 @@ class ModernGallery {
 
     /**
      * Charge et affiche une liste d'images
-     * @param {Array} images - [{ src, alt?, aspectRatio? }, ...]
+     * @param {Array} images - [{ src, thumb?, preview?, alt?, aspectRatio? }, ...]
+     *   src: image complète (téléchargement), thumb: grille, preview: visionneuse
      */
     loadImages(images) {
         this.images = images || [];
@@ -177,6 +178,11 @@ class ModernGallery {
         }
     }
 
+    // Source affichée dans la grille (vignette si disponible)
+    tileSrc(image) {
+        return (image && (image.thumb || image.src)) || '';
+    }
+
     preloadImage(src) {
         return new Promise((resolve) => {
             try {
@@ -229,8 +235,8 @@ class ModernGallery {
         const { colWidth } = this.getGridMetrics();
 
         const [a, b] = await Promise.all([
-            this.preloadImage(imgA.src),
-            imgB ? this.preloadImage(imgB.src) : Promise.resolve({ ok: false, img: null, w: 0, h: 0 })
+            this.preloadImage(this.tileSrc(imgA)),
+            imgB ? this.preloadImage(this.tileSrc(imgB)) : Promise.resolve({ ok: false, img: null, w: 0, h: 0 })
         ]);
 
         if (this.isDestroyed || token !== this.renderToken) return;
@@ -283,12 +289,12 @@ class ModernGallery {
         img.style.objectFit = 'contain';
         img.decoding = 'async';
         img.loading = 'eager';
-        if (!loadedImg) img.src = image.src;
+        if (!loadedImg) img.src = this.tileSrc(image);
 
         const projectedHeight = colWidth / (ratio || 1.5);
         if (this.shouldUseBlurPadding(rowHeight, projectedHeight)) {
             card.classList.add('needs-centering');
-            card.style.setProperty('--bg-image', `url(${image.src})`);
+            card.style.setProperty('--bg-image', `url(${this.tileSrc(image)})`);
         } else {
             card.classList.remove('needs-centering');
             card.style.removeProperty('--bg-image');
@@ -681,7 +687,7 @@ class ModernGallery {
         const prevBtn = this.lightboxElement.querySelector('.gallery-lightbox-prev');
         const nextBtn = this.lightboxElement.querySelector('.gallery-lightbox-next');
 
-        img.src = image.src;
+        img.src = image.preview || image.src;
         img.alt = image.alt || `Image ${index + 1}`;
         counter.textContent = `${index + 1} / ${this.images.length}`;
 
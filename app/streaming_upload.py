@@ -0,0 +1,242 @@
+"""
+Ingestion des photos en flux: du parseur multipart jusqu'à S3, sans fichier temporaire.
+
+Chaque fichier reçu est:
+    - identifié par ses premiers octets (signature JPEG/PNG/WebP/HEIC/GIF), pas par
+      le Content-Type déclaré par le client
+    - haché en SHA-256 au fil de l'eau
+    - envoyé vers S3 par parts de UPLOAD_STREAM_PART_SIZE_MB (multipart upload);
+      un fichier plus petit qu'une part part en un seul put_object
+
+La mémoire par fichier est bornée à une part (les parts sont envoyées avant de lire la
+suite du corps de la requête), quelle que soit la taille des photos.
+
+Usage:
+    from streaming_upload import S3StreamingWriter, stream_fileobj_to_s3
+
+    writer = S3StreamingWriter(client, bucket, key, content_type="image/jpeg")
+    for chunk in chunks:
+        if writer.write(chunk):
+            writer.flush()          # bloquant: à exécuter hors de la boucle asyncio
+    result = writer.complete()      # {"size", "sha256", "parts"}
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from settings import settings
+
+
+# Taille minimale d'une part S3 (hors dernière part): 5 Mo
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+# Octets nécessaires pour reconnaître le format
+SNIFF_BYTES = 16
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def part_size() -> int:
+    return max(S3_MIN_PART_SIZE, int(settings.UPLOAD_STREAM_PART_SIZE_MB or 8) * 1024 * 1024)
+
+
+def sniff_image_type(header: bytes) -> Optional[Tuple[str, str]]:
+    """Retourne (content_type, extension) d'après la signature du fichier, None si inconnu."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", "jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif", "gif"
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand in (b"heic", b"heix", b"hevc", b"hevx", b"mif1", b"msf1"):
+            return "image/heic", "heic"
+        if brand in (b"avif", b"avis"):
+            return "image/avif", "avif"
+    return None
+
+
+class S3StreamingWriter:
+    """Écrit un objet S3 par parts (multipart upload démarré à la première part pleine)."""
+
+    def __init__(self, client, bucket: str, key: str, content_type: str = "image/jpeg",
+                 chunk_size: Optional[int] = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = max(S3_MIN_PART_SIZE, int(chunk_size or part_size()))
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict] = []
+        self._closed = False
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def write(self, data: bytes) -> bool:
+        """Ajoute des octets (non bloquant). Retourne True si une part pleine attend flush()."""
+        if data:
+            self._buffer.extend(data)
+            self._sha256.update(data)
+            self.size += len(data)
+        return len(self._buffer) >= self.part_size
+
+    def flush(self):
+        """Envoie les parts pleines du tampon (bloquant)."""
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+
+    def _upload_part(self, body: bytes):
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )
+            self._upload_id = response["UploadId"]
+        number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            PartNumber=number, Body=body,
+        )
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    def complete(self) -> Dict:
+        """Termine l'objet (put_object si une seule part). Bloquant."""
+        if self._upload_id is None:
+            self.client.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer), ContentType=self.content_type
+            )
+        else:
+            self.flush()
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+        self._closed = True
+        return {"size": self.size, "sha256": self.sha256, "parts": max(1, len(self._parts))}
+
+    def abort(self):
+        """Abandonne l'upload multipart en cours (best-effort)."""
+        self._buffer = bytearray()
+        if self._upload_id is not None and not self._closed:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            except Exception as e:
+                print(f"[StreamUpload] abort failed key={self.key}: {e}")
+        self._closed = True
+
+
+def stream_fileobj_to_s3(client, bucket: str, key: str, fileobj, content_type: str) -> Dict:
+    """Copie un fichier (ex: UploadFile.file spoolé) vers S3 par morceaux. Bloquant."""
+    writer = S3StreamingWriter(client, bucket, key, content_type=content_type)
+    try:
+        while True:
+            chunk = fileobj.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if writer.write(chunk):
+                writer.flush()
+        return writer.complete()
+    except Exception:
+        writer.abort()
+        raise
+
+
+class MultipartStream:
+    """
+    Découpe un corps multipart/form-data reçu par morceaux (python-multipart) en
+    événements par partie, sans jamais matérialiser un fichier complet:
+        ("field", name, value)
+        ("file_start", name, filename, content_type)
+        ("data", bytes)
+        ("file_end",)
+    """
+
+    def __init__(self, content_type_header: str, max_field_size: int = 64 * 1024):
+        from multipart.multipart import MultipartParser, parse_options_header
+
+        _, params = parse_options_header(content_type_header)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise ValueError("Missing multipart boundary")
+        self.max_field_size = max_field_size
+        self._events: List[Tuple] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._part: Optional[Dict] = None
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    def feed(self, chunk: bytes) -> List[Tuple]:
+        """Analyse un morceau du corps et retourne les événements produits."""
+        self._parser.write(chunk)
+        events, self._events = self._events, []
+        return events
+
+    def close(self) -> List[Tuple]:
+        self._parser.finalize()
+        events, self._events = self._events, []
+        return events
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._part = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        from multipart.multipart import parse_options_header
+
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._part = {"kind": "field", "name": name, "value": bytearray()}
+            return
+        content_type = self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+        self._part = {"kind": "file"}
+        self._events.append(("file_start", name, filename.decode("utf-8", "replace"), content_type))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part is None:
+            return
+        if part["kind"] == "file":
+            self._events.append(("data", bytes(data[start:end])))
+        elif len(part["value"]) < self.max_field_size:
+            part["value"].extend(data[start:end])
+
+    def _on_part_end(self):
+        part = self._part
+        if part is None:
+            return
+        if part["kind"] == "file":
+            self._events.append(("file_end",))
+        else:
+            self._events.append(("field", part["name"], part["value"].decode("utf-8", "replace")))
+        self._part = None
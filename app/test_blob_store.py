@@ -0,0 +1,123 @@
+"""
+Tests du blob store (blob_store): écriture atomique du backend local, double lecture
+blob/colonne et suppression des blobs non référencés.
+
+Usage:
+    python -m pytest -q test_blob_store.py
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+import blob_store  # noqa: E402
+from blob_store import LocalBlobStore, content_key, delete_unreferenced, read_blob_or_column  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalBlobStore(str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store, "_store", store)
+    return store
+
+
+def _files(root):
+    return sorted(name for _dir, _subdirs, names in os.walk(root) for name in names)
+
+
+def test_local_put_is_content_addressed(store):
+    key = store.put(b"photo")
+    assert key == content_key(b"photo")
+    assert store.path(key) == os.path.join(store.root, key[:2], key[2:4], key)
+    assert store.get(key) == b"photo"
+    assert store.local_path(key) == store.path(key)
+    # Même contenu: même clé, pas de second fichier
+    assert store.put(b"photo") == key
+    assert _files(store.root) == [key]
+
+
+def test_local_put_leaves_no_temp_file_on_failure(store, monkeypatch):
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(blob_store.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        store.put(b"photo")
+    assert _files(store.root) == []
+    assert store.get(content_key(b"photo")) is None
+
+
+def test_local_get_and_delete_missing_keys(store):
+    key = store.put(b"photo")
+    store.delete(key)
+    store.delete(key)  # idempotent
+    assert store.get(key) is None
+    assert store.local_path(key) is None
+
+
+def test_read_blob_or_column_prefers_blob(store):
+    key = store.put(b"from-blob")
+    assert read_blob_or_column(key, b"from-column") == b"from-blob"
+
+
+def test_read_blob_or_column_falls_back_to_column(store):
+    assert read_blob_or_column(content_key(b"gone"), memoryview(b"from-column")) == b"from-column"
+    assert read_blob_or_column(None, b"from-column") == b"from-column"
+    assert read_blob_or_column(None, None) is None
+
+
+def test_read_blob_or_column_survives_store_errors(store, monkeypatch):
+    def broken_get(key):
+        raise IOError("unreachable")
+
+    monkeypatch.setattr(store, "get", broken_get)
+    assert read_blob_or_column("any", b"from-column") == b"from-column"
+
+
+def test_read_blob_or_column_without_store(monkeypatch):
+    monkeypatch.setattr(blob_store, "_store", False)
+    assert read_blob_or_column("any", b"from-column") == b"from-column"
+
+
+def test_delete_unreferenced_keeps_shared_blobs(store, monkeypatch):
+    kept, orphan = store.put(b"shared"), store.put(b"orphan")
+    monkeypatch.setattr(blob_store, "referenced_keys", lambda db, keys: {kept} & set(keys))
+
+    assert delete_unreferenced(None, [kept, orphan, None, ""]) == 1
+    assert store.get(kept) == b"shared"
+    assert store.get(orphan) is None
+
+
+def test_delete_unreferenced_counts_only_successful_deletes(store, monkeypatch):
+    keys = [store.put(b"a"), store.put(b"b")]
+    monkeypatch.setattr(blob_store, "referenced_keys", lambda db, keys: set())
+    real_delete = store.delete
+
+    def flaky_delete(key):
+        if key == keys[0]:
+            raise IOError("denied")
+        real_delete(key)
+
+    monkeypatch.setattr(store, "delete", flaky_delete)
+    assert delete_unreferenced(None, keys) == 1
+
+
+def test_delete_unreferenced_without_store(monkeypatch):
+    monkeypatch.setattr(blob_store, "_store", False)
+    assert delete_unreferenced(None, ["abc"]) == 0
+
+
+@pytest.mark.parametrize("configured, bucket, expected", [
+    ("", "photos", "db"),
+    ("db", "photos", "db"),
+    ("auto", "photos", "s3"),
+    ("auto", "", "db"),
+    ("LOCAL", "", "local"),
+    ("unknown", "photos", "db"),
+])
+def test_resolve_backend_is_opt_in(monkeypatch, configured, bucket, expected):
+    monkeypatch.setattr(blob_store.settings, "BLOB_STORE_BACKEND", configured)
+    monkeypatch.setattr(blob_store.settings, "PHOTO_BUCKET_NAME", bucket)
+    assert blob_store._resolve_backend() == expected
@@ -0,0 +1,155 @@
+"""
+Tests du bus d'événements (event_bus): diffusion inter-processus via PostgreSQL
+LISTEN/NOTIFY, filtrage de l'origine et file bornée des abonnés (abandon du plus ancien).
+
+Usage:
+    python -m pytest -q test_event_bus.py
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import types
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+import event_bus as event_bus_module  # noqa: E402
+from event_bus import EventBus, Subscription, user_topic  # noqa: E402
+
+
+def _bus(monkeypatch, backend="postgres"):
+    bus = EventBus()
+    bus.backend = backend
+    # Pas de thread LISTEN réel: les notifications sont injectées par le canal de test
+    monkeypatch.setattr(bus, "_ensure_listener", lambda: None)
+    return bus
+
+
+class _NotifyChannel:
+    """Canal NOTIFY en mémoire: chaque pg_notify est relayé à tous les bus à l'écoute."""
+
+    def __init__(self, *listeners):
+        self.listeners = list(listeners)
+        self.payloads = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement, params):
+        self.payloads.append(params["payload"])
+        for bus in self.listeners:
+            bus._on_notify(params["payload"])
+
+
+@pytest.fixture
+def notify_channel(monkeypatch):
+    pytest.importorskip("sqlalchemy")
+    channel = _NotifyChannel()
+    monkeypatch.setitem(sys.modules, "database", types.SimpleNamespace(engine=channel))
+    return channel
+
+
+def _drain(sub):
+    messages = []
+    while not sub.queue.empty():
+        messages.append(sub.queue.get_nowait())
+    return messages
+
+
+def test_notify_fans_out_to_other_processes_once(monkeypatch, notify_channel):
+    # Deux instances = deux processus (origines distinctes) à l'écoute du même canal
+    producer, consumer = _bus(monkeypatch), _bus(monkeypatch)
+    notify_channel.listeners = [producer, consumer]
+
+    async def scenario():
+        local = producer.subscribe([user_topic(1)])
+        remote = consumer.subscribe([user_topic(1)])
+        other = consumer.subscribe([user_topic(2)])
+        producer.publish(user_topic(1), "match", {"photo_id": 42})
+        await asyncio.sleep(0)
+        return _drain(local), _drain(remote), _drain(other)
+
+    local, remote, other = asyncio.run(scenario())
+    # Livré une seule fois localement (publish), l'écho NOTIFY de sa propre origine est ignoré
+    assert [(m["type"], m["data"]) for m in local] == [("match", {"photo_id": 42})]
+    assert [(m["type"], m["data"]) for m in remote] == [("match", {"photo_id": 42})]
+    assert "origin" not in remote[0]
+    assert other == []
+    assert producer.stats()["remote_received"] == 0
+    assert consumer.stats()["remote_received"] == 1
+
+
+def test_memory_backend_does_not_notify(monkeypatch, notify_channel):
+    bus = _bus(monkeypatch, backend="memory")
+    bus.publish(user_topic(1), "match", {})
+    assert notify_channel.payloads == []
+
+
+def test_oversized_payload_is_truncated(monkeypatch, notify_channel):
+    bus = _bus(monkeypatch)
+    bus.publish(user_topic(1), "match", {"blob": "x" * (event_bus_module.PG_NOTIFY_MAX_BYTES + 1)})
+    envelope = json.loads(notify_channel.payloads[0])
+    assert envelope["data"] == {"truncated": True}
+    assert envelope["topic"] == user_topic(1) and envelope["origin"]
+
+
+def test_on_notify_ignores_own_origin_and_invalid_payloads(monkeypatch):
+    bus = _bus(monkeypatch)
+
+    async def scenario():
+        sub = bus.subscribe([user_topic(1)])
+        message = {"topic": user_topic(1), "type": "match", "data": {}, "ts": 0}
+        bus._on_notify(json.dumps(dict(message, origin=bus._origin)))
+        bus._on_notify("not json")
+        bus._on_notify(json.dumps(dict(message, origin="other-process")))
+        await asyncio.sleep(0)
+        return _drain(sub)
+
+    assert [m["type"] for m in asyncio.run(scenario())] == ["match"]
+    assert bus.stats()["remote_received"] == 1
+
+
+def test_full_queue_drops_oldest():
+    async def scenario():
+        sub = Subscription([user_topic(1)], asyncio.get_running_loop(), maxsize=2)
+        for i in range(5):
+            sub._put({"n": i})
+        return sub, [m["n"] for m in _drain(sub)]
+
+    sub, received = asyncio.run(scenario())
+    assert received == [3, 4]
+    assert sub.dropped == 3
+
+
+def test_push_from_producer_thread_never_blocks():
+    async def scenario():
+        sub = Subscription([user_topic(1)], asyncio.get_running_loop(), maxsize=1)
+        producer = threading.Thread(target=lambda: [sub.push({"n": i}) for i in range(10)])
+        producer.start()
+        producer.join(2.0)
+        assert not producer.is_alive()
+        first = await sub.get(timeout=1.0)
+        return sub, first
+
+    sub, first = asyncio.run(scenario())
+    assert first == {"n": 9}
+    assert sub.dropped == 9
+
+
+def test_unsubscribe_removes_empty_topics(monkeypatch):
+    bus = _bus(monkeypatch, backend="memory")
+
+    async def scenario():
+        sub = bus.subscribe([user_topic(1), user_topic(2)])
+        bus.unsubscribe(sub)
+        bus.publish(user_topic(1), "match", {})
+        await asyncio.sleep(0)
+        return _drain(sub)
+
+    assert asyncio.run(scenario()) == []
+    assert bus.stats()["topics"] == 0
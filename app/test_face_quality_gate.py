@@ -0,0 +1,143 @@
+"""
+Tests du filtre qualité visage: raisons de rejet (netteté, luminosité, pose, taille),
+filtrage avant IndexFaces, lecture des booléens stockés et validation du corps
+PUT /api/admin/events/{id}/face-quality-gate.
+
+Usage:
+    python -m pytest -q test_face_quality_gate.py
+"""
+
+from io import BytesIO
+
+import pytest
+
+for _module in ("boto3", "sqlalchemy", "PIL", "numpy"):
+    pytest.importorskip(_module)
+
+import aws_face_recognizer  # noqa: E402
+from aws_face_recognizer import AwsFaceRecognizer, _parse_bool  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+GATE = {
+    "enabled": True,
+    "min_sharpness": 8.0,
+    "min_brightness": 15.0,
+    "max_brightness": 98.0,
+    "max_yaw": 60.0,
+    "max_pitch": 45.0,
+    "min_face_px": 40,
+}
+
+
+def _face(width=0.2, height=0.2, sharpness=50.0, brightness=60.0, yaw=0.0, pitch=0.0):
+    return {
+        "BoundingBox": {"Left": 0.1, "Top": 0.1, "Width": width, "Height": height},
+        "Quality": {"Sharpness": sharpness, "Brightness": brightness},
+        "Pose": {"Yaw": yaw, "Pitch": pitch, "Roll": 0.0},
+    }
+
+
+@pytest.fixture
+def recognizer():
+    # Sans __init__: pas de client AWS, seules les méthodes du filtre sont utilisées
+    return object.__new__(AwsFaceRecognizer)
+
+
+@pytest.mark.parametrize("face, expected", [
+    (_face(), None),
+    (_face(width=0.03), "too_small"),          # 30 px de large sur 1000
+    (_face(height=0.039), "too_small"),
+    (_face(width=0.04, height=0.04), None),    # exactement min_face_px
+    (_face(sharpness=7.9), "blurry"),
+    (_face(sharpness=8.0), None),
+    (_face(brightness=14.0), "too_dark"),
+    (_face(brightness=99.0), "overexposed"),
+    (_face(yaw=-61.0), "extreme_pose"),
+    (_face(pitch=46.0), "extreme_pose"),
+    (_face(yaw=60.0, pitch=-45.0), None),
+    ({"BoundingBox": {"Width": 0.2, "Height": 0.2}}, None),  # qualité/pose absentes: accepté
+    ({}, "too_small"),
+])
+def test_reject_reason(recognizer, face, expected):
+    assert recognizer._face_quality_reject_reason(face, GATE, 1000, 1000) == expected
+
+
+def test_size_is_checked_before_quality(recognizer):
+    face = _face(width=0.01, sharpness=1.0, brightness=1.0, yaw=90.0)
+    assert recognizer._face_quality_reject_reason(face, GATE, 1000, 1000) == "too_small"
+
+
+def _jpeg(width=1000, height=1000):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        aws_face_recognizer.aws_metrics, "record_face_quality",
+        lambda **kwargs: calls.append(kwargs),
+    )
+    return calls
+
+
+def test_filter_keeps_good_faces_and_counts_skipped(recognizer, monkeypatch, metrics):
+    monkeypatch.setattr(recognizer, "get_face_quality_gate", lambda event_id: GATE)
+    good, blurry, small = _face(), _face(sharpness=2.0), _face(width=0.01)
+    kept = recognizer._filter_faces_by_quality(1, 10, _jpeg(), [good, blurry, small, _face(yaw=80.0)])
+
+    assert kept == [good]
+    assert metrics == [{"checked": 4, "kept": 1, "skipped": {"blurry": 1, "too_small": 1, "extreme_pose": 1}}]
+
+
+def test_filter_uses_image_size_for_min_px(recognizer, monkeypatch, metrics):
+    monkeypatch.setattr(recognizer, "get_face_quality_gate", lambda event_id: GATE)
+    face = _face(width=0.1, height=0.1)
+    assert recognizer._filter_faces_by_quality(1, 10, _jpeg(1000, 1000), [face]) == [face]
+    assert recognizer._filter_faces_by_quality(1, 10, _jpeg(300, 300), [face]) == []
+
+
+def test_disabled_gate_keeps_everything(recognizer, monkeypatch, metrics):
+    monkeypatch.setattr(recognizer, "get_face_quality_gate", lambda event_id: dict(GATE, enabled=False))
+    faces = [_face(sharpness=0.0)]
+    assert recognizer._filter_faces_by_quality(1, 10, _jpeg(), faces) == faces
+    assert metrics == []
+
+
+def test_unreadable_image_keeps_faces(recognizer, monkeypatch, metrics):
+    monkeypatch.setattr(recognizer, "get_face_quality_gate", lambda event_id: GATE)
+    faces = [_face(sharpness=0.0)]
+    assert recognizer._filter_faces_by_quality(1, 10, b"not an image", faces) == faces
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), (False, False), (1, True), (0, False),
+    ("true", True), ("false", False), ("0", False), ("1", True),
+    (" Off ", False), ("yes", True),
+])
+def test_parse_bool(value, expected):
+    assert _parse_bool(value) is expected
+
+
+@pytest.mark.parametrize("value", ["maybe", "", 2, None, [True]])
+def test_parse_bool_rejects_ambiguous_values(value):
+    with pytest.raises(ValueError):
+        _parse_bool(value)
+
+
+def test_override_schema_parses_and_validates():
+    pydantic = pytest.importorskip("pydantic")
+    pytest.importorskip("fastapi")
+    from schemas import FaceQualityGateOverride
+
+    override = FaceQualityGateOverride(enabled="false", min_sharpness=12.5)
+    assert override.model_dump(exclude_none=True) == {"enabled": False, "min_sharpness": 12.5}
+    with pytest.raises(pydantic.ValidationError):
+        FaceQualityGateOverride(unknown_key=1)
+    with pytest.raises(pydantic.ValidationError):
+        FaceQualityGateOverride(max_yaw=400)
+    with pytest.raises(pydantic.ValidationError):
+        FaceQualityGateOverride(enabled="maybe")
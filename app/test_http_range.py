@@ -0,0 +1,120 @@
+"""
+Tests des réponses par plage (http_range): analyse de l'en-tête Range, If-Range, statuts
+200/206/416 et lecture des morceaux.
+
+Usage:
+    python -m pytest -q test_http_range.py
+"""
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from http_range import (  # noqa: E402
+    RangeNotSatisfiable,
+    iter_bytes,
+    iter_file,
+    parse_range_header,
+    range_response,
+)
+
+
+class _Request:
+    def __init__(self, **headers):
+        self.headers = {k.replace("_", "-"): v for k, v in headers.items()}
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=50-500", (50, 99)),
+    ("BYTES = 5 - 6", (5, 6)),
+    ("bytes=0-1,5-6", None),  # plusieurs plages: contenu complet
+    ("items=0-9", None),
+    ("bytes=9-0", None),
+    ("bytes=a-b", None),
+    ("bytes=5", None),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 100) == expected
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=-0", 100),
+    ("bytes=-5", 0),
+])
+def test_parse_range_header_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, size)
+
+
+def _response(request, size=100, headers=None):
+    calls = []
+
+    def open_chunks(start, end):
+        calls.append((start, end))
+        return iter(())
+
+    return range_response(request, size, "image/jpeg", headers or {}, open_chunks), calls
+
+
+def test_full_response_without_range():
+    response, calls = _response(_Request())
+    assert response.status_code == 200
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == "100"
+    assert calls == [(0, 99)]
+
+
+def test_partial_response():
+    response, calls = _response(_Request(Range="bytes=10-19"))
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/100"
+    assert response.headers["content-length"] == "10"
+    assert calls == [(10, 19)]
+
+
+def test_unsatisfiable_range():
+    response, calls = _response(_Request(Range="bytes=200-"))
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+    assert calls == []
+
+
+@pytest.mark.parametrize("if_range, status", [
+    ('"v1"', 206),
+    ('"v2"', 200),
+    ("Mon, 01 Jan 2024 00:00:00 GMT", 206),
+    ("Tue, 02 Jan 2024 00:00:00 GMT", 200),
+])
+def test_if_range(if_range, status):
+    headers = {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    response, _ = _response(_Request(Range="bytes=0-9", If_Range=if_range), headers=headers)
+    assert response.status_code == status
+
+
+def test_empty_content_is_not_read():
+    response, calls = _response(_Request(), size=0)
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "0"
+    assert calls == []
+
+
+def test_iter_bytes_chunks_inclusive_range():
+    data = bytes(range(256))
+    chunks = list(iter_bytes(data, 10, 109, chunk_size=32))
+    assert [len(c) for c in chunks] == [32, 32, 32, 4]
+    assert b"".join(chunks) == data[10:110]
+
+
+def test_iter_file_reads_from_offset(tmp_path):
+    path = tmp_path / "photo.bin"
+    data = bytes(range(256)) * 4
+    path.write_bytes(data)
+    assert b"".join(iter_file(str(path), 300, 899, chunk_size=100)) == data[300:900]
+    # Fin au-delà du fichier: s'arrête à la fin
+    assert b"".join(iter_file(str(path), 1000, 2000)) == data[1000:]
@@ -0,0 +1,118 @@
+"""
+Tests de la file locale (job_queue.SQLiteJobQueue) sur une base temporaire: visibility
+timeout, invalidation des receipt handles, DLQ après max_receive_count et delete_batch.
+
+Usage:
+    python -m pytest -q test_job_queue.py
+"""
+
+import pytest
+
+for _module in ("boto3", "pydantic_settings"):
+    pytest.importorskip(_module)
+
+import job_queue  # noqa: E402
+from job_queue import SQLiteJobQueue  # noqa: E402
+
+
+class _Clock:
+    """Horloge du module job_queue: le temps n'avance que via advance() ou sleep()."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(job_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return SQLiteJobQueue("photo", str(tmp_path / "queue.sqlite3"), default_visibility_timeout=30, max_receive_count=3)
+
+
+def test_received_message_is_hidden_until_visibility_timeout(queue, clock):
+    message_id = queue.send('{"photo_id": 1}')
+    first = queue.receive(max_messages=10)
+    assert [m["MessageId"] for m in first] == [message_id]
+    assert first[0]["Attributes"]["ApproximateReceiveCount"] == "1"
+    assert queue.receive() == []
+    assert queue.stats()["in_flight"] == 1
+
+    clock.advance(31)
+    again = queue.receive()
+    assert [m["MessageId"] for m in again] == [message_id]
+    assert again[0]["Attributes"]["ApproximateReceiveCount"] == "2"
+
+
+def test_redelivery_invalidates_previous_receipt_handle(queue, clock):
+    queue.send("a")
+    stale = queue.receive(visibility_timeout=5)[0]["ReceiptHandle"]
+    clock.advance(6)
+    current = queue.receive(visibility_timeout=5)[0]["ReceiptHandle"]
+    assert current != stale
+
+    # L'ancien handle n'agit plus: ni suppression, ni prolongation
+    queue.delete(stale)
+    queue.change_visibility(stale, 600)
+    clock.advance(6)
+    assert len(queue.receive()) == 1
+
+
+def test_change_visibility_extends_current_handle(queue, clock):
+    queue.send("a")
+    handle = queue.receive(visibility_timeout=5)[0]["ReceiptHandle"]
+    queue.change_visibility(handle, 60)
+    clock.advance(30)
+    assert queue.receive() == []
+    clock.advance(31)
+    assert len(queue.receive()) == 1
+
+
+def test_message_moves_to_dlq_after_max_receives(queue, clock):
+    message_id = queue.send("poison")
+    for _ in range(queue.max_receive_count):
+        assert len(queue.receive(visibility_timeout=1)) == 1
+        clock.advance(2)
+    assert queue.receive() == []
+    dead = queue.dead_letters()
+    assert [(d["MessageId"], d["Body"], d["ReceiveCount"]) for d in dead] == [(message_id, "poison", 3)]
+    stats = queue.stats()
+    assert (stats["visible"], stats["in_flight"], stats["dead_letters"]) == (0, 0, 1)
+
+
+def test_delete_batch_removes_only_current_handles(queue, clock):
+    queue.send_batch(["a", "b", "c"])
+    handles = [m["ReceiptHandle"] for m in queue.receive(max_messages=10, visibility_timeout=5)]
+    assert len(handles) == 3
+    assert queue.delete_batch(handles[:2] + ["unknown-handle"]) == []
+
+    clock.advance(6)
+    remaining = queue.receive(max_messages=10)
+    assert [m["Body"] for m in remaining] == ["c"]
+
+
+def test_receive_is_capped_at_sqs_batch(queue):
+    queue.send_batch([str(n) for n in range(15)])
+    assert len(queue.receive(max_messages=50)) == job_queue.SQS_MAX_BATCH
+    assert len(queue.receive(max_messages=50)) == 5
+
+
+def test_long_polling_waits_for_delayed_message(queue, clock):
+    queue.send("later", delay_seconds=3)
+    start = clock.now
+    assert [m["Body"] for m in queue.receive(wait_seconds=10)] == ["later"]
+    assert 3 <= clock.now - start < 10
+    assert queue.receive(wait_seconds=1) == []
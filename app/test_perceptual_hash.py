@@ -0,0 +1,92 @@
+"""
+Tests du hash perceptuel (perceptual_hash): distances de Hamming, bandes de l'index,
+dimensions et contrôle du cadrage avant réutilisation des boîtes de visages.
+
+Usage:
+    python -m pytest -q test_perceptual_hash.py
+"""
+
+import io
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+PIL_Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("sqlalchemy")
+
+import perceptual_hash  # noqa: E402
+from perceptual_hash import (  # noqa: E402
+    BAND_COUNT,
+    dhash_and_size,
+    hamming_distances,
+    hash_bands,
+    same_aspect,
+)
+
+
+def _flip_bits(phash: str, positions) -> str:
+    value = int(phash, 16)
+    for position in positions:
+        value ^= 1 << position
+    return f"{value:016x}"
+
+
+def _jpeg(width: int, height: int, exif_orientation: int = None) -> bytes:
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+    img = PIL_Image.fromarray(gradient).convert("RGB")
+    out = io.BytesIO()
+    if exif_orientation is None:
+        img.save(out, format="JPEG")
+    else:
+        exif = PIL_Image.Exif()
+        exif[0x0112] = exif_orientation
+        img.save(out, format="JPEG", exif=exif.tobytes())
+    return out.getvalue()
+
+
+def test_hamming_distances_counts_differing_bits():
+    base = "0f0f0f0f0f0f0f0f"
+    candidates = [base, _flip_bits(base, [0]), _flip_bits(base, [3, 17, 40]), "f0f0f0f0f0f0f0f0"]
+    assert hamming_distances(base, candidates).tolist() == [0, 1, 3, 64]
+
+
+def test_hamming_distances_empty():
+    assert hamming_distances("0" * 16, []).tolist() == []
+
+
+def test_hash_bands_split_in_16_bit_values():
+    assert hash_bands("0001ffff8000abcd") == [0x0001, 0xFFFF, 0x8000, 0xABCD]
+
+
+def test_close_hashes_share_a_band():
+    # Principe des tiroirs: distance <= BAND_COUNT - 1 => au moins une bande identique
+    rng = random.Random(7)
+    for _ in range(200):
+        phash = f"{rng.getrandbits(64):016x}"
+        other = _flip_bits(phash, rng.sample(range(64), BAND_COUNT - 1))
+        assert any(a == b for a, b in zip(hash_bands(phash), hash_bands(other)))
+
+
+@pytest.mark.parametrize("size, width, height, expected", [
+    ((6000, 4000), 1024, 683, True),   # redimensionnement: arrondi toléré
+    ((4000, 6000), 4000, 6000, True),
+    ((6000, 4000), 4000, 6000, False),  # rotation
+    ((6000, 4000), 5000, 4000, False),  # recadrage
+    ((6000, 4000), None, None, False),  # source hashée sans dimensions
+    (None, 6000, 4000, False),
+])
+def test_same_aspect(size, width, height, expected):
+    assert same_aspect(size, width, height) is expected
+
+
+def test_dhash_and_size_applies_exif_orientation():
+    phash, size = dhash_and_size(_jpeg(120, 80))
+    assert len(phash) == 16 and size == (120, 80)
+    _, rotated = dhash_and_size(_jpeg(120, 80, exif_orientation=6))
+    assert rotated == (80, 120)
+
+
+def test_dhash_and_size_unreadable():
+    assert dhash_and_size(b"not an image") == (None, None)
+    assert perceptual_hash.dhash_from_bytes(b"not an image") is None
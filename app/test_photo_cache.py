@@ -0,0 +1,159 @@
+"""
+Tests du cache des photos servies (photo_cache): coalescence des chargements concurrents,
+LRU mémoire borné en octets et purge LRU du cache disque.
+
+Usage:
+    python -m pytest -q test_photo_cache.py
+"""
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+from photo_cache import PhotoCache  # noqa: E402
+
+
+def _payload(size, fill=b"x"):
+    return (fill * size, "image/jpeg", size)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PhotoCache()
+    cache.enabled = True
+    cache.memory_limit = 1000
+    cache.max_item = 600
+    cache.disk_limit = 0
+    cache.disk_dir = None
+    return cache
+
+
+@pytest.fixture
+def disk_cache(cache, tmp_path):
+    cache.disk_limit = 1000
+    cache.disk_dir = str(tmp_path / "photo_cache")
+    return cache
+
+
+def test_concurrent_misses_load_once(cache):
+    calls = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def load():
+            calls.append(1)
+            await release.wait()
+            return _payload(10)
+
+        waiters = [asyncio.ensure_future(cache.get_or_load("etag-1", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        # Entrée en mémoire: la requête suivante ne recharge pas
+        results.append(await cache.get_or_load("etag-1", load))
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == _payload(10) for result in results)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["memory_hits"]) == (1, 4, 1)
+
+
+def test_cancelled_requester_does_not_cancel_shared_load(cache):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return _payload(10)
+
+        first = asyncio.ensure_future(cache.get_or_load("etag-1", load))
+        second = asyncio.ensure_future(cache.get_or_load("etag-1", load))
+        await asyncio.sleep(0)
+        first.cancel()  # client déconnecté
+        await asyncio.sleep(0)
+        release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == _payload(10)
+    assert cache._get_memory("etag-1") == _payload(10)
+
+
+def test_failed_load_is_not_cached_and_retried(cache):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        if len(calls) == 1:
+            raise IOError("db down")
+        return _payload(10)
+
+    async def scenario():
+        with pytest.raises(IOError):
+            await cache.get_or_load("etag-1", load)
+        return await cache.get_or_load("etag-1", load)
+
+    assert asyncio.run(scenario()) == _payload(10)
+    assert len(calls) == 2
+
+
+def test_memory_lru_is_bounded_in_bytes(cache):
+    for key in ("a", "b", "c"):
+        cache.put(key, _payload(300))
+    cache._get_memory("a")  # "a" redevient le plus récent
+    cache.put("d", _payload(300))
+
+    assert cache._get_memory("b") is None
+    assert all(cache._get_memory(key) is not None for key in ("a", "c", "d"))
+    stats = cache.stats()
+    assert stats["memory_entries"] == 3 and stats["evictions"] == 1
+    assert cache._memory_bytes == 900
+
+
+def test_oversized_items_are_not_cached(cache):
+    cache.put("big", _payload(601))
+    assert cache._get_memory("big") is None
+    assert not cache.contains("big")
+
+
+def test_replacing_entry_keeps_byte_count(cache):
+    cache.put("a", _payload(300))
+    cache.put("a", _payload(100))
+    assert cache._memory_bytes == 100
+
+
+def _age(cache, key, mtime):
+    os.utime(cache._disk_path(key), (mtime, mtime))
+
+
+def test_disk_roundtrip_and_trim(disk_cache):
+    for i, key in enumerate(("a", "b", "c")):
+        disk_cache.put(key, _payload(300, fill=key.encode()))
+        _age(disk_cache, key, 1_000_000 + i)
+    assert disk_cache._get_disk("b")[0] == b"b" * 300  # lecture: "b" devient la plus récente
+
+    disk_cache.put("d", _payload(300))
+    # Au-delà du budget: suppression des moins récemment utilisés jusqu'à 90%
+    assert not os.path.exists(disk_cache._disk_path("a"))
+    assert not os.path.exists(disk_cache._disk_path("c"))
+    assert os.path.exists(disk_cache._disk_path("b"))
+    assert os.path.exists(disk_cache._disk_path("d"))
+    assert disk_cache._disk_bytes <= 900
+
+
+def test_disk_hit_is_promoted_to_memory(disk_cache):
+    disk_cache.put("a", _payload(100))
+    disk_cache._memory.clear()
+    disk_cache._memory_bytes = 0
+
+    async def load():
+        raise AssertionError("should be served from disk")
+
+    assert asyncio.run(disk_cache.get_or_load("a", load)) == _payload(100)
+    assert disk_cache._get_memory("a") == _payload(100)
+    assert disk_cache.stats()["disk_hits"] == 1
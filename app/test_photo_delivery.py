@@ -0,0 +1,170 @@
+"""
+Tests de la diffusion des photos par redirection (photo_delivery): repli sur le mode proxy,
+réutilisation des URL signées pendant TTL/2 et alignement de l'échéance CloudFront.
+
+Usage:
+    python -m pytest -q test_photo_delivery.py
+"""
+
+import datetime
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+import photo_delivery as photo_delivery_module  # noqa: E402
+from photo_delivery import PhotoDelivery  # noqa: E402
+
+TTL = 3600
+
+
+class _Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class _S3Client:
+    def __init__(self):
+        self.calls = []
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.calls.append((operation, Params, ExpiresIn))
+        return f"https://bucket.s3/{Params['Key']}?sig={len(self.calls)}"
+
+
+class _S3Store:
+    backend = "s3"
+    bucket = "photos"
+
+    def __init__(self):
+        self.client = _S3Client()
+
+    def object_key(self, key):
+        return f"blobs/{key[:2]}/{key}"
+
+
+class _CloudFrontSigner:
+    def __init__(self):
+        self.expiries = []
+
+    def generate_presigned_url(self, url, date_less_than):
+        self.expiries.append(date_less_than)
+        return f"{url}?Expires={int(date_less_than.timestamp())}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(photo_delivery_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = _S3Store()
+    monkeypatch.setattr(photo_delivery_module, "get_blob_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    def _configure(mode, cdn_domain="", key_pair_id="", private_key=""):
+        settings = photo_delivery_module.settings
+        monkeypatch.setattr(settings, "PHOTO_DELIVERY_MODE", mode)
+        monkeypatch.setattr(settings, "PHOTO_SIGNED_URL_TTL_SECONDS", TTL)
+        monkeypatch.setattr(settings, "PHOTO_CDN_DOMAIN", cdn_domain)
+        monkeypatch.setattr(settings, "PHOTO_CDN_KEY_PAIR_ID", key_pair_id)
+        monkeypatch.setattr(settings, "PHOTO_CDN_PRIVATE_KEY", private_key)
+    return _configure
+
+
+@pytest.mark.parametrize("mode, cdn_domain, backend, expected", [
+    ("presigned", "", "s3", "presigned"),
+    ("cdn", "cdn.example.com", "s3", "cdn"),
+    ("cdn", "", "s3", "proxy"),            # CDN sans domaine
+    ("presigned", "", "local", "proxy"),   # blobs non S3
+    ("presigned", "", None, "proxy"),      # pas de blob store
+    ("proxy", "cdn.example.com", "s3", "proxy"),
+    ("unknown", "", "s3", "proxy"),
+    (" CDN ", "cdn.example.com", "s3", "cdn"),
+])
+def test_mode_falls_back_to_proxy(monkeypatch, configure, mode, cdn_domain, backend, expected):
+    configure(mode, cdn_domain=cdn_domain)
+    store = None
+    if backend is not None:
+        store = _S3Store()
+        store.backend = backend
+    monkeypatch.setattr(photo_delivery_module, "get_blob_store", lambda: store)
+    assert PhotoDelivery().mode() == expected
+
+
+def test_proxy_mode_never_redirects(configure, store):
+    configure("proxy")
+    assert PhotoDelivery().redirect_for("ab" * 32, "image/jpeg") is None
+    assert store.client.calls == []
+
+
+def test_presigned_url_is_reused_until_half_ttl(configure, store, clock):
+    configure("presigned")
+    delivery = PhotoDelivery()
+    key = "ab" * 32
+
+    url, max_age = delivery.redirect_for(key, "image/webp")
+    assert store.client.calls[0][1] == {
+        "Bucket": "photos", "Key": store.object_key(key), "ResponseContentType": "image/webp",
+    }
+    assert max_age == TTL - 60
+
+    clock.now += TTL / 2 - 1
+    again, max_age = delivery.redirect_for(key, "image/webp")
+    assert again == url and len(store.client.calls) == 1
+    assert max_age == TTL // 2 + 1 - 60
+
+    # Déclinaison différente: URL distincte
+    delivery.redirect_for(key, "image/jpeg")
+    assert len(store.client.calls) == 2
+
+    clock.now += 2  # moins de TTL/2 restant: nouvelle signature
+    renewed, _ = delivery.redirect_for(key, "image/webp")
+    assert renewed != url and len(store.client.calls) == 3
+
+
+def test_signing_failure_falls_back_to_application(configure, store, clock, monkeypatch):
+    configure("presigned")
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("no credentials")
+
+    monkeypatch.setattr(store.client, "generate_presigned_url", broken)
+    assert PhotoDelivery().redirect_for("ab" * 32, "image/jpeg") is None
+
+
+def test_public_cdn_url_is_stable(configure, store, clock):
+    configure("cdn", cdn_domain="cdn.example.com/")
+    url, max_age = PhotoDelivery().redirect_for("ab" * 32, "image/jpeg")
+    assert url == f"https://cdn.example.com/{store.object_key('ab' * 32)}"
+    assert max_age == TTL
+
+
+def test_cloudfront_expiry_is_aligned_across_workers(configure, store, clock, monkeypatch):
+    configure("cdn", cdn_domain="cdn.example.com", key_pair_id="K1", private_key="pem")
+    signer = _CloudFrontSigner()
+    workers = [PhotoDelivery(), PhotoDelivery()]
+    for worker in workers:
+        monkeypatch.setattr(worker, "_cloudfront_signer", lambda: signer)
+
+    step = TTL / 2
+    clock.now = 100 * step + 10
+    first, _ = workers[0].redirect_for("ab" * 32, "image/jpeg")
+    clock.now += step / 2  # autre worker, un peu plus tard dans la même tranche
+    second, max_age = workers[1].redirect_for("ab" * 32, "image/jpeg")
+
+    assert first == second
+    expiry = signer.expiries[0]
+    assert expiry.tzinfo == datetime.timezone.utc
+    assert expiry.timestamp() % step == 0
+    assert expiry.timestamp() >= 100 * step + 10 + TTL
+    assert max_age == int(expiry.timestamp() - clock.now) - 60
@@ -0,0 +1,105 @@
+"""
+Tests de l'ordonnanceur FairShareScheduler (photo_queue): round-robin pondéré, retries différés
+et comptage de la taille.
+
+Usage:
+    python -m pytest -q test_photo_queue.py
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from photo_queue import FairShareScheduler, PhotoJob, parse_lane_weights  # noqa: E402
+
+
+def _job(event_id: int, n: int) -> PhotoJob:
+    return PhotoJob(
+        job_id=f"{event_id}-{n}",
+        event_id=event_id,
+        photographer_id=1,
+        temp_path=f"/tmp/{event_id}-{n}.jpg",
+        filename=f"{n}.jpg",
+        original_filename=f"{n}.jpg",
+    )
+
+
+def test_round_robin_between_events():
+    scheduler = FairShareScheduler(maxsize=100)
+    for n in range(3):
+        assert scheduler.put(_job(1, n))
+    assert scheduler.put(_job(2, 0))
+    order = [scheduler.get(timeout=0.1).event_id for _ in range(4)]
+    assert order == [1, 2, 1, 1]
+    assert scheduler.qsize() == 0
+
+
+def test_weight_serves_lane_several_times_per_turn():
+    scheduler = FairShareScheduler(maxsize=100)
+    scheduler.set_weight("event:1", 2)
+    for n in range(4):
+        scheduler.put(_job(1, n))
+        scheduler.put(_job(2, n))
+    order = [scheduler.get(timeout=0.1).event_id for _ in range(6)]
+    assert order == [1, 1, 2, 1, 1, 2]
+
+
+def test_weights_from_setting():
+    assert parse_lane_weights(" event:12=3, Photographer:4=2 ,,event:7=0") == {
+        "event:12": 3, "photographer:4": 2, "event:7": 1,
+    }
+    assert parse_lane_weights("event:x=2,foo:1=2,event:1,event:2=abc") == {}
+    assert parse_lane_weights(None) == {}
+
+    scheduler = FairShareScheduler(maxsize=100, weights={"event:2": 3})
+    for n in range(4):
+        scheduler.put(_job(1, n))
+        scheduler.put(_job(2, n))
+    order = [scheduler.get(timeout=0.1).event_id for _ in range(5)]
+    assert order == [1, 2, 2, 2, 1]
+    assert scheduler.lane_stats()["event:2"]["weight"] == 3
+
+
+def test_put_refused_when_full():
+    scheduler = FairShareScheduler(maxsize=2)
+    assert scheduler.put(_job(1, 0))
+    assert scheduler.put(_job(1, 1))
+    assert not scheduler.put(_job(1, 2))
+
+
+def test_delayed_retry_keeps_size_consistent():
+    scheduler = FairShareScheduler(maxsize=2)
+    scheduler.put(_job(1, 0))
+    job = scheduler.get(timeout=0.1)
+    assert scheduler.qsize() == 0
+
+    scheduler.put_delayed(job, 0.01)
+    time.sleep(0.02)
+    assert scheduler.get(timeout=0.5) is job
+    # Le retry repassé par une sous-file ne doit pas rendre la taille négative
+    assert scheduler.qsize() == 0
+
+    # La borne reste effective après le retry
+    assert scheduler.put(_job(1, 1))
+    assert scheduler.put(_job(1, 2))
+    assert not scheduler.put(_job(1, 3))
+
+
+def test_promoted_retry_counts_in_size_until_dispatched():
+    scheduler = FairShareScheduler(maxsize=10)
+    scheduler.put_delayed(_job(1, 0), 0.0)
+    scheduler.put(_job(2, 0))
+    first = scheduler.get(timeout=0.5)
+    assert scheduler.qsize() == 1
+    second = scheduler.get(timeout=0.5)
+    assert {first.event_id, second.event_id} == {1, 2}
+    assert scheduler.qsize() == 0
+
+
+def test_get_times_out_and_close_unblocks():
+    scheduler = FairShareScheduler(maxsize=10)
+    assert scheduler.get(timeout=0.01) is None
+    scheduler.close()
+    assert scheduler.get() is None
@@ -0,0 +1,49 @@
+"""
+Tests de la négociation du format des photos (photo_variants.negotiate_format) selon
+l'en-tête Accept.
+
+Usage:
+    python -m pytest -q test_photo_variants.py
+"""
+
+import pytest
+
+for _module in ("PIL", "sqlalchemy", "pydantic_settings"):
+    pytest.importorskip(_module)
+
+import photo_variants  # noqa: E402
+from photo_variants import negotiate_format  # noqa: E402
+
+
+@pytest.fixture
+def formats(monkeypatch):
+    """Formats activés indépendants des encodeurs présents sur la machine de test."""
+    def _set(*enabled):
+        monkeypatch.setattr(photo_variants, "_ENABLED_FORMATS", tuple(enabled))
+    _set("avif", "webp")
+    return _set
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "avif"),
+    ("image/webp,*/*", "webp"),
+    ("IMAGE/WEBP", "webp"),
+    ("image/avif;q=0,image/webp", "webp"),
+    ("image/avif;q=abc,image/webp;q=0.5", "webp"),
+    ("image/*,*/*;q=0.8", "jpeg"),  # jokers seuls: JPEG
+    ("image/jpeg", "jpeg"),
+    ("", "jpeg"),
+    (None, "jpeg"),
+])
+def test_negotiate_format(formats, accept, expected):
+    assert negotiate_format(accept) == expected
+
+
+def test_preference_follows_enabled_order(formats):
+    formats("webp", "avif")
+    assert negotiate_format("image/avif,image/webp") == "webp"
+
+
+def test_no_enabled_format_serves_jpeg(formats):
+    formats()
+    assert negotiate_format("image/avif,image/webp") == "jpeg"
@@ -0,0 +1,212 @@
+"""
+Tests du worker photo (photo_worker_sqs): répartition d'un lot reçu sur les threads libres,
+heartbeat de visibilité, acquittements groupés et cache des contextes d'événement.
+
+Usage:
+    python -m pytest -q test_photo_worker_sqs.py
+"""
+
+import json
+import sys
+import time
+import types
+
+import pytest
+
+for _module in ("boto3", "sqlalchemy", "PIL", "numpy", "pydantic_settings"):
+    pytest.importorskip(_module)
+
+import photo_worker_sqs  # noqa: E402
+from job_queue import SQS_MAX_BATCH  # noqa: E402
+from photo_worker_sqs import PhotoWorkerSQS  # noqa: E402
+
+
+def _message(n, event_id):
+    body = {"photo_id": n, "event_id": event_id, "s3_key": f"raw/{n}.jpg"}
+    return {"MessageId": f"m{n}", "ReceiptHandle": f"h{n}", "Body": json.dumps(body)}
+
+
+def _handles(task):
+    return [message["ReceiptHandle"] for _event_id, items in task for message, _body in items]
+
+
+@pytest.mark.parametrize("event_ids, free_threads", [
+    (list(range(10)), 4),      # plus d'événements que de threads
+    ([1] * 10, 4),             # un seul événement découpé
+    ([1] * 8 + [2, 3], 4),     # gros groupe + petits groupes
+    ([1, 2], 4),
+    ([1] * 3, 10),
+    (list(range(10)), 0),
+])
+def test_plan_never_exceeds_free_threads(event_ids, free_threads):
+    messages = [_message(n, event_id) for n, event_id in enumerate(event_ids)]
+    tasks = PhotoWorkerSQS._plan_chunks(messages, free_threads)
+
+    assert 1 <= len(tasks) <= max(1, free_threads)
+    handles = [handle for task in tasks for handle in _handles(task)]
+    assert sorted(handles) == sorted(m["ReceiptHandle"] for m in messages)
+    for task in tasks:
+        for event_id, items in task:
+            assert {body["event_id"] for _message, body in items} == {event_id}
+
+
+def test_plan_spreads_single_event_over_free_threads():
+    tasks = PhotoWorkerSQS._plan_chunks([_message(n, 1) for n in range(10)], 4)
+    assert sorted(len(_handles(task)) for task in tasks) == [1, 3, 3, 3]
+
+
+def test_plan_balances_many_events():
+    messages = [_message(n, 1) for n in range(4)] + [_message(n, n) for n in range(10, 16)]
+    tasks = PhotoWorkerSQS._plan_chunks(messages, 2)
+    assert sorted(len(_handles(task)) for task in tasks) == [5, 5]
+
+
+def test_plan_groups_malformed_messages():
+    messages = [_message(1, 7), {"MessageId": "bad", "ReceiptHandle": "hx", "Body": "not json"}]
+    tasks = PhotoWorkerSQS._plan_chunks(messages, 4)
+    assert {event_id for task in tasks for event_id, _items in task} == {None, 7}
+
+
+class _RecordingQueue:
+    def __init__(self, fail_visibility=(), failed_deletes=None):
+        self.visibility = []
+        self.deletes = []
+        self.fail_visibility = set(fail_visibility)
+        self.failed_deletes = failed_deletes
+
+    def change_visibility(self, handle, timeout):
+        if handle in self.fail_visibility:
+            raise RuntimeError("expired receipt handle")
+        self.visibility.append((handle, timeout))
+
+    def delete_batch(self, handles):
+        self.deletes.append(list(handles))
+        if isinstance(self.failed_deletes, Exception):
+            raise self.failed_deletes
+        return self.failed_deletes or []
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    queue = _RecordingQueue()
+    monkeypatch.setattr(PhotoWorkerSQS, "queue", property(lambda self: queue))
+    monkeypatch.setattr(photo_worker_sqs.settings, "PHOTO_SQS_HEARTBEAT_SECONDS", 60)
+    monkeypatch.setattr(photo_worker_sqs.settings, "PHOTO_SQS_VISIBILITY_TIMEOUT", 300)
+    instance = PhotoWorkerSQS()
+    instance.test_queue = queue
+    return instance
+
+
+def _run_one_heartbeat(worker, monkeypatch):
+    def fake_sleep(_seconds):
+        worker._running = False  # une seule itération
+
+    monkeypatch.setattr(photo_worker_sqs.time, "sleep", fake_sleep)
+    worker._running = True
+    worker._heartbeat_loop()
+
+
+def test_heartbeat_extends_only_messages_close_to_expiry(worker, monkeypatch):
+    now = time.time()
+    worker._inflight = {
+        "due": {"message_id": "m1", "visible_until": now + 10},
+        "later": {"message_id": "m2", "visible_until": now + 1000},
+    }
+    _run_one_heartbeat(worker, monkeypatch)
+
+    assert worker.test_queue.visibility == [("due", 300)]
+    assert worker._inflight["due"]["visible_until"] >= now + 299
+    assert worker._inflight["later"]["visible_until"] == now + 1000
+
+
+def test_heartbeat_failure_keeps_deadline_and_flushes_acks(worker, monkeypatch):
+    now = time.time()
+    worker.test_queue.fail_visibility = {"due"}
+    worker._inflight = {"due": {"message_id": "m1", "visible_until": now + 10}}
+    worker._ack("done-1")
+    _run_one_heartbeat(worker, monkeypatch)
+
+    assert worker.test_queue.visibility == []
+    assert worker._inflight["due"]["visible_until"] == now + 10
+    assert worker.test_queue.deletes == [["done-1"]]
+
+
+def test_acks_are_sent_by_full_batches(worker):
+    for n in range(SQS_MAX_BATCH - 1):
+        worker._ack(f"h{n}")
+    assert worker.test_queue.deletes == []
+    worker._ack(None)  # ignoré
+    worker._ack("last")
+    assert worker.test_queue.deletes == [[f"h{n}" for n in range(SQS_MAX_BATCH - 1)] + ["last"]]
+    assert worker.get_stats()["pending_acks"] == 0
+
+
+def test_flush_acks_survives_delete_errors(worker):
+    worker.test_queue.failed_deletes = RuntimeError("throttled")
+    worker._ack("h1")
+    worker._flush_acks()
+    # Pas de nouvelle tentative: le message redélivré sera ignoré (photo déjà DONE)
+    worker._flush_acks()
+    assert worker.test_queue.deletes == [["h1"]]
+    assert worker.get_stats()["pending_acks"] == 0
+
+
+class _Recognizer:
+    def __init__(self):
+        self.prepared = []
+
+    def prepare_event_for_batch(self, event_id, db):
+        self.prepared.append(event_id)
+        return {"collection": f"event_{event_id}", "allowed_user_ids": {1}}
+
+    def _get_allowed_event_user_ids(self, event_id, db):
+        return {1, 2}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def recognizer(monkeypatch):
+    recognizer = _Recognizer()
+    monkeypatch.setitem(sys.modules, "recognizer_factory", types.SimpleNamespace(get_face_recognizer=lambda: recognizer))
+    monkeypatch.setattr(photo_worker_sqs.settings, "PHOTO_WORKER_EVENT_CONTEXT_TTL", 60)
+    return recognizer
+
+
+def test_event_context_is_reused_within_ttl(worker, recognizer, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(photo_worker_sqs, "time", clock)
+    first = worker._get_event_context(1, None)
+    clock.now += 30
+    second = worker._get_event_context(1, None)
+    assert recognizer.prepared == [1]
+    assert first["allowed_user_ids"] == {1}
+    # Invités relus à chaque groupe, le reste du contexte est partagé
+    assert second == {"collection": "event_1", "allowed_user_ids": {1, 2}}
+
+
+def test_expired_contexts_and_their_locks_are_pruned(worker, recognizer, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(photo_worker_sqs, "time", clock)
+    for event_id in range(1, 51):
+        worker._get_event_context(event_id, None)
+    assert len(worker._event_contexts) == len(worker._event_context_locks) == 50
+
+    clock.now += 61
+    worker._get_event_context(99, None)
+    assert set(worker._event_contexts) == {99}
+    assert set(worker._event_context_locks) == {99}
+
+    # Un verrou tenu (préparation en cours) n'est jamais retiré
+    worker._event_context_locks[7] = held = photo_worker_sqs.threading.Lock()
+    held.acquire()
+    clock.now += 61
+    worker._get_event_context(100, None)
+    assert set(worker._event_context_locks) == {7, 100}
+    held.release()
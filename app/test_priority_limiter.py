@@ -0,0 +1,110 @@
+"""
+Tests des classes de priorité et du limiteur à slots réservés (priority_limiter).
+
+Usage:
+    python -m pytest -q test_priority_limiter.py
+"""
+
+import threading
+import time
+
+from priority_limiter import (
+    BULK,
+    INTERACTIVE,
+    MAINTENANCE,
+    PriorityExecutor,
+    PriorityLimiter,
+    bind_priority,
+    current_priority,
+    priority_context,
+)
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_priority_context_nests_and_defaults_to_bulk():
+    assert current_priority() == BULK
+    with priority_context(INTERACTIVE):
+        assert current_priority() == INTERACTIVE
+        with priority_context(MAINTENANCE):
+            assert current_priority() == MAINTENANCE
+        assert current_priority() == INTERACTIVE
+    with priority_context("unknown"):
+        assert current_priority() == BULK
+    assert current_priority() == BULK
+
+
+def test_bind_priority_carries_class_to_other_thread():
+    seen = []
+    with priority_context(INTERACTIVE):
+        fn = bind_priority(lambda: seen.append(current_priority()))
+    thread = threading.Thread(target=fn)
+    thread.start()
+    thread.join()
+    assert seen == [INTERACTIVE]
+
+
+def test_total_covers_reserved_slots():
+    limiter = PriorityLimiter("t", total=1, reserved={INTERACTIVE: 1, BULK: 1})
+    assert limiter.total == 2
+    assert limiter.shared == 0
+
+
+def test_reserved_slot_available_while_bulk_holds_shared():
+    limiter = PriorityLimiter("t", total=3, reserved={INTERACTIVE: 1})
+    bulk_tokens = [limiter.acquire(BULK, timeout=0.1) for _ in range(2)]
+    assert bulk_tokens == ["shared", "shared"]
+    assert limiter.acquire(BULK, timeout=0.05) is None
+    assert limiter.acquire(INTERACTIVE, timeout=0.05) == "reserved"
+    stats = limiter.stats()
+    assert stats["classes"][BULK]["timeouts"] == 1
+    assert stats["classes"][INTERACTIVE]["reserved_in_use"] == 1
+
+
+def test_released_shared_slot_goes_to_interactive_first():
+    limiter = PriorityLimiter("t", total=1)
+    held = limiter.acquire(BULK)
+    order = []
+
+    def waiter(cls):
+        token = limiter.acquire(cls, timeout=2.0)
+        order.append(cls)
+        limiter.release(cls, token)
+
+    bulk = threading.Thread(target=waiter, args=(BULK,))
+    bulk.start()
+    assert _wait_until(lambda: limiter.stats()["classes"][BULK]["waiting"] == 1)
+    interactive = threading.Thread(target=waiter, args=(INTERACTIVE,))
+    interactive.start()
+    assert _wait_until(lambda: limiter.stats()["classes"][INTERACTIVE]["waiting"] == 1)
+
+    limiter.release(BULK, held)
+    bulk.join(2.0)
+    interactive.join(2.0)
+    assert order == [INTERACTIVE, BULK]
+
+
+def test_slot_context_releases_and_reports_timeout():
+    limiter = PriorityLimiter("t", total=1)
+    with limiter.slot(BULK) as acquired:
+        assert acquired
+        with limiter.slot(MAINTENANCE, timeout=0.01) as nested:
+            assert not nested
+    assert limiter.stats()["shared_in_use"] == 0
+    assert limiter.stats()["classes"][MAINTENANCE]["timeouts"] == 1
+
+
+def test_executor_runs_tasks_in_their_class():
+    executor = PriorityExecutor("t", {INTERACTIVE: 1, BULK: 1, MAINTENANCE: 1})
+    try:
+        assert executor.submit(MAINTENANCE, current_priority).result(timeout=2.0) == MAINTENANCE
+        assert executor.submit("unknown", current_priority).result(timeout=2.0) == BULK
+    finally:
+        executor.shutdown()
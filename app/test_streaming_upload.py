@@ -0,0 +1,161 @@
+"""
+Tests de l'ingestion en flux (streaming_upload): reconnaissance du format par signature,
+découpage multipart par morceaux et envoi S3 par parts.
+
+Usage:
+    python -m pytest -q test_streaming_upload.py
+"""
+
+import hashlib
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+
+import streaming_upload  # noqa: E402
+from streaming_upload import MultipartStream, S3StreamingWriter, sniff_image_type  # noqa: E402
+
+
+@pytest.mark.parametrize("header, expected", [
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF\x00", ("image/jpeg", "jpg")),
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", ("image/png", "png")),
+    (b"RIFF\x24\x00\x00\x00WEBPVP8 ", ("image/webp", "webp")),
+    (b"GIF89a\x01\x00\x01\x00", ("image/gif", "gif")),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00", ("image/heic", "heic")),
+    (b"\x00\x00\x00\x1cftypmif1\x00\x00\x00\x00", ("image/heic", "heic")),
+    (b"\x00\x00\x00\x1cftypavif\x00\x00\x00\x00", ("image/avif", "avif")),
+    (b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00", None),  # vidéo
+    (b"%PDF-1.7\n", None),
+    (b"", None),
+])
+def test_sniff_image_type(header, expected):
+    assert sniff_image_type(header) == expected
+
+
+BOUNDARY = "----testboundary"
+
+
+def _multipart_body(parts):
+    body = b""
+    for headers, content in parts:
+        body += f"--{BOUNDARY}\r\n".encode() + headers.encode() + b"\r\n\r\n" + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _collect(stream, body, chunk_size):
+    events = []
+    for offset in range(0, len(body), chunk_size):
+        events.extend(stream.feed(body[offset:offset + chunk_size]))
+    events.extend(stream.close())
+    return events
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_multipart_stream_emits_fields_and_file_events(chunk_size):
+    pytest.importorskip("multipart")
+    photo = bytes(range(256)) * 20
+    body = _multipart_body([
+        ('Content-Disposition: form-data; name="upload_batch_id"', b"batch-1"),
+        ('Content-Disposition: form-data; name="files"; filename="IMG_0001.jpg"\r\nContent-Type: image/jpeg', photo),
+        ('Content-Disposition: form-data; name="files"; filename="b.png"', b"\x89PNG"),
+    ])
+    stream = MultipartStream(f"multipart/form-data; boundary={BOUNDARY}")
+    events = _collect(stream, body, chunk_size)
+
+    assert events[0] == ("field", "upload_batch_id", "batch-1")
+    starts = [e for e in events if e[0] == "file_start"]
+    assert starts == [
+        ("file_start", "files", "IMG_0001.jpg", "image/jpeg"),
+        ("file_start", "files", "b.png", "application/octet-stream"),
+    ]
+    # Données de chaque fichier entre son file_start et son file_end
+    files, current = [], None
+    for event in events:
+        if event[0] == "file_start":
+            current = bytearray()
+        elif event[0] == "data":
+            current.extend(event[1])
+        elif event[0] == "file_end":
+            files.append(bytes(current))
+    assert files == [photo, b"\x89PNG"]
+
+
+def test_multipart_stream_truncates_large_fields():
+    pytest.importorskip("multipart")
+    body = _multipart_body([('Content-Disposition: form-data; name="note"', b"x" * 100)])
+    stream = MultipartStream(f"multipart/form-data; boundary={BOUNDARY}", max_field_size=10)
+    events = _collect(stream, body, 16)
+    assert len(events) == 1 and events[0][:2] == ("field", "note")
+    assert len(events[0][2]) < 100
+
+
+def test_multipart_stream_requires_boundary():
+    pytest.importorskip("multipart")
+    with pytest.raises(ValueError):
+        MultipartStream("multipart/form-data")
+
+
+class _RecordingS3Client:
+    """Client S3 minimal: enregistre les appels du writer."""
+
+    def __init__(self):
+        self.calls = []
+        self.parts = []
+
+    def put_object(self, **kwargs):
+        self.calls.append(("put_object", len(kwargs["Body"])))
+
+    def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create_multipart_upload",))
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, **kwargs):
+        self.calls.append(("upload_part", kwargs["PartNumber"], len(kwargs["Body"])))
+        self.parts.append(kwargs["Body"])
+        return {"ETag": f'"etag-{kwargs["PartNumber"]}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.calls.append(("complete_multipart_upload", len(kwargs["MultipartUpload"]["Parts"])))
+
+    def abort_multipart_upload(self, **kwargs):
+        self.calls.append(("abort_multipart_upload",))
+
+
+def test_small_file_uses_single_put():
+    client = _RecordingS3Client()
+    writer = S3StreamingWriter(client, "bucket", "raw/1.jpg")
+    assert not writer.write(b"abc")
+    result = writer.complete()
+    assert client.calls == [("put_object", 3)]
+    assert result == {"size": 3, "sha256": hashlib.sha256(b"abc").hexdigest(), "parts": 1}
+
+
+def test_large_file_is_sent_in_parts():
+    size = streaming_upload.S3_MIN_PART_SIZE
+    data = b"\x01" * (2 * size + 123)
+    client = _RecordingS3Client()
+    writer = S3StreamingWriter(client, "bucket", "raw/2.jpg", chunk_size=size)
+    for offset in range(0, len(data), 1 << 20):
+        if writer.write(data[offset:offset + (1 << 20)]):
+            writer.flush()
+    result = writer.complete()
+    assert client.calls == [
+        ("create_multipart_upload",),
+        ("upload_part", 1, size),
+        ("upload_part", 2, size),
+        ("upload_part", 3, 123),
+        ("complete_multipart_upload", 3),
+    ]
+    assert b"".join(client.parts) == data
+    assert result["size"] == len(data) and result["parts"] == 3
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_abort_after_first_part():
+    size = streaming_upload.S3_MIN_PART_SIZE
+    client = _RecordingS3Client()
+    writer = S3StreamingWriter(client, "bucket", "raw/3.jpg", chunk_size=size)
+    assert writer.write(b"\x00" * size)
+    writer.flush()
+    writer.abort()
+    assert client.calls[-1] == ("abort_multipart_upload",)
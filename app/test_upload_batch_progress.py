@@ -0,0 +1,62 @@
+"""
+Tests de la progression des lots d'upload par compteurs (upload_batch_progress).
+
+Usage:
+    python -m pytest -q test_upload_batch_progress.py
+"""
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from upload_batch_progress import _batch_status, transition_deltas  # noqa: E402
+
+
+@pytest.mark.parametrize("prev_status, new_status, expected", [
+    ("PENDING", "DONE", (1, 1, 0)),
+    ("PROCESSING", "DONE", (1, 1, 0)),
+    (None, "DONE", (1, 1, 0)),
+    ("PENDING", "FAILED", (1, 0, 1)),
+    ("PROCESSING", "FAILED", (1, 0, 1)),
+    ("FAILED", "DONE", (0, 1, -1)),
+    ("FAILED", "FAILED", (0, 0, 0)),
+    ("DONE", "DONE", (0, 0, 0)),
+    ("DONE", "FAILED", (0, 0, 0)),
+    ("PENDING", "PROCESSING", (0, 0, 0)),
+    ("FAILED", "PROCESSING", (0, 0, 0)),
+])
+def test_transition_deltas(prev_status, new_status, expected):
+    assert transition_deltas(prev_status, new_status) == expected
+
+
+def test_retry_after_failure_keeps_processed_count():
+    processed = success = error = 0
+    for prev, new in [("PENDING", "FAILED"), ("FAILED", "DONE")]:
+        d_processed, d_success, d_error = transition_deltas(prev, new)
+        processed += d_processed
+        success += d_success
+        error += d_error
+    assert (processed, success, error) == (1, 1, 0)
+
+
+@pytest.mark.parametrize("counters, expected", [
+    ((10, 0, 0, 0), ("PENDING", False)),
+    ((10, 4, 4, 0), ("PROCESSING", False)),
+    ((10, 10, 10, 0), ("DONE", True)),
+    ((10, 10, 7, 3), ("PARTIAL", True)),
+    ((10, 10, 0, 10), ("FAILED", True)),
+    ((0, 0, 0, 0), ("PENDING", False)),
+    ((0, 3, 3, 0), ("PROCESSING", False)),
+])
+def test_batch_status(counters, expected):
+    assert _batch_status(*counters) == expected
+
+
+def test_duplicates_counted_in_reserved_total_do_not_complete_early():
+    # Requête 1: 10 fichiers dont 3 doublons, requête 2: 10 fichiers (total réservé 20)
+    total = 10 + 10
+    processed = success = 3  # doublons de la requête 1, comptés à l'upload
+    for _ in range(7 + 10 - 1):
+        processed, success = processed + 1, success + 1
+        assert _batch_status(total, processed, success, 0) == ("PROCESSING", False)
+    assert _batch_status(total, processed + 1, success + 1, 0) == ("DONE", True)
@@ -0,0 +1,116 @@
+"""
+Tests de l'archive ZIP stored en flux (zip_stream): disposition annoncée, lecture par
+plage (reprise Range) et relecture par zipfile, y compris en ZIP64.
+
+Usage:
+    python -m pytest -q test_zip_stream.py
+"""
+
+import datetime
+import io
+import zipfile
+import zlib
+
+import pytest
+
+import zip_stream
+from zip_stream import StoredZip, ZipEntry
+
+
+def _entries(payloads):
+    modified = datetime.datetime(2024, 6, 1, 14, 30, 12)
+    return [
+        ZipEntry(name, len(data), zlib.crc32(data), modified, ref=data)
+        for name, data in payloads
+    ]
+
+
+def _read_slice(entry, start, stop):
+    data = entry.ref
+    # Morceaux volontairement petits pour traverser les frontières de segments
+    for offset in range(start, stop, 7):
+        yield data[offset:min(offset + 7, stop)]
+
+
+def _build(archive):
+    return b"".join(archive.iter_range(0, archive.size - 1, _read_slice))
+
+
+PAYLOADS = [
+    ("0001_mariage.jpg", b"\xff\xd8" + bytes(range(256)) * 3),
+    ("0002_église é.jpg", b"second photo payload"),
+    ("0003_vide.jpg", b""),
+]
+
+
+def test_archive_matches_announced_size_and_reads_back():
+    archive = StoredZip(_entries(PAYLOADS))
+    data = _build(archive)
+    assert len(data) == archive.size
+    assert not archive.zip64
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [name for name, _ in PAYLOADS]
+        for name, payload in PAYLOADS:
+            info = zf.getinfo(name)
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.date_time == (2024, 6, 1, 14, 30, 12)
+            assert zf.read(name) == payload
+
+
+def test_iter_range_returns_exact_slices():
+    archive = StoredZip(_entries(PAYLOADS))
+    full = _build(archive)
+    boundaries = sorted(set(archive.offsets + [archive.cd_offset, archive.cd_offset + archive.cd_size]))
+    points = {0, 1, archive.size - 1}
+    for b in boundaries:
+        points.update({max(0, b - 1), b, min(archive.size - 1, b + 1)})
+    points = sorted(points)
+    for start in points:
+        for end in points:
+            if end < start:
+                continue
+            assert b"".join(archive.iter_range(start, end, _read_slice)) == full[start:end + 1]
+
+
+def test_resume_from_middle_of_entry_reads_only_needed_bytes():
+    archive = StoredZip(_entries(PAYLOADS))
+    requested = []
+
+    def read_slice(entry, start, stop):
+        requested.append((entry.name, start, stop))
+        return _read_slice(entry, start, stop)
+
+    start = archive.offsets[0] + 100
+    list(archive.iter_range(start, archive.offsets[1] - 1, read_slice))
+    header_size = zip_stream.LOCAL_HEADER.size + len(PAYLOADS[0][0].encode("utf-8"))
+    assert requested == [(PAYLOADS[0][0], 100 - header_size, len(PAYLOADS[0][1]))]
+
+
+def test_empty_archive_is_valid():
+    archive = StoredZip([])
+    data = _build(archive)
+    assert len(data) == archive.size == zip_stream.END_RECORD.size
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == []
+
+
+def test_zip64_when_offsets_exceed_limit(monkeypatch):
+    # Limite abaissée: les offsets des dernières entrées passent en ZIP64
+    monkeypatch.setattr(zip_stream, "ZIP64_LIMIT", 800)
+    archive = StoredZip(_entries(PAYLOADS))
+    assert archive.zip64
+    data = _build(archive)
+    assert len(data) == archive.size
+    assert data[-zip_stream.END_RECORD.size:][:4] == b"PK\x05\x06"
+    assert b"PK\x06\x06" in data and b"PK\x06\x07" in data
+
+
+def test_entry_too_large_is_rejected():
+    with pytest.raises(ValueError):
+        StoredZip([ZipEntry("big.jpg", zip_stream.ZIP64_LIMIT, 0, None)])
+
+
+def test_dos_time_clamps_before_1980():
+    entry = ZipEntry("old.jpg", 0, 0, datetime.datetime(1975, 5, 5))
+    assert entry.dos_time() == (0, (1 << 5) | 1)
@@ -0,0 +1,146 @@
+"""
+Progression des lots d'upload photographe (photographer_upload_batches) par compteurs.
+
+Chaque changement de statut d'une photo d'un lot se traduit par un UPDATE atomique
+    processed_count = processed_count + :d, success_count = ..., error_count = ...
+exécuté dans la même transaction que le changement de statut de la photo. L'état du lot
+(status, completed_at) est déduit des compteurs renvoyés (RETURNING), sans relire les
+photos du lot: O(1) par photo au lieu de O(taille du lot).
+
+Transitions comptées (statut précédent -> nouveau statut):
+    - PENDING/PROCESSING -> DONE:   processed +1, success +1
+    - PENDING/PROCESSING -> FAILED: processed +1, error +1
+    - FAILED -> DONE (retry):       success +1, error -1
+    - autres:                       aucun changement
+
+Les doublons et les fichiers rejetés à l'upload comptent directement dans processed_count;
+le total du lot est réservé par requête sur le compteur reserved_photos (reserve_batch_total).
+
+Les fonctions ne commitent pas: l'appelant commit la transaction.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, update, func
+from sqlalchemy.orm import Session
+
+from models import PhotographerUploadBatch, PhotoProcessingStatus
+
+
+_DONE = PhotoProcessingStatus.DONE.value
+_FAILED = PhotoProcessingStatus.FAILED.value
+
+
+def transition_deltas(prev_status: Optional[str], new_status: str) -> Tuple[int, int, int]:
+    """Retourne (processed, success, error) à ajouter pour une transition de statut."""
+    if prev_status == _DONE or prev_status == new_status:
+        return (0, 0, 0)
+    if prev_status == _FAILED:
+        return (0, 1, -1) if new_status == _DONE else (0, 0, 0)
+    if new_status == _DONE:
+        return (1, 1, 0)
+    if new_status == _FAILED:
+        return (1, 0, 1)
+    return (0, 0, 0)
+
+
+def _batch_status(total: int, processed: int, success: int, error: int) -> Tuple[str, bool]:
+    is_completed = total > 0 and processed >= total
+    if is_completed and error == 0:
+        return "DONE", True
+    if is_completed and error > 0 and success > 0:
+        return "PARTIAL", True
+    if is_completed and success == 0 and error > 0:
+        return "FAILED", True
+    return ("PENDING" if processed == 0 else "PROCESSING"), is_completed
+
+
+def apply_batch_deltas(db: Session, batch_id: str, processed: int = 0, success: int = 0,
+                       error: int = 0) -> Optional[Dict]:
+    """
+    Applique des deltas de compteurs au lot (UPDATE atomique) et met à jour son statut.
+
+    Retourne l'état du lot après mise à jour (None si lot inconnu).
+    """
+    if not batch_id:
+        return None
+    table = PhotographerUploadBatch.__table__
+    row = db.execute(
+        update(table)
+        .where(table.c.upload_batch_id == batch_id)
+        .values(
+            processed_count=table.c.processed_count + int(processed),
+            success_count=table.c.success_count + int(success),
+            error_count=table.c.error_count + int(error),
+        )
+        .returning(
+            table.c.total_photos,
+            table.c.processed_count,
+            table.c.success_count,
+            table.c.error_count,
+            table.c.completed_at,
+            table.c.photographer_id,
+        )
+    ).first()
+    if row is None:
+        return None
+
+    total, processed_count, success_count, error_count, completed_at, photographer_id = (
+        int(row[0] or 0), int(row[1] or 0), int(row[2] or 0), int(row[3] or 0), row[4], row[5]
+    )
+    status, is_completed = _batch_status(total, processed_count, success_count, error_count)
+    if is_completed:
+        completed_at = completed_at or datetime.utcnow()
+    else:
+        completed_at = None
+    db.execute(
+        update(table)
+        .where(table.c.upload_batch_id == batch_id)
+        .values(status=status, completed_at=completed_at)
+    )
+
+    print(
+        f"[UPLOAD-BATCH] progress batch_id={batch_id} total={total} "
+        f"processed={processed_count} success={success_count} error={error_count} status={status}"
+    )
+    if is_completed:
+        print(f"[UPLOAD-BATCH] completed batch_id={batch_id} status={status}")
+
+    return {
+        "batch_id": batch_id,
+        "photographer_id": photographer_id,
+        "total_photos": total,
+        "processed_count": processed_count,
+        "success_count": success_count,
+        "error_count": error_count,
+        "status": status,
+        "completed": is_completed,
+    }
+
+
+def reserve_batch_total(db: Session, batch_id: str, incoming: int) -> None:
+    """
+    Ajoute les fichiers de la requête en cours aux fichiers annoncés du lot (reserved_photos)
+    et garantit total_photos >= reserved_photos (total non déclaré par le client, ou lot
+    envoyé en plusieurs requêtes). Appelé une fois par requête d'upload, avant la mise en
+    file, pour que la complétion soit détectable par les compteurs dès la dernière photo
+    traitée.
+
+    Chaque fichier annoncé est compté une fois dans processed_count (photo traitée, échec ou
+    doublon): la réservation se fait donc sur le compteur du lot et non sur les photos
+    rattachées, que les doublons ne créent pas. Un seul UPDATE (verrou de ligne): les
+    requêtes concurrentes d'un même lot s'additionnent.
+    """
+    if not batch_id:
+        return
+    table = PhotographerUploadBatch.__table__
+    reserved = func.coalesce(table.c.reserved_photos, 0) + max(0, int(incoming))
+    db.execute(
+        update(table)
+        .where(table.c.upload_batch_id == batch_id)
+        .values(
+            reserved_photos=reserved,
+            total_photos=case((table.c.total_photos < reserved, reserved), else_=table.c.total_photos),
+        )
+    )
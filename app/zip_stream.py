@@ -0,0 +1,168 @@
+"""
+Archive ZIP « stored » (sans compression) produite en flux, à disposition déterministe.
+
+Les JPEG sont déjà compressés: les entrées sont stockées telles quelles (méthode 0), ce qui
+rend la taille et la position de chaque octet de l'archive calculables à l'avance à partir
+de (nom, taille, CRC-32, date) de chaque entrée. On peut donc:
+    - annoncer Content-Length avant d'envoyer le premier octet
+    - servir n'importe quelle plage (reprise via Range) en ne lisant que les entrées touchées
+    - garder une mémoire constante (en-têtes générés à la demande, données lues par morceaux)
+
+ZIP64 est utilisé uniquement si nécessaire (archive > 4 Go ou plus de 65535 entrées);
+les en-têtes locaux ne portent pas de descripteur de données (CRC connu à l'avance).
+
+Usage:
+    from zip_stream import ZipEntry, StoredZip
+
+    archive = StoredZip([ZipEntry("0001_photo.jpg", size, crc, uploaded_at, ref=photo_id)])
+    for chunk in archive.iter_range(0, archive.size - 1, read_slice):
+        ...
+"""
+
+import datetime
+import struct
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_COUNT_LIMIT = 0xFFFF
+FLAG_UTF8 = 0x0800
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+ZIP64_EXTRA_OFFSET = struct.Struct("<HHQ")
+ZIP64_END = struct.Struct("<IQHHIIQQQQ")
+ZIP64_LOCATOR = struct.Struct("<IIQI")
+END_RECORD = struct.Struct("<IHHHHIIH")
+
+
+class ZipEntry:
+    """Entrée de l'archive: nom, taille et CRC-32 des données, date, référence de la source."""
+
+    __slots__ = ("name", "size", "crc32", "modified", "ref", "_name_bytes")
+
+    def __init__(self, name: str, size: int, crc32: int, modified: Optional[datetime.datetime], ref: Any = None):
+        self.name = name
+        self.size = int(size)
+        self.crc32 = int(crc32) & 0xFFFFFFFF
+        self.modified = modified
+        self.ref = ref
+        self._name_bytes = name.encode("utf-8")
+
+    def dos_time(self):
+        dt = self.modified or datetime.datetime(1980, 1, 1)
+        if dt.year < 1980:
+            dt = datetime.datetime(1980, 1, 1)
+        time_field = (dt.hour << 11) | (dt.minute << 5) | (dt.second // 2)
+        date_field = ((dt.year - 1980) << 9) | (dt.month << 5) | dt.day
+        return time_field, date_field
+
+
+class StoredZip:
+    """Disposition complète d'une archive stored: offsets, taille totale, lecture par plage."""
+
+    def __init__(self, entries: List[ZipEntry]):
+        self.entries = entries
+        self.offsets: List[int] = []
+        offset = 0
+        for entry in entries:
+            if entry.size >= ZIP64_LIMIT:
+                raise ValueError(f"Entry too large for a stored archive: {entry.name}")
+            self.offsets.append(offset)
+            offset += LOCAL_HEADER.size + len(entry._name_bytes) + entry.size
+        self.cd_offset = offset
+        self.cd_size = sum(self._central_size(i) for i in range(len(entries)))
+        self.zip64 = (
+            self.cd_offset >= ZIP64_LIMIT
+            or self.cd_offset + self.cd_size >= ZIP64_LIMIT
+            or len(entries) >= ZIP_COUNT_LIMIT
+        )
+        self.end_size = END_RECORD.size + (ZIP64_END.size + ZIP64_LOCATOR.size if self.zip64 else 0)
+        self.size = self.cd_offset + self.cd_size + self.end_size
+
+    # ---------- Enregistrements ----------
+
+    def _version(self) -> int:
+        return 45 if self.zip64 else 20
+
+    def _central_size(self, index: int) -> int:
+        extra = ZIP64_EXTRA_OFFSET.size if self.offsets[index] >= ZIP64_LIMIT else 0
+        return CENTRAL_HEADER.size + len(self.entries[index]._name_bytes) + extra
+
+    def local_header(self, index: int) -> bytes:
+        entry = self.entries[index]
+        time_field, date_field = entry.dos_time()
+        return LOCAL_HEADER.pack(
+            0x04034B50, self._version(), FLAG_UTF8, 0, time_field, date_field,
+            entry.crc32, entry.size, entry.size, len(entry._name_bytes), 0,
+        ) + entry._name_bytes
+
+    def central_header(self, index: int) -> bytes:
+        entry = self.entries[index]
+        time_field, date_field = entry.dos_time()
+        offset = self.offsets[index]
+        extra = b""
+        if offset >= ZIP64_LIMIT:
+            extra = ZIP64_EXTRA_OFFSET.pack(0x0001, 8, offset)
+            offset = ZIP64_LIMIT
+        return CENTRAL_HEADER.pack(
+            0x02014B50, self._version(), self._version(), FLAG_UTF8, 0, time_field, date_field,
+            entry.crc32, entry.size, entry.size, len(entry._name_bytes), len(extra), 0, 0, 0, 0, offset,
+        ) + entry._name_bytes + extra
+
+    def end_records(self) -> bytes:
+        count = len(self.entries)
+        records = b""
+        if self.zip64:
+            zip64_end_offset = self.cd_offset + self.cd_size
+            records += ZIP64_END.pack(
+                0x06064B50, ZIP64_END.size - 12, 45, 45, 0, 0,
+                count, count, self.cd_size, self.cd_offset,
+            )
+            records += ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_end_offset, 1)
+        return records + END_RECORD.pack(
+            0x06054B50, 0, 0,
+            min(count, ZIP_COUNT_LIMIT), min(count, ZIP_COUNT_LIMIT),
+            min(self.cd_size, ZIP64_LIMIT), min(self.cd_offset, ZIP64_LIMIT), 0,
+        )
+
+    # ---------- Lecture par plage ----------
+
+    def _segments(self) -> Iterator[tuple]:
+        """(début, longueur, producteur) dans l'ordre de l'archive; producteur(a, b) -> morceaux de [a, b)."""
+        for index, entry in enumerate(self.entries):
+            start = self.offsets[index]
+            header_size = LOCAL_HEADER.size + len(entry._name_bytes)
+            yield start, header_size, ("header", index)
+            yield start + header_size, entry.size, ("data", index)
+        position = self.cd_offset
+        for index in range(len(self.entries)):
+            size = self._central_size(index)
+            yield position, size, ("central", index)
+            position += size
+        yield position, self.end_size, ("end", None)
+
+    def iter_range(self, start: int, end: int,
+                   read_slice: Callable[[ZipEntry, int, int], Iterable[bytes]]) -> Iterator[bytes]:
+        """
+        Octets [start, end] (fin incluse) de l'archive. read_slice(entrée, a, b) fournit les
+        octets [a, b) des données d'une entrée, par morceaux.
+        """
+        stop = end + 1
+        for seg_start, seg_size, (kind, index) in self._segments():
+            seg_end = seg_start + seg_size
+            if seg_end <= start or seg_size == 0:
+                continue
+            if seg_start >= stop:
+                break
+            lo, hi = max(start, seg_start) - seg_start, min(stop, seg_end) - seg_start
+            if kind == "data":
+                yield from read_slice(self.entries[index], lo, hi)
+                continue
+            if kind == "header":
+                record = self.local_header(index)
+            elif kind == "central":
+                record = self.central_header(index)
+            else:
+                record = self.end_records()
+            yield record[lo:hi]